@@ -2,7 +2,6 @@ from functools import lru_cache
 import os
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
-from google.cloud import bigquery
 
 # Load environment variables
 load_dotenv()
@@ -15,6 +14,64 @@ class Settings(BaseSettings):
     google_application_credentials: str = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "")
     bigquery_project_id: str = os.getenv("BIGQUERY_PROJECT_ID", "")
     bigquery_dataset: str = os.getenv("BIGQUERY_DATASET", "")
+    bigquery_http_pool_size: int = int(os.getenv("BIGQUERY_HTTP_POOL_SIZE", "32"))
+    bigquery_max_concurrent_queries: int = int(os.getenv("BIGQUERY_MAX_CONCURRENT_QUERIES", "16"))
+    bigquery_graph_max_workers: int = int(os.getenv("BIGQUERY_GRAPH_MAX_WORKERS", "16"))
+    bigquery_fused_metrics: bool = os.getenv("BIGQUERY_FUSED_METRICS", "true").lower() in ["true", "1", "t", "yes"]
+    bigquery_stream_page_size: int = int(os.getenv("BIGQUERY_STREAM_PAGE_SIZE", "1000"))
+    # Results with at least this many rows (or cells) are downloaded via the Storage Read API
+    bigquery_storage_api_enabled: bool = os.getenv("BIGQUERY_STORAGE_API_ENABLED", "true").lower() in ["true", "1", "t", "yes"]
+    bigquery_storage_api_min_rows: int = int(os.getenv("BIGQUERY_STORAGE_API_MIN_ROWS", "5000"))
+    bigquery_storage_api_min_cells: int = int(os.getenv("BIGQUERY_STORAGE_API_MIN_CELLS", "200000"))
+    # Agencies per batched (IN UNNEST(@agency_ids)) query when warming per-agency queries
+    bigquery_agency_batch_size: int = int(os.getenv("BIGQUERY_AGENCY_BATCH_SIZE", "15"))
+    # During preloads, answer a query for a predefined time period for all of them in one scan (and cache the others)
+    bigquery_multi_period_prefetch: bool = os.getenv("BIGQUERY_MULTI_PERIOD_PREFETCH", "true").lower() in ["true", "1", "t", "yes"]
+    # Serve agency names and details from the in-memory agency dimension instead of joining the agencies table
+    bigquery_agency_dimension: bool = os.getenv("BIGQUERY_AGENCY_DIMENSION", "true").lower() in ["true", "1", "t", "yes"]
+    agency_dimension_refresh_seconds: int = int(os.getenv("AGENCY_DIMENSION_REFRESH_SECONDS", "3600"))
+    # Fraction of named queries whose faster paths are compared against plain BigQuery in the background (0 = off)
+    bigquery_shadow_sample_rate: float = float(os.getenv("BIGQUERY_SHADOW_SAMPLE_RATE", "0"))
+    bigquery_shadow_max_pending: int = int(os.getenv("BIGQUERY_SHADOW_MAX_PENDING", "2"))
+    
+    # Query result cache settings (in-memory, shared by all requests)
+    query_result_cache_enabled: bool = os.getenv("QUERY_RESULT_CACHE_ENABLED", "true").lower() in ["true", "1", "t", "yes"]
+    query_result_cache_max_entries: int = int(os.getenv("QUERY_RESULT_CACHE_MAX_ENTRIES", "2000"))
+    query_result_cache_max_mb: int = int(os.getenv("QUERY_RESULT_CACHE_MAX_MB", "256"))
+    query_result_cache_ttl_seconds: int = int(os.getenv("QUERY_RESULT_CACHE_TTL_SECONDS", "3600"))
+    
+    # Deterministic BigQuery job IDs (dedup of identical queries across processes)
+    bigquery_deterministic_job_ids: bool = os.getenv("BIGQUERY_DETERMINISTIC_JOB_IDS", "false").lower() in ["true", "1", "t", "yes"]
+    bigquery_job_id_bucket_seconds: int = int(os.getenv("BIGQUERY_JOB_ID_BUCKET_SECONDS", "300"))
+    
+    # Scan cost guard: maximum_bytes_billed per query (0 = no default limit)
+    bigquery_max_bytes_billed: int = int(os.getenv("BIGQUERY_MAX_BYTES_BILLED", "0"))
+    # JSON object mapping query names (or SQL hashes) to a fixed byte limit
+    bigquery_bytes_billed_overrides: str = os.getenv("BIGQUERY_BYTES_BILLED_OVERRIDES", "")
+    # Profiled queries are limited to their largest dry-run estimate times this factor (0 = off)
+    bigquery_bytes_billed_headroom: float = float(os.getenv("BIGQUERY_BYTES_BILLED_HEADROOM", "3.0"))
+    
+    # Admission control: BigQuery jobs running at once, and slots only interactive requests may use
+    bigquery_admission_max_concurrent: int = int(os.getenv("BIGQUERY_ADMISSION_MAX_CONCURRENT", "12"))
+    bigquery_admission_interactive_reserve: int = int(os.getenv("BIGQUERY_ADMISSION_INTERACTIVE_RESERVE", "4"))
+    # Submit jobs of preload requests with BATCH instead of INTERACTIVE priority
+    bigquery_preload_batch_priority: bool = os.getenv("BIGQUERY_PRELOAD_BATCH_PRIORITY", "true").lower() in ["true", "1", "t", "yes"]
+    
+    # Circuit breaker per query family: consecutive failed or slow jobs that open it (0 = off),
+    # seconds after which a job counts as slow, and seconds before an open circuit is probed
+    bigquery_circuit_failure_threshold: int = int(os.getenv("BIGQUERY_CIRCUIT_FAILURE_THRESHOLD", "5"))
+    bigquery_circuit_slow_seconds: float = float(os.getenv("BIGQUERY_CIRCUIT_SLOW_SECONDS", "60"))
+    bigquery_circuit_open_seconds: float = float(os.getenv("BIGQUERY_CIRCUIT_OPEN_SECONDS", "30"))
+    # Hours expired cache entries are kept to answer requests while BigQuery is unavailable
+    cache_stale_retention_hours: int = int(os.getenv("CACHE_STALE_RETENTION_HOURS", "168"))
+    # In-process memory tier in front of the SQLite response cache (0 entries = off); the TTL
+    # bounds how long responses cached by other worker processes go unnoticed
+    response_memory_cache_max_entries: int = int(os.getenv("RESPONSE_MEMORY_CACHE_MAX_ENTRIES", "1000"))
+    response_memory_cache_max_mb: int = int(os.getenv("RESPONSE_MEMORY_CACHE_MAX_MB", "128"))
+    response_memory_cache_ttl_seconds: int = int(os.getenv("RESPONSE_MEMORY_CACHE_TTL_SECONDS", "300"))
+    # Storage of cached responses: json (text), zlib or zstd (compressed; zstd needs zstandard).
+    # Existing entries are migrated to it on startup
+    cache_storage_format: str = os.getenv("CACHE_STORAGE_FORMAT", "zlib")
     
     # API settings
     api_host: str = os.getenv("API_HOST", "0.0.0.0")
@@ -46,58 +103,12 @@ def get_settings():
 
 def get_bigquery_client():
     """
-    Create and return a BigQuery client
+    Return the process-wide BigQuery client.
+    Credentials are resolved once and the client is reused for all requests.
     """
-    settings = get_settings()
-    project_id = settings.bigquery_project_id or "gcpxbixpflegehilfesenioren"
-    
-    # Look for any JSON file in the current and parent directories that might be credentials
-    current_dir = os.getcwd()
-    json_files_current = [f for f in os.listdir(current_dir) if f.endswith('.json')]
-    json_files_parent = []
-    parent_dir = os.path.join(current_dir, "..")
-    if os.path.exists(parent_dir):
-        json_files_parent = [os.path.join("..", f) for f in os.listdir(parent_dir) if f.endswith('.json')]
-    
-    # Try multiple potential credential paths
-    credential_paths = [
-        # Windows project directory path - any JSON file
-        *[os.path.join(current_dir, f) for f in json_files_current],
-        # Parent directory path - any JSON file
-        *[os.path.join(current_dir, f) for f in json_files_parent],
-        # Standard name in project directory
-        os.path.join(current_dir, "credentials.json"),
-        # Linux path from other project
-        "/home/PfS/gcpxbixpflegehilfesenioren-a47c654480a8.json",
-        # Environment variable path
-        settings.google_application_credentials
-    ]
-    
-    # Try each path until one works
-    last_error = None
-    for path in credential_paths:
-        if not path:  # Skip empty paths
-            continue
-            
-        try:
-            # Try with explicit path
-            client = bigquery.Client.from_service_account_json(
-                path, 
-                project=project_id
-            )
-            print(f"Successfully connected to BigQuery using credentials at: {path}")
-            return client
-        except FileNotFoundError:
-            # Try next path
-            last_error = f"Credentials file not found at: {path}"
-            continue
-        except Exception as e:
-            # Log the error but try next path
-            last_error = f"Error with credentials at {path}: {str(e)}"
-            continue
+    from .utils.bigquery_client_registry import get_client_registry
     
-    # If we get here, all paths failed
-    raise ValueError(f"Failed to create BigQuery client. Last error: {last_error}")
+    return get_client_registry().get_client()
 
 
 async def get_db():
@@ -1,11 +1,22 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import os
+import asyncio
 import logging
 from dotenv import load_dotenv
 from .routes import agencies, quotas, reaction_times, profile_quality, quotas_with_reasons, problematic_stays, cache, care_stays, cv_quality
 from .dependencies import get_settings
 from .utils.database_connection import initialize_database
+from .utils.bigquery_client_registry import get_client_registry
+from .services.query_cost_service import get_query_cost_service
+from .services.cache_writer import get_cache_writer
+from .utils.query_metrics import get_query_metrics
+from .utils.query_fingerprint import get_fingerprint_registry
+from .utils.admission_control import QUERY_PRIORITY_HEADER, parse_priority, query_priority
+from .utils.job_labels import PRELOAD_SESSION_HEADER, job_labels
+from .utils.cache_decorator import STALE_AGE_HEADER, tracking_stale_responses
+from .utils.agency_dimension import get_agency_dimension
 
 # Load environment variables
 load_dotenv()
@@ -28,8 +39,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[STALE_AGE_HEADER],
 )
 
+# Requests sent by the preload routes carry their priority class and preload
+# session; everything else is interactive. Responses answered with an expired
+# cache entry while BigQuery is unavailable report its age in a header.
+@app.middleware("http")
+async def query_priority_middleware(request: Request, call_next):
+    with query_priority(parse_priority(request.headers.get(QUERY_PRIORITY_HEADER))), \
+            job_labels(preload_session=request.headers.get(PRELOAD_SESSION_HEADER)), \
+            tracking_stale_responses() as stale:
+        response = await call_next(request)
+    if "age_seconds" in stale:
+        response.headers[STALE_AGE_HEADER] = str(stale["age_seconds"])
+    return response
+
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
@@ -45,6 +70,29 @@ async def startup_event():
             logger.info("Database connection test successful")
         else:
             logger.error("Database connection test failed")
+        
+        # Compress entries cached in a previous storage format in the background
+        asyncio.get_running_loop().run_in_executor(
+            None, db_manager.migrate_cached_data_storage, get_settings().cache_storage_format
+        )
+        
+        # Warm up the shared BigQuery client in the background so the first
+        # request does not pay for credential discovery
+        asyncio.get_running_loop().run_in_executor(None, get_client_registry().warm_up)
+        
+        # Load the agency dimension in the background, so agency names are in memory
+        if get_settings().bigquery_agency_dimension:
+            asyncio.get_running_loop().run_in_executor(None, get_agency_dimension().warm_up)
+        
+        # Enforce the maximum_bytes_billed limits of the last query cost profile
+        try:
+            await get_query_cost_service().refresh_limits()
+        except Exception as e:
+            logger.warning(f"Could not load query byte limits: {e}")
+        
+        # Hash the registered queries before the first cache lookup checks
+        # the SQL fingerprints of the cached responses
+        await asyncio.get_running_loop().run_in_executor(None, get_fingerprint_registry().load)
             
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
@@ -54,6 +102,10 @@ async def startup_event():
 async def shutdown_event():
     """Clean up database connections on shutdown."""
     try:
+        # Write the queued cache entries before the connections are closed
+        if not await get_cache_writer().flush():
+            logger.warning("Cache writer queue was not drained before shutdown")
+        
         from .utils.database_connection import get_database_manager
         db_manager = get_database_manager()
         db_manager.close()
@@ -79,6 +131,13 @@ async def health_check():
     """
     return {"status": "ok", "message": "API is running"}
 
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Per-query BigQuery latency, slot time, bytes and cache hits in Prometheus text format
+    """
+    return PlainTextResponse(get_query_metrics().render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     """
@@ -2,4 +2,4 @@
 from .pydantic_models import *
 
 # Database models package
-from .database import Base, CachedData, PreloadSession, DataFreshness
\ No newline at end of file
+from .database import Base, CachedData, PreloadSession, DataFreshness, QueryCostProfile
\ No newline at end of file
@@ -3,16 +3,47 @@ Database models for persistent cache storage.
 Replaces in-memory cache with SQLite-based persistent storage.
 """
 
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Index, UniqueConstraint
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Boolean, DateTime, Index, UniqueConstraint, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 import json
 import hashlib
+import zlib
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:  # zstandard is optional, "zstd" falls back to zlib without it
+    zstandard = None
+    HAS_ZSTD = False
 
 Base = declarative_base()
 
+# Storage formats of cached payloads
+STORAGE_JSON = "json"  # JSON text in the data column (rows without storage_format)
+STORAGE_ZLIB = "zlib"  # zlib-compressed compact JSON in the payload column
+STORAGE_ZSTD = "zstd"  # zstd-compressed compact JSON in the payload column
+STORAGE_FORMATS = (STORAGE_JSON, STORAGE_ZLIB, STORAGE_ZSTD)
+
+
+def resolve_storage_format(storage_format: Optional[str]) -> str:
+    """Map a configured storage format to one that is available."""
+    storage_format = (storage_format or STORAGE_JSON).lower()
+    if storage_format not in STORAGE_FORMATS:
+        raise ValueError(f"Unknown cache storage format '{storage_format}', expected one of {STORAGE_FORMATS}")
+    if storage_format == STORAGE_ZSTD and not HAS_ZSTD:
+        return STORAGE_ZLIB
+    return storage_format
+
+
+def _json_serializer(obj):
+    """Custom JSON serializer for datetime and other objects."""
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    return str(obj)
+
 
 class CachedData(Base):
     """
@@ -27,11 +58,14 @@ class CachedData(Base):
     agency_id = Column(String(100), nullable=True, index=True)
     time_period = Column(String(50), nullable=True, index=True)
     parameters = Column(Text, nullable=True)  # JSON string for additional parameters
-    data = Column(Text, nullable=False)  # JSON string of API response
+    data = Column(Text, nullable=False)  # JSON string of API response (empty for compressed payloads)
     created_at = Column(DateTime, default=func.now(), nullable=False)
     expires_at = Column(DateTime, nullable=True, index=True)
     is_preloaded = Column(Boolean, default=False, nullable=False)
     data_hash = Column(String(64), nullable=True)  # SHA256 hash for data integrity
+    query_fingerprint = Column(Text, nullable=True)  # JSON: endpoint version and SQL hashes of the queries used
+    payload = Column(LargeBinary, nullable=True)  # Compressed compact JSON of API response
+    storage_format = Column(String(10), nullable=True)  # STORAGE_* constant, NULL = json
     
     # Composite indexes for common query patterns
     __table_args__ = (
@@ -40,21 +74,51 @@ class CachedData(Base):
         Index('idx_expires_preloaded', 'expires_at', 'is_preloaded'),
     )
 
-    def set_data(self, data_dict: Dict[Any, Any]) -> None:
-        """Set data and compute hash for integrity checking."""
-        def json_serializer(obj):
-            """Custom JSON serializer for datetime and other objects."""
-            if hasattr(obj, 'isoformat'):
-                return obj.isoformat()
-            return str(obj)
+    def set_data(self, data_dict: Dict[Any, Any], storage_format: str = STORAGE_JSON) -> str:
+        """
+        Set data and compute hash for integrity checking.
         
-        json_data = json.dumps(data_dict, sort_keys=True, default=json_serializer)
-        self.data = json_data
-        self.data_hash = hashlib.sha256(json_data.encode()).hexdigest()
+        Args:
+            data_dict: Data to store
+            storage_format: STORAGE_JSON stores JSON text; STORAGE_ZLIB and
+                STORAGE_ZSTD store compressed compact JSON, hashed as stored
+        
+        Returns:
+            The JSON encoding of the data
+        """
+        storage_format = resolve_storage_format(storage_format)
+        if storage_format == STORAGE_JSON:
+            json_data = json.dumps(data_dict, sort_keys=True, default=_json_serializer)
+            self.data = json_data
+            self.payload = None
+            self.storage_format = None
+            self.data_hash = hashlib.sha256(json_data.encode()).hexdigest()
+            return json_data
+        
+        json_data = json.dumps(data_dict, separators=(",", ":"), default=_json_serializer)
+        if storage_format == STORAGE_ZSTD:
+            payload = zstandard.ZstdCompressor(level=3).compress(json_data.encode())
+        else:
+            payload = zlib.compress(json_data.encode(), 6)
+        self.data = ""
+        self.payload = payload
+        self.storage_format = storage_format
+        self.data_hash = hashlib.sha256(payload).hexdigest()
+        return json_data
+
+    def get_json(self) -> str:
+        """Get the JSON encoding of the data, decompressing it if needed."""
+        if self.storage_format == STORAGE_ZLIB:
+            return zlib.decompress(self.payload).decode()
+        if self.storage_format == STORAGE_ZSTD:
+            if not HAS_ZSTD:
+                raise RuntimeError("Cache entry is zstd-compressed but zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(self.payload).decode()
+        return self.data
 
     def get_data(self) -> Dict[Any, Any]:
         """Get data as dictionary."""
-        return json.loads(self.data)
+        return json.loads(self.get_json())
 
     def set_parameters(self, params: Dict[str, Any]) -> None:
         """Set parameters as JSON string."""
@@ -183,14 +247,16 @@ class DataFreshness(Base):
         return max(0, self.freshness_duration_hours - age)
 
     @classmethod
-    def get_freshness_duration(cls, data_type: str, time_period: str) -> int:
+    def get_freshness_duration(cls, data_type: Optional[str], time_period: Optional[str], default: int = 24) -> int:
         """
         Get appropriate freshness duration based on data type and time period.
+        This is the freshness policy cached endpoint responses expire by.
         
         Rules:
         - quotas: 24h for historical periods, 4h for current periods
         - reaction_times: 12h for historical, 2h for current
         - problematic_stays: 24h for historical, 6h for current
+        - care_stays: 48h for historical, 6h for current
         - all_time: 7 days (weekly refresh)
         """
         freshness_rules = {
@@ -205,10 +271,14 @@ class DataFreshness(Base):
             "problematic_stays": {
                 "last_quarter": 24, "last_year": 48, "last_month": 24, "all_time": 168,
                 "current_quarter": 6, "current_year": 8, "current_month": 4
+            },
+            "care_stays": {
+                "last_quarter": 48, "last_year": 48, "last_month": 48, "all_time": 168,
+                "current_quarter": 6, "current_year": 8, "current_month": 4
             }
         }
         
-        return freshness_rules.get(data_type, {}).get(time_period, 24)  # Default: 24 hours
+        return freshness_rules.get(data_type, {}).get(time_period, default)  # Default: 24 hours
 
     def __repr__(self):
         return f"<DataFreshness(data_type='{self.data_type}', agency_id='{self.agency_id}', is_fresh={self.is_fresh}, age={self.get_age_hours():.1f}h)>"
@@ -280,4 +350,43 @@ class CVAnalysisResult(Base):
         return self.overall_score / 10.0 if self.overall_score is not None else 5.0
     
     def __repr__(self):
-        return f"<CVAnalysisResult(care_stay_id='{self.care_stay_id}', agency_id='{self.agency_id}', overall_score={self.get_overall_score()})>"
\ No newline at end of file
+        return f"<CVAnalysisResult(care_stay_id='{self.care_stay_id}', agency_id='{self.agency_id}', overall_score={self.get_overall_score()})>"
+
+
+class QueryCostProfile(Base):
+    """
+    Stores dry-run scan estimates of BigQuery queries.
+    One row per query and time period of a profiling run; the history shows
+    how the bytes processed by each query develop over time.
+    """
+    __tablename__ = "query_cost_profiles"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String(64), nullable=False, index=True)  # Groups the rows of one profiling run
+    query_name = Column(String(200), nullable=False, index=True)
+    source = Column(String(50), nullable=False)  # query_manager or constant
+    sql_hash = Column(String(64), nullable=False, index=True)  # SHA256 of the normalized SQL
+    time_period = Column(String(50), nullable=True)
+    total_bytes_processed = Column(BigInteger, nullable=True)  # None if the dry run failed
+    error = Column(Text, nullable=True)
+    profiled_at = Column(DateTime, default=func.now(), nullable=False, index=True)
+    
+    __table_args__ = (
+        Index('idx_query_cost_history', 'query_name', 'time_period', 'profiled_at'),
+    )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert profile row to dictionary."""
+        return {
+            "run_id": self.run_id,
+            "query_name": self.query_name,
+            "source": self.source,
+            "sql_hash": self.sql_hash,
+            "time_period": self.time_period,
+            "total_bytes_processed": self.total_bytes_processed,
+            "error": self.error,
+            "profiled_at": self.profiled_at.isoformat() if self.profiled_at else None
+        }
+
+    def __repr__(self):
+        return f"<QueryCostProfile(query_name='{self.query_name}', time_period='{self.time_period}', bytes={self.total_bytes_processed})>"
\ No newline at end of file
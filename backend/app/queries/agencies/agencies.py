@@ -62,4 +62,46 @@ FROM
     `gcpxbixpflegehilfesenioren.PflegehilfeSeniore_BI.agencies`
 WHERE 
     _id = @agency_id
-"""
\ No newline at end of file
+"""
+
+# Agency dimension: details of all agencies, loaded into memory (see utils/agency_dimension.py)
+GET_AGENCY_DIMENSION = """
+WITH active_stays_last_30_days AS (
+    SELECT DISTINCT
+        c.agency_id
+    FROM
+        `gcpxbixpflegehilfesenioren.PflegehilfeSeniore_BI.care_stays` cs
+    JOIN
+        `gcpxbixpflegehilfesenioren.PflegehilfeSeniore_BI.contracts` c ON cs.contract_id = c._id
+    WHERE
+        cs.arrival IS NOT NULL
+        AND SAFE.TIMESTAMP(cs.arrival) IS NOT NULL
+        AND SAFE.TIMESTAMP(cs.arrival) <= CURRENT_TIMESTAMP()
+        AND (
+             cs.departure IS NULL
+             OR (SAFE.TIMESTAMP(cs.departure) IS NOT NULL
+                 AND SAFE.TIMESTAMP(cs.departure) >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 30 DAY)
+                )
+            )
+)
+SELECT
+    a._id AS agency_id,
+    a.name AS agency_name,
+    a.created_at,
+    a.active AS status,
+    a.jurisdiction AS location,
+    a.homepage AS website,
+    a.nationalities,
+    a.contract_duration,
+    a.health_insurance,
+    a.liability_insurance,
+    a.accident_insurance,
+    a.hours_per_week,
+    a.night_care,
+    a.ger_minimum_wage,
+    act.agency_id IS NOT NULL AS is_active_recently
+FROM
+    `gcpxbixpflegehilfesenioren.PflegehilfeSeniore_BI.agencies` a
+LEFT JOIN
+    active_stays_last_30_days act ON a._id = act.agency_id
+"""
@@ -2,7 +2,7 @@ from typing import Dict, Any, List
 from google.cloud import bigquery
 from datetime import datetime
 
-from ...utils.bigquery_connection import get_bigquery_client
+from ...utils.bigquery_connection import get_bigquery_client, run_in_query_executor
 
 async def get_communications_for_stay(care_stay_id: str) -> Dict[str, Any]:
     """
@@ -79,11 +79,15 @@ async def get_communications_for_stay(care_stay_id: str) -> Dict[str, Any]:
     )
     
     # Execute both queries
-    email_job = client.query(email_query, job_config=job_config)
-    ticket_job = client.query(ticket_query, job_config=job_config)
+    email_job = await run_in_query_executor(client.query, email_query, job_config=job_config)
+    ticket_job = await run_in_query_executor(client.query, ticket_query, job_config=job_config)
+    
+    # Wait for both jobs off the event loop
+    email_rows = await run_in_query_executor(lambda: list(email_job.result()))
+    ticket_rows = await run_in_query_executor(lambda: list(ticket_job.result()))
     
     emails = []
-    for row in email_job.result():
+    for row in email_rows:
         emails.append({
             "id": row.email_id,
             "subject": row.subject,
@@ -96,7 +100,7 @@ async def get_communications_for_stay(care_stay_id: str) -> Dict[str, Any]:
         })
     
     tickets = []
-    for row in ticket_job.result():
+    for row in ticket_rows:
         tickets.append({
             "id": row.ticket_id,
             "subject": row.subject,
@@ -2,7 +2,7 @@ from typing import List, Dict, Any, Optional
 from google.cloud import bigquery
 from datetime import datetime
 
-from ...utils.bigquery_connection import get_bigquery_client
+from ...utils.bigquery_connection import get_bigquery_client, run_in_query_executor
 
 
 def interpret_german_score(score: str) -> str:
@@ -149,8 +149,8 @@ async def get_care_stays_for_cv_analysis(
     OFFSET {offset}
     """
     
-    query_job = client.query(query)
-    results = query_job.result()
+    query_job = await run_in_query_executor(client.query, query)
+    results = await run_in_query_executor(lambda: list(query_job.result()))
     
     care_stays = []
     for row in results:
@@ -256,8 +256,8 @@ async def get_care_stay_details(care_stay_id: str) -> Dict[str, Any]:
         ]
     )
     
-    query_job = client.query(query, job_config=job_config)
-    results = list(query_job.result())
+    query_job = await run_in_query_executor(client.query, query, job_config=job_config)
+    results = await run_in_query_executor(lambda: list(query_job.result()))
     
     if not results:
         raise ValueError(f"Care stay {care_stay_id} not found")
@@ -830,6 +830,94 @@ GROUP BY
     a.name
 """
 
+# Fused care stay counts
+# Die PV-, Angenommen-, Bestätigt- und Anreise-Queries oben scannen alle denselben
+# Join care_stays ⋈ contracts ⋈ agencies und unterscheiden sich nur im Filter.
+# Sie werden hier als (Alias, Filter) über eine gemeinsame Basisrelation deklariert
+# und von utils/metric_compiler.py zu einer einzigen COUNTIF-Query kompiliert.
+# Die Aliase entsprechen den Ergebnisspalten der einzelnen Queries.
+# Jede Deklaration muss zur jeweiligen Query kompilieren (compile_metric_query);
+# tests/test_metric_compiler.py prüft das, Änderungen gehören in beide.
+CARE_STAYS_BASE_RELATION = {
+    "from": """`gcpxbixpflegehilfesenioren.PflegehilfeSeniore_BI.care_stays` cs
+    JOIN 
+        `gcpxbixpflegehilfesenioren.PflegehilfeSeniore_BI.contracts` c ON cs.contract_id = c._id
+    JOIN 
+        `gcpxbixpflegehilfesenioren.PflegehilfeSeniore_BI.agencies` a ON c.agency_id = a._id""",
+    "where": """a._id = @agency_id
+        AND cs.created_at BETWEEN @start_date AND @end_date""",
+    "group_by": {"agency_name": "a.name"}
+}
+
+_REACHED_ACCEPTED = """EXISTS (
+            SELECT 1
+            FROM UNNEST(JSON_EXTRACT_ARRAY(cs.tracks)) AS track
+            WHERE JSON_EXTRACT_SCALAR(track, '$.differences.stage[1]') = 'Angenommen'
+        )"""
+
+_REACHED_ACCEPTED_FROM_STAGE = """EXISTS (
+            SELECT 1
+            FROM UNNEST(JSON_EXTRACT_ARRAY(cs.tracks)) AS track
+            WHERE JSON_EXTRACT_SCALAR(track, '$.differences.stage[0]') IS NOT NULL
+                AND JSON_EXTRACT_SCALAR(track, '$.differences.stage[1]') = 'Angenommen'
+        )"""
+
+_REACHED_CONFIRMED = """EXISTS (
+            SELECT 1
+            FROM UNNEST(JSON_EXTRACT_ARRAY(cs.tracks)) AS track
+            WHERE JSON_EXTRACT_SCALAR(track, '$.differences.stage[1]') = 'Bestätigt'
+        )"""
+
+# Angereist: Anreisedatum vorhanden, "Bestätigt" erreicht und nicht vor Anreise abgebrochen
+# (die Einsatzart steht in den einzelnen Queries zwischen Anreisedatum und Status)
+_HAS_ARRIVAL = """cs.arrival IS NOT NULL
+        AND cs.arrival != ''"""
+_CONFIRMED_NOT_CANCELLED = f"""{_REACHED_CONFIRMED}
+        AND NOT (
+            cs.stage = 'Abgebrochen' AND 
+            EXISTS (
+                SELECT 1
+                FROM UNNEST(JSON_EXTRACT_ARRAY(cs.tracks)) AS track
+                WHERE 
+                    JSON_EXTRACT_SCALAR(track, '$.differences.stage[1]') = 'Abgebrochen'
+                    AND TIMESTAMP(JSON_EXTRACT_SCALAR(track, '$.created_at')) < TIMESTAMP(cs.arrival)
+            )
+        )"""
+
+_FIRST_STAY = 'cs.is_swap = "false"'
+_FOLLOW_STAY = 'cs.is_swap = "true"'
+
+CARE_STAYS_FUSED_METRICS = [
+    # Personalvorschläge
+    {"query": "GET_PV_COUNT", "alias": "pv_count", "distinct": "cs._id",
+     "filter": "TRUE"},
+    {"query": "GET_PV_FIRST_COUNT", "alias": "pv_first_count", "distinct": "cs._id",
+     "filter": f"{_FIRST_STAY} AND cs.visor_id IS NOT NULL"},
+    {"query": "GET_PV_FOLLOW_COUNT", "alias": "pv_follow_count", "distinct": "cs._id",
+     "filter": f"{_FOLLOW_STAY} AND cs.visor_id IS NOT NULL"},
+    # Angenommen
+    {"query": "GET_ACCEPTED_CARE_STAYS", "alias": "accepted_care_stays_count", "distinct": "cs._id",
+     "filter": _REACHED_ACCEPTED},
+    {"query": "GET_ACCEPTED_FIRST_CARE_STAYS", "alias": "accepted_first_care_stays_count", "distinct": "cs._id",
+     "filter": f"{_FIRST_STAY} AND cs.visor_id IS NOT NULL AND {_REACHED_ACCEPTED_FROM_STAGE}"},
+    {"query": "GET_ACCEPTED_FOLLOW_CARE_STAYS", "alias": "accepted_follow_care_stays_count", "distinct": "cs._id",
+     "filter": f"{_FOLLOW_STAY} AND {_REACHED_ACCEPTED}"},
+    # Bestätigt
+    {"query": "GET_CONFIRMED_CARE_STAYS", "alias": "confirmed_care_stays_count", "distinct": "cs._id",
+     "filter": _REACHED_CONFIRMED},
+    {"query": "GET_CONFIRMED_FIRST_CARE_STAYS", "alias": "confirmed_first_care_stays_count", "distinct": "cs._id",
+     "filter": f"{_FIRST_STAY} AND {_REACHED_CONFIRMED}"},
+    {"query": "GET_CONFIRMED_FOLLOW_CARE_STAYS", "alias": "confirmed_follow_care_stays_count", "distinct": "cs._id",
+     "filter": f"{_FOLLOW_STAY} AND {_REACHED_CONFIRMED}"},
+    # Angereist (COUNT(*) wie in den einzelnen Queries)
+    {"query": "GET_SIMPLE_ARRIVED_ALL_CARE_STAYS", "alias": "simple_arrived_all_care_stays_count",
+     "filter": f"{_HAS_ARRIVAL} AND {_CONFIRMED_NOT_CANCELLED}"},
+    {"query": "GET_SIMPLE_ARRIVED_FIRST_CARE_STAYS", "alias": "simple_arrived_first_care_stays_count",
+     "filter": f"{_HAS_ARRIVAL} AND {_FIRST_STAY} AND {_CONFIRMED_NOT_CANCELLED}"},
+    {"query": "GET_SIMPLE_ARRIVED_FOLLOW_CARE_STAYS", "alias": "simple_arrived_follow_care_stays_count",
+     "filter": f"{_HAS_ARRIVAL} AND {_FOLLOW_STAY} AND {_CONFIRMED_NOT_CANCELLED}"}
+]
+
 # Query for all agencies conversion stats (dashboard widget)
 GET_ALL_AGENCIES_CONVERSION_STATS = """
 WITH agency_confirmed AS (
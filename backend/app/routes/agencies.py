@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
 from ..utils.query_manager import QueryManager
+from ..utils.bigquery_connection import run_in_query_executor
 from ..models import Agency, TimeFilter
 from ..dependencies import get_settings
 from ..services.database_cache_service import get_cache_service
+from ..utils.agency_dimension import get_agency_dimension
 import logging
 
 router = APIRouter()
@@ -14,6 +16,14 @@ async def get_all_agencies():
     """
     Get a list of all agencies with database caching
     """
+    # The agency dimension answers from memory, the SQLite cache is not needed
+    if get_settings().bigquery_agency_dimension:
+        try:
+            return await run_in_query_executor(get_agency_dimension().list_agencies)
+        except Exception as e:
+            logger.error(f"Error in get_all_agencies: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Failed to fetch agencies: {str(e)}")
+    
     cache_service = get_cache_service()
     endpoint = "/agencies"
     
@@ -30,7 +40,7 @@ async def get_all_agencies():
         # Cache miss - fetch fresh data
         logger.info(f"Cache miss for agencies endpoint, fetching fresh data")
         query_manager = QueryManager()
-        agencies = query_manager.get_all_agencies()
+        agencies = await run_in_query_executor(query_manager.get_all_agencies)
         
         # Save to cache (agencies data changes rarely, so cache for 48 hours)
         await cache_service.save_cached_data(
@@ -52,6 +62,16 @@ async def get_agency(agency_id: str):
     """
     Get a specific agency by ID with database caching
     """
+    if get_settings().bigquery_agency_dimension:
+        try:
+            agency = await run_in_query_executor(get_agency_dimension().get, agency_id)
+        except Exception as e:
+            logger.error(f"Error in get_agency for {agency_id}: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Failed to fetch agency: {str(e)}")
+        if not agency:
+            raise HTTPException(status_code=404, detail=f"Agency with ID {agency_id} not found")
+        return agency
+    
     cache_service = get_cache_service()
     endpoint = f"/agencies/{agency_id}"
     
@@ -68,7 +88,7 @@ async def get_agency(agency_id: str):
         # Cache miss - fetch fresh data
         logger.info(f"Cache miss for agency {agency_id}, fetching fresh data")
         query_manager = QueryManager()
-        agency = query_manager.get_agency_details(agency_id)
+        agency = await run_in_query_executor(query_manager.get_agency_details, agency_id)
         
         if not agency:
             raise HTTPException(status_code=404, detail=f"Agency with ID {agency_id} not found")
@@ -119,7 +139,7 @@ async def filter_agencies(time_filter: TimeFilter):
         query_manager = QueryManager()
         # For now, we don't use the time filter for the agencies endpoint
         # but it's here for consistency with other endpoints
-        agencies = query_manager.get_all_agencies()
+        agencies = await run_in_query_executor(query_manager.get_all_agencies)
         
         # Save to cache 
         await cache_service.save_cached_data(
@@ -12,8 +12,25 @@ import httpx
 from urllib.parse import unquote
 
 from ..services.database_cache_service import get_cache_service, DatabaseCacheService
+from ..services.cache_writer import get_cache_writer
 from ..utils.database_connection import get_async_db_session
 from ..routes.agencies import get_all_agencies
+from ..utils.bigquery_client_registry import get_client_registry
+from ..utils.query_result_cache import get_query_result_cache
+from ..utils.cache_decorator import get_single_flight_stats
+from ..utils.bigquery_connection import get_job_dedup_stats
+from ..utils.bytes_billed_guard import get_bytes_billed_guard
+from ..utils.query_fingerprint import get_fingerprint_registry
+from ..utils.circuit_breaker import get_circuit_breaker
+from ..utils.agency_dimension import get_agency_dimension
+from ..utils.shadow_execution import get_shadow_runner
+from ..services.query_cost_service import get_query_cost_service, PROFILE_TIME_PERIODS
+from ..utils.admission_control import (
+    get_admission_controller, query_priority, QUERY_PRIORITY_HEADER, PRIORITY_NAMES,
+    PRIORITY_DASHBOARD_PRELOAD, PRIORITY_COMPREHENSIVE_PRELOAD
+)
+from ..utils.job_labels import PRELOAD_SESSION_HEADER, job_labels
+from ..dependencies import get_settings
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -109,6 +126,36 @@ async def get_cache_stats():
                 }
             }
         
+        # Setup-time and reuse counters of the shared BigQuery client
+        stats['bigquery_client'] = get_client_registry().get_stats()
+        
+        # Hit/miss/eviction counters of the in-memory query result cache
+        stats['query_result_cache'] = get_query_result_cache().get_stats()
+        
+        # Requests that waited for an identical in-flight fetch instead of querying BigQuery
+        stats['single_flight'] = get_single_flight_stats()
+        
+        # Jobs submitted vs. attached to an identical job of another process
+        stats['bigquery_job_dedup'] = get_job_dedup_stats()
+        
+        # maximum_bytes_billed limits and jobs BigQuery refused because of them
+        stats['bytes_billed_guard'] = get_bytes_billed_guard().get_stats()
+        
+        # Cached responses found to be computed by SQL that changed since
+        stats['query_fingerprints'] = get_fingerprint_registry().get_stats()
+        
+        # Circuit state per query family; open circuits are answered from expired entries
+        stats['circuit_breaker'] = get_circuit_breaker().get_stats()
+        
+        # Queue depth and flush latency of the write-behind cache writer
+        stats['cache_writer'] = get_cache_writer().get_stats()
+        
+        # Size and age of the in-memory agency dimension
+        stats['agency_dimension'] = get_agency_dimension().get_stats()
+        
+        # Running and queued BigQuery jobs per priority class
+        stats['admission_control'] = get_admission_controller().get_stats()
+        
         return stats
         
     except Exception as e:
@@ -272,6 +319,22 @@ async def start_comprehensive_preload():
         raise HTTPException(status_code=500, detail=f"Failed to start comprehensive preload: {str(e)}")
 
 
+async def _warm_agency_batch(query_manager, agency_ids: List[str], time_periods: List[str], session_key: str) -> None:
+    """
+    Run the batchable per-agency queries for a batch of agencies and all
+    time periods in one scan per query, so the per-agency preload calls that
+    follow are served from the query result cache. Failures only cost the warm-up.
+    """
+    from ..utils.bigquery_connection import run_in_query_executor
+    
+    try:
+        with query_priority(PRIORITY_COMPREHENSIVE_PRELOAD), \
+                job_labels(preload_session=session_key, endpoint="warm_agency_queries"):
+            await run_in_query_executor(query_manager.warm_agency_queries, agency_ids, time_periods)
+    except Exception as e:
+        logger.warning(f"Batched warm-up for {len(agency_ids)} agencies ({', '.join(time_periods)}) failed: {e}")
+
+
 @router.post("/preload/comprehensive/execute")
 async def execute_comprehensive_preload():
     """
@@ -285,6 +348,7 @@ async def execute_comprehensive_preload():
     import asyncio
     import httpx
     from ..utils.query_manager import QueryManager
+    from ..utils.bigquery_connection import run_in_query_executor
     
     try:
         cache_service = get_cache_service()
@@ -292,7 +356,8 @@ async def execute_comprehensive_preload():
         
         # Get all agencies
         query_manager = QueryManager()
-        agencies = query_manager.get_all_agencies()
+        with query_priority(PRIORITY_COMPREHENSIVE_PRELOAD), job_labels(preload_session=session_key, endpoint="get_all_agencies"):
+            agencies = await run_in_query_executor(query_manager.get_all_agencies)
         
         # Define time periods and data types
         time_periods = ["last_quarter", "last_year", "last_month", "all_time"]
@@ -312,9 +377,28 @@ async def execute_comprehensive_preload():
         # Base URL for internal API calls
         base_url = "http://localhost:8000/api"
         
-        # Process each agency
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            for agency in agencies:
+        # Process each agency. Requests are marked as comprehensive preload, so their
+        # BigQuery jobs queue behind interactive and dashboard traffic, run with
+        # BATCH priority and are labelled with this session.
+        preload_headers = {
+            QUERY_PRIORITY_HEADER: PRIORITY_NAMES[PRIORITY_COMPREHENSIVE_PRELOAD],
+            PRELOAD_SESSION_HEADER: session_key
+        }
+        # Agencies are warmed in batches: one batched multi-period query per metric
+        # query fills the result cache for the whole batch and all periods. all_time
+        # is skipped below for the quota endpoints, so it is not warmed either.
+        batch_size = max(1, get_settings().bigquery_agency_batch_size)
+        warm_periods = [time_period for time_period in time_periods if time_period != "all_time"]
+        
+        async with httpx.AsyncClient(timeout=60.0, headers=preload_headers) as client:
+            for index, agency in enumerate(agencies):
+                if index % batch_size == 0:
+                    batch_ids = [
+                        (a.get('agency_id') or a.get('_id')) if isinstance(a, dict) else a.agency_id
+                        for a in agencies[index:index + batch_size]
+                    ]
+                    await _warm_agency_batch(query_manager, [a for a in batch_ids if a], warm_periods, session_key)
+                
                 # Handle both dict and object formats
                 if isinstance(agency, dict):
                     agency_id = agency.get('agency_id') or agency.get('_id')
@@ -423,7 +507,8 @@ async def preload_dashboard_data(
         )
         
         # Get all agencies
-        agencies = await get_all_agencies()
+        with query_priority(PRIORITY_DASHBOARD_PRELOAD), job_labels(preload_session=session_key):
+            agencies = await get_all_agencies()
         
         # Dashboard requires 3 endpoints total (not per agency)
         # 1. problematic_stays/overview (for all agencies)
@@ -449,7 +534,11 @@ async def preload_dashboard_data(
             f"/quotas/all-agencies/completion?time_period={time_period}"
         ]
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
+        preload_headers = {
+            QUERY_PRIORITY_HEADER: PRIORITY_NAMES[PRIORITY_DASHBOARD_PRELOAD],
+            PRELOAD_SESSION_HEADER: session_key
+        }
+        async with httpx.AsyncClient(timeout=60.0, headers=preload_headers) as client:
             for endpoint in dashboard_endpoints:
                 try:
                     # Make the API call
@@ -615,6 +704,9 @@ async def cleanup_expired_data():
         # Clean expired cache entries
         deleted_count = await cache_service.cleanup_expired_data()
         
+        # Drop expired in-memory query results as well
+        purged_query_results = get_query_result_cache().purge_expired()
+        
         # Clean up stuck preload sessions (running for more than 1 hour)
         async with cache_service.db_manager.get_async_session() as session:
             from datetime import datetime, timedelta
@@ -638,6 +730,7 @@ async def cleanup_expired_data():
         return {
             "message": f"Cleanup completed",
             "deleted_entries": deleted_count,
+            "purged_query_results": purged_query_results,
             "cleaned_sessions": cleaned_sessions
         }
         
@@ -663,6 +756,66 @@ async def vacuum_database():
         raise HTTPException(status_code=500, detail=f"Failed to vacuum database: {str(e)}")
 
 
+@router.post("/query-costs/profile")
+async def profile_query_costs(
+    time_period: Optional[str] = Query(None, description="Profile only this time period (default: all)"),
+    query_name: Optional[List[str]] = Query(None, description="Profile only these queries")
+):
+    """
+    Dry-run all named queries and SQL constants to record their scan size.
+    Dry runs are free; the results are stored as history and the
+    maximum_bytes_billed limits are refreshed from them.
+    """
+    try:
+        time_periods = [time_period] if time_period else PROFILE_TIME_PERIODS
+        return await get_query_cost_service().profile_queries(time_periods, query_name)
+        
+    except Exception as e:
+        logger.error(f"Error profiling query costs: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to profile query costs: {str(e)}")
+
+
+@router.get("/query-costs")
+async def get_query_costs(
+    query_name: Optional[str] = Query(None, description="Only return the history of this query"),
+    limit: int = Query(200, ge=1, le=5000)
+):
+    """
+    Get the stored dry-run history and the currently enforced byte limits.
+    """
+    try:
+        history = await get_query_cost_service().get_history(query_name, limit)
+        
+        return {
+            "history": history,
+            "bytes_billed_guard": get_bytes_billed_guard().get_stats()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error getting query costs: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get query costs: {str(e)}")
+
+
+@router.get("/shadow-report")
+async def get_shadow_report(reset: bool = Query(False, description="Clear the collected results after returning them")):
+    """
+    Get the shadow comparison of the fused, batched, multi-period and
+    agency-dimension query paths against plain BigQuery queries: runs,
+    mismatches and latency deltas per query and path.
+    Enable sampling with BIGQUERY_SHADOW_SAMPLE_RATE.
+    """
+    try:
+        shadow_runner = get_shadow_runner()
+        report = shadow_runner.get_report()
+        if reset:
+            shadow_runner.reset()
+        return report
+        
+    except Exception as e:
+        logger.error(f"Error getting shadow report: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get shadow report: {str(e)}")
+
+
 @router.get("/data/{cache_key:path}")
 async def get_cached_data_by_key(cache_key: str):
     """
@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 
 from app.queries.care_stays.confirmed_stays import execute_confirmed_stays_query
 from app.utils.cache_decorator import cache_endpoint
+from app.utils.bigquery_connection import run_in_query_executor
 
 router = APIRouter(
     tags=["care_stays"]
@@ -62,7 +63,7 @@ def get_date_range(time_period: str) -> tuple:
 
 
 @router.get("/confirmed")
-@cache_endpoint(ttl_hours=24, key_params=['time_period', 'agency_id'], cache_key_prefix="/care_stays/confirmed")
+@cache_endpoint(key_params=['time_period', 'agency_id'], cache_key_prefix="/care_stays/confirmed")
 async def get_confirmed_stays(
     time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$"),
     agency_id: Optional[str] = Query(None, description="Filter by agency ID")
@@ -81,7 +82,7 @@ async def get_confirmed_stays(
         start_date, end_date = get_date_range(time_period)
         
         # Query ausführen
-        results = execute_confirmed_stays_query(start_date, end_date, agency_id)
+        results = await run_in_query_executor(execute_confirmed_stays_query, start_date, end_date, agency_id)
         
         # Gesamtsumme berechnen
         total_confirmed = sum(agency['confirmed_stays_count'] for agency in results)
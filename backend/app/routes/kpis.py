@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional, Dict, Any
-from ..utils.bigquery_connection import BigQueryConnection
+from ..utils.bigquery_connection import BigQueryConnection, run_in_query_executor
 from ..models import KPIData, TimeFilter, AgencyRequest, AgencyComparison
 from ..dependencies import get_settings
 import statistics
@@ -17,7 +17,7 @@ async def get_agency_kpis(
     """
     try:
         bq = BigQueryConnection()
-        kpi_data = bq.get_kpis_by_agency(agency_id, time_period)
+        kpi_data = await run_in_query_executor(bq.get_kpis_by_agency, agency_id, time_period)
         
         # If no data is found
         if not kpi_data:
@@ -34,7 +34,7 @@ async def filter_kpis(time_filter: TimeFilter):
     """
     try:
         bq = BigQueryConnection()
-        all_kpis = bq.get_all_agencies_kpis(time_filter.time_period)
+        all_kpis = await run_in_query_executor(bq.get_all_agencies_kpis, time_filter.time_period)
         return all_kpis
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to filter KPIs: {str(e)}")
@@ -48,7 +48,7 @@ async def compare_agency_kpis(request: AgencyRequest):
         bq = BigQueryConnection()
         
         # Get data for all agencies
-        all_agencies_data = bq.get_all_agencies_kpis(request.time_period)
+        all_agencies_data = await run_in_query_executor(bq.get_all_agencies_kpis, request.time_period)
         
         # Find the selected agency
         selected_agency = None
@@ -60,7 +60,7 @@ async def compare_agency_kpis(request: AgencyRequest):
         # If the selected agency is not found in the results
         if not selected_agency:
             # Try to get it separately
-            selected_agency = bq.get_kpis_by_agency(request.agency_id, request.time_period)
+            selected_agency = await run_in_query_executor(bq.get_kpis_by_agency, request.agency_id, request.time_period)
             
             # If still not found, create an empty record
             if not selected_agency:
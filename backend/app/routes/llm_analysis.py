@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional, Dict, Any
-from ..utils.bigquery_connection import BigQueryConnection
+from ..utils.bigquery_connection import BigQueryConnection, run_in_query_executor
 from ..utils.openai_integration import OpenAIIntegration
 from ..models import LLMAnalysisResult, TimeFilter, AgencyRequest, StrengthWeaknessAnalysis
 from ..dependencies import get_settings
@@ -22,7 +22,7 @@ async def get_cancellation_analysis(
         
         # Get cancellation texts from BigQuery
         # This would be actual emails, tickets, notes, etc. related to cancellations
-        cancellation_texts = bq.get_cancellation_texts(agency_id, time_period)
+        cancellation_texts = await run_in_query_executor(bq.get_cancellation_texts, agency_id, time_period)
         
         # If no texts are found, return mock data
         if not cancellation_texts or len(cancellation_texts) == 0:
@@ -73,7 +73,7 @@ async def get_violations_analysis(
         
         # Get violation texts from BigQuery
         # This would be actual emails, tickets, notes, etc. related to profile violations
-        violation_texts = bq.get_violation_texts(agency_id, time_period)
+        violation_texts = await run_in_query_executor(bq.get_violation_texts, agency_id, time_period)
         
         # If no texts are found, return mock data
         if not violation_texts or len(violation_texts) == 0:
@@ -123,9 +123,9 @@ async def get_agency_summary(
         bq = BigQueryConnection()
         
         # Get agency data
-        kpi_data = bq.get_kpis_by_agency(agency_id, time_period)
-        response_time_data = bq.get_response_times_by_agency(agency_id, time_period)
-        profile_quality_data = bq.get_profile_quality_by_agency(agency_id, time_period)
+        kpi_data = await run_in_query_executor(bq.get_kpis_by_agency, agency_id, time_period)
+        response_time_data = await run_in_query_executor(bq.get_response_times_by_agency, agency_id, time_period)
+        profile_quality_data = await run_in_query_executor(bq.get_profile_quality_by_agency, agency_id, time_period)
         
         # Get strength/weakness analysis
         strength_weakness_data = _analyze_strength_weakness(
@@ -133,7 +133,7 @@ async def get_agency_summary(
             kpi_data,
             response_time_data,
             profile_quality_data,
-            bq.get_all_agencies_kpis(time_period)
+            await run_in_query_executor(bq.get_all_agencies_kpis, time_period)
         )
         
         # Combine data for summary
@@ -172,16 +172,16 @@ async def get_strength_weakness_analysis(
         bq = BigQueryConnection()
         
         # Get KPIs
-        kpi_data = bq.get_kpis_by_agency(agency_id, time_period)
+        kpi_data = await run_in_query_executor(bq.get_kpis_by_agency, agency_id, time_period)
         
         # Get response times
-        response_time_data = bq.get_response_times_by_agency(agency_id, time_period)
+        response_time_data = await run_in_query_executor(bq.get_response_times_by_agency, agency_id, time_period)
         
         # Get profile quality
-        profile_quality_data = bq.get_profile_quality_by_agency(agency_id, time_period)
+        profile_quality_data = await run_in_query_executor(bq.get_profile_quality_by_agency, agency_id, time_period)
         
         # Get all agencies data for comparison
-        all_agencies_kpis = bq.get_all_agencies_kpis(time_period)
+        all_agencies_kpis = await run_in_query_executor(bq.get_all_agencies_kpis, time_period)
         
         # Perform strength/weakness analysis
         analysis = _analyze_strength_weakness(
@@ -1,13 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Query as QueryParam
 from typing import Dict, List, Optional, Any
 from ..utils.query_manager import QueryManager
-from ..utils.bigquery_connection import BigQueryConnection
+from ..utils.bigquery_connection import BigQueryConnection, run_in_query_executor
 from ..models import TimeFilter, AgencyRequest
 from ..dependencies import get_settings
 from ..services.database_cache_service import get_cache_service
 from ..utils.cache_decorator import cache_endpoint
+from ..utils.ndjson_stream import month_grouped_events, ndjson_response
 from ..queries.problematic_stays.queries import (
-    GET_PROBLEMATIC_STAYS_OVERVIEW,
     GET_PROBLEMATIC_STAYS_REASONS,
     GET_PROBLEMATIC_STAYS_TIME_ANALYSIS,
     GET_PROBLEMATIC_STAYS_HEATMAP,
@@ -28,7 +28,7 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.get("/overview")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'time_period'], cache_key_prefix="/problematic_stays/overview")
+@cache_endpoint(key_params=['agency_id', 'time_period'], cache_key_prefix="/problematic_stays/overview")
 async def get_problematic_stays_overview(
     agency_id: Optional[str] = QueryParam(None),
     time_period: str = QueryParam("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
@@ -54,15 +54,15 @@ async def get_problematic_stays_overview(
             
         end_date = today.strftime("%Y-%m-%d")
         
-        # Execute the query with parameters
-        connection = BigQueryConnection()
+        # Execute the query with parameters (as a named query, so preloads
+        # answer all time periods from one scan)
         query_params = {
             "agency_id": agency_id,
             "start_date": start_date,
             "end_date": end_date
         }
         
-        results = connection.execute_query(GET_PROBLEMATIC_STAYS_OVERVIEW, query_params)
+        results = await QueryManager().execute_query_async("GET_PROBLEMATIC_STAYS_OVERVIEW", query_params)
         
         # Process and format the results
         if not results or len(results) == 0:
@@ -101,7 +101,7 @@ async def get_problematic_stays_overview(
         raise HTTPException(status_code=500, detail=f"Failed to fetch problematic stays overview: {str(e)}")
 
 @router.get("/reasons")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'event_type', 'time_period'], cache_key_prefix="/problematic_stays/reasons")
+@cache_endpoint(key_params=['agency_id', 'event_type', 'time_period'], cache_key_prefix="/problematic_stays/reasons")
 async def get_problematic_stays_reasons(
     agency_id: Optional[str] = QueryParam(None),
     event_type: Optional[str] = QueryParam(None, regex="^(cancelled_before_arrival|shortened_after_arrival|)$"),
@@ -135,7 +135,7 @@ async def get_problematic_stays_reasons(
             "end_date": end_date
         }
         
-        results = connection.execute_query(GET_PROBLEMATIC_STAYS_REASONS, query_params)
+        results = await connection.execute_query_async(GET_PROBLEMATIC_STAYS_REASONS, query_params)
         
         # Process and format the results
         if not results or len(results) == 0:
@@ -174,7 +174,7 @@ async def get_problematic_stays_reasons(
         raise HTTPException(status_code=500, detail=f"Failed to fetch problematic stays reasons: {str(e)}")
 
 @router.get("/time-analysis")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'event_type', 'stay_type', 'time_period'], cache_key_prefix="/problematic-stays/time-analysis")
+@cache_endpoint(key_params=['agency_id', 'event_type', 'stay_type', 'time_period'], cache_key_prefix="/problematic-stays/time-analysis")
 async def get_problematic_stays_time_analysis(
     agency_id: Optional[str] = QueryParam(None),
     event_type: Optional[str] = QueryParam(None, regex="^(cancelled_before_arrival|shortened_after_arrival|)$"),
@@ -210,7 +210,7 @@ async def get_problematic_stays_time_analysis(
             "end_date": end_date
         }
         
-        results = connection.execute_query(GET_PROBLEMATIC_STAYS_TIME_ANALYSIS, query_params)
+        results = await connection.execute_query_async(GET_PROBLEMATIC_STAYS_TIME_ANALYSIS, query_params)
         
         # Process and format the results
         if not results or len(results) == 0:
@@ -251,7 +251,7 @@ async def get_problematic_stays_time_analysis(
         raise HTTPException(status_code=500, detail=f"Failed to fetch problematic stays time analysis: {str(e)}")
 
 @router.get("/{agency_id}/detailed")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'event_type', 'stay_type', 'time_period', 'limit'], cache_key_prefix="/problematic-stays/detailed")
+@cache_endpoint(key_params=['agency_id', 'event_type', 'stay_type', 'time_period', 'limit'], cache_key_prefix="/problematic-stays/detailed")
 async def get_problematic_stays_detailed(
     agency_id: str,
     event_type: Optional[str] = QueryParam(None, regex="^(cancelled_before_arrival|shortened_after_arrival|)$"),
@@ -322,7 +322,7 @@ async def get_problematic_stays_detailed(
             "end_date": end_date
         }
         
-        results = connection.execute_query(query, query_params)
+        results = await connection.execute_query_async(query, query_params)
         
         # Process and format the results
         detailed_data = []
@@ -349,7 +349,7 @@ async def get_problematic_stays_detailed(
         raise HTTPException(status_code=500, detail=f"Failed to fetch detailed problematic stays: {str(e)}")
 
 @router.get("/heatmap")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'event_type', 'stay_type', 'time_period'], cache_key_prefix="/problematic-stays/heatmap")
+@cache_endpoint(key_params=['agency_id', 'event_type', 'stay_type', 'time_period'], cache_key_prefix="/problematic-stays/heatmap")
 async def get_problematic_stays_heatmap(
     agency_id: Optional[str] = QueryParam(None),
     event_type: Optional[str] = QueryParam(None, regex="^(cancelled_before_arrival|shortened_after_arrival|)$"),
@@ -385,7 +385,7 @@ async def get_problematic_stays_heatmap(
             "end_date": end_date
         }
         
-        results = connection.execute_query(GET_PROBLEMATIC_STAYS_HEATMAP, query_params)
+        results = await connection.execute_query_async(GET_PROBLEMATIC_STAYS_HEATMAP, query_params)
         
         # Process and format the results
         if not results or len(results) == 0:
@@ -426,7 +426,7 @@ async def get_problematic_stays_heatmap(
         raise HTTPException(status_code=500, detail=f"Failed to fetch problematic stays heatmap: {str(e)}")
 
 @router.get("/instant-departures")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'time_period'], cache_key_prefix="/problematic-stays/instant-departures")
+@cache_endpoint(key_params=['agency_id', 'time_period'], cache_key_prefix="/problematic-stays/instant-departures")
 async def get_problematic_stays_instant_departures(
     agency_id: Optional[str] = QueryParam(None),
     time_period: str = QueryParam("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
@@ -458,7 +458,7 @@ async def get_problematic_stays_instant_departures(
             "end_date": end_date
         }
         
-        results = connection.execute_query(GET_PROBLEMATIC_STAYS_INSTANT_DEPARTURES, query_params)
+        results = await connection.execute_query_async(GET_PROBLEMATIC_STAYS_INSTANT_DEPARTURES, query_params)
         
         # Process and format the results
         if not results or len(results) == 0:
@@ -495,7 +495,7 @@ async def get_problematic_stays_instant_departures(
         raise HTTPException(status_code=500, detail=f"Failed to fetch problematic stays instant departures: {str(e)}")
 
 @router.get("/replacement-analysis")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'time_period'], cache_key_prefix="/problematic-stays/replacement-analysis")
+@cache_endpoint(key_params=['agency_id', 'time_period'], cache_key_prefix="/problematic-stays/replacement-analysis")
 async def get_problematic_stays_replacement_analysis(
     agency_id: Optional[str] = QueryParam(None),
     time_period: str = QueryParam("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
@@ -528,7 +528,7 @@ async def get_problematic_stays_replacement_analysis(
             "end_date": end_date
         }
         
-        results = connection.execute_query(GET_PROBLEMATIC_STAYS_REPLACEMENT_ANALYSIS, query_params)
+        results = await connection.execute_query_async(GET_PROBLEMATIC_STAYS_REPLACEMENT_ANALYSIS, query_params)
         
         # Process and format the results
         if not results or len(results) == 0:
@@ -565,7 +565,7 @@ async def get_problematic_stays_replacement_analysis(
         raise HTTPException(status_code=500, detail=f"Failed to fetch problematic stays replacement analysis: {str(e)}")
 
 @router.get("/customer-satisfaction")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'time_period'], cache_key_prefix="/problematic-stays/customer-satisfaction")
+@cache_endpoint(key_params=['agency_id', 'time_period'], cache_key_prefix="/problematic-stays/customer-satisfaction")
 async def get_problematic_stays_customer_satisfaction(
     agency_id: Optional[str] = QueryParam(None),
     time_period: str = QueryParam("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
@@ -598,7 +598,7 @@ async def get_problematic_stays_customer_satisfaction(
             "end_date": end_date
         }
         
-        results = connection.execute_query(GET_PROBLEMATIC_STAYS_CUSTOMER_SATISFACTION, query_params)
+        results = await connection.execute_query_async(GET_PROBLEMATIC_STAYS_CUSTOMER_SATISFACTION, query_params)
         
         # Process and format the results
         if not results or len(results) == 0:
@@ -635,7 +635,7 @@ async def get_problematic_stays_customer_satisfaction(
         raise HTTPException(status_code=500, detail=f"Failed to fetch problematic stays customer satisfaction: {str(e)}")
 
 @router.get("/trend-analysis")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'event_type', 'stay_type', 'time_period'], cache_key_prefix="/problematic-stays/trend-analysis")
+@cache_endpoint(key_params=['agency_id', 'event_type', 'stay_type', 'time_period'], cache_key_prefix="/problematic-stays/trend-analysis")
 async def get_problematic_stays_trend_analysis(
     agency_id: Optional[str] = QueryParam(None),
     event_type: Optional[str] = QueryParam(None, regex="^(cancelled_before_arrival|shortened_after_arrival|)$"),
@@ -671,7 +671,7 @@ async def get_problematic_stays_trend_analysis(
             "end_date": end_date
         }
         
-        results = connection.execute_query(GET_PROBLEMATIC_STAYS_TREND_ANALYSIS, query_params)
+        results = await connection.execute_query_async(GET_PROBLEMATIC_STAYS_TREND_ANALYSIS, query_params)
         
         # Process and format the results
         if not results or len(results) == 0:
@@ -712,7 +712,7 @@ async def get_problematic_stays_trend_analysis(
         raise HTTPException(status_code=500, detail=f"Failed to fetch problematic stays trend analysis: {str(e)}")
 
 @router.get("/cancellation-lead-time")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'time_period'], cache_key_prefix="/problematic-stays/cancellation-lead-time")
+@cache_endpoint(key_params=['agency_id', 'time_period'], cache_key_prefix="/problematic-stays/cancellation-lead-time")
 async def get_problematic_stays_cancellation_lead_time(
     agency_id: Optional[str] = QueryParam(None),
     time_period: str = QueryParam("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
@@ -788,8 +788,146 @@ async def get_problematic_stays_cancellation_lead_time(
         raise HTTPException(status_code=500, detail=f"Failed to fetch cancellation lead time data: {str(e)}")
 
 
+def _problematic_details_params(agency_id: str, time_period: str) -> Dict[str, Any]:
+    """Query parameters of the problematic stays details for a time period"""
+    # Calculate date range
+    today = datetime.today()
+    if time_period == "last_month":
+        start_date = (today - timedelta(days=30)).strftime("%Y-%m-%d")
+    elif time_period == "last_quarter":
+        start_date = (today - timedelta(days=90)).strftime("%Y-%m-%d")
+    elif time_period == "last_year":
+        start_date = (today - timedelta(days=365)).strftime("%Y-%m-%d")
+    else:  # all_time
+        start_date = "2020-01-01"
+        
+    end_date = today.strftime("%Y-%m-%d")
+    
+    return {
+        "agency_id": agency_id,
+        "start_date": start_date,
+        "end_date": end_date
+    }
+
+
+def _build_problematic_details_query(event_type: Optional[str]) -> str:
+    """Details query for problematic stays, ordered by created_at (newest first)"""
+    # Build query based on event type
+    base_query = """
+    WITH problematic_details AS (
+        SELECT
+            cs._id as care_stay_id,
+            cs.created_at,
+            cs.arrival,
+            cs.departure,
+            cs.stage,
+            -- Extract cancellation info from tracks
+            (SELECT TIMESTAMP(JSON_EXTRACT_SCALAR(track, '$.created_at'))
+             FROM UNNEST(JSON_EXTRACT_ARRAY(cs.tracks)) AS track
+             WHERE JSON_EXTRACT_SCALAR(track, '$.differences.stage[1]') = 'Abgebrochen'
+             ORDER BY JSON_EXTRACT_SCALAR(track, '$.created_at') DESC
+             LIMIT 1) as cancelled_at,
+            cs.rejection_reason as cancellation_reason,
+            cs.updated_at as ended_at,
+            cs.rejection_reason as end_reason,
+            c.customer_name,
+            c.customer_city,
+            c.agency_id,
+            a.name as agency_name,
+            -- Determine problematic type
+            CASE
+                WHEN cs.stage = 'Abgebrochen' 
+                     AND cs.cancelled_at IS NOT NULL 
+                     AND cs.arrival IS NOT NULL 
+                     AND DATE(cs.cancelled_at) < DATE(cs.arrival) THEN 'Abbruch vor Anreise'
+                WHEN cs.ended_at IS NOT NULL 
+                     AND cs.arrival IS NOT NULL 
+                     AND cs.departure IS NOT NULL
+                     AND DATE_DIFF(DATE(cs.departure), DATE(cs.arrival), DAY) <= 3 THEN 'Sofortabreise (≤3 Tage)'
+                WHEN cs.ended_at IS NOT NULL 
+                     AND cs.arrival IS NOT NULL 
+                     AND cs.departure IS NOT NULL
+                     AND cs.ended_at < cs.departure THEN 'Vorzeitige Beendigung'
+                ELSE 'Andere'
+            END as problem_type,
+            -- Calculate duration if applicable
+            CASE
+                WHEN cs.arrival IS NOT NULL AND cs.departure IS NOT NULL
+                THEN DATE_DIFF(DATE(cs.departure), DATE(cs.arrival), DAY)
+                ELSE NULL
+            END as stay_duration_days
+        FROM
+            `gcpxbixpflegehilfesenioren.PflegehilfeSeniore_BI.care_stays` cs
+        JOIN
+            `gcpxbixpflegehilfesenioren.PflegehilfeSeniore_BI.contracts` c ON cs.contract_id = c._id
+        JOIN
+            `gcpxbixpflegehilfesenioren.PflegehilfeSeniore_BI.agencies` a ON c.agency_id = a._id
+        WHERE
+            c.agency_id = @agency_id
+            AND cs.created_at BETWEEN @start_date AND @end_date
+            AND (
+                -- Include based on problem type
+                -- Abbruch vor Anreise
+                (cs.stage = 'Abgebrochen' AND cs.arrival IS NOT NULL 
+                 AND EXISTS (
+                    SELECT 1
+                    FROM UNNEST(JSON_EXTRACT_ARRAY(cs.tracks)) AS track
+                    WHERE JSON_EXTRACT_SCALAR(track, '$.differences.stage[1]') = 'Abgebrochen'
+                      AND TIMESTAMP(JSON_EXTRACT_SCALAR(track, '$.created_at')) < TIMESTAMP(cs.arrival)
+                 ))
+                -- Sofortabreise (≤3 Tage)
+                OR (cs.arrival IS NOT NULL AND cs.departure IS NOT NULL 
+                    AND DATE_DIFF(DATE(cs.departure), DATE(cs.arrival), DAY) <= 3)
+                -- Vorzeitige Beendigung
+                OR (cs.arrival IS NOT NULL AND cs.departure IS NOT NULL 
+                    AND cs.departure < cs.arrival) -- This will be filtered later in the query
+            )
+    )
+    SELECT * FROM problematic_details
+    """
+
+    # Add event type filter if specified
+    if event_type:
+        if event_type == "before_3_days":
+            base_query += " WHERE problem_type = 'Sofortabreise (≤3 Tage)'"
+        elif event_type == "early_end":
+            base_query += " WHERE problem_type = 'Vorzeitige Beendigung'"
+        elif event_type == "instant_departure":
+            base_query += " WHERE problem_type = 'Abbruch vor Anreise'"
+
+    base_query += " ORDER BY created_at DESC"
+    
+    return base_query
+
+
+def _format_date(date_value):
+    if not date_value:
+        return None
+    if hasattr(date_value, 'isoformat'):
+        return date_value.isoformat()
+    return str(date_value)
+
+
+def _format_problematic_detail(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "care_stay_id": row.get("care_stay_id"),
+        "customer_name": row.get("customer_name"),
+        "customer_city": row.get("customer_city"),
+        "problem_type": row.get("problem_type"),
+        "created_at": _format_date(row.get("created_at")),
+        "arrival": _format_date(row.get("arrival")),
+        "departure": _format_date(row.get("departure")),
+        "cancelled_at": _format_date(row.get("cancelled_at")),
+        "ended_at": _format_date(row.get("ended_at")),
+        "cancellation_reason": row.get("cancellation_reason"),
+        "end_reason": row.get("end_reason"),
+        "stay_duration_days": row.get("stay_duration_days"),
+        "stage": row.get("stage")
+    }
+
+
 @router.get("/details/{agency_id}")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'time_period', 'event_type'], cache_key_prefix="/problematic-stays/details")
+@cache_endpoint(key_params=['agency_id', 'time_period', 'event_type'], cache_key_prefix="/problematic-stays/details")
 async def get_problematic_stays_details(
     agency_id: str,
     time_period: str = QueryParam("last_quarter", description="Time period filter"),
@@ -800,133 +938,16 @@ async def get_problematic_stays_details(
     Returns individual care stay records with customer info, dates, and reasons.
     """
     try:
-        # Calculate date range
-        today = datetime.today()
-        if time_period == "last_month":
-            start_date = (today - timedelta(days=30)).strftime("%Y-%m-%d")
-        elif time_period == "last_quarter":
-            start_date = (today - timedelta(days=90)).strftime("%Y-%m-%d")
-        elif time_period == "last_year":
-            start_date = (today - timedelta(days=365)).strftime("%Y-%m-%d")
-        else:  # all_time
-            start_date = "2020-01-01"
-            
-        end_date = today.strftime("%Y-%m-%d")
-        
-        # Build query based on event type
-        base_query = """
-        WITH problematic_details AS (
-            SELECT
-                cs._id as care_stay_id,
-                cs.created_at,
-                cs.arrival,
-                cs.departure,
-                cs.stage,
-                -- Extract cancellation info from tracks
-                (SELECT TIMESTAMP(JSON_EXTRACT_SCALAR(track, '$.created_at'))
-                 FROM UNNEST(JSON_EXTRACT_ARRAY(cs.tracks)) AS track
-                 WHERE JSON_EXTRACT_SCALAR(track, '$.differences.stage[1]') = 'Abgebrochen'
-                 ORDER BY JSON_EXTRACT_SCALAR(track, '$.created_at') DESC
-                 LIMIT 1) as cancelled_at,
-                cs.rejection_reason as cancellation_reason,
-                cs.updated_at as ended_at,
-                cs.rejection_reason as end_reason,
-                c.customer_name,
-                c.customer_city,
-                c.agency_id,
-                a.name as agency_name,
-                -- Determine problematic type
-                CASE
-                    WHEN cs.stage = 'Abgebrochen' 
-                         AND cs.cancelled_at IS NOT NULL 
-                         AND cs.arrival IS NOT NULL 
-                         AND DATE(cs.cancelled_at) < DATE(cs.arrival) THEN 'Abbruch vor Anreise'
-                    WHEN cs.ended_at IS NOT NULL 
-                         AND cs.arrival IS NOT NULL 
-                         AND cs.departure IS NOT NULL
-                         AND DATE_DIFF(DATE(cs.departure), DATE(cs.arrival), DAY) <= 3 THEN 'Sofortabreise (≤3 Tage)'
-                    WHEN cs.ended_at IS NOT NULL 
-                         AND cs.arrival IS NOT NULL 
-                         AND cs.departure IS NOT NULL
-                         AND cs.ended_at < cs.departure THEN 'Vorzeitige Beendigung'
-                    ELSE 'Andere'
-                END as problem_type,
-                -- Calculate duration if applicable
-                CASE
-                    WHEN cs.arrival IS NOT NULL AND cs.departure IS NOT NULL
-                    THEN DATE_DIFF(DATE(cs.departure), DATE(cs.arrival), DAY)
-                    ELSE NULL
-                END as stay_duration_days
-            FROM
-                `gcpxbixpflegehilfesenioren.PflegehilfeSeniore_BI.care_stays` cs
-            JOIN
-                `gcpxbixpflegehilfesenioren.PflegehilfeSeniore_BI.contracts` c ON cs.contract_id = c._id
-            JOIN
-                `gcpxbixpflegehilfesenioren.PflegehilfeSeniore_BI.agencies` a ON c.agency_id = a._id
-            WHERE
-                c.agency_id = @agency_id
-                AND cs.created_at BETWEEN @start_date AND @end_date
-                AND (
-                    -- Include based on problem type
-                    -- Abbruch vor Anreise
-                    (cs.stage = 'Abgebrochen' AND cs.arrival IS NOT NULL 
-                     AND EXISTS (
-                        SELECT 1
-                        FROM UNNEST(JSON_EXTRACT_ARRAY(cs.tracks)) AS track
-                        WHERE JSON_EXTRACT_SCALAR(track, '$.differences.stage[1]') = 'Abgebrochen'
-                          AND TIMESTAMP(JSON_EXTRACT_SCALAR(track, '$.created_at')) < TIMESTAMP(cs.arrival)
-                     ))
-                    -- Sofortabreise (≤3 Tage)
-                    OR (cs.arrival IS NOT NULL AND cs.departure IS NOT NULL 
-                        AND DATE_DIFF(DATE(cs.departure), DATE(cs.arrival), DAY) <= 3)
-                    -- Vorzeitige Beendigung
-                    OR (cs.arrival IS NOT NULL AND cs.departure IS NOT NULL 
-                        AND cs.departure < cs.arrival) -- This will be filtered later in the query
-                )
-        )
-        SELECT * FROM problematic_details
-        """
-        
-        # Add event type filter if specified
-        if event_type:
-            if event_type == "before_3_days":
-                base_query += " WHERE problem_type = 'Sofortabreise (≤3 Tage)'"
-            elif event_type == "early_end":
-                base_query += " WHERE problem_type = 'Vorzeitige Beendigung'"
-            elif event_type == "instant_departure":
-                base_query += " WHERE problem_type = 'Abbruch vor Anreise'"
-                
-        base_query += " ORDER BY created_at DESC"
+        base_query = _build_problematic_details_query(event_type)
         
         # Execute query
         connection = BigQueryConnection()
-        query_params = {
-            "agency_id": agency_id,
-            "start_date": start_date,
-            "end_date": end_date
-        }
+        query_params = _problematic_details_params(agency_id, time_period)
         
-        results = connection.execute_query(base_query, query_params)
+        results = await connection.execute_query_async(base_query, query_params)
         
         # Format results
-        details = []
-        for row in results:
-            detail = {
-                "care_stay_id": row.get("care_stay_id"),
-                "customer_name": row.get("customer_name"),
-                "customer_city": row.get("customer_city"),
-                "problem_type": row.get("problem_type"),
-                "created_at": row.get("created_at").isoformat() if row.get("created_at") else None,
-                "arrival": row.get("arrival").isoformat() if row.get("arrival") else None,
-                "departure": row.get("departure").isoformat() if row.get("departure") else None,
-                "cancelled_at": row.get("cancelled_at").isoformat() if row.get("cancelled_at") else None,
-                "ended_at": row.get("ended_at").isoformat() if row.get("ended_at") else None,
-                "cancellation_reason": row.get("cancellation_reason"),
-                "end_reason": row.get("end_reason"),
-                "stay_duration_days": row.get("stay_duration_days"),
-                "stage": row.get("stage")
-            }
-            details.append(detail)
+        details = [_format_problematic_detail(row) for row in results]
         
         # Group by month for better organization
         from collections import defaultdict
@@ -960,8 +981,33 @@ async def get_problematic_stays_details(
         logger.error(f"Error fetching problematic stays details: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@router.get("/details/{agency_id}/stream")
+async def stream_problematic_stays_details(
+    agency_id: str,
+    time_period: str = QueryParam("last_quarter", description="Time period filter"),
+    event_type: Optional[str] = QueryParam(None, description="Filter by event type (early_end, instant_departure, before_3_days)")
+):
+    """
+    Streaming variant of the problematic stays details as NDJSON.
+    Pages through the result and emits each created_at month group as soon as
+    it is complete, keeping memory bounded for long time periods.
+    """
+    connection = BigQueryConnection()
+    pages = connection.stream_query_pages(
+        _build_problematic_details_query(event_type),
+        _problematic_details_params(agency_id, time_period)
+    )
+    
+    return ndjson_response(month_grouped_events(
+        pages,
+        format_row=_format_problematic_detail,
+        month_field="created_at",
+        items_key="stays",
+        header={"agency_id": agency_id, "time_period": time_period, "event_type": event_type}
+    ))
+
 @router.get("/dashboard-overview")
-@cache_endpoint(ttl_hours=24, key_params=['time_period'], cache_key_prefix="/problematic_stays/dashboard-overview")
+@cache_endpoint(key_params=['time_period'], cache_key_prefix="/problematic_stays/dashboard-overview", stale_while_revalidate_hours=24)
 async def get_dashboard_overview(
     time_period: str = QueryParam("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
 ):
@@ -995,7 +1041,7 @@ async def get_dashboard_overview(
             "end_date": end_date
         }
         
-        results = connection.execute_query(GET_DASHBOARD_PROBLEMATIC_OVERVIEW, query_params)
+        results = await connection.execute_query_async(GET_DASHBOARD_PROBLEMATIC_OVERVIEW, query_params)
         
         # Process and format the results
         dashboard_data = []
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional, Dict, Any
-from ..utils.bigquery_connection import BigQueryConnection
+from ..utils.bigquery_connection import BigQueryConnection, run_in_query_executor
 from ..utils.query_manager import QueryManager
 from ..models import ProfileQualityData, TimeFilter, AgencyRequest, ProfileQualityComparison
 from ..dependencies import get_settings
@@ -17,7 +17,7 @@ async def get_agency_profile_quality(
     """
     try:
         bq = BigQueryConnection()
-        profile_quality_data = bq.get_profile_quality_by_agency(agency_id, time_period)
+        profile_quality_data = await run_in_query_executor(bq.get_profile_quality_by_agency, agency_id, time_period)
         
         # If no data is found
         if not profile_quality_data:
@@ -49,7 +49,7 @@ async def compare_agency_profile_quality(request: AgencyRequest):
         bq = BigQueryConnection()
         
         # Get data for the selected agency
-        selected_agency = bq.get_profile_quality_by_agency(request.agency_id, request.time_period)
+        selected_agency = await run_in_query_executor(bq.get_profile_quality_by_agency, request.agency_id, request.time_period)
         
         # If no data is found for the selected agency
         if not selected_agency:
@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import Dict, List, Optional, Any
 from ..utils.query_manager import QueryManager
+from ..utils.bigquery_connection import BigQueryConnection, run_in_query_executor
 from ..models import TimeFilter, AgencyRequest
 from ..dependencies import get_settings
 from ..services.database_cache_service import get_cache_service
 from ..utils.cache_decorator import cache_endpoint
+from ..utils.ndjson_stream import month_grouped_events, ndjson_response
 
 router = APIRouter()
 
 @router.get("/postings")
-@cache_endpoint(ttl_hours=24, key_params=['time_period'], cache_key_prefix="/quotas/postings")
+@cache_endpoint(key_params=['time_period'], cache_key_prefix="/quotas/postings")
 async def get_posting_metrics(
     time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
 ):
@@ -18,13 +20,13 @@ async def get_posting_metrics(
     """
     try:
         query_manager = QueryManager()
-        posting_metrics = query_manager.get_posting_metrics(time_period=time_period)
+        posting_metrics = await run_in_query_executor(query_manager.get_posting_metrics, time_period=time_period)
         return posting_metrics
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch posting metrics: {str(e)}")
 
 @router.get("/{agency_id}/reservations")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'time_period', 'start_date', 'end_date'], cache_key_prefix="/quotas/reservations")
+@cache_endpoint(key_params=['agency_id', 'time_period', 'start_date', 'end_date'], cache_key_prefix="/quotas/reservations")
 async def get_agency_reservation_metrics(
     agency_id: str,
     time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$"),
@@ -36,7 +38,8 @@ async def get_agency_reservation_metrics(
     """
     try:
         query_manager = QueryManager()
-        reservation_metrics = query_manager.get_agency_reservation_metrics(
+        reservation_metrics = await run_in_query_executor(
+            query_manager.get_agency_reservation_metrics,
             agency_id=agency_id,
             start_date=start_date,
             end_date=end_date,
@@ -47,7 +50,7 @@ async def get_agency_reservation_metrics(
         raise HTTPException(status_code=500, detail=f"Failed to fetch reservation metrics: {str(e)}")
 
 @router.get("/{agency_id}/fulfillment", deprecated=True)
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'time_period'], cache_key_prefix="/quotas/fulfillment")
+@cache_endpoint(key_params=['agency_id', 'time_period'], cache_key_prefix="/quotas/fulfillment")
 async def get_fulfillment_rate(
     agency_id: str,
     time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
@@ -59,7 +62,8 @@ async def get_fulfillment_rate(
     """
     try:
         query_manager = QueryManager()
-        fulfillment_metrics = query_manager.get_reservation_fulfillment_rate(
+        fulfillment_metrics = await run_in_query_executor(
+            query_manager.get_reservation_fulfillment_rate,
             agency_id=agency_id,
             time_period=time_period
         )
@@ -68,7 +72,7 @@ async def get_fulfillment_rate(
         raise HTTPException(status_code=500, detail=f"Failed to fetch fulfillment rate: {str(e)}")
 
 @router.get("/{agency_id}/reservation-fulfillment")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'time_period'], cache_key_prefix="/quotas/reservation-fulfillment")
+@cache_endpoint(key_params=['agency_id', 'time_period'], cache_key_prefix="/quotas/reservation-fulfillment")
 async def get_reservation_fulfillment_rate(
     agency_id: str,
     time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
@@ -79,7 +83,8 @@ async def get_reservation_fulfillment_rate(
     """
     try:
         query_manager = QueryManager()
-        fulfillment_metrics = query_manager.get_fulfillment_rate(
+        fulfillment_metrics = await run_in_query_executor(
+            query_manager.get_fulfillment_rate,
             agency_id=agency_id,
             time_period=time_period
         )
@@ -88,7 +93,7 @@ async def get_reservation_fulfillment_rate(
         raise HTTPException(status_code=500, detail=f"Failed to fetch reservation fulfillment rate: {str(e)}")
 
 @router.get("/{agency_id}/withdrawal")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'time_period'], cache_key_prefix="/quotas/withdrawal")
+@cache_endpoint(key_params=['agency_id', 'time_period'], cache_key_prefix="/quotas/withdrawal")
 async def get_withdrawal_rate(
     agency_id: str,
     time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
@@ -99,7 +104,8 @@ async def get_withdrawal_rate(
     """
     try:
         query_manager = QueryManager()
-        withdrawal_metrics = query_manager.get_withdrawal_rate(
+        withdrawal_metrics = await run_in_query_executor(
+            query_manager.get_withdrawal_rate,
             agency_id=agency_id,
             time_period=time_period
         )
@@ -108,7 +114,7 @@ async def get_withdrawal_rate(
         raise HTTPException(status_code=500, detail=f"Failed to fetch withdrawal rate: {str(e)}")
 
 @router.get("/{agency_id}/pending")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'time_period'], cache_key_prefix="/quotas/pending")
+@cache_endpoint(key_params=['agency_id', 'time_period'], cache_key_prefix="/quotas/pending")
 async def get_pending_rate(
     agency_id: str,
     time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
@@ -119,7 +125,8 @@ async def get_pending_rate(
     """
     try:
         query_manager = QueryManager()
-        pending_metrics = query_manager.get_pending_rate(
+        pending_metrics = await run_in_query_executor(
+            query_manager.get_pending_rate,
             agency_id=agency_id,
             time_period=time_period
         )
@@ -128,7 +135,7 @@ async def get_pending_rate(
         raise HTTPException(status_code=500, detail=f"Failed to fetch pending rate: {str(e)}")
 
 @router.get("/{agency_id}/arrival")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'time_period'], cache_key_prefix="/quotas/arrival")
+@cache_endpoint(key_params=['agency_id', 'time_period'], cache_key_prefix="/quotas/arrival")
 async def get_arrival_metrics(
     agency_id: str,
     time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
@@ -161,7 +168,8 @@ async def get_arrival_metrics(
     """
     try:
         query_manager = QueryManager()
-        arrival_metrics = query_manager.get_arrival_metrics(
+        arrival_metrics = await run_in_query_executor(
+            query_manager.get_arrival_metrics,
             agency_id=agency_id,
             time_period=time_period
         )
@@ -170,7 +178,7 @@ async def get_arrival_metrics(
         raise HTTPException(status_code=500, detail=f"Failed to fetch arrival metrics: {str(e)}")
 
 @router.get("/{agency_id}/cancellation-before-arrival")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'time_period'], cache_key_prefix="/quotas/cancellation-before-arrival")
+@cache_endpoint(key_params=['agency_id', 'time_period'], cache_key_prefix="/quotas/cancellation-before-arrival")
 async def get_cancellation_before_arrival_rate(
     agency_id: str,
     time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
@@ -181,7 +189,8 @@ async def get_cancellation_before_arrival_rate(
     """
     try:
         query_manager = QueryManager()
-        cancellation_metrics = query_manager.get_cancellation_before_arrival_rate(
+        cancellation_metrics = await run_in_query_executor(
+            query_manager.get_cancellation_before_arrival_rate,
             agency_id=agency_id,
             time_period=time_period
         )
@@ -190,7 +199,7 @@ async def get_cancellation_before_arrival_rate(
         raise HTTPException(status_code=500, detail=f"Failed to fetch cancellation before arrival rate: {str(e)}")
 
 @router.get("/all-agencies/completion")
-@cache_endpoint(ttl_hours=24, key_params=['time_period'], cache_key_prefix="/quotas/all-agencies/completion")
+@cache_endpoint(key_params=['time_period'], cache_key_prefix="/quotas/all-agencies/completion", stale_while_revalidate_hours=24)
 async def get_all_agencies_completion_stats(
     time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
 ):
@@ -201,13 +210,13 @@ async def get_all_agencies_completion_stats(
     """
     try:
         query_manager = QueryManager()
-        completion_stats = query_manager.get_all_agencies_completion_stats(time_period)
+        completion_stats = await run_in_query_executor(query_manager.get_all_agencies_completion_stats, time_period)
         return completion_stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch all agencies completion stats: {str(e)}")
 
 @router.get("/{agency_id}/completion")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'time_period'], cache_key_prefix="/quotas/completion")
+@cache_endpoint(key_params=['agency_id', 'time_period'], cache_key_prefix="/quotas/completion")
 async def get_completion_rate(
     agency_id: str,
     time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
@@ -218,7 +227,8 @@ async def get_completion_rate(
     """
     try:
         query_manager = QueryManager()
-        completion_metrics = query_manager.get_completion_rate(
+        completion_metrics = await run_in_query_executor(
+            query_manager.get_completion_rate,
             agency_id=agency_id,
             time_period=time_period
         )
@@ -227,7 +237,7 @@ async def get_completion_rate(
         raise HTTPException(status_code=500, detail=f"Failed to fetch completion rate: {str(e)}")
 
 @router.get("/{agency_id}/all")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'time_period', 'start_date', 'end_date'], cache_key_prefix="/quotas/all")
+@cache_endpoint(key_params=['agency_id', 'time_period', 'start_date', 'end_date'], cache_key_prefix="/quotas/all")
 async def get_all_quotas(
     agency_id: str,
     time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$"),
@@ -239,7 +249,8 @@ async def get_all_quotas(
     """
     try:
         query_manager = QueryManager()
-        all_quotas = query_manager.get_all_quotas(
+        all_quotas = await run_in_query_executor(
+            query_manager.get_all_quotas,
             agency_id=agency_id,
             start_date=start_date,
             end_date=end_date,
@@ -272,48 +283,57 @@ async def get_custom_metrics(request: Dict[str, Any]):
             raise HTTPException(status_code=400, detail="agency_id is required")
         
         if metrics_type == "reservations":
-            metrics = query_manager.get_agency_reservation_metrics(
+            metrics = await run_in_query_executor(
+                query_manager.get_agency_reservation_metrics,
                 agency_id=agency_id,
                 time_period=time_period
             )
         elif metrics_type == "fulfillment":
             # Deprecated but still supported for backwards compatibility
-            metrics = query_manager.get_reservation_fulfillment_rate(
+            metrics = await run_in_query_executor(
+                query_manager.get_reservation_fulfillment_rate,
                 agency_id=agency_id,
                 time_period=time_period
             )
         elif metrics_type == "reservation-fulfillment":
-            metrics = query_manager.get_reservation_fulfillment_rate(
+            metrics = await run_in_query_executor(
+                query_manager.get_reservation_fulfillment_rate,
                 agency_id=agency_id,
                 time_period=time_period
             )
         elif metrics_type == "withdrawal":
-            metrics = query_manager.get_withdrawal_rate(
+            metrics = await run_in_query_executor(
+                query_manager.get_withdrawal_rate,
                 agency_id=agency_id,
                 time_period=time_period
             )
         elif metrics_type == "pending":
-            metrics = query_manager.get_pending_rate(
+            metrics = await run_in_query_executor(
+                query_manager.get_pending_rate,
                 agency_id=agency_id,
                 time_period=time_period
             )
         elif metrics_type == "arrival":
-            metrics = query_manager.get_arrival_metrics(
+            metrics = await run_in_query_executor(
+                query_manager.get_arrival_metrics,
                 agency_id=agency_id,
                 time_period=time_period
             )
         elif metrics_type == "cancellation":
-            metrics = query_manager.get_cancellation_before_arrival_rate(
+            metrics = await run_in_query_executor(
+                query_manager.get_cancellation_before_arrival_rate,
                 agency_id=agency_id,
                 time_period=time_period
             )
         elif metrics_type == "completion":
-            metrics = query_manager.get_completion_rate(
+            metrics = await run_in_query_executor(
+                query_manager.get_completion_rate,
                 agency_id=agency_id,
                 time_period=time_period
             )
         elif metrics_type == "all":
-            metrics = query_manager.get_all_quotas(
+            metrics = await run_in_query_executor(
+                query_manager.get_all_quotas,
                 agency_id=agency_id,
                 time_period=time_period
             )
@@ -327,7 +347,7 @@ async def get_custom_metrics(request: Dict[str, Any]):
         raise HTTPException(status_code=500, detail=f"Failed to fetch custom metrics: {str(e)}")
 
 @router.get("/stats/overall/cancellation-before-arrival")
-@cache_endpoint(ttl_hours=24, key_params=['start_date', 'end_date', 'time_period'], cache_key_prefix="/quotas/stats/overall/cancellation-before-arrival")
+@cache_endpoint(key_params=['start_date', 'end_date', 'time_period'], cache_key_prefix="/quotas/stats/overall/cancellation-before-arrival")
 async def get_overall_cancellation_stats(
     start_date: Optional[str] = Query(None, description="Startdatum im Format YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="Enddatum im Format YYYY-MM-DD"),
@@ -338,13 +358,13 @@ async def get_overall_cancellation_stats(
     """
     try:
         query_manager = QueryManager()
-        stats = query_manager.get_overall_cancellation_before_arrival_stats(start_date, end_date, time_period)
+        stats = await run_in_query_executor(query_manager.get_overall_cancellation_before_arrival_stats, start_date, end_date, time_period)
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch overall cancellation before arrival stats: {str(e)}")
 
 @router.get("/all-agencies/conversion")
-@cache_endpoint(ttl_hours=24, key_params=['time_period'], cache_key_prefix="/quotas/all-agencies/conversion")
+@cache_endpoint(key_params=['time_period'], cache_key_prefix="/quotas/all-agencies/conversion", stale_while_revalidate_hours=24)
 async def get_all_agencies_conversion_stats(
     time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
 ):
@@ -354,28 +374,17 @@ async def get_all_agencies_conversion_stats(
     """
     try:
         query_manager = QueryManager()
-        conversion_stats = query_manager.get_all_agencies_conversion_stats(time_period)
+        conversion_stats = await run_in_query_executor(query_manager.get_all_agencies_conversion_stats, time_period)
         return conversion_stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch all agencies conversion stats: {str(e)}")
 
 
-@router.get("/{agency_id}/cancellations-before-arrival/details")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'time_period'], cache_key_prefix="/quotas/cancellations-before-arrival/details")
-async def get_cancellations_before_arrival_details(
-    agency_id: str,
-    time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
-):
-    """
-    Get detailed list of individual cancellations before arrival for an agency.
-    Returns individual care stay records that were cancelled before arrival.
-    """
-    try:
-        
-        query_manager = QueryManager()
-        
-        # Build the query - using tracks for cancellation info
-        query = """
+# Detail queries shared by the cached and the streaming detail endpoints.
+# Both are ordered by the date the details are grouped by (month).
+
+# Cancellations before arrival - using tracks for cancellation info
+CANCELLATIONS_BEFORE_ARRIVAL_DETAILS_QUERY = """
         WITH cancellation_details AS (
             SELECT
                 cs._id as care_stay_id,
@@ -422,95 +431,10 @@ async def get_cancellations_before_arrival_details(
           AND cancelled_at < TIMESTAMP(planned_arrival)
         ORDER BY cancelled_at DESC
         """
-        
-        # Calculate date range
-        start_date, end_date = query_manager._calculate_date_range(time_period)
-        
-        # Execute query
-        from ..utils.bigquery_connection import BigQueryConnection
-        connection = BigQueryConnection()
-        results = connection.execute_query(query, {
-            "agency_id": agency_id,
-            "start_date": start_date,
-            "end_date": end_date
-        })
-        
-        # Format results
-        details = []
-        agency_name = "Unknown"
-        
-        for row in results:
-            if not agency_name or agency_name == "Unknown":
-                agency_name = row.get("agency_name", "Unknown")
-                
-            # Helper function to format dates
-            def format_date(date_value):
-                if not date_value:
-                    return None
-                if hasattr(date_value, 'isoformat'):
-                    return date_value.isoformat()
-                return str(date_value)
-            
-            detail = {
-                "care_stay_id": row.get("care_stay_id"),
-                "customer_name": row.get("customer_name"),
-                "customer_city": row.get("customer_city"),
-                "created_at": format_date(row.get("created_at")),
-                "planned_arrival": format_date(row.get("planned_arrival")),
-                "cancelled_at": format_date(row.get("cancelled_at")),
-                "cancellation_reason": row.get("cancellation_reason"),
-                "days_before_arrival": row.get("days_before_arrival")
-            }
-            details.append(detail)
-        
-        # Group by month
-        from collections import defaultdict
-        grouped_by_month = defaultdict(list)
-        
-        for detail in details:
-            if detail["cancelled_at"]:
-                month_key = detail["cancelled_at"][:7]  # YYYY-MM
-                grouped_by_month[month_key].append(detail)
-        
-        # Convert to sorted list
-        grouped_data = []
-        for month in sorted(grouped_by_month.keys(), reverse=True):
-            grouped_data.append({
-                "month": month,
-                "count": len(grouped_by_month[month]),
-                "cancellations": grouped_by_month[month]
-            })
-        
-        result = {
-            "agency_id": agency_id,
-            "agency_name": agency_name,
-            "time_period": time_period,
-            "total_count": len(details),
-            "grouped_by_month": grouped_data
-        }
-        
-        return result
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch cancellation details: {str(e)}")
 
 
-@router.get("/{agency_id}/early-terminations/details")
-@cache_endpoint(ttl_hours=24, key_params=['agency_id', 'time_period'], cache_key_prefix="/quotas/early-terminations/details")
-async def get_early_terminations_details(
-    agency_id: str,
-    time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
-):
-    """
-    Get detailed list of individual early terminations after arrival for an agency.
-    Returns individual care stay records that were terminated early (based on 33% rule).
-    """
-    try:
-        
-        query_manager = QueryManager()
-        
-        # Build the query - reusing logic from GET_ALL_AGENCIES_COMPLETION_STATS
-        query = """
+# Early terminations after arrival (shortened by more than 33%)
+EARLY_TERMINATIONS_DETAILS_QUERY = """
         WITH early_termination_details AS (
             WITH parsed AS (
                 SELECT
@@ -638,14 +562,85 @@ async def get_early_terminations_details(
         SELECT * FROM early_termination_details
         ORDER BY departure DESC
         """
+
+
+def _format_date(date_value):
+    """Helper function to format dates"""
+    if not date_value:
+        return None
+    if hasattr(date_value, 'isoformat'):
+        return date_value.isoformat()
+    return str(date_value)
+
+
+def _format_cancellation_detail(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "care_stay_id": row.get("care_stay_id"),
+        "customer_name": row.get("customer_name"),
+        "customer_city": row.get("customer_city"),
+        "created_at": _format_date(row.get("created_at")),
+        "planned_arrival": _format_date(row.get("planned_arrival")),
+        "cancelled_at": _format_date(row.get("cancelled_at")),
+        "cancellation_reason": row.get("cancellation_reason"),
+        "days_before_arrival": row.get("days_before_arrival")
+    }
+
+
+def _format_early_termination_detail(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "care_stay_id": row.get("care_stay_id"),
+        "customer_name": row.get("customer_name"),
+        "customer_city": row.get("customer_city"),
+        "arrival": _format_date(row.get("arrival")),
+        "departure": _format_date(row.get("departure")),
+        "actual_duration_days": row.get("actual_duration_days"),
+        "planned_duration_days": row.get("planned_duration_days"),
+        "reduction_percentage": round(row.get("reduction_percentage", 0) * 100, 1) if row.get("reduction_percentage") else 0,
+        "end_reason": row.get("end_reason")
+    }
+
+
+def _group_details_by_month(details: List[Dict[str, Any]], month_field: str, items_key: str) -> List[Dict[str, Any]]:
+    """Group details by the month of month_field, newest month first"""
+    from collections import defaultdict
+    grouped_by_month = defaultdict(list)
+    
+    for detail in details:
+        if detail[month_field]:
+            month_key = detail[month_field][:7]  # YYYY-MM
+            grouped_by_month[month_key].append(detail)
+    
+    # Convert to sorted list
+    grouped_data = []
+    for month in sorted(grouped_by_month.keys(), reverse=True):
+        grouped_data.append({
+            "month": month,
+            "count": len(grouped_by_month[month]),
+            items_key: grouped_by_month[month]
+        })
+    return grouped_data
+
+
+@router.get("/{agency_id}/cancellations-before-arrival/details")
+@cache_endpoint(key_params=['agency_id', 'time_period'], cache_key_prefix="/quotas/cancellations-before-arrival/details")
+async def get_cancellations_before_arrival_details(
+    agency_id: str,
+    time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
+):
+    """
+    Get detailed list of individual cancellations before arrival for an agency.
+    Returns individual care stay records that were cancelled before arrival.
+    """
+    try:
+        
+        query_manager = QueryManager()
         
         # Calculate date range
         start_date, end_date = query_manager._calculate_date_range(time_period)
         
         # Execute query
-        from ..utils.bigquery_connection import BigQueryConnection
         connection = BigQueryConnection()
-        results = connection.execute_query(query, {
+        results = await connection.execute_query_async(CANCELLATIONS_BEFORE_ARRIVAL_DETAILS_QUERY, {
             "agency_id": agency_id,
             "start_date": start_date,
             "end_date": end_date
@@ -658,52 +653,92 @@ async def get_early_terminations_details(
         for row in results:
             if not agency_name or agency_name == "Unknown":
                 agency_name = row.get("agency_name", "Unknown")
-                
-            # Helper function to format dates
-            def format_date(date_value):
-                if not date_value:
-                    return None
-                if hasattr(date_value, 'isoformat'):
-                    return date_value.isoformat()
-                return str(date_value)
-            
-            detail = {
-                "care_stay_id": row.get("care_stay_id"),
-                "customer_name": row.get("customer_name"),
-                "customer_city": row.get("customer_city"),
-                "arrival": format_date(row.get("arrival")),
-                "departure": format_date(row.get("departure")),
-                "actual_duration_days": row.get("actual_duration_days"),
-                "planned_duration_days": row.get("planned_duration_days"),
-                "reduction_percentage": round(row.get("reduction_percentage", 0) * 100, 1) if row.get("reduction_percentage") else 0,
-                "end_reason": row.get("end_reason")
-            }
-            details.append(detail)
+            details.append(_format_cancellation_detail(row))
         
-        # Group by month (based on departure date)
-        from collections import defaultdict
-        grouped_by_month = defaultdict(list)
+        result = {
+            "agency_id": agency_id,
+            "agency_name": agency_name,
+            "time_period": time_period,
+            "total_count": len(details),
+            "grouped_by_month": _group_details_by_month(details, "cancelled_at", "cancellations")
+        }
+        
+        return result
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch cancellation details: {str(e)}")
+
+
+@router.get("/{agency_id}/cancellations-before-arrival/details/stream")
+async def stream_cancellations_before_arrival_details(
+    agency_id: str,
+    time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
+):
+    """
+    Streaming variant of the cancellation details as NDJSON.
+    Rows are read page by page and each month group is emitted as soon as it is
+    complete, so large periods (all_time) start arriving immediately.
+    """
+    query_manager = QueryManager()
+    start_date, end_date = query_manager._calculate_date_range(time_period)
+    
+    connection = BigQueryConnection()
+    pages = connection.stream_query_pages(CANCELLATIONS_BEFORE_ARRIVAL_DETAILS_QUERY, {
+        "agency_id": agency_id,
+        "start_date": start_date,
+        "end_date": end_date
+    })
+    
+    return ndjson_response(month_grouped_events(
+        pages,
+        format_row=_format_cancellation_detail,
+        month_field="cancelled_at",
+        items_key="cancellations",
+        header={"agency_id": agency_id, "time_period": time_period}
+    ))
+
+
+@router.get("/{agency_id}/early-terminations/details")
+@cache_endpoint(key_params=['agency_id', 'time_period'], cache_key_prefix="/quotas/early-terminations/details")
+async def get_early_terminations_details(
+    agency_id: str,
+    time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
+):
+    """
+    Get detailed list of individual early terminations after arrival for an agency.
+    Returns individual care stay records that were terminated early (based on 33% rule).
+    """
+    try:
+        
+        query_manager = QueryManager()
+        
+        # Calculate date range
+        start_date, end_date = query_manager._calculate_date_range(time_period)
+        
+        # Execute query
+        connection = BigQueryConnection()
+        results = await connection.execute_query_async(EARLY_TERMINATIONS_DETAILS_QUERY, {
+            "agency_id": agency_id,
+            "start_date": start_date,
+            "end_date": end_date
+        })
         
-        for detail in details:
-            if detail["departure"]:
-                month_key = detail["departure"][:7]  # YYYY-MM
-                grouped_by_month[month_key].append(detail)
+        # Format results
+        details = []
+        agency_name = "Unknown"
         
-        # Convert to sorted list
-        grouped_data = []
-        for month in sorted(grouped_by_month.keys(), reverse=True):
-            grouped_data.append({
-                "month": month,
-                "count": len(grouped_by_month[month]),
-                "terminations": grouped_by_month[month]
-            })
+        for row in results:
+            if not agency_name or agency_name == "Unknown":
+                agency_name = row.get("agency_name", "Unknown")
+            details.append(_format_early_termination_detail(row))
         
+        # Group by month (based on departure date)
         result = {
             "agency_id": agency_id,
             "agency_name": agency_name,
             "time_period": time_period,
             "total_count": len(details),
-            "grouped_by_month": grouped_data
+            "grouped_by_month": _group_details_by_month(details, "departure", "terminations")
         }
         
         return result
@@ -712,6 +747,29 @@ async def get_early_terminations_details(
         raise HTTPException(status_code=500, detail=f"Failed to fetch early termination details: {str(e)}")
 
 
-# Include other routers if necessary
-# from . import other_router
-# router.include_router(other_router.router)
\ No newline at end of file
+@router.get("/{agency_id}/early-terminations/details/stream")
+async def stream_early_terminations_details(
+    agency_id: str,
+    time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
+):
+    """
+    Streaming variant of the early termination details as NDJSON, grouped by
+    departure month.
+    """
+    query_manager = QueryManager()
+    start_date, end_date = query_manager._calculate_date_range(time_period)
+    
+    connection = BigQueryConnection()
+    pages = connection.stream_query_pages(EARLY_TERMINATIONS_DETAILS_QUERY, {
+        "agency_id": agency_id,
+        "start_date": start_date,
+        "end_date": end_date
+    })
+    
+    return ndjson_response(month_grouped_events(
+        pages,
+        format_row=_format_early_termination_detail,
+        month_field="departure",
+        items_key="terminations",
+        header={"agency_id": agency_id, "time_period": time_period}
+    ))
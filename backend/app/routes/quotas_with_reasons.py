@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Query as QueryParam
 from typing import Dict, List, Optional, Any
 from ..utils.query_manager import QueryManager
-from ..utils.bigquery_connection import BigQueryConnection
+from ..utils.bigquery_connection import BigQueryConnection, run_in_query_executor
 from ..models import TimeFilter, AgencyRequest
 from ..dependencies import get_settings
 from ..services.database_cache_service import get_cache_service
@@ -146,7 +146,7 @@ async def get_all_problem_cases(
             "end_date": end_date
         }
         
-        results = connection.execute_query(GET_ALL_PROBLEM_CASES, query_params)
+        results = await connection.execute_query_async(GET_ALL_PROBLEM_CASES, query_params)
         
         # Process and format the results
         problem_cases = []
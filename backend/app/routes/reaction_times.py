@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional, Dict, Any
-from ..utils.bigquery_connection import BigQueryConnection
+from ..utils.bigquery_connection import BigQueryConnection, run_in_query_executor
 from ..models import ResponseTimeData as ReactionTimeData, TimeFilter, AgencyRequest, ResponseTimeComparison as ReactionTimeComparison
 from ..dependencies import get_settings
 from ..utils.query_manager import QueryManager
@@ -10,7 +10,7 @@ from ..utils.cache_decorator import cache_endpoint
 router = APIRouter()
 
 @router.get("/{agency_id}", response_model=ReactionTimeData)
-@cache_endpoint(ttl_hours=48, key_params=['agency_id', 'time_period'], cache_key_prefix="/reaction_times")
+@cache_endpoint(key_params=['agency_id', 'time_period'], cache_key_prefix="/reaction_times")
 async def get_agency_reaction_times(
     agency_id: str, 
     time_period: str = Query("last_quarter", regex="^(last_quarter|last_month|last_year|all_time)$")
@@ -20,7 +20,7 @@ async def get_agency_reaction_times(
     """
     try:
         bq = BigQueryConnection()
-        reaction_time_data = bq.get_response_times_by_agency(agency_id, time_period)
+        reaction_time_data = await run_in_query_executor(bq.get_response_times_by_agency, agency_id, time_period)
         
         # If no data is found
         if not reaction_time_data:
@@ -52,7 +52,7 @@ async def compare_agency_reaction_times(request: AgencyRequest):
         bq = BigQueryConnection()
         
         # Get data for the selected agency
-        selected_agency = bq.get_response_times_by_agency(request.agency_id, request.time_period)
+        selected_agency = await run_in_query_executor(bq.get_response_times_by_agency, request.agency_id, request.time_period)
         
         # If no data is found for the selected agency
         if not selected_agency:
@@ -132,7 +132,7 @@ def _calculate_industry_average(agencies_data: List[Dict[str, Any]]) -> Dict[str
     return averages 
 
 @router.get("/{agency_id}/posting_to_reservation")
-@cache_endpoint(ttl_hours=48, key_params=['agency_id', 'start_date', 'end_date', 'time_period'], cache_key_prefix="/reaction_times/posting_to_reservation")
+@cache_endpoint(key_params=['agency_id', 'start_date', 'end_date', 'time_period'], cache_key_prefix="/reaction_times/posting_to_reservation")
 async def get_posting_to_reservation_stats(
     agency_id: str,
     start_date: Optional[str] = Query(None, description="Startdatum im Format YYYY-MM-DD"),
@@ -143,12 +143,10 @@ async def get_posting_to_reservation_stats(
     Median und Durchschnitt (in Stunden) von Posting bis Reservierung für eine Agentur
     """
     try:
-        bq = BigQueryConnection()
+        qm = QueryManager()
         if not start_date or not end_date:
-            from ..utils.query_manager import QueryManager
-            qm = QueryManager()
             start_date, end_date = qm._calculate_date_range(time_period)
-        stats = bq.get_posting_to_reservation_stats(agency_id, start_date, end_date)
+        stats = await run_in_query_executor(qm.get_posting_to_reservation_stats, agency_id, start_date, end_date)
         median_hours = stats["median_hours"]
         avg_hours = stats["avg_hours"]
         return {
@@ -162,7 +160,7 @@ async def get_posting_to_reservation_stats(
         raise HTTPException(status_code=500, detail=f"Failed to fetch posting_to_reservation stats: {str(e)}")
 
 @router.get("/{agency_id}/reservation_to_first_proposal")
-@cache_endpoint(ttl_hours=48, key_params=['agency_id', 'start_date', 'end_date', 'time_period'], cache_key_prefix="/reaction_times/reservation_to_first_proposal")
+@cache_endpoint(key_params=['agency_id', 'start_date', 'end_date', 'time_period'], cache_key_prefix="/reaction_times/reservation_to_first_proposal")
 async def get_reservation_to_first_proposal_stats(
     agency_id: str,
     start_date: Optional[str] = Query(None, description="Startdatum im Format YYYY-MM-DD"),
@@ -173,12 +171,10 @@ async def get_reservation_to_first_proposal_stats(
     Median und Durchschnitt (in Stunden) von Reservierung bis zum ersten Personalvorschlag (CareStay) für eine Agentur
     """
     try:
-        bq = BigQueryConnection()
+        qm = QueryManager()
         if not start_date or not end_date:
-            from ..utils.query_manager import QueryManager
-            qm = QueryManager()
             start_date, end_date = qm._calculate_date_range(time_period)
-        stats = bq.get_reservation_to_first_proposal_stats(agency_id, start_date, end_date)
+        stats = await run_in_query_executor(qm.get_reservation_to_first_proposal_stats, agency_id, start_date, end_date)
         median_hours = stats["median_hours"]
         avg_hours = stats["avg_hours"]
         return {
@@ -192,7 +188,7 @@ async def get_reservation_to_first_proposal_stats(
         raise HTTPException(status_code=500, detail=f"Failed to fetch reservation_to_first_proposal stats: {str(e)}")
 
 @router.get("/{agency_id}/proposal_to_cancellation")
-@cache_endpoint(ttl_hours=48, key_params=['agency_id', 'start_date', 'end_date', 'time_period'], cache_key_prefix="/reaction_times/proposal_to_cancellation")
+@cache_endpoint(key_params=['agency_id', 'start_date', 'end_date', 'time_period'], cache_key_prefix="/reaction_times/proposal_to_cancellation")
 async def get_proposal_to_cancellation_stats(
     agency_id: str,
     start_date: Optional[str] = Query(None, description="Startdatum im Format YYYY-MM-DD"),
@@ -203,12 +199,10 @@ async def get_proposal_to_cancellation_stats(
     Median und Durchschnitt (in Stunden) von Personalvorschlag (presented_at) bis Abbruch (vor Anreise) für abgebrochene CareStays
     """
     try:
-        bq = BigQueryConnection()
+        qm = QueryManager()
         if not start_date or not end_date:
-            from ..utils.query_manager import QueryManager
-            qm = QueryManager()
             start_date, end_date = qm._calculate_date_range(time_period)
-        stats = bq.get_proposal_to_cancellation_stats(agency_id, start_date, end_date)
+        stats = await run_in_query_executor(qm.get_proposal_to_cancellation_stats, agency_id, start_date, end_date)
         median_hours = stats["median_hours"]
         avg_hours = stats["avg_hours"]
         return {
@@ -222,7 +216,7 @@ async def get_proposal_to_cancellation_stats(
         raise HTTPException(status_code=500, detail=f"Failed to fetch proposal_to_cancellation stats: {str(e)}")
 
 @router.get("/{agency_id}/arrival_to_cancellation")
-@cache_endpoint(ttl_hours=48, key_params=['agency_id', 'start_date', 'end_date', 'time_period'], cache_key_prefix="/reaction_times/arrival_to_cancellation")
+@cache_endpoint(key_params=['agency_id', 'start_date', 'end_date', 'time_period'], cache_key_prefix="/reaction_times/arrival_to_cancellation")
 async def get_arrival_to_cancellation_stats(
     agency_id: str,
     start_date: Optional[str] = Query(None, description="Startdatum im Format YYYY-MM-DD"),
@@ -234,12 +228,10 @@ async def get_arrival_to_cancellation_stats(
     Aufgeteilt in: overall, first_stays (Neukunden), followup_stays (Wechsel)
     """
     try:
-        bq = BigQueryConnection()
+        qm = QueryManager()
         if not start_date or not end_date:
-            from ..utils.query_manager import QueryManager
-            qm = QueryManager()
             start_date, end_date = qm._calculate_date_range(time_period)
-        stats = bq.get_arrival_to_cancellation_stats(agency_id, start_date, end_date)
+        stats = await run_in_query_executor(qm.get_arrival_to_cancellation_stats, agency_id, start_date, end_date)
         def fmt(val):
             return f"{val:.2f}" if val is not None else None
         
@@ -268,7 +260,7 @@ async def get_arrival_to_cancellation_stats(
 # --- Endpoints for Overall Reaction Time Stats --- 
 
 @router.get("/stats/overall/posting_to_reservation")
-@cache_endpoint(ttl_hours=48, key_params=['start_date', 'end_date', 'time_period'], cache_key_prefix="/reaction_times/stats/overall/posting_to_reservation")
+@cache_endpoint(key_params=['start_date', 'end_date', 'time_period'], cache_key_prefix="/reaction_times/stats/overall/posting_to_reservation")
 async def get_overall_posting_to_reservation_stats(
     start_date: Optional[str] = Query(None, description="Startdatum im Format YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="Enddatum im Format YYYY-MM-DD"),
@@ -279,13 +271,13 @@ async def get_overall_posting_to_reservation_stats(
     """
     try:
         qm = QueryManager()
-        stats = qm.get_overall_posting_to_reservation_stats(start_date, end_date, time_period)
+        stats = await run_in_query_executor(qm.get_overall_posting_to_reservation_stats, start_date, end_date, time_period)
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch overall posting_to_reservation stats: {str(e)}")
 
 @router.get("/stats/overall/reservation_to_first_proposal")
-@cache_endpoint(ttl_hours=48, key_params=['start_date', 'end_date', 'time_period'], cache_key_prefix="/reaction_times/stats/overall/reservation_to_first_proposal")
+@cache_endpoint(key_params=['start_date', 'end_date', 'time_period'], cache_key_prefix="/reaction_times/stats/overall/reservation_to_first_proposal")
 async def get_overall_reservation_to_first_proposal_stats(
     start_date: Optional[str] = Query(None, description="Startdatum im Format YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="Enddatum im Format YYYY-MM-DD"),
@@ -296,13 +288,13 @@ async def get_overall_reservation_to_first_proposal_stats(
     """
     try:
         qm = QueryManager()
-        stats = qm.get_overall_reservation_to_first_proposal_stats(start_date, end_date, time_period)
+        stats = await run_in_query_executor(qm.get_overall_reservation_to_first_proposal_stats, start_date, end_date, time_period)
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch overall reservation_to_first_proposal stats: {str(e)}")
 
 @router.get("/stats/overall/proposal_to_cancellation")
-@cache_endpoint(ttl_hours=48, key_params=['start_date', 'end_date', 'time_period'], cache_key_prefix="/reaction_times/stats/overall/proposal_to_cancellation")
+@cache_endpoint(key_params=['start_date', 'end_date', 'time_period'], cache_key_prefix="/reaction_times/stats/overall/proposal_to_cancellation")
 async def get_overall_proposal_to_cancellation_stats(
     start_date: Optional[str] = Query(None, description="Startdatum im Format YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="Enddatum im Format YYYY-MM-DD"),
@@ -313,13 +305,13 @@ async def get_overall_proposal_to_cancellation_stats(
     """
     try:
         qm = QueryManager()
-        stats = qm.get_overall_proposal_to_cancellation_stats(start_date, end_date, time_period)
+        stats = await run_in_query_executor(qm.get_overall_proposal_to_cancellation_stats, start_date, end_date, time_period)
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch overall proposal_to_cancellation stats: {str(e)}")
 
 @router.get("/stats/overall/arrival_to_cancellation")
-@cache_endpoint(ttl_hours=48, key_params=['start_date', 'end_date', 'time_period'], cache_key_prefix="/reaction_times/stats/overall/arrival_to_cancellation")
+@cache_endpoint(key_params=['start_date', 'end_date', 'time_period'], cache_key_prefix="/reaction_times/stats/overall/arrival_to_cancellation")
 async def get_overall_arrival_to_cancellation_stats(
     start_date: Optional[str] = Query(None, description="Startdatum im Format YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="Enddatum im Format YYYY-MM-DD"),
@@ -330,7 +322,7 @@ async def get_overall_arrival_to_cancellation_stats(
     """
     try:
         qm = QueryManager()
-        stats = qm.get_overall_arrival_to_cancellation_stats(start_date, end_date, time_period)
+        stats = await run_in_query_executor(qm.get_overall_arrival_to_cancellation_stats, start_date, end_date, time_period)
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch overall arrival_to_cancellation stats: {str(e)}") 
\ No newline at end of file
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional, Dict, Any
-from ..utils.bigquery_connection import BigQueryConnection
+from ..utils.bigquery_connection import BigQueryConnection, run_in_query_executor
 from ..models import ResponseTimeData, TimeFilter, AgencyRequest, ResponseTimeComparison
 from ..dependencies import get_settings
 
@@ -16,7 +16,7 @@ async def get_agency_response_times(
     """
     try:
         bq = BigQueryConnection()
-        response_time_data = bq.get_response_times_by_agency(agency_id, time_period)
+        response_time_data = await run_in_query_executor(bq.get_response_times_by_agency, agency_id, time_period)
         
         # If no data is found
         if not response_time_data:
@@ -48,7 +48,7 @@ async def compare_agency_response_times(request: AgencyRequest):
         bq = BigQueryConnection()
         
         # Get data for the selected agency
-        selected_agency = bq.get_response_times_by_agency(request.agency_id, request.time_period)
+        selected_agency = await run_in_query_executor(bq.get_response_times_by_agency, request.agency_id, request.time_period)
         
         # If no data is found for the selected agency
         if not selected_agency:
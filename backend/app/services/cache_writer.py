@@ -0,0 +1,297 @@
+"""
+Write-behind writer of the SQLite response cache.
+DatabaseCacheService.save_cached_data only queues an entry; a single writer
+task per event loop drains the queue in batches. Repeated saves of a key
+are coalesced to the latest one. Each batch is written in one transaction:
+the cache rows as INSERT ... ON CONFLICT(cache_key) DO UPDATE, followed by
+the DataFreshness rows of the batch.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+import logging
+
+from ..models.database import CachedData, DataFreshness
+from ..utils.database_connection import get_database_manager
+from ..utils.response_memory_cache import get_response_memory_cache
+from ..dependencies import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Columns of an existing cache row that a save replaces
+_UPDATED_COLUMNS = (
+    "parameters", "data", "payload", "storage_format", "data_hash",
+    "created_at", "expires_at", "is_preloaded", "query_fingerprint"
+)
+
+
+class CacheWriter:
+    """
+    Queue of pending cache writes with a background writer task.
+    """
+
+    def __init__(self, max_batch: int = 200, max_attempts: int = 3):
+        """
+        Args:
+            max_batch: Entries written per transaction
+            max_attempts: Attempts per batch before its entries are dropped
+        """
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        # cache key -> entry, oldest first; entries of the batch being written
+        # stay visible to get_pending until they are committed
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._writing: Dict[str, Dict[str, Any]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._enqueued = 0
+        self._coalesced = 0
+        self._batches = 0
+        self._written = 0
+        self._failed = 0
+        self._flush_ms_total = 0.0
+        self._flush_ms_max = 0.0
+        self._last_flush_ms: Optional[float] = None
+
+    def enqueue(
+        self,
+        cache_key: str,
+        data: Any,
+        endpoint: str,
+        agency_id: Optional[str],
+        time_period: Optional[str],
+        params: Optional[Dict[str, Any]],
+        expires_hours: int,
+        is_preloaded: bool,
+        query_fingerprint: Optional[str],
+        data_type: Optional[str]
+    ) -> None:
+        """
+        Queue a cache entry for writing; must be called on the event loop.
+        A pending entry of the same key is replaced.
+
+        Args:
+            data_type: DataFreshness type updated with the entry (None = none)
+        """
+        now = datetime.utcnow()
+        entry = {
+            "cache_key": cache_key,
+            "data": data,
+            "endpoint": endpoint,
+            "agency_id": agency_id,
+            "time_period": time_period,
+            "params": params,
+            "expires_hours": expires_hours,
+            "is_preloaded": is_preloaded,
+            "query_fingerprint": query_fingerprint,
+            "data_type": data_type,
+            "created_at": now,
+            "expires_at": now + timedelta(hours=expires_hours)
+        }
+        if self._pending.pop(cache_key, None) is not None:
+            self._coalesced += 1
+        self._pending[cache_key] = entry
+        self._enqueued += 1
+        self._ensure_task()
+        self._wakeup.set()
+
+    def get_pending(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a queued or currently written entry, so reads see saves before they reach SQLite.
+
+        Returns:
+            The entry (with "data", "expires_at" and "query_fingerprint"), or None
+        """
+        return self._pending.get(cache_key) or self._writing.get(cache_key)
+
+    def _ensure_task(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._pending:
+                batch = []
+                while self._pending and len(batch) < self.max_batch:
+                    batch.append(self._pending.popitem(last=False)[1])
+                self._writing = {entry["cache_key"]: entry for entry in batch}
+                try:
+                    await self._write_batch(batch)
+                except Exception as e:
+                    # Never let the writer die, later saves would be lost
+                    logger.error(f"[CACHE WRITER] Unexpected error writing {len(batch)} entries: {e}")
+                    self._failed += len(batch)
+                finally:
+                    self._writing = {}
+
+    async def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        """Encode a batch off the event loop and write it in one transaction, with retries."""
+        storage_format = get_settings().cache_storage_format
+        rows, freshness, decoded, encode_failures = await asyncio.get_running_loop().run_in_executor(
+            None, self._encode_batch, batch, storage_format
+        )
+        self._failed += encode_failures
+        if not rows:
+            return
+
+        for attempt in range(self.max_attempts):
+            started = time.perf_counter()
+            try:
+                await self._execute(rows, freshness)
+                break
+            except Exception as e:
+                logger.warning(f"[CACHE WRITER] Attempt {attempt + 1} writing {len(rows)} entries failed: {e}")
+                if attempt == self.max_attempts - 1:
+                    logger.error(f"[CACHE WRITER] Dropped {len(rows)} cache entries after {self.max_attempts} attempts")
+                    self._failed += len(rows)
+                    return
+                # Exponential backoff
+                await asyncio.sleep(0.2 * (2 ** attempt))
+
+        flush_ms = (time.perf_counter() - started) * 1000
+        # Only committed entries are served from the memory tier
+        memory_cache = get_response_memory_cache()
+        for cache_key, data, size_bytes, expires_at, fingerprint in decoded:
+            memory_cache.put(cache_key, data, size_bytes, expires_at, fingerprint)
+        self._batches += 1
+        self._written += len(rows)
+        self._flush_ms_total += flush_ms
+        self._flush_ms_max = max(self._flush_ms_max, flush_ms)
+        self._last_flush_ms = flush_ms
+        logger.debug(f"[CACHE WRITER] Wrote {len(rows)} cache entries in {flush_ms:.0f}ms")
+
+    def _encode_batch(self, batch: List[Dict[str, Any]], storage_format: str) -> tuple:
+        """
+        Build the cache and freshness rows of a batch and decode the entries
+        like an SQLite hit would, for the memory tier once they are committed.
+
+        Returns:
+            tuple: (cache rows, {(data_type, agency_id, time_period): freshness hours},
+                memory tier entries, number of entries that could not be encoded)
+        """
+        rows = []
+        freshness = {}
+        decoded = []
+        encode_failures = 0
+        for entry in batch:
+            cache_entry = CachedData()
+            try:
+                encoded_data = cache_entry.set_data(entry["data"], storage_format)
+                cache_entry.set_parameters(entry["params"])
+            except Exception as e:
+                logger.error(f"[CACHE WRITER] Could not encode cache entry {entry['cache_key']}: {e}")
+                encode_failures += 1
+                continue
+
+            rows.append({
+                "cache_key": entry["cache_key"],
+                "endpoint": entry["endpoint"],
+                "agency_id": entry["agency_id"],
+                "time_period": entry["time_period"],
+                "parameters": cache_entry.parameters,
+                "data": cache_entry.data,
+                "payload": cache_entry.payload,
+                "storage_format": cache_entry.storage_format,
+                "data_hash": cache_entry.data_hash,
+                "created_at": entry["created_at"],
+                "expires_at": entry["expires_at"],
+                "is_preloaded": entry["is_preloaded"],
+                "query_fingerprint": entry["query_fingerprint"]
+            })
+            decoded.append((
+                entry["cache_key"], json.loads(encoded_data), len(encoded_data), entry["expires_at"], entry["query_fingerprint"]
+            ))
+            if entry["data_type"]:
+                freshness[(entry["data_type"], entry["agency_id"], entry["time_period"])] = entry["expires_hours"]
+        return rows, freshness, decoded, encode_failures
+
+    async def _execute(self, rows: List[Dict[str, Any]], freshness: Dict[tuple, int]) -> None:
+        statement = sqlite_insert(CachedData).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[CachedData.cache_key],
+            set_={column: statement.excluded[column] for column in _UPDATED_COLUMNS}
+        )
+        now = datetime.utcnow()
+
+        async with get_database_manager().get_async_session() as session:
+            await session.execute(statement)
+            # The unique constraint of data_freshness does not conflict on NULL
+            # agency IDs or periods in SQLite, so freshness rows are updated
+            # null-safely and inserted if missing
+            for (data_type, agency_id, time_period), freshness_hours in freshness.items():
+                result = await session.execute(
+                    update(DataFreshness)
+                    .where(
+                        DataFreshness.data_type == data_type,
+                        DataFreshness.agency_id.is_not_distinct_from(agency_id),
+                        DataFreshness.time_period.is_not_distinct_from(time_period)
+                    )
+                    .values(last_updated=now, is_fresh=True, freshness_duration_hours=freshness_hours)
+                )
+                if result.rowcount == 0:
+                    session.add(DataFreshness(
+                        data_type=data_type,
+                        agency_id=agency_id,
+                        time_period=time_period,
+                        last_updated=now,
+                        freshness_duration_hours=freshness_hours
+                    ))
+            await session.commit()
+
+    async def flush(self, timeout: float = 10.0) -> bool:
+        """
+        Wait until all queued entries are written (e.g. on shutdown).
+
+        Returns:
+            Whether the queue was drained within the timeout
+        """
+        deadline = time.monotonic() + timeout
+        while self._pending or self._writing:
+            if self._task is None or self._task.done() or time.monotonic() > deadline:
+                return False
+            await asyncio.sleep(0.01)
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get queue depth, coalesced saves and flush latency for monitoring.
+        """
+        return {
+            "queue_depth": len(self._pending) + len(self._writing),
+            "enqueued": self._enqueued,
+            "coalesced": self._coalesced,
+            "batches": self._batches,
+            "written_entries": self._written,
+            "failed_entries": self._failed,
+            "last_flush_ms": round(self._last_flush_ms, 1) if self._last_flush_ms is not None else None,
+            "mean_flush_ms": round(self._flush_ms_total / self._batches, 1) if self._batches else None,
+            "max_flush_ms": round(self._flush_ms_max, 1)
+        }
+
+
+# Global writer instance
+_cache_writer: Optional[CacheWriter] = None
+_cache_writer_lock = threading.Lock()
+
+def get_cache_writer() -> CacheWriter:
+    """Get the global cache writer instance."""
+    global _cache_writer
+    if _cache_writer is None:
+        with _cache_writer_lock:
+            if _cache_writer is None:
+                _cache_writer = CacheWriter()
+    return _cache_writer
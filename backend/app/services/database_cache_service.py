@@ -15,6 +15,10 @@ import logging
 
 from ..models.database import CachedData, PreloadSession, DataFreshness
 from ..utils.database_connection import get_database_manager
+from ..utils.query_fingerprint import get_fingerprint_registry
+from ..utils.response_memory_cache import get_response_memory_cache
+from .cache_writer import get_cache_writer
+from ..dependencies import get_settings
 
 logger = logging.getLogger(__name__)
 
@@ -22,13 +26,14 @@ logger = logging.getLogger(__name__)
 class DatabaseCacheService:
     """
     Service class for database-backed caching operations.
-    Replaces the in-memory cache with persistent SQLite storage.
+    Persistent SQLite storage with an in-process memory tier in front of it
+    (see ResponseMemoryCache).
     """
     
     def __init__(self):
         self.db_manager = get_database_manager()
-        # Add a lock to prevent concurrent SQLite writes
-        self._write_lock = asyncio.Lock()
+        # Lookups answered per tier
+        self._tier_stats = {"memory_hits": 0, "sqlite_hits": 0, "misses": 0}
     
     @staticmethod
     def create_cache_key(endpoint: str, params: Dict[str, Any] = None) -> str:
@@ -47,16 +52,34 @@ class DatabaseCacheService:
             return f"{endpoint}?{param_string}"
         return endpoint
     
-    async def get_cached_data(self, cache_key: str) -> Optional[Dict[Any, Any]]:
+    async def get_cached_data(self, cache_key: str, version: Optional[int] = None) -> Optional[Dict[Any, Any]]:
         """
-        Retrieve cached data by cache key.
+        Retrieve cached data by cache key, from memory if possible.
         
         Args:
             cache_key: The cache key to look up
+            version: Current version of the endpoint, entries of other versions are misses
             
         Returns:
-            Cached data as dictionary, or None if not found/expired
+            Cached data as dictionary (shared with the memory tier, do not modify),
+            or None if not found/expired/produced by changed SQL
         """
+        memory_cache = get_response_memory_cache()
+        cached = memory_cache.get(cache_key)
+        if cached is not None:
+            data, query_fingerprint = cached
+            if get_fingerprint_registry().is_current(query_fingerprint, version):
+                self._tier_stats["memory_hits"] += 1
+                return data
+            memory_cache.invalidate(cache_key)
+        
+        # Saved but not yet written to SQLite
+        pending = get_cache_writer().get_pending(cache_key)
+        if pending is not None and pending["expires_at"] > datetime.utcnow() \
+                and get_fingerprint_registry().is_current(pending["query_fingerprint"], version):
+            self._tier_stats["memory_hits"] += 1
+            return pending["data"]
+        
         try:
             async with self.db_manager.get_async_session() as session:
                 # Query for the cache entry
@@ -67,22 +90,63 @@ class DatabaseCacheService:
                 
                 if not cache_entry:
                     logger.debug(f"Cache miss for key: {cache_key}")
+                    self._tier_stats["misses"] += 1
                     return None
                 
-                # Check if expired
+                # Check if expired. The entry is kept as fallback for when
+                # BigQuery is unavailable, until the refetch overwrites it
                 if cache_entry.is_expired():
                     logger.debug(f"Cache expired for key: {cache_key}")
-                    # Schedule deletion without blocking main operation
-                    asyncio.create_task(self._delete_expired_entry(cache_key))
+                    self._tier_stats["misses"] += 1
+                    return None
+                
+                # Entries computed by a previous version of the SQL are misses,
+                # the refetch overwrites them
+                if not get_fingerprint_registry().is_current(cache_entry.query_fingerprint, version):
+                    logger.info(f"Cache entry for key {cache_key} was produced by changed SQL")
+                    self._tier_stats["misses"] += 1
                     return None
                 
                 logger.debug(f"Cache hit for key: {cache_key}")
-                return cache_entry.get_data()
+                self._tier_stats["sqlite_hits"] += 1
+                encoded_data = cache_entry.get_json()
+                data = json.loads(encoded_data)
+                memory_cache.put(cache_key, data, len(encoded_data), cache_entry.expires_at, cache_entry.query_fingerprint)
+                return data
                 
         except Exception as e:
             logger.error(f"Error retrieving cached data for key {cache_key}: {e}")
             return None
     
+    async def get_stale_data(self, cache_key: str, version: Optional[int] = None) -> Optional[Tuple[Dict[Any, Any], datetime, Optional[datetime]]]:
+        """
+        Retrieve cached data regardless of its expiry, to answer a request
+        while BigQuery is unavailable.
+        
+        Args:
+            cache_key: The cache key to look up
+            version: Current version of the endpoint
+            
+        Returns:
+            Tuple of the cached data, when it was cached and when it expired,
+            or None if there is no usable entry
+        """
+        try:
+            async with self.db_manager.get_async_session() as session:
+                result = await session.execute(
+                    select(CachedData).where(CachedData.cache_key == cache_key)
+                )
+                cache_entry = result.scalar_one_or_none()
+                
+                if not cache_entry or not get_fingerprint_registry().is_current(cache_entry.query_fingerprint, version):
+                    return None
+                
+                return cache_entry.get_data(), cache_entry.created_at, cache_entry.expires_at
+                
+        except Exception as e:
+            logger.error(f"Error retrieving stale data for key {cache_key}: {e}")
+            return None
+    
     async def save_cached_data(
         self,
         cache_key: str,
@@ -92,10 +156,12 @@ class DatabaseCacheService:
         time_period: Optional[str] = None,
         params: Optional[Dict[str, Any]] = None,
         expires_hours: int = 24,
-        is_preloaded: bool = False
+        is_preloaded: bool = False,
+        query_fingerprint: Optional[str] = None
     ) -> bool:
         """
-        Save data to cache with metadata.
+        Save data to cache with metadata. The entry is written to SQLite in
+        the background (see CacheWriter); lookups see it right away.
         
         Args:
             cache_key: Unique cache key
@@ -106,77 +172,30 @@ class DatabaseCacheService:
             params: Optional additional parameters
             expires_hours: Hours until expiry (default 24)
             is_preloaded: Whether this data was preloaded
+            query_fingerprint: Fingerprint of the SQL the data was computed with
             
         Returns:
-            True if saved successfully, False otherwise
+            True if the entry was queued, False otherwise
         """
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                # Acquire write lock to prevent concurrent SQLite writes
-                async with self._write_lock:
-                    # Use a new session for each attempt to avoid state issues
-                    async with self.db_manager.get_async_session() as session:
-                        try:
-                            # Check if entry exists first
-                            existing_result = await session.execute(
-                                select(CachedData).where(CachedData.cache_key == cache_key)
-                            )
-                            existing_entry = existing_result.scalar_one_or_none()
-                            
-                            if existing_entry:
-                                # Update existing entry
-                                existing_entry.set_data(data)
-                                existing_entry.set_parameters(params)
-                                existing_entry.created_at = datetime.utcnow()
-                                existing_entry.set_expiry(expires_hours)
-                                existing_entry.is_preloaded = is_preloaded
-                                logger.debug(f"Updated existing cache entry for key: {cache_key}")
-                            else:
-                                # Create new entry
-                                cache_entry = CachedData(
-                                    cache_key=cache_key,
-                                    endpoint=endpoint,
-                                    agency_id=agency_id,
-                                    time_period=time_period,
-                                    is_preloaded=is_preloaded
-                                )
-                                cache_entry.set_data(data)
-                                cache_entry.set_parameters(params)
-                                cache_entry.set_expiry(expires_hours)
-                                
-                                session.add(cache_entry)
-                                logger.debug(f"Created new cache entry for key: {cache_key}")
-                            
-                            # Commit the cache data first
-                            await session.commit()
-                            
-                            logger.debug(f"Saved cache entry for key: {cache_key}")
-                            
-                            # Update data freshness in background to avoid blocking
-                            asyncio.create_task(
-                                self._update_data_freshness_background(endpoint, agency_id, time_period, expires_hours)
-                            )
-                            
-                            return True
-                            
-                        except Exception as e:
-                            try:
-                                await session.rollback()
-                            except:
-                                pass  # Ignore rollback errors
-                            raise e
-                    
-            except Exception as e:
-                logger.warning(f"Attempt {attempt + 1} failed saving cache key {cache_key}: {e}")
-                if attempt == max_retries - 1:
-                    logger.error(f"Failed to save cached data after {max_retries} attempts: {e}")
-                    return False
-                
-                # Exponential backoff
-                await asyncio.sleep(0.2 * (2 ** attempt))
-                
-        return False
+        try:
+            get_cache_writer().enqueue(
+                cache_key=cache_key,
+                data=data,
+                endpoint=endpoint,
+                agency_id=agency_id,
+                time_period=time_period,
+                params=params,
+                expires_hours=expires_hours,
+                is_preloaded=is_preloaded,
+                query_fingerprint=query_fingerprint,
+                data_type=self._extract_data_type(endpoint)
+            )
+            logger.debug(f"Queued cache entry for key: {cache_key}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to queue cached data for key {cache_key}: {e}")
+            return False
     
     async def is_data_fresh(
         self,
@@ -404,8 +423,22 @@ class DatabaseCacheService:
             return None
     
     async def cleanup_expired_data(self) -> int:
-        """Remove expired cache entries."""
-        return await self.db_manager.cleanup_expired_data()
+        """Remove cache entries expired longer than the stale retention."""
+        return await self.db_manager.cleanup_expired_data(get_settings().cache_stale_retention_hours)
+    
+    def get_tier_stats(self) -> Dict[str, Any]:
+        """
+        Get the lookups answered by the memory tier and by SQLite.
+        
+        Returns:
+            Dictionary with per-tier hit counters and the memory tier's usage
+        """
+        lookups = sum(self._tier_stats.values())
+        return {
+            **self._tier_stats,
+            "memory_hit_rate": round(self._tier_stats["memory_hits"] / lookups, 3) if lookups else 0.0,
+            "memory": get_response_memory_cache().get_stats()
+        }
     
     async def get_cache_stats(self) -> Dict[str, Any]:
         """
@@ -450,7 +483,8 @@ class DatabaseCacheService:
                     "preloaded_entries": preloaded_entries,
                     "expired_entries": expired_entries,
                     "recent_sessions_24h": recent_sessions,
-                    "database_info": self.db_manager.get_database_info()
+                    "database_info": self.db_manager.get_database_info(),
+                    "tiers": self.get_tier_stats()
                 }
                 
         except Exception as e:
@@ -458,98 +492,6 @@ class DatabaseCacheService:
             return {"error": str(e)}
     
 
-    async def _update_data_freshness(
-        self,
-        session: AsyncSession,
-        endpoint: str,
-        agency_id: Optional[str],
-        time_period: Optional[str],
-        freshness_hours: int
-    ):
-        """Update data freshness tracking."""
-        try:
-            # Extract data type from endpoint
-            data_type = self._extract_data_type(endpoint)
-            if not data_type:
-                return
-            
-            # Simple check and update approach
-            result = await session.execute(
-                select(DataFreshness).where(
-                    and_(
-                        DataFreshness.data_type == data_type,
-                        DataFreshness.agency_id == agency_id,
-                        DataFreshness.time_period == time_period
-                    )
-                )
-            )
-            freshness_entry = result.scalar_one_or_none()
-            
-            if freshness_entry:
-                freshness_entry.update_freshness()
-                freshness_entry.freshness_duration_hours = freshness_hours
-            else:
-                # Check again for race condition
-                try:
-                    freshness_entry = DataFreshness(
-                        data_type=data_type,
-                        agency_id=agency_id,
-                        time_period=time_period,
-                        freshness_duration_hours=freshness_hours
-                    )
-                    session.add(freshness_entry)
-                except Exception:
-                    # If it fails due to unique constraint, just ignore
-                    await session.rollback()
-                    # Try to find the existing one that was created by another session
-                    result = await session.execute(
-                        select(DataFreshness).where(
-                            and_(
-                                DataFreshness.data_type == data_type,
-                                DataFreshness.agency_id == agency_id,
-                                DataFreshness.time_period == time_period
-                            )
-                        )
-                    )
-                    freshness_entry = result.scalar_one_or_none()
-                    if freshness_entry:
-                        freshness_entry.update_freshness()
-                        freshness_entry.freshness_duration_hours = freshness_hours
-                    
-        except Exception as e:
-            logger.warning(f"Error updating data freshness: {e}")
-
-    async def _update_data_freshness_background(
-        self,
-        endpoint: str,
-        agency_id: Optional[str],
-        time_period: Optional[str],
-        freshness_hours: int
-    ):
-        """Update data freshness tracking in background."""
-        try:
-            # Use a completely separate session to avoid conflicts
-            async with self.db_manager.get_async_session() as session:
-                await self._update_data_freshness(session, endpoint, agency_id, time_period, freshness_hours)
-                await session.commit()
-        except Exception as e:
-            logger.warning(f"Error updating data freshness in background: {e}")
-    
-    async def _delete_expired_entry(self, cache_key: str):
-        """Delete expired entry in background without blocking."""
-        try:
-            async with self.db_manager.get_async_session() as session:
-                result = await session.execute(
-                    select(CachedData).where(CachedData.cache_key == cache_key)
-                )
-                cache_entry = result.scalar_one_or_none()
-                if cache_entry and cache_entry.is_expired():
-                    await session.delete(cache_entry)
-                    await session.commit()
-                    logger.debug(f"Deleted expired cache entry: {cache_key}")
-        except Exception as e:
-            logger.warning(f"Error deleting expired entry {cache_key}: {e}")
-    
     @staticmethod
     def _extract_data_type(endpoint: str) -> Optional[str]:
         """Extract data type from endpoint path."""
@@ -557,13 +499,31 @@ class DatabaseCacheService:
             return "quotas"
         elif "reaction_times" in endpoint:
             return "reaction_times"
-        elif "problematic_stays" in endpoint:
+        elif "problematic_stays" in endpoint or "problematic-stays" in endpoint:
             return "problematic_stays"
         elif "profile_quality" in endpoint:
             return "profile_quality"
+        elif "care_stays" in endpoint:
+            return "care_stays"
         return None
 
 
+def get_ttl_hours(endpoint: str, time_period: Optional[str], default: int = 24) -> int:
+    """
+    Get the hours a response of an endpoint stays cached under the freshness
+    policy (DataFreshness.get_freshness_duration) for its data type and time period.
+    
+    Args:
+        endpoint: Endpoint path or cache key prefix
+        time_period: Time period of the response, if any
+        default: Hours for data types and periods without a rule
+        
+    Returns:
+        Time to live in hours
+    """
+    return DataFreshness.get_freshness_duration(DatabaseCacheService._extract_data_type(endpoint), time_period, default)
+
+
 # Global service instance
 _cache_service: Optional[DatabaseCacheService] = None
 
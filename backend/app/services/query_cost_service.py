@@ -0,0 +1,293 @@
+"""
+Scan cost profiling for BigQuery queries.
+Dry-runs every named query of the QueryManager and the SQL constants of the
+query and route modules for each time period, stores the estimated bytes
+processed as history and derives the maximum_bytes_billed limits that the
+BytesBilledGuard applies to real jobs.
+"""
+
+import asyncio
+import importlib
+import json
+import pkgutil
+import re
+import uuid
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Iterable
+from sqlalchemy import select, desc
+import logging
+
+from ..models.database import QueryCostProfile
+from ..utils.database_connection import get_database_manager
+from ..utils.bigquery_connection import run_in_query_executor
+from ..utils.bytes_billed_guard import get_bytes_billed_guard
+from ..utils.query_result_cache import sql_hash
+from ..dependencies import get_settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TIME_PERIODS = ["last_month", "last_quarter", "last_year", "all_time"]
+
+# Modules whose upper-case SQL string constants are profiled
+CONSTANT_PACKAGES = ["app.queries", "app.routes"]
+
+# Values bound for parameters other than the date range. NULL selects the
+# unfiltered branch of optional filters ("@x IS NULL OR ..."), the worst case.
+DRY_RUN_PARAM_VALUES: Dict[str, Any] = {
+    "agency_id": "dry_run",
+    "care_stay_id": "dry_run",
+    "event_type": None,
+    "stay_type": None,
+}
+
+_PARAM_PATTERN = re.compile(r"@(\w+)")
+_LEADING_COMMENTS = re.compile(r"^(\s*--[^\n]*\n)+")
+
+
+def _is_select(query: str) -> bool:
+    """Only read queries are profiled; DDL and DML constants are skipped."""
+    text = _LEADING_COMMENTS.sub("", query).lstrip().upper()
+    return text.startswith("SELECT") or text.startswith("WITH")
+
+
+class QueryCostService:
+    """
+    Service class for dry-run profiling and scan limits.
+    """
+
+    def __init__(self):
+        self.db_manager = get_database_manager()
+        self._query_manager = None
+
+    def _get_query_manager(self):
+        if self._query_manager is None:
+            from ..utils.query_manager import QueryManager
+            self._query_manager = QueryManager()
+        return self._query_manager
+
+    def collect_targets(self) -> List[Dict[str, Any]]:
+        """
+        Collect all queries to profile.
+
+        Returns:
+            List of dicts with name, source, sql and sql_hash; SQL that is both
+            a named query and a constant is listed once under its query name
+        """
+        targets = []
+        seen = set()
+
+        def add(name: str, source: str, query: str):
+            key = sql_hash(query)
+            if key in seen or not _is_select(query):
+                return
+            seen.add(key)
+            targets.append({"name": name, "source": source, "sql": query, "sql_hash": key})
+
+        for name, query in self._get_query_manager().queries.items():
+            add(name, "query_manager", query)
+
+        for package_name in CONSTANT_PACKAGES:
+            package = importlib.import_module(package_name)
+            for module_info in pkgutil.walk_packages(package.__path__, package_name + "."):
+                try:
+                    module = importlib.import_module(module_info.name)
+                except Exception as e:
+                    logger.warning(f"[QUERY COST] Could not import {module_info.name}: {e}")
+                    continue
+                for attr, value in sorted(vars(module).items()):
+                    if attr.isupper() and not attr.startswith("_") and isinstance(value, str):
+                        add(f"{module_info.name[len('app.'):]}.{attr}", "constant", value)
+
+        return targets
+
+    def build_dry_run_params(self, query: str, time_period: str) -> Optional[Dict[str, Any]]:
+        """
+        Bind sample values for all parameters of a query.
+
+        Returns:
+            Parameters for the dry run, or None if the query uses a parameter
+            without a known sample value
+        """
+        start_date, end_date = self._get_query_manager()._calculate_date_range(time_period)
+        params = {}
+        for name in set(_PARAM_PATTERN.findall(query)):
+            if name == "start_date":
+                params[name] = start_date
+            elif name == "end_date":
+                params[name] = end_date
+            elif name in DRY_RUN_PARAM_VALUES:
+                params[name] = DRY_RUN_PARAM_VALUES[name]
+            else:
+                return None
+        return params
+
+    def _dry_run(self, target: Dict[str, Any], time_period: Optional[str], params: Dict[str, Any]) -> Dict[str, Any]:
+        bq_connection = self._get_query_manager().bq_connection
+        result = {
+            "query_name": target["name"],
+            "source": target["source"],
+            "sql_hash": target["sql_hash"],
+            "time_period": time_period,
+            "total_bytes_processed": None,
+            "error": None
+        }
+        try:
+            result["total_bytes_processed"] = bq_connection.dry_run(target["sql"], params)
+        except Exception as e:
+            result["error"] = str(e)
+        return result
+
+    async def profile_queries(self, time_periods: Optional[Iterable[str]] = None, query_names: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Dry-run all queries for each time period, store the results and refresh the limits.
+
+        Args:
+            time_periods: Periods to profile (defaults to PROFILE_TIME_PERIODS)
+            query_names: Restrict profiling to these queries
+
+        Returns:
+            Dictionary with the run ID, per-query results and skipped queries
+        """
+        time_periods = list(time_periods or PROFILE_TIME_PERIODS)
+        targets = await run_in_query_executor(self.collect_targets)
+        if query_names:
+            wanted = set(query_names)
+            targets = [target for target in targets if target["name"] in wanted]
+
+        jobs = []
+        skipped = []
+        for target in targets:
+            uses_dates = "@start_date" in target["sql"] or "@end_date" in target["sql"]
+            # Queries without a date range scan the same data for every period
+            for time_period in (time_periods if uses_dates else [None]):
+                params = self.build_dry_run_params(target["sql"], time_period or "all_time")
+                if params is None:
+                    skipped.append(target["name"])
+                    break
+                jobs.append(run_in_query_executor(self._dry_run, target, time_period, params))
+
+        results = await asyncio.gather(*jobs)
+        previous = {name: entry["max_bytes"] for name, entry in (await self._latest_profiles()).items()}
+
+        run_id = uuid.uuid4().hex
+        async with self.db_manager.get_async_session() as session:
+            for result in results:
+                session.add(QueryCostProfile(run_id=run_id, **result))
+            await session.commit()
+
+        await self.refresh_limits()
+
+        # Report each query with its largest estimate and the change since the last run
+        summary: Dict[str, Dict[str, Any]] = {}
+        for result in results:
+            entry = summary.setdefault(result["query_name"], {
+                "query_name": result["query_name"],
+                "source": result["source"],
+                "max_bytes_processed": 0,
+                "by_time_period": {},
+                "errors": []
+            })
+            if result["error"]:
+                entry["errors"].append({"time_period": result["time_period"], "error": result["error"]})
+                continue
+            entry["by_time_period"][result["time_period"] or "any"] = result["total_bytes_processed"]
+            entry["max_bytes_processed"] = max(entry["max_bytes_processed"], result["total_bytes_processed"])
+
+        for entry in summary.values():
+            last = previous.get(entry["query_name"])
+            entry["previous_max_bytes_processed"] = last
+            if last and entry["max_bytes_processed"] > last * 1.5:
+                logger.warning(
+                    f"[QUERY COST] {entry['query_name']} now processes {entry['max_bytes_processed']} bytes "
+                    f"(previous profile: {last})"
+                )
+
+        failed = sum(1 for result in results if result["error"])
+        logger.info(f"[QUERY COST] Profiled {len(summary)} queries ({len(results)} dry runs, {failed} failed, {len(skipped)} skipped)")
+
+        return {
+            "run_id": run_id,
+            "profiled_at": datetime.utcnow().isoformat(),
+            "dry_runs": len(results),
+            "failed": failed,
+            "skipped": sorted(set(skipped)),
+            "queries": sorted(summary.values(), key=lambda entry: entry["max_bytes_processed"], reverse=True)
+        }
+
+    async def _latest_profiles(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Largest estimate and SQL hash per query from its most recent profiling run.
+        """
+        latest: Dict[str, Dict[str, Any]] = {}
+        async with self.db_manager.get_async_session() as session:
+            result = await session.execute(
+                select(QueryCostProfile)
+                .where(QueryCostProfile.total_bytes_processed.isnot(None))
+                .order_by(desc(QueryCostProfile.profiled_at), desc(QueryCostProfile.id))
+            )
+            for profile in result.scalars():
+                entry = latest.setdefault(profile.query_name, {
+                    "run_id": profile.run_id,
+                    "sql_hash": profile.sql_hash,
+                    "max_bytes": 0
+                })
+                if entry["run_id"] == profile.run_id:
+                    entry["max_bytes"] = max(entry["max_bytes"], profile.total_bytes_processed)
+        return latest
+
+    async def refresh_limits(self) -> Dict[str, int]:
+        """
+        Derive the per-query byte limits from the latest profiles and the
+        configured overrides and install them in the BytesBilledGuard.
+
+        Returns:
+            Mapping of query name to limit in bytes
+        """
+        settings = get_settings()
+        latest = await self._latest_profiles()
+
+        limits = {}
+        if settings.bigquery_bytes_billed_headroom > 0:
+            # BigQuery bills at least 10 MB per table, so tiny estimates get that floor
+            limits = {
+                name: int(max(entry["max_bytes"], 10 * 1024 * 1024) * settings.bigquery_bytes_billed_headroom)
+                for name, entry in latest.items()
+            }
+
+        if settings.bigquery_bytes_billed_overrides:
+            try:
+                overrides = json.loads(settings.bigquery_bytes_billed_overrides)
+                limits.update({name: int(limit) for name, limit in overrides.items()})
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.error(f"[QUERY COST] Invalid BIGQUERY_BYTES_BILLED_OVERRIDES: {e}")
+
+        names_by_hash = {entry["sql_hash"]: name for name, entry in latest.items()}
+        get_bytes_billed_guard().set_limits(limits, names_by_hash)
+        logger.info(f"[QUERY COST] Installed byte limits for {len(limits)} queries")
+        return limits
+
+    async def get_history(self, query_name: Optional[str] = None, limit: int = 200) -> List[Dict[str, Any]]:
+        """
+        Get stored profile rows, newest first.
+
+        Args:
+            query_name: Only return rows of this query
+            limit: Maximum number of rows
+        """
+        async with self.db_manager.get_async_session() as session:
+            statement = select(QueryCostProfile).order_by(desc(QueryCostProfile.profiled_at), desc(QueryCostProfile.id))
+            if query_name:
+                statement = statement.where(QueryCostProfile.query_name == query_name)
+            result = await session.execute(statement.limit(limit))
+            return [profile.to_dict() for profile in result.scalars()]
+
+
+# Global service instance
+_query_cost_service: Optional[QueryCostService] = None
+
+def get_query_cost_service() -> QueryCostService:
+    """Get the global query cost service instance."""
+    global _query_cost_service
+    if _query_cost_service is None:
+        _query_cost_service = QueryCostService()
+    return _query_cost_service
@@ -0,0 +1,183 @@
+"""
+Admission control for BigQuery jobs.
+All jobs pass through one controller that caps how many run at once. Waiting
+jobs are admitted by priority class (interactive before dashboard preload
+before comprehensive preload), and a number of slots is reserved for
+interactive requests, so page loads stay fast while a full preload runs.
+"""
+
+from typing import Dict, Any, Optional, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+import heapq
+import itertools
+import threading
+import logging
+import time
+
+from ..dependencies import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, lower value = admitted first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_DASHBOARD_PRELOAD = 1
+PRIORITY_COMPREHENSIVE_PRELOAD = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_DASHBOARD_PRELOAD: "dashboard_preload",
+    PRIORITY_COMPREHENSIVE_PRELOAD: "comprehensive_preload",
+}
+
+# Header the preload routes send when they call the API on their own behalf
+QUERY_PRIORITY_HEADER = "X-Query-Priority"
+
+_current_priority: ContextVar[int] = ContextVar("query_priority", default=PRIORITY_INTERACTIVE)
+
+
+def parse_priority(value: Optional[str]) -> int:
+    """Map a priority name (as sent in QUERY_PRIORITY_HEADER) to its class; unknown names are interactive."""
+    for priority, name in PRIORITY_NAMES.items():
+        if value == name:
+            return priority
+    return PRIORITY_INTERACTIVE
+
+
+def get_current_priority() -> int:
+    """Priority class of the request the current code runs for."""
+    return _current_priority.get()
+
+
+def is_background() -> bool:
+    """Whether the current code runs for a preload instead of a user."""
+    return get_current_priority() != PRIORITY_INTERACTIVE
+
+
+@contextmanager
+def query_priority(priority: int) -> Iterator[None]:
+    """
+    Run the enclosed code (and the executor work it starts) with the given priority.
+    """
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class AdmissionController:
+    """
+    Thread-safe priority semaphore for BigQuery jobs.
+    """
+
+    def __init__(self, max_concurrent: int, interactive_reserve: int = 0):
+        """
+        Args:
+            max_concurrent: Maximum number of jobs running at once
+            interactive_reserve: Slots that background jobs may not use
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.interactive_reserve = min(max(0, interactive_reserve), self.max_concurrent - 1)
+
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiters = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+
+        self._admitted = {priority: 0 for priority in PRIORITY_NAMES}
+        self._wait_seconds = {priority: 0.0 for priority in PRIORITY_NAMES}
+
+    def _limit(self, priority: int) -> int:
+        if priority == PRIORITY_INTERACTIVE:
+            return self.max_concurrent
+        return self.max_concurrent - self.interactive_reserve
+
+    def acquire(self, priority: int) -> float:
+        """
+        Block until the job may run.
+
+        Returns:
+            Seconds spent waiting
+        """
+        started = time.perf_counter()
+        with self._condition:
+            entry = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, entry)
+            # Only the highest-priority, longest-waiting job may take a free slot
+            while self._waiters[0] != entry or self._active >= self._limit(priority):
+                self._condition.wait()
+            heapq.heappop(self._waiters)
+            self._active += 1
+
+            waited = time.perf_counter() - started
+            self._admitted[priority] += 1
+            self._wait_seconds[priority] += waited
+            # The next waiter may be admissible as well
+            self._condition.notify_all()
+        return waited
+
+    def release(self) -> None:
+        """Free the slot of a finished job."""
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, priority: Optional[int] = None) -> Iterator[float]:
+        """
+        Hold a slot for the enclosed job.
+
+        Args:
+            priority: Priority class (defaults to the priority of the current request)
+
+        Yields:
+            Seconds spent waiting for the slot
+        """
+        if priority is None:
+            priority = get_current_priority()
+        waited = self.acquire(priority)
+        if waited > 1:
+            logger.info(f"[ADMISSION] {PRIORITY_NAMES[priority]} job waited {waited:.1f}s for a slot")
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get running/waiting jobs and admissions per priority for monitoring.
+        """
+        with self._condition:
+            waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._waiters:
+                waiting[PRIORITY_NAMES[priority]] += 1
+            return {
+                "max_concurrent": self.max_concurrent,
+                "interactive_reserve": self.interactive_reserve,
+                "active": self._active,
+                "waiting": waiting,
+                "admitted": {PRIORITY_NAMES[p]: count for p, count in self._admitted.items()},
+                "avg_wait_ms": {
+                    PRIORITY_NAMES[p]: round(self._wait_seconds[p] / count * 1000, 1) if count else 0.0
+                    for p, count in self._admitted.items()
+                }
+            }
+
+
+# Global controller instance
+_admission_controller: Optional[AdmissionController] = None
+_admission_controller_lock = threading.Lock()
+
+def get_admission_controller() -> AdmissionController:
+    """Get the global admission controller instance."""
+    global _admission_controller
+    if _admission_controller is None:
+        with _admission_controller_lock:
+            if _admission_controller is None:
+                settings = get_settings()
+                _admission_controller = AdmissionController(
+                    max_concurrent=settings.bigquery_admission_max_concurrent,
+                    interactive_reserve=settings.bigquery_admission_interactive_reserve
+                )
+    return _admission_controller
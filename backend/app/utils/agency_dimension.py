@@ -0,0 +1,298 @@
+"""
+In-memory agency dimension.
+The details of all agencies are loaded once and refreshed periodically in the
+background, so agency lookups and names are served from memory. Per-agency
+queries that join the agencies table only to return the agency name are
+rewritten without the join (see drop_agency_join); QueryManager fills in the
+name from the dimension instead.
+"""
+
+from typing import Dict, List, Any, Optional
+import contextvars
+import re
+import threading
+import logging
+import time
+
+from ..dependencies import get_settings
+from ..queries.agencies.agencies import GET_AGENCY_DIMENSION
+from .bigquery_connection import BigQueryConnection, get_query_executor
+from .query_batching import _top_level_keywords
+
+logger = logging.getLogger(__name__)
+
+# Seconds before an unknown agency ID triggers another refresh (e.g. a new agency)
+_MISS_REFRESH_SECONDS = 300
+
+_AGENCY_JOIN = re.compile(
+    r"\s*(?:INNER\s+)?JOIN\s+`[^`]*\.agencies`\s+(?:AS\s+)?a\s+ON\s+"
+    r"(?:(\w+)\.agency_id\s*=\s*a\._id|a\._id\s*=\s*(\w+)\.agency_id)\b",
+    re.IGNORECASE
+)
+_AGENCY_NAME_ITEM = re.compile(r"a\.name\s+AS\s+agency_name\b", re.IGNORECASE)
+_AGENCY_REF = re.compile(r"(?<![\w.])a\.(\w+)")
+
+
+def _join_alias(sql: str) -> Optional[tuple]:
+    """Find the single agencies join and the alias of the table it is joined on."""
+    joins = list(_AGENCY_JOIN.finditer(sql))
+    if len(joins) != 1 or sql.count(".agencies`") != 1:
+        return None
+    match = joins[0]
+    return match, match.group(1) or match.group(2)
+
+
+def drop_agency_join(sql: str) -> Optional[str]:
+    """
+    Rewrite a per-agency query that joins the agencies table only for the
+    agency name into one without the join.
+
+    Supported is a single SELECT (no CTEs) joining `agencies a` on
+    `<alias>.agency_id`, using `a.name` only as `a.name AS agency_name` in
+    the select list and in the GROUP BY, and `a._id` only in place of the
+    agency ID. The rewritten query groups by `<alias>.agency_id` and no
+    longer returns agency_name.
+
+    Args:
+        sql (str): SQL of the query
+
+    Returns:
+        The rewritten SQL, or None if the query does not have this shape
+    """
+    found = _join_alias(sql)
+    if found is None:
+        return None
+    join, alias = found
+    sql = sql[:join.start()] + sql[join.end():]
+    if set(_AGENCY_REF.findall(sql)) - {"_id", "name"} or len(_AGENCY_NAME_ITEM.findall(sql)) != 1:
+        return None
+
+    keywords = _top_level_keywords(sql)
+    words = [word for _, word in keywords]
+    if words[:1] != ["SELECT"] or words.count("SELECT") != 1 or words.count("GROUP BY") != 1 or "FROM" not in words:
+        return None
+
+    # Drop the agency name from the select list
+    from_position = next(position for position, word in keywords if word == "FROM")
+    item = _AGENCY_NAME_ITEM.search(sql)
+    if item.start() > from_position:
+        return None
+    before = re.search(r",\s*$", sql[:item.start()])
+    after = re.match(r"\s*,", sql[item.end():])
+    if before:
+        sql = sql[:before.start()] + sql[item.end():]
+    elif after:
+        sql = sql[:item.start()] + sql[item.end() + after.end():]
+    else:
+        return None
+
+    sql = re.sub(r"(?<![\w.])a\._id\b", f"{alias}.agency_id", sql)
+
+    # The remaining agency names must be grouped on, group by the agency ID instead
+    keywords = _top_level_keywords(sql)
+    group_by_position = next(position for position, word in keywords if word == "GROUP BY")
+    clause_end = next(
+        (position for position, word in keywords
+         if position > group_by_position and word in ("HAVING", "ORDER BY", "WINDOW", "LIMIT", "QUALIFY")),
+        len(sql)
+    )
+    group_by_end = re.compile(r"GROUP\s+BY\s+", re.IGNORECASE).match(sql, group_by_position).end()
+    clause = sql[group_by_end:clause_end]
+    if any(not group_by_end <= match.start() < clause_end for match in re.finditer(r"(?<![\w.])a\.name\b", sql)):
+        return None
+    items = []
+    for group_item in re.sub(r"(?<![\w.])a\.name\b", f"{alias}.agency_id", clause).split(","):
+        if group_item.strip() not in [existing.strip() for existing in items]:
+            items.append(group_item)
+    if "(" in clause and len(items) != len(clause.split(",")):
+        return None
+    return f"{sql[:group_by_end]}{','.join(items).rstrip()}\n{sql[clause_end:]}"
+
+
+def drop_agency_join_relation(base_relation: Dict[str, Any], metrics: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Rewrite a fused-metric base relation (see metric_compiler.compile_fused_query)
+    without the agencies join: the relation is grouped by agency_id instead of
+    the agency name.
+
+    Returns:
+        The rewritten relation, or None if the agencies table is used otherwise
+    """
+    found = _join_alias(base_relation["from"])
+    if found is None:
+        return None
+    join, alias = found
+    from_clause = base_relation["from"][:join.start()] + base_relation["from"][join.end():]
+    group_by = {name: expression for name, expression in base_relation["group_by"].items() if expression not in ("a.name", "a._id")}
+    if _AGENCY_REF.search(from_clause) or set(_AGENCY_REF.findall(base_relation["where"])) - {"_id"} \
+            or any(_AGENCY_REF.search(expression) for expression in group_by.values()) or _AGENCY_REF.search(str(metrics)):
+        return None
+    return {
+        **base_relation,
+        "from": from_clause,
+        "where": re.sub(r"(?<![\w.])a\._id\b", f"{alias}.agency_id", base_relation["where"]),
+        "group_by": {"agency_id": f"{alias}.agency_id", **group_by}
+    }
+
+
+class AgencyDimension:
+    """
+    Thread-safe in-memory index of all agencies by ID.
+    """
+
+    def __init__(self, refresh_seconds: int = 3600):
+        """
+        Args:
+            refresh_seconds: Age after which the agencies are reloaded in the background
+        """
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._agencies: Optional[Dict[str, Dict[str, Any]]] = None
+        self._loaded_at = 0.0
+        self._refreshing = False
+        self._refreshes = 0
+        self._failed_refreshes = 0
+        self._connection = None
+
+    def refresh(self) -> int:
+        """
+        Reload all agencies from BigQuery.
+
+        Returns:
+            Number of loaded agencies
+        """
+        if self._connection is None:
+            self._connection = BigQueryConnection()
+        try:
+            rows = self._connection.execute_query(GET_AGENCY_DIMENSION, query_name="GET_AGENCY_DIMENSION", use_cache=False)
+        except Exception:
+            with self._lock:
+                self._failed_refreshes += 1
+                # Keep serving the previous agencies, retry after a while
+                self._loaded_at = time.monotonic() - self.refresh_seconds + _MISS_REFRESH_SECONDS
+            raise
+        agencies = {row["agency_id"]: row for row in rows}
+        with self._lock:
+            self._agencies = agencies
+            self._loaded_at = time.monotonic()
+            self._refreshes += 1
+        logger.info(f"[AGENCY DIMENSION] Loaded {len(agencies)} agencies")
+        return len(agencies)
+
+    def warm_up(self) -> None:
+        """Load the agencies unless they are loaded already, logging instead of raising."""
+        try:
+            self._index()
+        except Exception as e:
+            logger.warning(f"[AGENCY DIMENSION] Could not load agencies: {e}")
+
+    def _refresh_in_background(self) -> None:
+        def refresh():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"[AGENCY DIMENSION] Refresh failed, keeping previous agencies: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        get_query_executor(background=True).submit(contextvars.copy_context().run, refresh)
+
+    def _index(self, max_age: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the current agencies; the first call loads them, later calls
+        trigger a background refresh once they are older than max_age.
+        """
+        if self._agencies is None:
+            with self._load_lock:
+                if self._agencies is None:
+                    self.refresh()
+        elif time.monotonic() - self._loaded_at > (self.refresh_seconds if max_age is None else max_age):
+            self._refresh_in_background()
+        return self._agencies
+
+    def get(self, agency_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the details of an agency.
+
+        Returns:
+            The agency, or None if it is unknown
+        """
+        agency = self._index().get(agency_id)
+        if agency is None:
+            # A new agency shows up after the next refresh
+            self._index(max_age=_MISS_REFRESH_SECONDS)
+        return agency
+
+    def get_name(self, agency_id: Optional[str]) -> Optional[str]:
+        """Get the name of an agency (None if unknown)."""
+        if not agency_id:
+            return None
+        agency = self.get(agency_id)
+        return agency.get("agency_name") if agency else None
+
+    def list_agencies(self) -> List[Dict[str, Any]]:
+        """
+        Get all agencies in the order and shape of GET_ALL_AGENCIES:
+        recently active agencies first, then by name.
+        """
+        agencies = sorted(
+            self._index().values(),
+            key=lambda agency: (not agency.get("is_active_recently"), agency.get("agency_name") or "")
+        )
+        return [
+            {
+                "agency_id": agency["agency_id"],
+                "agency_name": agency.get("agency_name"),
+                "is_active_recently": bool(agency.get("is_active_recently"))
+            }
+            for agency in agencies
+        ]
+
+    def with_agency_names(self, rows: List[Dict[str, Any]], agency_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Add the agency name to the rows of a query whose agencies join was dropped.
+
+        Args:
+            rows: Result rows (not modified, they may be shared via the result cache)
+            agency_id: The agency the query was run for, for rows without agency_id
+
+        Returns:
+            Copies of the rows with agency_name
+        """
+        return [
+            row if "agency_name" in row else {**row, "agency_name": self.get_name(row.get("agency_id") or agency_id)}
+            for row in rows
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get size, age and refresh counts for monitoring.
+        """
+        with self._lock:
+            return {
+                "agencies": len(self._agencies or {}),
+                "age_seconds": round(time.monotonic() - self._loaded_at) if self._agencies is not None else None,
+                "refresh_seconds": self.refresh_seconds,
+                "refreshes": self._refreshes,
+                "failed_refreshes": self._failed_refreshes
+            }
+
+
+# Global agency dimension instance
+_agency_dimension: Optional[AgencyDimension] = None
+_agency_dimension_lock = threading.Lock()
+
+def get_agency_dimension() -> AgencyDimension:
+    """Get the global agency dimension instance."""
+    global _agency_dimension
+    if _agency_dimension is None:
+        with _agency_dimension_lock:
+            if _agency_dimension is None:
+                _agency_dimension = AgencyDimension(refresh_seconds=get_settings().agency_dimension_refresh_seconds)
+    return _agency_dimension
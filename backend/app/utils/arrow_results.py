@@ -0,0 +1,140 @@
+"""
+Arrow-based decoding of BigQuery results.
+Query results are fetched as a pyarrow Table and date/time columns are
+converted to ISO strings column by column instead of value by value.
+Routes can work on the columnar table directly or on ArrowRows, which
+materializes dictionaries lazily and behaves like the list of dicts that
+BigQueryConnection.execute_query has always returned.
+"""
+
+from typing import Dict, List, Any, Iterator
+from collections.abc import Sequence
+import logging
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    HAS_ARROW = True
+except ImportError:  # pragma: no cover - pyarrow is listed in requirements.txt
+    pa = None
+    pc = None
+    HAS_ARROW = False
+
+logger = logging.getLogger(__name__)
+
+
+def _iso_column(column: "pa.ChunkedArray") -> "pa.ChunkedArray":
+    """
+    Convert a temporal column to the strings datetime.isoformat() produces.
+    Other columns are returned unchanged.
+    """
+    column_type = column.type
+
+    if pa.types.is_date(column_type):
+        return pc.cast(column, pa.string())
+
+    if pa.types.is_time(column_type):
+        # isoformat() omits the fraction when it is zero
+        return pc.replace_substring_regex(pc.cast(column, pa.string()), pattern=r"\.0+$", replacement="")
+
+    if pa.types.is_timestamp(column_type):
+        if column_type.tz not in (None, "UTC", "+00:00"):
+            # Only UTC is produced by BigQuery; anything else goes through Python
+            return pa.chunked_array(
+                [pa.array([value.isoformat() if value is not None else None for value in column.to_pylist()], pa.string())]
+            )
+        text = pc.strftime(column, format="%Y-%m-%dT%H:%M:%S")
+        text = pc.replace_substring_regex(text, pattern=r"\.0+$", replacement="")
+        if column_type.tz is not None:
+            text = pc.binary_join_element_wise(text, pa.scalar("+00:00"), "")
+        return text
+
+    return column
+
+
+def to_serializable_table(table: "pa.Table") -> "pa.Table":
+    """
+    Convert all top-level temporal columns of a table to ISO strings.
+
+    Args:
+        table (pa.Table): Table as returned by RowIterator.to_arrow()
+
+    Returns:
+        pa.Table: Table whose values match the legacy row-by-row conversion
+    """
+    columns = [_iso_column(table.column(i)) for i in range(table.num_columns)]
+    return pa.Table.from_arrays(columns, names=table.column_names)
+
+
+class ArrowRows(Sequence):
+    """
+    Read-only list of row dictionaries backed by a pyarrow Table.
+
+    Rows are materialized per record batch on first access, so code that only
+    reads the first row or the length never builds the remaining dictionaries.
+    Supports len(), indexing, slicing, iteration and comparison with lists.
+    """
+
+    def __init__(self, table: "pa.Table"):
+        self.table = table
+        self._batches = table.to_batches()
+        self._offsets = []
+        offset = 0
+        for batch in self._batches:
+            self._offsets.append(offset)
+            offset += batch.num_rows
+        self._materialized: Dict[int, List[Dict[str, Any]]] = {}
+
+    def _batch_rows(self, batch_index: int) -> List[Dict[str, Any]]:
+        rows = self._materialized.get(batch_index)
+        if rows is None:
+            rows = self._batches[batch_index].to_pylist()
+            self._materialized[batch_index] = rows
+        return rows
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("row index out of range")
+        for batch_index in range(len(self._batches) - 1, -1, -1):
+            if index >= self._offsets[batch_index]:
+                return self._batch_rows(batch_index)[index - self._offsets[batch_index]]
+        raise IndexError("row index out of range")
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for batch_index in range(len(self._batches)):
+            yield from self._batch_rows(batch_index)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, ArrowRows)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"ArrowRows(num_rows={len(self)}, columns={self.table.column_names})"
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """Materialize all rows as a plain list of dictionaries."""
+        return list(self)
+
+
+def decode_rows(results, bqstorage_client=None) -> "pa.Table":
+    """
+    Fetch a finished job's RowIterator as a serializable Arrow table.
+
+    Args:
+        results: RowIterator returned by QueryJob.result()
+        bqstorage_client: BigQueryReadClient to download the result through
+            the Storage Read API (None = paged REST download)
+
+    Returns:
+        pa.Table: Table with temporal columns converted to ISO strings
+    """
+    table = results.to_arrow(bqstorage_client=bqstorage_client, create_bqstorage_client=False)
+    return to_serializable_table(table)
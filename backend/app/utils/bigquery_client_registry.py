@@ -0,0 +1,245 @@
+"""
+Process-wide registry for the BigQuery client.
+Resolves credentials once and keeps a single warmed client (including its
+HTTP session pool) alive for the lifetime of the process. The Storage Read
+API client for large results shares the same credentials.
+"""
+
+import os
+import time
+import threading
+import logging
+from typing import Dict, Any, Optional, List
+
+from google.cloud import bigquery
+
+try:
+    from google.cloud import bigquery_storage
+    HAS_BQSTORAGE = True
+except ImportError:  # pragma: no cover - google-cloud-bigquery-storage is listed in requirements.txt
+    bigquery_storage = None
+    HAS_BQSTORAGE = False
+
+from ..dependencies import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class BigQueryClientRegistry:
+    """
+    Holds the shared BigQuery client for all connections, query managers and
+    query modules. Credential discovery and client construction run only once;
+    every later caller reuses the same client.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client: Optional[bigquery.Client] = None
+        self._credentials_path: Optional[str] = None
+        self._storage_client = None
+        self._storage_client_failed = False
+
+        # Counters exposed via get_stats()
+        self._clients_created = 0
+        self._reuse_count = 0
+        self._failed_setups = 0
+        self._last_setup_ms: Optional[float] = None
+        self._total_setup_ms = 0.0
+        self._created_at: Optional[float] = None
+        self._last_error: Optional[str] = None
+
+    def get_client(self) -> bigquery.Client:
+        """
+        Return the shared BigQuery client, creating it on first use.
+        """
+        client = self._client
+        if client is not None:
+            with self._lock:
+                self._reuse_count += 1
+            return client
+
+        with self._lock:
+            # Another thread may have created the client while we waited
+            if self._client is not None:
+                self._reuse_count += 1
+                return self._client
+
+            start = time.perf_counter()
+            try:
+                self._client = self._create_client()
+            except Exception as e:
+                self._failed_setups += 1
+                self._last_error = str(e)
+                raise
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self._last_setup_ms = elapsed_ms
+                self._total_setup_ms += elapsed_ms
+
+            self._clients_created += 1
+            self._created_at = time.time()
+            self._last_error = None
+            logger.info(
+                f"[BQ CLIENT] Created shared BigQuery client in {self._last_setup_ms:.0f}ms "
+                f"using credentials at: {self._credentials_path}"
+            )
+            return self._client
+
+    def get_storage_client(self):
+        """
+        Return the shared BigQuery Storage Read API client, creating it on first use.
+        
+        Returns:
+            BigQueryReadClient, or None if the library is missing or the client
+            could not be created (results are then downloaded via REST)
+        """
+        if self._storage_client is not None or self._storage_client_failed or not HAS_BQSTORAGE:
+            return self._storage_client
+
+        client = self.get_client()
+        with self._lock:
+            if self._storage_client is None and not self._storage_client_failed:
+                try:
+                    self._storage_client = bigquery_storage.BigQueryReadClient(credentials=client._credentials)
+                    logger.info("[BQ CLIENT] Created shared BigQuery Storage Read API client")
+                except Exception as e:
+                    self._storage_client_failed = True
+                    logger.warning(f"[BQ CLIENT] Storage Read API unavailable, using REST downloads: {e}")
+            return self._storage_client
+
+    def warm_up(self) -> bool:
+        """
+        Create the client ahead of the first request.
+
+        Returns:
+            True if the client is ready, False if setup failed
+        """
+        try:
+            self.get_client()
+            return True
+        except Exception as e:
+            logger.warning(f"[BQ CLIENT] Warm-up failed: {e}")
+            return False
+
+    def reset(self) -> None:
+        """
+        Drop the shared client so the next call resolves credentials again.
+        Useful after rotating the service account file.
+        """
+        with self._lock:
+            client = self._client
+            self._client = None
+            self._credentials_path = None
+            self._storage_client = None
+            self._storage_client_failed = False
+        if client is not None:
+            try:
+                client.close()
+            except Exception as e:
+                logger.warning(f"[BQ CLIENT] Error closing client: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get setup-time and reuse counters for monitoring.
+        """
+        with self._lock:
+            return {
+                "client_ready": self._client is not None,
+                "storage_client_ready": self._storage_client is not None,
+                "credentials_path": self._credentials_path,
+                "clients_created": self._clients_created,
+                "reuse_count": self._reuse_count,
+                "failed_setups": self._failed_setups,
+                "last_setup_ms": round(self._last_setup_ms, 1) if self._last_setup_ms is not None else None,
+                "total_setup_ms": round(self._total_setup_ms, 1),
+                "client_age_seconds": round(time.time() - self._created_at, 1) if self._client is not None and self._created_at else None,
+                "last_error": self._last_error
+            }
+
+    def _create_client(self) -> bigquery.Client:
+        """
+        Try each candidate credential file until one produces a client.
+        """
+        settings = get_settings()
+        project_id = settings.bigquery_project_id or "gcpxbixpflegehilfesenioren"
+
+        last_error = None
+        for path in self._candidate_credential_paths():
+            try:
+                client = bigquery.Client.from_service_account_json(path, project=project_id)
+            except FileNotFoundError:
+                last_error = f"Credentials file not found at: {path}"
+                continue
+            except Exception as e:
+                last_error = f"Error with credentials at {path}: {str(e)}"
+                continue
+
+            self._credentials_path = path
+            self._configure_http_pool(client, settings.bigquery_http_pool_size)
+            return client
+
+        raise ValueError(f"Failed to create BigQuery client. Last error: {last_error}")
+
+    @staticmethod
+    def _candidate_credential_paths() -> List[str]:
+        """
+        Build the list of credential paths in the order they should be tried.
+        """
+        settings = get_settings()
+        current_dir = os.getcwd()
+        parent_dir = os.path.join(current_dir, "..")
+
+        json_files_current = [f for f in os.listdir(current_dir) if f.endswith('.json')]
+        json_files_parent = []
+        if os.path.exists(parent_dir):
+            json_files_parent = [os.path.join("..", f) for f in os.listdir(parent_dir) if f.endswith('.json')]
+
+        candidates = [
+            # Any JSON file in the project directory
+            *[os.path.join(current_dir, f) for f in json_files_current],
+            # Any JSON file in the parent directory
+            *[os.path.join(current_dir, f) for f in json_files_parent],
+            # Standard name in project directory
+            os.path.join(current_dir, "credentials.json"),
+            # Linux path from other project
+            "/home/PfS/gcpxbixpflegehilfesenioren-a47c654480a8.json",
+            # Environment variable path
+            settings.google_application_credentials
+        ]
+
+        # Skip empty entries and duplicates while keeping the order
+        seen = set()
+        paths = []
+        for path in candidates:
+            if path and path not in seen:
+                seen.add(path)
+                paths.append(path)
+        return paths
+
+    @staticmethod
+    def _configure_http_pool(client: bigquery.Client, pool_size: int) -> None:
+        """
+        Enlarge the connection pool of the client's HTTP session so concurrent
+        queries reuse keep-alive connections instead of opening new ones.
+        """
+        try:
+            from requests.adapters import HTTPAdapter
+
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            client._http.mount("https://", adapter)
+        except Exception as e:
+            logger.warning(f"[BQ CLIENT] Could not configure HTTP pool: {e}")
+
+
+# Global registry instance
+_client_registry: Optional[BigQueryClientRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_client_registry() -> BigQueryClientRegistry:
+    """Get the global BigQuery client registry instance."""
+    global _client_registry
+    if _client_registry is None:
+        with _registry_lock:
+            if _client_registry is None:
+                _client_registry = BigQueryClientRegistry()
+    return _client_registry
@@ -1,14 +1,112 @@
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Union, Callable, Iterator, AsyncIterator
 from google.cloud import bigquery
+from google.api_core.exceptions import Conflict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import functools
+import hashlib
+import json
+import threading
 import logging
 import os
+import time
 from datetime import datetime, timedelta
+from collections.abc import Sequence
 from ..dependencies import get_settings, get_bigquery_client
+from .arrow_results import HAS_ARROW, ArrowRows, decode_rows, to_serializable_table, pa
+from .query_result_cache import get_query_result_cache, make_cache_key, normalize_sql
+from .bytes_billed_guard import get_bytes_billed_guard, is_bytes_limit_error
+from .query_metrics import get_query_metrics
+from .admission_control import get_admission_controller, is_background, PRIORITY_NAMES, get_current_priority
+from .job_labels import get_job_labels
+from .bigquery_client_registry import get_client_registry
+from .query_fingerprint import record_query
+from .circuit_breaker import get_circuit_breaker, is_availability_error, CircuitOpenError
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bounded thread pools for running blocking BigQuery calls off the event loop.
+# Preload work gets its own pool, so threads waiting for admission on behalf
+# of a preload never hold up interactive requests in the executor queue.
+_query_executor: Optional[ThreadPoolExecutor] = None
+_background_query_executor: Optional[ThreadPoolExecutor] = None
+_query_executor_lock = threading.Lock()
+
+def get_query_executor(background: bool = False) -> ThreadPoolExecutor:
+    """Get the global executor used for BigQuery jobs (or the one for preload work)."""
+    global _query_executor, _background_query_executor
+    if _query_executor is None or _background_query_executor is None:
+        with _query_executor_lock:
+            if _query_executor is None:
+                _query_executor = ThreadPoolExecutor(
+                    max_workers=get_settings().bigquery_max_concurrent_queries,
+                    thread_name_prefix="bigquery"
+                )
+            if _background_query_executor is None:
+                _background_query_executor = ThreadPoolExecutor(
+                    max_workers=get_settings().bigquery_max_concurrent_queries,
+                    thread_name_prefix="bigquery-background"
+                )
+    return _background_query_executor if background else _query_executor
+
+# Counters for deterministic job IDs (cross-process dedup)
+_job_dedup_stats = {"submitted": 0, "attached": 0, "retried_failed": 0}
+_job_dedup_lock = threading.Lock()
+
+def _record_job_dedup(outcome: str) -> None:
+    with _job_dedup_lock:
+        _job_dedup_stats[outcome] += 1
+
+def get_job_dedup_stats() -> Dict[str, int]:
+    """Get how many jobs were submitted and how many attached to an existing job."""
+    with _job_dedup_lock:
+        return dict(_job_dedup_stats)
+
+def deterministic_job_id(query: str, query_params: Optional[Dict[str, Any]], bucket_seconds: int,
+                         priority: Optional[str] = None) -> str:
+    """
+    Derive a BigQuery job ID from the query text, its parameters, its job
+    priority and a time bucket. The same query issued by any process within the
+    same bucket gets the same ID; an interactive caller never attaches to a
+    BATCH job that may still be queued.
+    """
+    bucket = int(time.time() // max(1, bucket_seconds))
+    payload = json.dumps(
+        {"query": normalize_sql(query), "params": query_params or {}, "priority": priority or bigquery.QueryPriority.INTERACTIVE},
+        sort_keys=True,
+        default=str
+    )
+    digest = hashlib.sha256(payload.encode()).hexdigest()[:40]
+    return f"agency_reporter_{bucket}_{digest}"
+
+def job_run_seconds(query_job: Any, wall_seconds: float) -> float:
+    """
+    Time a job spent running in BigQuery. Unlike the wall time it leaves out
+    how long a BATCH job waited in the queue, which is expected and says
+    nothing about BigQuery's health. Falls back to the wall time.
+    """
+    started = getattr(query_job, "started", None)
+    ended = getattr(query_job, "ended", None)
+    if isinstance(started, datetime) and isinstance(ended, datetime):
+        return max(0.0, (ended - started).total_seconds())
+    return wall_seconds
+
+async def run_in_query_executor(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking BigQuery call (or a QueryManager method that issues several)
+    in the bounded query executor and await its result without blocking the event loop.
+    The call runs in a copy of the current context, so it keeps the request's query priority.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_query_executor(background=is_background()),
+        functools.partial(context.run, func, *args, **kwargs)
+    )
+
 class BigQueryConnection:
     """
     A class to handle BigQuery connections and queries for the Agency Reporter
@@ -23,65 +121,377 @@ class BigQueryConnection:
         self.project_id = self.settings.bigquery_project_id
         self.dataset = self.settings.bigquery_dataset
     
-    def execute_query(self, query: str, query_params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    def _run_job(self, query: str, query_params: Optional[Dict[str, Any]] = None, page_size: Optional[int] = None,
+                 query_name: Optional[str] = None, probe: bool = False, scan_scale: int = 1, shadow: bool = False):
         """
-        Execute a BigQuery SQL query and return the results as a list of dictionaries
+        Run a BigQuery SQL query and wait for the job to finish
         
         Args:
             query (str): The SQL query to execute
             query_params (dict, optional): Parameters for the query
+            page_size (int, optional): Rows per result page
+            query_name (str, optional): Name of a registered query, used for its byte limit and metrics
+            probe (bool): Run as the probe of an open circuit
+            scan_scale (int): Runs of the base query a derived variant replaces (see BytesBilledGuard.limit_for)
+            shadow (bool): Shadow run; bypasses BigQuery's query cache and deterministic job IDs so its latency is real
             
         Returns:
-            list: List of dictionaries with the query results
-        """
+            RowIterator: The finished job's result
+            
+        Raises:
+            CircuitOpenError: If the circuit of the query family is open
+        """
+        record_query(query)
+        query_label = get_bytes_billed_guard().resolve_name(query, query_name)
+        breaker = get_circuit_breaker()
+        if not probe and not breaker.check(query_label):
+            # This job probes the open circuit in the background, the caller still gets rejected
+            self._start_probe(query, query_params, query_name, query_label, scan_scale)
+            raise CircuitOpenError(query_label, breaker.open_seconds)
+        started = None
+        query_job = None
         try:
-            # Create query job config
-            job_config = bigquery.QueryJobConfig()
-            query_parameters = []
+            job_config = self._build_job_config(query_params)
+            
+            # Cap the scan so a regressed query fails instead of billing a multiple of its profiled cost
+            bytes_limit = get_bytes_billed_guard().limit_for(query, query_name, scan_scale)
+            if bytes_limit:
+                job_config.maximum_bytes_billed = bytes_limit
+            if shadow:
+                job_config.use_query_cache = False
+            
+            # Attribute the job to the request (endpoint, agency, period, preload session)
+            priority = get_current_priority()
+            job_config.labels = {**get_job_labels(), "request_priority": PRIORITY_NAMES[priority]}
             
-            # Add parameters if provided
-            if query_params:
-                for param_name, param_value in query_params.items():
-                    # Determine parameter type
-                    if isinstance(param_value, int):
-                        param_type = "INT64"
-                    elif isinstance(param_value, float):
-                        param_type = "FLOAT64"
-                    elif isinstance(param_value, bool):
-                        param_type = "BOOL"
-                    elif isinstance(param_value, datetime):
-                        param_type = "TIMESTAMP"
+            # Preload traffic is latency-insensitive and should not use interactive query capacity
+            if is_background() and self.settings.bigquery_preload_batch_priority:
+                job_config.priority = bigquery.QueryPriority.BATCH
+            
+            # Execute query once the admission controller grants a slot
+            with get_admission_controller().admit(priority) as waited:
+                get_query_metrics().observe_admission_wait(PRIORITY_NAMES[priority], waited)
+                started = time.perf_counter()
+                query_job = self._submit_job(query, query_params, job_config, deterministic_id=not shadow)
+                if page_size:
+                    results = query_job.result(page_size=page_size)
+                else:
+                    results = query_job.result()
+            
+            elapsed = time.perf_counter() - started
+            get_query_metrics().observe_job(query_label, elapsed, query_job)
+            # Only the time the job ran counts towards the slow threshold
+            breaker.record_success(query_label, job_run_seconds(query_job, elapsed))
+            return results
+        
+        except Exception as e:
+            get_query_metrics().observe_error(query_label)
+            if is_bytes_limit_error(e):
+                get_bytes_billed_guard().record_rejection(query, query_name)
+            if is_availability_error(e):
+                breaker.record_failure(query_label, type(e).__name__)
+            else:
+                # BigQuery answered, the query itself is wrong
+                elapsed = time.perf_counter() - started if started is not None else 0.0
+                breaker.record_success(query_label, job_run_seconds(query_job, elapsed))
+            logger.error(f"Error executing BigQuery query: {str(e)}")
+            raise
+    
+    def _start_probe(self, query: str, query_params: Optional[Dict[str, Any]], query_name: Optional[str], query_label: str,
+                     scan_scale: int = 1) -> None:
+        """
+        Run a rejected job in the background to find out whether BigQuery
+        recovered. Its result is not downloaded; BigQuery's own result cache
+        makes the next request for it cheap.
+        """
+        def probe():
+            try:
+                self._run_job(query, query_params, query_name=query_name, probe=True, scan_scale=scan_scale)
+            except Exception as e:
+                logger.warning(f"[CIRCUIT] Probe for {query_label} failed: {str(e)}")
+        
+        try:
+            get_query_executor(background=True).submit(contextvars.copy_context().run, probe)
+        except Exception as e:
+            logger.error(f"[CIRCUIT] Could not start probe for {query_label}: {str(e)}")
+            get_circuit_breaker().release_probe(query_label)
+    
+    @staticmethod
+    def _build_job_config(query_params: Optional[Dict[str, Any]] = None) -> bigquery.QueryJobConfig:
+        """
+        Create a query job config with the given parameters bound.
+        Lists and tuples are bound as ARRAY parameters (of STRING unless the
+        first element says otherwise).
+        """
+        job_config = bigquery.QueryJobConfig()
+        query_parameters = []
+        
+        # Add parameters if provided
+        if query_params:
+            for param_name, param_value in query_params.items():
+                if isinstance(param_value, (list, tuple)):
+                    element = param_value[0] if param_value else None
+                    if isinstance(element, bool):
+                        element_type = "BOOL"
+                    elif isinstance(element, int):
+                        element_type = "INT64"
+                    elif isinstance(element, float):
+                        element_type = "FLOAT64"
                     else:
-                        param_type = "STRING"
-                    
-                    # Add parameter to the list
+                        element_type = "STRING"
                     query_parameters.append(
-                        bigquery.ScalarQueryParameter(param_name, param_type, param_value)
+                        bigquery.ArrayQueryParameter(param_name, element_type, list(param_value))
                     )
+                    continue
                 
-                job_config.query_parameters = query_parameters
+                # Determine parameter type
+                if isinstance(param_value, int):
+                    param_type = "INT64"
+                elif isinstance(param_value, float):
+                    param_type = "FLOAT64"
+                elif isinstance(param_value, bool):
+                    param_type = "BOOL"
+                elif isinstance(param_value, datetime):
+                    param_type = "TIMESTAMP"
+                else:
+                    param_type = "STRING"
+                
+                # Add parameter to the list
+                query_parameters.append(
+                    bigquery.ScalarQueryParameter(param_name, param_type, param_value)
+                )
             
-            # Execute query
-            query_job = self.client.query(query, job_config=job_config)
-            results = query_job.result()
+            job_config.query_parameters = query_parameters
+        
+        return job_config
+    
+    def dry_run(self, query: str, query_params: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Estimate the bytes a query would process without running it
+        
+        Args:
+            query (str): The SQL query to estimate
+            query_params (dict, optional): Parameters for the query
             
-            # Convert results to list of dictionaries
-            rows = []
-            for row in results:
-                row_dict = {}
-                for key, value in row.items():
-                    # Convert non-serializable values
-                    if hasattr(value, 'isoformat'):
-                        row_dict[key] = value.isoformat()
-                    else:
-                        row_dict[key] = value
-                rows.append(row_dict)
+        Returns:
+            int: total_bytes_processed reported by the dry run
+        """
+        job_config = self._build_job_config(query_params)
+        job_config.dry_run = True
+        job_config.use_query_cache = False
+        
+        query_job = self.client.query(query, job_config=job_config)
+        return query_job.total_bytes_processed or 0
+    
+    def _submit_job(self, query: str, query_params: Optional[Dict[str, Any]], job_config: bigquery.QueryJobConfig,
+                    deterministic_id: bool = True):
+        """
+        Submit a query job. With deterministic job IDs enabled, the job ID is
+        derived from the query, its parameters, its priority and the current time bucket, so a
+        process issuing a query that another process is already running attaches
+        to the existing job instead of starting a duplicate. Jobs submitted with
+        deterministic_id=False (shadow runs) always start a job of their own.
+        """
+        if not deterministic_id or not self.settings.bigquery_deterministic_job_ids:
+            return self.client.query(query, job_config=job_config)
+        
+        job_id = deterministic_job_id(query, query_params, self.settings.bigquery_job_id_bucket_seconds, job_config.priority)
+        try:
+            query_job = self.client.query(query, job_config=job_config, job_id=job_id)
+            _record_job_dedup("submitted")
+            return query_job
+        except Conflict:
+            existing_job = self.client.get_job(job_id, location=self.client.location)
+            if existing_job.state == "DONE" and existing_job.error_result:
+                # The earlier run failed - do not hand out its error, run the query again
+                logger.warning(f"[BQ JOB] Job {job_id} failed earlier, submitting a new job")
+                _record_job_dedup("retried_failed")
+                return self.client.query(query, job_config=job_config)
+            
+            logger.info(f"[BQ JOB] Attached to existing job {job_id} (state: {existing_job.state})")
+            _record_job_dedup("attached")
+            return existing_job
+    
+    def execute_query(self, query: str, query_params: Optional[Dict[str, Any]] = None, query_name: Optional[str] = None,
+                      use_cache: bool = True) -> List[Dict[str, Any]]:
+        """
+        Execute a BigQuery SQL query and return the results as a list of dictionaries.
+        Results are served from the process-wide query result cache when possible.
+        
+        Args:
+            query (str): The SQL query to execute
+            query_params (dict, optional): Parameters for the query
+            query_name (str, optional): Name of a registered query, used as cache key instead of the SQL hash
+            use_cache (bool): Use the query result cache (False to force a reload)
             
+        Returns:
+            list: List of dictionaries with the query results
+        """
+        # Also record results served from the cache, the response still depends on this SQL
+        record_query(query)
+        if not use_cache or not self.settings.query_result_cache_enabled:
+            return self._fetch_rows(query, query_params, query_name)
+        
+        result_cache = get_query_result_cache()
+        cache_key = make_cache_key(query, query_params, query_name)
+        rows = result_cache.get(cache_key)
+        get_query_metrics().observe_result_cache(get_bytes_billed_guard().resolve_name(query, query_name), rows is not None)
+        if rows is not None:
             return rows
         
-        except Exception as e:
-            logger.error(f"Error executing BigQuery query: {str(e)}")
-            raise
+        rows = self._fetch_rows(query, query_params, query_name)
+        result_cache.put(cache_key, rows)
+        return rows
+    
+    def _fetch_rows(self, query: str, query_params: Optional[Dict[str, Any]] = None, query_name: Optional[str] = None,
+                    scan_scale: int = 1, shadow: bool = False) -> List[Dict[str, Any]]:
+        """
+        Run a query in BigQuery and decode all rows to dictionaries
+        """
+        results = self._run_job(query, query_params, query_name=query_name, scan_scale=scan_scale, shadow=shadow)
+        
+        if HAS_ARROW:
+            # Columnar decoding: date/time conversion happens per column in Arrow
+            try:
+                return self._decode_results(results, get_bytes_billed_guard().resolve_name(query, query_name)).to_pylist()
+            except Exception as e:
+                logger.error(f"Error decoding BigQuery result: {str(e)}")
+                raise
+        
+        # Convert results to list of dictionaries
+        return [self._row_to_dict(row) for row in results]
+    
+    def _storage_client_for(self, results):
+        """
+        Choose how to download a finished query's result: large results (by row
+        or cell count) through the Storage Read API, small ones via paged REST.
+        
+        Returns:
+            BigQueryReadClient for Storage Read API downloads, or None for REST
+        """
+        if not self.settings.bigquery_storage_api_enabled:
+            return None
+        total_rows = results.total_rows if isinstance(results.total_rows, int) else 0
+        cells = total_rows * len(results.schema or [])
+        if total_rows < self.settings.bigquery_storage_api_min_rows and cells < self.settings.bigquery_storage_api_min_cells:
+            return None
+        return get_client_registry().get_storage_client()
+    
+    def _decode_results(self, results, query_label: str):
+        """
+        Download a finished query's result as a serializable Arrow table and
+        record the download path and throughput
+        """
+        storage_client = self._storage_client_for(results)
+        started = time.perf_counter()
+        table = decode_rows(results, bqstorage_client=storage_client)
+        get_query_metrics().observe_download(
+            query_label,
+            "storage_api" if storage_client is not None else "rest",
+            table.num_rows,
+            table.nbytes,
+            time.perf_counter() - started
+        )
+        return table
+    
+    @staticmethod
+    def _row_to_dict(row) -> Dict[str, Any]:
+        """
+        Convert a BigQuery row to a dictionary with serializable values
+        """
+        row_dict = {}
+        for key, value in row.items():
+            # Convert non-serializable values
+            if hasattr(value, 'isoformat'):
+                row_dict[key] = value.isoformat()
+            else:
+                row_dict[key] = value
+        return row_dict
+    
+    def execute_query_table(self, query: str, query_params: Optional[Dict[str, Any]] = None):
+        """
+        Execute a BigQuery SQL query and return the result as a pyarrow Table
+        with date/time columns converted to ISO strings
+        
+        Args:
+            query (str): The SQL query to execute
+            query_params (dict, optional): Parameters for the query
+            
+        Returns:
+            pa.Table: Columnar query result
+        """
+        if not HAS_ARROW:
+            raise RuntimeError("pyarrow is required for columnar query results")
+        return self._decode_results(self._run_job(query, query_params), get_bytes_billed_guard().resolve_name(query))
+    
+    def execute_query_rows(self, query: str, query_params: Optional[Dict[str, Any]] = None) -> Sequence:
+        """
+        Execute a BigQuery SQL query and return lazily materialized rows.
+        The result behaves like the list returned by execute_query, but row
+        dictionaries are only built when they are accessed.
+        
+        Args:
+            query (str): The SQL query to execute
+            query_params (dict, optional): Parameters for the query
+            
+        Returns:
+            ArrowRows: Sequence of row dictionaries (a plain list without pyarrow)
+        """
+        if not HAS_ARROW:
+            return self.execute_query(query, query_params)
+        return ArrowRows(self.execute_query_table(query, query_params))
+    
+    async def execute_query_async(self, query: str, query_params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Execute a BigQuery SQL query without blocking the event loop.
+        The job is submitted and awaited in the bounded query executor, so cache hits
+        and other requests keep being served while the job runs.
+        
+        Args:
+            query (str): The SQL query to execute
+            query_params (dict, optional): Parameters for the query
+            
+        Returns:
+            list: List of dictionaries with the query results
+        """
+        return await run_in_query_executor(self.execute_query, query, query_params)
+    
+    def _iter_pages(self, query: str, query_params: Optional[Dict[str, Any]], page_size: int) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Run a query and yield its result page by page as lists of dictionaries
+        """
+        results = self._run_job(query, query_params, page_size=page_size)
+        
+        if HAS_ARROW:
+            # Large results are streamed from the Storage Read API in record batches
+            for batch in results.to_arrow_iterable(bqstorage_client=self._storage_client_for(results)):
+                yield to_serializable_table(pa.Table.from_batches([batch])).to_pylist()
+            return
+        
+        for page in results.pages:
+            yield [self._row_to_dict(row) for row in page]
+    
+    async def stream_query_pages(self, query: str, query_params: Optional[Dict[str, Any]] = None, page_size: Optional[int] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Execute a BigQuery SQL query and yield the result one page at a time.
+        Each page is fetched in the bounded query executor, so only one page
+        is held in memory regardless of the size of the result.
+        
+        Args:
+            query (str): The SQL query to execute
+            query_params (dict, optional): Parameters for the query
+            page_size (int, optional): Rows per page (defaults to BIGQUERY_STREAM_PAGE_SIZE)
+            
+        Yields:
+            list: Dictionaries of the rows in the next page
+        """
+        pages = self._iter_pages(query, query_params, page_size or self.settings.bigquery_stream_page_size)
+        done = object()
+        while True:
+            page = await run_in_query_executor(next, pages, done)
+            if page is done:
+                break
+            yield page
     
     def get_agencies(self) -> List[Dict[str, Any]]:
         """
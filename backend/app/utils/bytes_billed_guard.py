@@ -0,0 +1,127 @@
+"""
+Per-query scan limits for BigQuery jobs.
+Every job is submitted with maximum_bytes_billed set to the limit of its SQL,
+so BigQuery fails the job instead of billing a scan that grew far beyond what
+the query was profiled at. Limits come from the dry-run profiles (see
+QueryCostService), from explicit overrides and from a global default.
+"""
+
+from typing import Dict, Any, Optional
+import threading
+import logging
+
+from ..dependencies import get_settings
+from .query_result_cache import sql_hash
+
+logger = logging.getLogger(__name__)
+
+# Error reason BigQuery reports when a job would exceed maximum_bytes_billed
+BYTES_BILLED_LIMIT_EXCEEDED = "bytesBilledLimitExceeded"
+
+
+def is_bytes_limit_error(error: Exception) -> bool:
+    """Check whether a BigQuery exception was caused by maximum_bytes_billed."""
+    for detail in getattr(error, "errors", None) or []:
+        if isinstance(detail, dict) and detail.get("reason") == BYTES_BILLED_LIMIT_EXCEEDED:
+            return True
+    return BYTES_BILLED_LIMIT_EXCEEDED in str(error)
+
+
+class BytesBilledGuard:
+    """
+    Thread-safe lookup of the maximum_bytes_billed limit for a query.
+    """
+
+    def __init__(self, default_limit: int = 0):
+        """
+        Args:
+            default_limit: Limit for queries without a specific limit (0 = unlimited)
+        """
+        self.default_limit = default_limit
+        self._lock = threading.Lock()
+        self._limits: Dict[str, int] = {}  # query name -> limit in bytes
+        self._names: Dict[str, str] = {}  # sql hash -> query name, for unnamed SQL constants
+        self._rejections: Dict[str, int] = {}
+
+    def set_limits(self, limits: Dict[str, int], names_by_hash: Dict[str, str]) -> None:
+        """
+        Replace the per-query limits.
+
+        Limits are keyed by query name, so a named query whose SQL changed is
+        still held to the limit it was profiled at. SQL that is executed
+        without a name is recognized by its hash.
+
+        Args:
+            limits: Mapping of query name to limit in bytes
+            names_by_hash: Mapping of SQL hash to query name
+        """
+        with self._lock:
+            self._limits = dict(limits)
+            self._names = dict(names_by_hash)
+
+    def resolve_name(self, query: str, query_name: Optional[str] = None) -> str:
+        """Name of a query: the given name, the profiled name of its SQL or its hash."""
+        if query_name:
+            return query_name
+        key = sql_hash(query)
+        return self._names.get(key, "sql:" + key[:16])
+
+    def limit_for(self, query: str, query_name: Optional[str] = None, scan_scale: int = 1) -> Optional[int]:
+        """
+        Get the byte limit for a query.
+
+        Variants derived from a registered query (named "<query>@<variant>",
+        e.g. its batched or multi-period form) are not profiled themselves;
+        they are held to the limit of their base query times scan_scale.
+
+        Args:
+            query: SQL text
+            query_name: Name of a registered query, if known
+            scan_scale: For derived variants, how many runs of the base query
+                the variant replaces (agencies times periods)
+
+        Returns:
+            The limit in bytes, or None if the query is not limited
+        """
+        name = self.resolve_name(query, query_name)
+        with self._lock:
+            limit = self._limits.get(name)
+            if not limit and "@" in name:
+                base_limit = self._limits.get(name.split("@", 1)[0])
+                limit = base_limit * max(1, scan_scale) if base_limit else None
+        if limit:
+            return limit
+        return self.default_limit or None
+
+    def record_rejection(self, query: str, query_name: Optional[str] = None) -> None:
+        """Count a job that BigQuery refused because it exceeded its limit."""
+        with self._lock:
+            name = self.resolve_name(query, query_name)
+            self._rejections[name] = self._rejections.get(name, 0) + 1
+        logger.error(f"[BYTES GUARD] Query {name} exceeded its maximum_bytes_billed limit")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the configured limits and rejection counts for monitoring.
+        """
+        with self._lock:
+            return {
+                "default_limit_bytes": self.default_limit,
+                "limited_queries": len(self._limits),
+                "limits": dict(sorted(self._limits.items())),
+                "rejections": dict(self._rejections)
+            }
+
+
+# Global guard instance
+_bytes_billed_guard: Optional[BytesBilledGuard] = None
+_bytes_billed_guard_lock = threading.Lock()
+
+def get_bytes_billed_guard() -> BytesBilledGuard:
+    """Get the global bytes billed guard instance."""
+    global _bytes_billed_guard
+    if _bytes_billed_guard is None:
+        with _bytes_billed_guard_lock:
+            if _bytes_billed_guard is None:
+                _bytes_billed_guard = BytesBilledGuard(default_limit=get_settings().bigquery_max_bytes_billed)
+    return _bytes_billed_guard
@@ -2,33 +2,76 @@
 Cache decorator for unified caching across all endpoints
 """
 from functools import wraps
-from typing import Callable, Optional, List, Any, Dict
+from typing import Callable, Optional, List, Any, Dict, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 import hashlib
 import json
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 import inspect
 import asyncio
 
-from ..services.database_cache_service import get_cache_service
+from ..services.database_cache_service import get_cache_service, get_ttl_hours
+from .job_labels import job_labels
+from .query_fingerprint import get_fingerprint_registry, recording_queries
+from .circuit_breaker import caused_by_unavailable_bigquery
+from .admission_control import query_priority, get_current_priority, PRIORITY_DASHBOARD_PRELOAD
 
 logger = logging.getLogger(__name__)
 
+# Response header with the age in seconds of a stale cache entry served instead of fresh data
+STALE_AGE_HEADER = "X-Cache-Stale-Age"
+
+# Set per HTTP request: receives the age of a stale entry the response was answered with
+_stale_response: ContextVar[Optional[Dict[str, Any]]] = ContextVar("stale_response", default=None)
+
+
+@contextmanager
+def tracking_stale_responses() -> Iterator[Dict[str, Any]]:
+    """
+    Track whether the enclosed request is answered with a stale cache entry.
+    
+    Yields:
+        Dict that receives "age_seconds" if a stale entry was served
+    """
+    stale: Dict[str, Any] = {}
+    token = _stale_response.set(stale)
+    try:
+        yield stale
+    finally:
+        _stale_response.reset(token)
+
 
 def cache_endpoint(
-    ttl_hours: int = 48,
+    ttl_hours: Optional[int] = None,
     key_params: Optional[List[str]] = None,
     preloadable: bool = False,
-    cache_key_prefix: Optional[str] = None
+    cache_key_prefix: Optional[str] = None,
+    version: int = 1,
+    stale_while_revalidate_hours: float = 0
 ):
     """
     Decorator for caching endpoint responses
     
+    Responses expire by the freshness policy for the endpoint's data type and
+    the requested time_period (see get_ttl_hours), unless ttl_hours is given.
+    Cached responses are fingerprinted with the SQL of the registered queries
+    they were computed with, so they are refetched once that SQL changes.
+    Within the stale-while-revalidate window after expiry, the expired
+    response is served right away (flagged like a stale response) while one
+    background fetch refreshes it.
+    
     Args:
-        ttl_hours: Time to live for cached data in hours
+        ttl_hours: Time to live for cached data in hours, overriding the freshness policy
         key_params: List of parameter names to include in cache key
         preloadable: Whether this endpoint supports preloading
         cache_key_prefix: Optional prefix for cache key (defaults to endpoint path)
+        version: Version of the endpoint's own processing and runtime-built SQL;
+            increment it to invalidate the cached responses on deploy
+        stale_while_revalidate_hours: Hours after expiry an expired response is
+            still served while it is refreshed (0 = wait for the fetch); must
+            stay below CACHE_STALE_RETENTION_HOURS
     """
     def decorator(func: Callable) -> Callable:
         @wraps(func)
@@ -57,10 +100,13 @@ def cache_endpoint(
             
             # Generate cache key using the same logic as frontend
             cache_key = generate_cache_key(endpoint_path, **cache_params)
+            entry_ttl_hours = ttl_hours if ttl_hours is not None else get_ttl_hours(
+                endpoint_path, cache_params.get('time_period')
+            )
             
             # Try to get from cache
             start_time = datetime.now()
-            cached_data = await cache_service.get_cached_data(cache_key)
+            cached_data = await cache_service.get_cached_data(cache_key, version=version)
             
             if cached_data is not None:
                 response_time = (datetime.now() - start_time).total_seconds() * 1000
@@ -70,55 +116,59 @@ def cache_endpoint(
                 )
                 return cached_data
             
+            def start_fetch() -> asyncio.Future:
+                # The fetch runs in its own task, so it completes for the waiting
+                # requests even if the request that started it is cancelled
+                flight = asyncio.get_running_loop().create_future()
+                _inflight[cache_key] = flight
+                _single_flight_stats["fetches"] += 1
+                # The task inherits the labels its BigQuery jobs are submitted with
+                # and records the SQL they run
+                with job_labels(
+                    endpoint=endpoint_path,
+                    agency_id=cache_params.get('agency_id'),
+                    time_period=cache_params.get('time_period')
+                ), recording_queries() as recorded:
+                    task = asyncio.create_task(_fetch_and_cache(
+                        func, args, kwargs, flight, cache_service, cache_key, endpoint_path,
+                        key_params, bound_args if key_params else None, entry_ttl_hours, recorded, version
+                    ))
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+                return flight
+            
+            # Serve an entry that expired within the stale-while-revalidate
+            # window and refresh it in the background (once per key). The
+            # window starts at the expiry the entry was stored with.
+            if stale_while_revalidate_hours > 0:
+                stale = await cache_service.get_stale_data(cache_key, version=version)
+                if stale is not None and stale[2] is not None and \
+                        stale[2] + timedelta(hours=stale_while_revalidate_hours) > datetime.utcnow():
+                    if cache_key not in _inflight:
+                        # Nobody waits for the refresh, so it yields to interactive queries
+                        with query_priority(max(get_current_priority(), PRIORITY_DASHBOARD_PRELOAD)):
+                            start_fetch()
+                    data, cached_at, _ = stale
+                    return _stale_result(endpoint_path, cache_key, data, cached_at, revalidating=True)
+            
+            # Another request is already fetching this key - wait for its result
+            inflight = _inflight.get(cache_key)
+            if inflight is not None:
+                _single_flight_stats["coalesced"] += 1
+                logger.info(
+                    f"[CACHE] Endpoint: {endpoint_path} | Status: COALESCED | "
+                    f"Waiting for in-flight fetch | Cache Key: {cache_key}"
+                )
+                return await _await_fetch(inflight, cache_service, cache_key, endpoint_path, version)
+            
             # Cache miss - fetch fresh data
             logger.info(
                 f"[CACHE] Endpoint: {endpoint_path} | Status: MISS | "
                 f"Fetching fresh data | Cache Key: {cache_key}"
             )
+            flight = start_fetch()
             
-            # Call the original function
-            fetch_start = datetime.now()
-            try:
-                if asyncio.iscoroutinefunction(func):
-                    result = await func(*args, **kwargs)
-                else:
-                    result = func(*args, **kwargs)
-            except Exception as e:
-                logger.error(f"[CACHE] Error fetching data for {endpoint_path}: {str(e)}")
-                raise
-            
-            fetch_time = (datetime.now() - fetch_start).total_seconds() * 1000
-            
-            # Cache the result
-            try:
-                # Extract parameters for caching
-                cache_params = {}
-                if key_params and bound_args:
-                    for param in key_params:
-                        if param in bound_args.arguments:
-                            cache_params[param] = bound_args.arguments[param]
-                
-                await cache_service.save_cached_data(
-                    cache_key=cache_key,
-                    data=result,
-                    endpoint=endpoint_path,
-                    agency_id=cache_params.get('agency_id'),
-                    time_period=cache_params.get('time_period'),
-                    params=cache_params,
-                    expires_hours=ttl_hours,
-                    is_preloaded=False
-                )
-                
-                logger.info(
-                    f"[CACHE] Endpoint: {endpoint_path} | Status: MISS | "
-                    f"Fetch Time: {fetch_time:.0f}ms | Cached for: {ttl_hours}h | "
-                    f"Cache Key: {cache_key}"
-                )
-            except Exception as e:
-                logger.error(f"[CACHE] Failed to cache data for {endpoint_path}: {str(e)}")
-                # Don't fail the request if caching fails
-            
-            return result
+            return await _await_fetch(flight, cache_service, cache_key, endpoint_path, version)
         
         # For sync functions
         @wraps(func)
@@ -133,7 +183,9 @@ def cache_endpoint(
             'ttl_hours': ttl_hours,
             'key_params': key_params,
             'preloadable': preloadable,
-            'cache_key_prefix': cache_key_prefix
+            'cache_key_prefix': cache_key_prefix,
+            'version': version,
+            'stale_while_revalidate_hours': stale_while_revalidate_hours
         }
         
         return wrapper
@@ -141,6 +193,146 @@ def cache_endpoint(
     return decorator
 
 
+# Single-flight state: one in-flight fetch per cache key within this process
+_inflight: Dict[str, asyncio.Future] = {}
+_background_tasks: set = set()
+_single_flight_stats = {"fetches": 0, "coalesced": 0, "stale": 0, "revalidating": 0}
+
+
+async def _await_fetch(flight: asyncio.Future, cache_service, cache_key: str, endpoint_path: str, version: int) -> Any:
+    """
+    Wait for the in-flight fetch of a cache key. If it failed because BigQuery
+    is failing or its circuit is open, answer with the expired cache entry
+    rather than an error.
+    """
+    try:
+        return await asyncio.shield(flight)
+    except Exception as e:
+        if not caused_by_unavailable_bigquery(e):
+            raise
+        stale = await cache_service.get_stale_data(cache_key, version=version)
+        if stale is None:
+            raise
+        data, cached_at, _ = stale
+        return _stale_result(endpoint_path, cache_key, data, cached_at)
+
+
+def _stale_result(endpoint_path: str, cache_key: str, data: Any, cached_at: datetime, revalidating: bool = False) -> Any:
+    """
+    Flag a stale cache entry served instead of fresh data, because BigQuery is
+    unavailable or because the entry is being refreshed in the background.
+    The age is reported in the STALE_AGE_HEADER response header and, for
+    object responses, in a "_stale" field.
+    """
+    age_seconds = max(0, int((datetime.utcnow() - cached_at).total_seconds()))
+    stale = _stale_response.get()
+    if stale is not None:
+        stale["age_seconds"] = age_seconds
+    if revalidating:
+        _single_flight_stats["revalidating"] += 1
+        logger.info(
+            f"[CACHE] Endpoint: {endpoint_path} | Status: STALE-REVALIDATE | "
+            f"Serving entry cached {age_seconds}s ago while it is refreshed | Cache Key: {cache_key}"
+        )
+    else:
+        _single_flight_stats["stale"] += 1
+        logger.warning(
+            f"[CACHE] Endpoint: {endpoint_path} | Status: STALE | "
+            f"BigQuery unavailable, serving entry cached {age_seconds}s ago | Cache Key: {cache_key}"
+        )
+    if isinstance(data, dict):
+        return {**data, "_stale": {"cached_at": cached_at.isoformat(), "age_seconds": age_seconds}}
+    return data
+
+
+async def _fetch_and_cache(
+    func: Callable,
+    args: tuple,
+    kwargs: dict,
+    flight: asyncio.Future,
+    cache_service,
+    cache_key: str,
+    endpoint_path: str,
+    key_params: Optional[List[str]],
+    bound_args,
+    ttl_hours: int,
+    recorded: set,
+    version: int
+):
+    """
+    Fetch fresh data for a cache miss, hand it to all waiting requests and
+    store it in the cache. The in-flight entry is removed only after the
+    result has been cached, so no request can start a second fetch in between.
+    """
+    try:
+        # Call the original function
+        fetch_start = datetime.now()
+        try:
+            if asyncio.iscoroutinefunction(func):
+                result = await func(*args, **kwargs)
+            else:
+                result = func(*args, **kwargs)
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"[CACHE] Error fetching data for {endpoint_path}: {str(e)}")
+            if not flight.done():
+                flight.set_exception(e)
+                # Mark the exception as retrieved in case nobody is waiting anymore
+                flight.exception()
+            return
+        
+        fetch_time = (datetime.now() - fetch_start).total_seconds() * 1000
+        flight.set_result(result)
+        
+        # Cache the result
+        try:
+            # Extract parameters for caching
+            cache_params = {}
+            if key_params and bound_args:
+                for param in key_params:
+                    if param in bound_args.arguments:
+                        cache_params[param] = bound_args.arguments[param]
+            
+            await cache_service.save_cached_data(
+                cache_key=cache_key,
+                data=result,
+                endpoint=endpoint_path,
+                agency_id=cache_params.get('agency_id'),
+                time_period=cache_params.get('time_period'),
+                params=cache_params,
+                expires_hours=ttl_hours,
+                is_preloaded=False,
+                query_fingerprint=get_fingerprint_registry().build(recorded, version)
+            )
+            
+            logger.info(
+                f"[CACHE] Endpoint: {endpoint_path} | Status: MISS | "
+                f"Fetch Time: {fetch_time:.0f}ms | Cached for: {ttl_hours}h | "
+                f"Cache Key: {cache_key}"
+            )
+        except Exception as e:
+            logger.error(f"[CACHE] Failed to cache data for {endpoint_path}: {str(e)}")
+            # Don't fail the request if caching fails
+    finally:
+        if _inflight.get(cache_key) is flight:
+            del _inflight[cache_key]
+
+
+def get_single_flight_stats() -> Dict[str, Any]:
+    """
+    Get the number of fetches started and requests coalesced onto them.
+    """
+    return {
+        "in_flight": len(_inflight),
+        "fetches": _single_flight_stats["fetches"],
+        "coalesced_requests": _single_flight_stats["coalesced"],
+        "stale_responses": _single_flight_stats["stale"],
+        "stale_while_revalidate_responses": _single_flight_stats["revalidating"]
+    }
+
+
 def generate_cache_key(endpoint: str, **params) -> str:
     """
     Generate a consistent cache key from endpoint and parameters
@@ -0,0 +1,205 @@
+"""
+Circuit breaker for BigQuery jobs, per query family.
+A query family is the name the job is recorded under (see
+BytesBilledGuard.resolve_name). After a number of consecutive failed or slow
+jobs of a family its circuit opens: jobs of the family are rejected with
+CircuitOpenError instead of being submitted, so cached endpoints can answer
+from their expired cache entries. Once the circuit has been open for a while,
+the next rejected job is run in the background as a probe; its outcome closes
+the circuit or keeps it open.
+"""
+
+from typing import Dict, Any, Optional
+import threading
+import logging
+import time
+
+from google.api_core.exceptions import GoogleAPIError, ClientError, ServerError, TooManyRequests, RetryError, DeadlineExceeded
+
+from ..dependencies import get_settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"  # Open with a probe running
+
+# Error reasons of 4xx responses that mean BigQuery is overloaded, not that the query is wrong
+_OVERLOAD_REASONS = ("rateLimitExceeded", "quotaExceeded", "backendError")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of submitting a job while the circuit of its query family is open."""
+
+    def __init__(self, family: str, retry_after: float):
+        super().__init__(f"BigQuery circuit for {family} is open, retry in {retry_after:.0f}s")
+        self.family = family
+        self.retry_after = retry_after
+
+
+def is_availability_error(error: BaseException) -> bool:
+    """
+    Check whether a failed job points at BigQuery being unavailable or overloaded:
+    5xx responses, rate limiting and transport errors (connection errors and
+    timeouts). Invalid SQL, missing tables, exceeded byte limits and errors of
+    our own code do not trip the circuit.
+    """
+    if isinstance(error, (CircuitOpenError, TooManyRequests, ServerError, RetryError, DeadlineExceeded, OSError)):
+        return True
+    if isinstance(error, ClientError):
+        reasons = [detail.get("reason") for detail in getattr(error, "errors", None) or [] if isinstance(detail, dict)]
+        return any(reason in _OVERLOAD_REASONS for reason in reasons)
+    return False
+
+
+def caused_by_unavailable_bigquery(error: BaseException) -> bool:
+    """
+    Check whether an exception (e.g. the HTTPException a route raised while
+    handling a failed query) was caused by an open circuit or an availability error.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, CircuitOpenError):
+            return True
+        # Connection errors and timeouts of the HTTP transport are OSErrors
+        if isinstance(error, (GoogleAPIError, OSError)) and is_availability_error(error):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class _Circuit:
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0  # Consecutive failed or slow jobs
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit state per query family.
+    """
+
+    def __init__(self, failure_threshold: int = 5, slow_seconds: float = 60.0, open_seconds: float = 30.0):
+        """
+        Args:
+            failure_threshold: Consecutive failed or slow jobs that open the circuit (0 = disabled)
+            slow_seconds: Jobs running longer than this count as failed
+            open_seconds: Time an open circuit rejects jobs before a probe is run
+        """
+        self.failure_threshold = failure_threshold
+        self.slow_seconds = slow_seconds
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+        self._circuits: Dict[str, _Circuit] = {}
+
+    def _circuit(self, family: str) -> _Circuit:
+        circuit = self._circuits.get(family)
+        if circuit is None:
+            circuit = self._circuits[family] = _Circuit()
+        return circuit
+
+    def check(self, family: str) -> bool:
+        """
+        Check whether a job of a family may be submitted.
+
+        Returns:
+            True if the circuit is closed, False if the caller should run the
+            job as the background probe of an open circuit
+
+        Raises:
+            CircuitOpenError: If the circuit is open (or already probing)
+        """
+        if not self.failure_threshold:
+            return True
+        with self._lock:
+            circuit = self._circuits.get(family)
+            if circuit is None or circuit.state == CLOSED:
+                return True
+            retry_after = circuit.opened_at + self.open_seconds - time.monotonic()
+            if circuit.state == OPEN and retry_after <= 0:
+                circuit.state = HALF_OPEN
+                logger.info(f"[CIRCUIT] Probing BigQuery for {family}")
+                return False
+            circuit.rejected += 1
+        raise CircuitOpenError(family, max(0.0, retry_after))
+
+    def record_success(self, family: str, seconds: float) -> None:
+        """Record a finished job; a slow one counts as a failure."""
+        if not self.failure_threshold:
+            return
+        if seconds > self.slow_seconds:
+            self.record_failure(family, f"job took {seconds:.1f}s")
+            return
+        with self._lock:
+            circuit = self._circuits.get(family)
+            if circuit is None:
+                return
+            if circuit.state != CLOSED:
+                logger.info(f"[CIRCUIT] Closed circuit for {family}")
+            circuit.state = CLOSED
+            circuit.failures = 0
+
+    def record_failure(self, family: str, reason: str) -> None:
+        """Record a failed job; opens the circuit at the threshold or when a probe failed."""
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            circuit = self._circuit(family)
+            circuit.failures += 1
+            if circuit.state == HALF_OPEN or (circuit.state == CLOSED and circuit.failures >= self.failure_threshold):
+                if circuit.state == CLOSED:
+                    circuit.times_opened += 1
+                circuit.state = OPEN
+                circuit.opened_at = time.monotonic()
+                logger.warning(f"[CIRCUIT] Opened circuit for {family} after {circuit.failures} failures ({reason})")
+
+    def release_probe(self, family: str) -> None:
+        """Return a probe that could not be started, so the next rejected job probes instead."""
+        with self._lock:
+            circuit = self._circuits.get(family)
+            if circuit is not None and circuit.state == HALF_OPEN:
+                circuit.state = OPEN
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the state of all circuits that saw failures, for monitoring.
+        """
+        with self._lock:
+            return {
+                "failure_threshold": self.failure_threshold,
+                "slow_seconds": self.slow_seconds,
+                "open_seconds": self.open_seconds,
+                "open_circuits": sorted(family for family, circuit in self._circuits.items() if circuit.state != CLOSED),
+                "circuits": {
+                    family: {
+                        "state": circuit.state,
+                        "consecutive_failures": circuit.failures,
+                        "times_opened": circuit.times_opened,
+                        "rejected_jobs": circuit.rejected
+                    }
+                    for family, circuit in sorted(self._circuits.items())
+                }
+            }
+
+
+# Global circuit breaker instance
+_circuit_breaker: Optional[CircuitBreaker] = None
+_circuit_breaker_lock = threading.Lock()
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Get the global circuit breaker instance."""
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        with _circuit_breaker_lock:
+            if _circuit_breaker is None:
+                settings = get_settings()
+                _circuit_breaker = CircuitBreaker(
+                    failure_threshold=settings.bigquery_circuit_failure_threshold,
+                    slow_seconds=settings.bigquery_circuit_slow_seconds,
+                    open_seconds=settings.bigquery_circuit_open_seconds
+                )
+    return _circuit_breaker
@@ -6,13 +6,13 @@ Handles database initialization, session management, and connection pooling.
 import os
 import logging
 from typing import AsyncGenerator, Optional
-from sqlalchemy import create_engine, event, text
+from sqlalchemy import create_engine, event, text, inspect, update, func
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.pool import StaticPool
 from sqlalchemy.orm import sessionmaker, Session
 from contextlib import asynccontextmanager, contextmanager
 
-from ..models.database import Base, CachedData, PreloadSession, DataFreshness
+from ..models.database import Base, CachedData, PreloadSession, DataFreshness, STORAGE_JSON, resolve_storage_format
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -121,11 +121,29 @@ class DatabaseManager:
         """Create all database tables. Should be called during app startup."""
         try:
             Base.metadata.create_all(bind=self.sync_engine)
+            self._add_missing_columns()
             logger.info("Database tables created successfully")
         except Exception as e:
             logger.error(f"Error creating database tables: {e}")
             raise
     
+    def _add_missing_columns(self):
+        """
+        Add columns introduced after a table was created.
+        create_all only creates missing tables, existing cache databases keep
+        their old schema. New columns must therefore be nullable.
+        """
+        inspector = inspect(self.sync_engine)
+        with self.sync_engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                existing = {column["name"] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing:
+                        continue
+                    column_type = column.type.compile(dialect=self.sync_engine.dialect)
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                    logger.info(f"Added column {table.name}.{column.name}")
+    
     def drop_tables(self):
         """Drop all database tables. Use with caution!"""
         try:
@@ -213,10 +231,13 @@ class DatabaseManager:
         
         return info
     
-    async def cleanup_expired_data(self) -> int:
+    async def cleanup_expired_data(self, retention_hours: int = 0) -> int:
         """
         Remove expired cache entries.
         
+        Args:
+            retention_hours: Keep entries that expired less than this many hours ago
+        
         Returns:
             Number of entries removed.
         """
@@ -224,7 +245,8 @@ class DatabaseManager:
             async with self.get_async_session() as session:
                 # Find expired entries
                 result = await session.execute(
-                    text("DELETE FROM cached_data WHERE expires_at IS NOT NULL AND expires_at < datetime('now')")
+                    text("DELETE FROM cached_data WHERE expires_at IS NOT NULL AND expires_at < datetime('now', :retention)"),
+                    {"retention": f"-{int(retention_hours)} hours"}
                 )
                 await session.commit()
                 
@@ -236,6 +258,72 @@ class DatabaseManager:
             logger.error(f"Error cleaning up expired data: {e}")
             return 0
     
+    def migrate_cached_data_storage(self, storage_format: str, batch_size: int = 200) -> int:
+        """
+        Rewrite cache entries stored in another format, e.g. the JSON text of
+        entries cached before compression was enabled, and VACUUM afterwards
+        so the database file shrinks (SQLite only). Entries updated while they
+        are being rewritten, recognized by their creation time, are left as
+        their writer stored them.
+        
+        Args:
+            storage_format: Target storage format (see CachedData.set_data)
+            batch_size: Entries rewritten per transaction
+        
+        Returns:
+            Number of migrated entries
+        """
+        storage_format = resolve_storage_format(storage_format)
+        migrated = 0
+        last_id = 0
+        try:
+            while True:
+                with self.get_sync_session() as session:
+                    entries = (
+                        session.query(CachedData)
+                        .filter(CachedData.id > last_id, func.coalesce(CachedData.storage_format, STORAGE_JSON) != storage_format)
+                        .order_by(CachedData.id)
+                        .limit(batch_size)
+                        .all()
+                    )
+                    if not entries:
+                        break
+                    
+                    for entry in entries:
+                        last_id = entry.id
+                        try:
+                            rewritten = CachedData()
+                            rewritten.set_data(entry.get_data(), storage_format)
+                        except Exception as e:
+                            logger.warning(f"Could not migrate cache entry {entry.cache_key}: {e}")
+                            continue
+                        result = session.execute(
+                            update(CachedData)
+                            # Not saved again since it was read (SQLite keeps legacy
+                            # timestamps without fractional seconds, hence <=)
+                            .where(CachedData.id == entry.id, CachedData.created_at <= entry.created_at)
+                            .values(
+                                data=rewritten.data,
+                                payload=rewritten.payload,
+                                storage_format=rewritten.storage_format,
+                                data_hash=rewritten.data_hash
+                            )
+                        )
+                        migrated += result.rowcount
+                    session.commit()
+            
+            if migrated:
+                logger.info(f"Migrated {migrated} cache entries to {storage_format} storage")
+            if migrated and "sqlite" in self.database_url:
+                with self.get_sync_session() as session:
+                    session.execute(text("VACUUM"))
+                    session.commit()
+                logger.info("Database VACUUM completed")
+        except Exception as e:
+            logger.error(f"Error migrating cache entries to {storage_format} storage: {e}")
+        
+        return migrated
+    
     async def vacuum_database(self):
         """Optimize database by running VACUUM (SQLite only)."""
         if "sqlite" in self.database_url:
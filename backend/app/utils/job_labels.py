@@ -0,0 +1,50 @@
+"""
+BigQuery job labels for the current request.
+Labels (endpoint, agency_id, time_period, preload session) are collected in a
+context variable while a request is handled and attached to every job it
+submits, so job costs can be attributed in INFORMATION_SCHEMA.JOBS.
+"""
+
+from typing import Dict, Optional, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+import re
+
+# Header the preload routes send with the key of their preload session
+PRELOAD_SESSION_HEADER = "X-Preload-Session"
+
+_job_labels: ContextVar[Dict[str, str]] = ContextVar("job_labels", default={})
+
+_INVALID_LABEL_CHARS = re.compile(r"[^a-z0-9_-]+")
+
+
+def sanitize_label_value(value) -> str:
+    """
+    Convert a value to a valid BigQuery label value
+    (lowercase letters, digits, "_" and "-", at most 63 characters).
+    """
+    return _INVALID_LABEL_CHARS.sub("_", str(value).lower()).strip("_")[:63]
+
+
+def get_job_labels() -> Dict[str, str]:
+    """Labels for jobs submitted by the current request."""
+    return dict(_job_labels.get())
+
+
+@contextmanager
+def job_labels(**labels: Optional[str]) -> Iterator[None]:
+    """
+    Add labels for jobs submitted by the enclosed code (and the tasks and
+    executor work it starts). None values are ignored.
+    """
+    merged = dict(_job_labels.get())
+    for key, value in labels.items():
+        if value is not None:
+            sanitized = sanitize_label_value(value)
+            if sanitized:
+                merged[key] = sanitized
+    token = _job_labels.set(merged)
+    try:
+        yield
+    finally:
+        _job_labels.reset(token)
@@ -0,0 +1,219 @@
+"""
+Compiler for fused count metrics.
+Count metrics that scan the same base relation and only differ in their
+filter are declared as (alias, filter) pairs and compiled into a single
+query that evaluates all filters in one scan. Several time periods can be
+compiled into the same scan by conditional aggregation on the date column.
+"""
+
+from typing import Dict, List, Any, Optional, Sequence
+
+from .query_batching import PERIOD_COLUMN, find_date_filter, replace_date_filter, period_predicate
+
+
+def compile_fused_query(base_relation: Dict[str, Any], metrics: List[Dict[str, Any]], time_periods: Optional[Sequence[str]] = None) -> str:
+    """
+    Compile metric declarations over a base relation into one query.
+
+    Args:
+        base_relation (dict): The shared relation with keys
+            "from" (FROM clause incl. joins), "where" (shared filter) and
+            "group_by" (output column -> expression)
+        metrics (list): Metric declarations with keys "alias" (result column),
+            "filter" (boolean SQL expression) and optionally "distinct"
+            (expression counted distinctly instead of counting rows)
+        time_periods (sequence, optional): Compile a multi-period query: the
+            "where" filter `<column> BETWEEN @start_date AND @end_date` is
+            evaluated for each period (see query_batching.period_params)
+
+    Returns:
+        str: SQL returning one row per group with one column per metric
+            (per group and period, with PERIOD_COLUMN, for a multi-period query)
+    """
+    if not metrics:
+        raise ValueError("At least one metric is required")
+    if time_periods:
+        return _compile_multi_period_query(base_relation, metrics, time_periods)
+
+    aliases = [metric["alias"] for metric in metrics]
+    if len(set(aliases)) != len(aliases):
+        raise ValueError(f"Duplicate metric aliases: {aliases}")
+
+    group_columns = base_relation["group_by"]
+
+    # Evaluate every filter once per row in the base relation ...
+    base_columns = [f"{expression} AS {column}" for column, expression in group_columns.items()]
+    distinct_columns = {}  # distinct expression -> base column
+    for metric in metrics:
+        base_columns.append(f"({metric['filter']}) AS m_{metric['alias']}")
+        distinct = metric.get("distinct")
+        if distinct and distinct not in distinct_columns:
+            distinct_columns[distinct] = f"d_{len(distinct_columns)}"
+            base_columns.append(f"{distinct} AS {distinct_columns[distinct]}")
+
+    # ... and aggregate them in a single pass
+    aggregates = []
+    for metric in metrics:
+        alias = metric["alias"]
+        if metric.get("distinct"):
+            aggregates.append(f"COUNT(DISTINCT IF(m_{alias}, {distinct_columns[metric['distinct']]}, NULL)) AS {alias}")
+        else:
+            aggregates.append(f"COUNTIF(m_{alias}) AS {alias}")
+    aggregates.extend(group_columns.keys())
+
+    base_select = ",\n        ".join(base_columns)
+    outer_select = ",\n    ".join(aggregates)
+    group_by = ", ".join(group_columns.keys())
+
+    return f"""
+WITH base AS (
+    SELECT
+        {base_select}
+    FROM
+        {base_relation["from"]}
+    WHERE
+        {base_relation["where"]}
+)
+SELECT
+    {outer_select}
+FROM base
+GROUP BY
+    {group_by}
+"""
+
+
+def compile_metric_query(base_relation: Dict[str, Any], metric: Dict[str, Any]) -> str:
+    """
+    Compile a single metric declaration into its stand-alone query: the
+    filter is applied in WHERE, so groups without matching rows are omitted.
+    This is the form of the hand-written per-metric queries the declaration
+    replaces, and must match them (see tests/test_metric_compiler.py).
+
+    Args:
+        base_relation (dict): The shared relation (see compile_fused_query)
+        metric (dict): The metric declaration
+
+    Returns:
+        str: SQL returning one row per group with the metric column
+    """
+    count = f"COUNT(DISTINCT {metric['distinct']})" if metric.get("distinct") else "COUNT(*)"
+    select = ",\n    ".join(
+        [f"{count} AS {metric['alias']}"]
+        + [f"{expression} AS {column}" for column, expression in base_relation["group_by"].items()]
+    )
+    where = base_relation["where"]
+    if metric["filter"] != "TRUE":
+        where = f"{where}\n    AND {metric['filter']}"
+    group_by = ", ".join(base_relation["group_by"].values())
+
+    return f"""
+SELECT
+    {select}
+FROM
+    {base_relation["from"]}
+WHERE
+    {where}
+GROUP BY
+    {group_by}
+"""
+
+
+def _compile_multi_period_query(base_relation: Dict[str, Any], metrics: List[Dict[str, Any]], time_periods: Sequence[str]) -> str:
+    """
+    Compile the fused query for several periods: the metric and period flags
+    are evaluated once per row and every metric is aggregated per period, then
+    the per-period columns are turned back into one row per group and period.
+    """
+    date_expression = find_date_filter(base_relation["where"])
+    if date_expression is None:
+        raise ValueError("A multi-period query needs a single '<column> BETWEEN @start_date AND @end_date' filter")
+
+    group_columns = base_relation["group_by"]
+    # Only rows in at least one of the periods are scanned
+    where = replace_date_filter(
+        base_relation["where"],
+        "(" + " OR ".join(period_predicate(date_expression, time_period) for time_period in time_periods) + ")"
+    )
+
+    base_columns = [f"{expression} AS {column}" for column, expression in group_columns.items()]
+    for index, time_period in enumerate(time_periods):
+        base_columns.append(f"({period_predicate(date_expression, time_period)}) AS p_{index}")
+    distinct_columns = {}  # distinct expression -> base column
+    for metric in metrics:
+        base_columns.append(f"({metric['filter']}) AS m_{metric['alias']}")
+        distinct = metric.get("distinct")
+        if distinct and distinct not in distinct_columns:
+            distinct_columns[distinct] = f"d_{len(distinct_columns)}"
+            base_columns.append(f"{distinct} AS {distinct_columns[distinct]}")
+
+    aggregates = []
+    period_structs = []
+    for index, time_period in enumerate(time_periods):
+        # Groups without rows in a period are dropped, like the single-period query does
+        aggregates.append(f"COUNTIF(p_{index}) AS rows_{index}")
+        fields = [f"'{time_period}' AS {PERIOD_COLUMN}", f"rows_{index} AS period_rows"]
+        for metric in metrics:
+            alias = metric["alias"]
+            if metric.get("distinct"):
+                aggregates.append(
+                    f"COUNT(DISTINCT IF(m_{alias} AND p_{index}, {distinct_columns[metric['distinct']]}, NULL)) AS {alias}_{index}"
+                )
+            else:
+                aggregates.append(f"COUNTIF(m_{alias} AND p_{index}) AS {alias}_{index}")
+            fields.append(f"{alias}_{index} AS {alias}")
+        period_structs.append("STRUCT(" + ", ".join(fields) + ")")
+    aggregates.extend(group_columns.keys())
+
+    base_select = ",\n        ".join(base_columns)
+    aggregate_select = ",\n        ".join(aggregates)
+    group_by = ", ".join(group_columns.keys())
+    group_select = "".join(f",\n    aggregated.{column}" for column in group_columns)
+    periods = ",\n    ".join(period_structs)
+
+    return f"""
+WITH base AS (
+    SELECT
+        {base_select}
+    FROM
+        {base_relation["from"]}
+    WHERE
+        {where}
+),
+aggregated AS (
+    SELECT
+        {aggregate_select}
+    FROM base
+    GROUP BY
+        {group_by}
+)
+SELECT
+    period.* EXCEPT (period_rows){group_select}
+FROM aggregated
+CROSS JOIN UNNEST([
+    {periods}
+]) AS period
+WHERE period.period_rows > 0
+"""
+
+
+def split_fused_result(rows: List[Dict[str, Any]], alias: str, group_columns) -> List[Dict[str, Any]]:
+    """
+    Extract the result of a single metric from the rows of a fused query.
+
+    The result has the shape of the stand-alone query: groups where the
+    metric's filter matched no row are omitted, just like a filtered
+    GROUP BY would return no row for them.
+
+    Args:
+        rows (list): Rows returned by the fused query
+        alias (str): Alias of the metric
+        group_columns (iterable): Group columns to keep
+
+    Returns:
+        list: Rows with the metric column and the group columns
+    """
+    return [
+        {alias: row[alias], **{column: row[column] for column in group_columns}}
+        for row in rows
+        if row.get(alias)
+    ]
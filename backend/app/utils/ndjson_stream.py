@@ -0,0 +1,100 @@
+"""
+NDJSON streaming of month-grouped detail lists.
+Detail endpoints group their rows by month. Rows arrive ordered by the
+grouping date, so groups can be emitted as soon as their boundary is
+crossed instead of after the whole result has been loaded.
+"""
+
+from typing import Dict, List, Any, Callable, AsyncIterator, Optional
+import json
+import logging
+
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _line(event: Dict[str, Any]) -> bytes:
+    return (json.dumps(event, default=str, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+async def month_grouped_events(
+    pages: AsyncIterator[List[Dict[str, Any]]],
+    format_row: Callable[[Dict[str, Any]], Dict[str, Any]],
+    month_field: str,
+    items_key: str,
+    header: Dict[str, Any]
+) -> AsyncIterator[bytes]:
+    """
+    Turn pages of query rows into NDJSON events.
+
+    Events (one JSON object per line):
+        {"event": "start", **header}
+        {"event": "month_start", "month": "YYYY-MM"}
+        {"event": "item", "month": "YYYY-MM", "<items_key>": {...}}
+        {"event": "month_end", "month": "YYYY-MM", "count": n}
+        {"event": "end", "total_count": n, "agency_name": "..."}
+        {"event": "error", "detail": "..."}  (instead of "end" if the query fails)
+
+    Args:
+        pages: Pages of raw rows, ordered by month_field descending
+        format_row: Converts a raw row to the detail dict of the endpoint
+        month_field: Key of the formatted detail holding the grouping date
+        items_key: Key under which each detail is emitted
+        header: Fields for the start event
+
+    Yields:
+        bytes: Encoded NDJSON lines
+    """
+    yield _line({"event": "start", **header})
+
+    current_month: Optional[str] = None
+    month_count = 0
+    total_count = 0
+    agency_name = "Unknown"
+
+    try:
+        async for page in pages:
+            for row in page:
+                if agency_name == "Unknown" and row.get("agency_name"):
+                    agency_name = row["agency_name"]
+
+                detail = format_row(row)
+                total_count += 1
+
+                # Rows without a date count towards the total but belong to no month
+                month = detail.get(month_field)[:7] if detail.get(month_field) else None
+                if month is None:
+                    continue
+
+                if month != current_month:
+                    if current_month is not None:
+                        yield _line({"event": "month_end", "month": current_month, "count": month_count})
+                    current_month = month
+                    month_count = 0
+                    yield _line({"event": "month_start", "month": month})
+
+                month_count += 1
+                yield _line({"event": "item", "month": month, items_key: detail})
+    except Exception as e:
+        # Headers are already sent, so the error is reported in-band
+        logger.error(f"[STREAM] Error while streaming {items_key}: {str(e)}")
+        yield _line({"event": "error", "detail": str(e)})
+        return
+
+    if current_month is not None:
+        yield _line({"event": "month_end", "month": current_month, "count": month_count})
+    yield _line({"event": "end", "total_count": total_count, "agency_name": agency_name})
+
+
+def ndjson_response(events: AsyncIterator[bytes]) -> StreamingResponse:
+    """
+    Wrap an NDJSON event stream in a chunked response.
+    """
+    return StreamingResponse(
+        events,
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,575 @@
+"""
+Multi-agency and multi-period variants of per-agency queries.
+A query that filters on a single agency (`<column> = @agency_id`) is
+rewritten to filter on an ARRAY<STRING> parameter (`IN UNNEST(@agency_ids)`)
+and to group by agency, so one scan answers the query for many agencies.
+A query that filters on a date range (`<column> BETWEEN @start_date AND
+@end_date`) is rewritten to evaluate several date ranges in one scan and to
+group by time period; in queries built from CTEs, the period is carried
+through the pipeline. The result is split back into the results the original
+query would have returned.
+"""
+
+from typing import Dict, List, Any, Optional, Iterable, NamedTuple, Sequence, Tuple
+import re
+
+# Column the batched variant adds to tell the agencies' rows apart
+BATCH_AGENCY_COLUMN = "batch_agency_id"
+# Column the multi-period variant adds to tell the time periods' rows apart
+PERIOD_COLUMN = "batch_time_period"
+
+_AGENCY_FILTER = re.compile(r"([A-Za-z_][\w.]*)\s*=\s*@agency_id\b")
+_AGENCY_PARAM = re.compile(r"@agency_id\b")
+_DATE_FILTER = re.compile(r"([A-Za-z_][\w.]*)\s+BETWEEN\s+@start_date\s+AND\s+@end_date\b", re.IGNORECASE)
+_DATE_PARAM = re.compile(r"@(?:start|end)_date\b")
+
+
+class BatchedQuery(NamedTuple):
+    """A derived multi-agency query and how to split its result."""
+    sql: str
+    split_column: str  # Column holding the agency ID of each row
+    drop_split_column: bool  # Whether the column was added by the rewrite
+
+
+def _top_level_keywords(sql: str) -> List[tuple]:
+    """
+    Find SQL keywords outside of parentheses, string literals and comments.
+
+    Returns:
+        List of (position, upper-case keyword) tuples
+    """
+    keywords = []
+    depth = 0
+    i = 0
+    length = len(sql)
+    while i < length:
+        char = sql[i]
+        if char in ("'", '"', "`"):
+            end = sql.find(char, i + 1)
+            i = length if end == -1 else end + 1
+            continue
+        if sql.startswith("--", i) or char == "#":
+            end = sql.find("\n", i)
+            i = length if end == -1 else end + 1
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif depth == 0 and (char.isalpha() or char == "_") and (i == 0 or not (sql[i - 1].isalnum() or sql[i - 1] in "_.@")):
+            match = re.match(r"[A-Za-z_]\w*", sql[i:])
+            word = match.group(0).upper()
+            if word == "GROUP" or word == "ORDER":
+                by = re.match(r"[A-Za-z_]\w*\s+BY\b", sql[i:], re.IGNORECASE)
+                if by:
+                    keywords.append((i, f"{word} BY"))
+                    i += by.end()
+                    continue
+            keywords.append((i, word))
+            i += len(word)
+            continue
+        i += 1
+    return keywords
+
+
+def derive_batched_query(sql: str) -> Optional[BatchedQuery]:
+    """
+    Derive the multi-agency variant of a per-agency query.
+
+    Supported shapes:
+        - A single SELECT with a top-level GROUP BY: the agency column is added
+          to the select list and the GROUP BY
+        - Any query (including CTEs) whose top-level GROUP BY already contains
+          agency_id: only the filter is replaced
+
+    Args:
+        sql (str): SQL of the per-agency query
+
+    Returns:
+        BatchedQuery, or None if the query cannot be batched safely
+    """
+    filters = _AGENCY_FILTER.findall(sql)
+    # Every use of @agency_id must be the same equality filter
+    if not filters or len(set(filters)) != 1 or len(filters) != len(_AGENCY_PARAM.findall(sql)):
+        return None
+    agency_column = filters[0]
+    batched_sql = _AGENCY_FILTER.sub(lambda match: f"{match.group(1)} IN UNNEST(@agency_ids)", sql)
+
+    keywords = _top_level_keywords(batched_sql)
+    words = [word for _, word in keywords]
+    if "UNION" in words or "LIMIT" in words or "QUALIFY" in words or words.count("GROUP BY") != 1:
+        return None
+
+    group_by_position = next(position for position, word in keywords if word == "GROUP BY")
+    clause_end = next(
+        (position for position, word in keywords if position > group_by_position and word in ("HAVING", "ORDER BY", "WINDOW")),
+        len(batched_sql)
+    )
+    group_items = [item.strip() for item in batched_sql[group_by_position + len("GROUP BY"):clause_end].split(",")]
+
+    if "agency_id" in group_items:
+        return BatchedQuery(batched_sql, "agency_id", False)
+
+    if words[0] != "SELECT" or words.count("SELECT") != 1 or words[1] == "DISTINCT":
+        return None
+
+    # Group the single SELECT by agency as well (unless it is already) ...
+    if agency_column not in group_items:
+        group_by_match = re.compile(r"GROUP\s+BY\s+", re.IGNORECASE).match(batched_sql, group_by_position)
+        insert_at = group_by_match.end()
+        batched_sql = f"{batched_sql[:insert_at]}{agency_column}, {batched_sql[insert_at:]}"
+
+    # ... and return the agency of each row
+    select_position = keywords[0][0] + len("SELECT")
+    batched_sql = f"{batched_sql[:select_position]}\n    {agency_column} AS {BATCH_AGENCY_COLUMN},{batched_sql[select_position:]}"
+
+    return BatchedQuery(batched_sql, BATCH_AGENCY_COLUMN, True)
+
+
+def batch_base_relation(base_relation: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Derive the multi-agency variant of a fused-metric base relation
+    (see metric_compiler.compile_fused_query).
+
+    Returns:
+        The relation filtered on @agency_ids and grouped by agency, or None
+    """
+    filters = _AGENCY_FILTER.findall(base_relation["where"])
+    if len(filters) != 1 or len(_AGENCY_PARAM.findall(base_relation["where"])) != 1:
+        return None
+    return {
+        **base_relation,
+        "where": _AGENCY_FILTER.sub(lambda match: f"{match.group(1)} IN UNNEST(@agency_ids)", base_relation["where"]),
+        "group_by": {BATCH_AGENCY_COLUMN: filters[0], **base_relation["group_by"]}
+    }
+
+
+def split_batched_result(rows: List[Dict[str, Any]], agency_ids: Iterable[str], batched: BatchedQuery) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Split the rows of a batched query into per-agency results.
+
+    Args:
+        rows (list): Rows returned by the batched query
+        agency_ids (iterable): The agencies the query was run for
+        batched (BatchedQuery): The batched variant that produced the rows
+
+    Returns:
+        dict: agency_id -> rows in the shape of the per-agency query
+            (agencies without rows get an empty list)
+    """
+    results: Dict[str, List[Dict[str, Any]]] = {agency_id: [] for agency_id in agency_ids}
+    for row in rows:
+        agency_id = row.get(batched.split_column)
+        if agency_id not in results:
+            continue
+        if batched.drop_split_column:
+            row = {key: value for key, value in row.items() if key != batched.split_column}
+        results[agency_id].append(row)
+    return results
+
+
+def period_param_names(time_period: str) -> Tuple[str, str]:
+    """Names of the start and end date parameters of a time period in a multi-period query."""
+    return f"start_date_{time_period}", f"end_date_{time_period}"
+
+
+def period_params(date_ranges: Dict[str, Tuple[str, str]]) -> Dict[str, str]:
+    """
+    Bind the date ranges of a multi-period query.
+
+    Args:
+        date_ranges (dict): time_period -> (start_date, end_date)
+
+    Returns:
+        dict: Parameters named after period_param_names
+    """
+    params = {}
+    for time_period, (start_date, end_date) in date_ranges.items():
+        start_name, end_name = period_param_names(time_period)
+        params[start_name] = start_date
+        params[end_name] = end_date
+    return params
+
+
+def period_predicate(expression: str, time_period: str) -> str:
+    """The date filter of one time period of a multi-period query."""
+    start_name, end_name = period_param_names(time_period)
+    return f"{expression} BETWEEN @{start_name} AND @{end_name}"
+
+
+def find_date_filter(sql: str) -> Optional[str]:
+    """
+    Find the date column of a query filtered by `<column> BETWEEN @start_date AND @end_date`.
+
+    Returns:
+        The filtered expression, or None if the query has no such filter, has
+        several, or uses the date parameters elsewhere
+    """
+    filters = _DATE_FILTER.findall(sql)
+    if len(filters) != 1 or len(_DATE_PARAM.findall(sql)) != 2:
+        return None
+    return filters[0]
+
+
+def replace_date_filter(sql: str, replacement: str) -> str:
+    """Replace the `<column> BETWEEN @start_date AND @end_date` filter found by find_date_filter."""
+    return _DATE_FILTER.sub(lambda match: replacement, sql)
+
+
+def derive_multi_period_query(sql: str, time_periods: Sequence[str]) -> Optional[str]:
+    """
+    Derive the variant of a query that answers several time periods in one scan.
+
+    Every row is joined with the periods whose date range it falls in and the
+    query is grouped by period as well, so each period gets exactly the rows
+    and aggregates of the original query. Supported are single SELECTs with a
+    top-level GROUP BY whose date filter is part of the WHERE clause.
+
+    Args:
+        sql (str): SQL of the query (may already be a batched variant)
+        time_periods (sequence): The periods to answer
+
+    Returns:
+        SQL taking the parameters of period_params instead of @start_date and
+        @end_date and returning PERIOD_COLUMN, or None if not supported
+    """
+    expression = find_date_filter(sql)
+    if expression is None or not time_periods:
+        return None
+
+    keywords = _top_level_keywords(sql)
+    words = [word for _, word in keywords]
+    if words[:1] != ["SELECT"] or words.count("SELECT") != 1 or words[1] == "DISTINCT" or \
+            "UNION" in words or "LIMIT" in words or "QUALIFY" in words or \
+            words.count("WHERE") != 1 or words.count("GROUP BY") != 1:
+        return None
+
+    where_position = next(position for position, word in keywords if word == "WHERE")
+    group_by_position = next(position for position, word in keywords if word == "GROUP BY")
+    filter_position = _DATE_FILTER.search(sql).start()
+    if not where_position < filter_position < group_by_position:
+        return None
+
+    # Rewrite back to front so the keyword positions stay valid
+    group_by_end = re.compile(r"GROUP\s+BY\s+", re.IGNORECASE).match(sql, group_by_position).end()
+    sql = f"{sql[:group_by_end]}{PERIOD_COLUMN}, {sql[group_by_end:]}"
+
+    period_filters = "\n        OR ".join(
+        f"({PERIOD_COLUMN} = '{time_period}' AND {period_predicate(expression, time_period)})"
+        for time_period in time_periods
+    )
+    sql = replace_date_filter(sql, f"(\n        {period_filters}\n    )")
+
+    period_list = ", ".join(f"'{time_period}'" for time_period in time_periods)
+    sql = f"{sql[:where_position]}CROSS JOIN UNNEST([{period_list}]) AS {PERIOD_COLUMN}\n{sql[where_position:]}"
+
+    select_position = keywords[0][0] + len("SELECT")
+    return f"{sql[:select_position]}\n    {PERIOD_COLUMN},{sql[select_position:]}"
+
+
+# Date range filters the pipeline variant can evaluate per period: BETWEEN
+# (also on a function of a column) and half-open TIMESTAMP ranges
+_RANGE_OPERAND = r"(?:[A-Za-z_]\w*\([^()]*\)|[A-Za-z_][\w.]*)"
+_PERIOD_FILTER = re.compile(
+    rf"{_RANGE_OPERAND}\s+BETWEEN\s+@start_date\s+AND\s+@end_date\b"
+    rf"|(?P<operand>{_RANGE_OPERAND})\s*>=\s*TIMESTAMP\(@start_date\)\s+AND\s+(?P=operand)\s*<\s*TIMESTAMP\(@end_date\)",
+    re.IGNORECASE
+)
+# Aggregates that ignore NULL input, so a period without rows still gets its row of NULLs
+_AGGREGATE_CALL = re.compile(
+    r"\b(?:COUNT|COUNTIF|SUM|AVG|MIN|MAX|APPROX_QUANTILES|APPROX_COUNT_DISTINCT|ANY_VALUE|LOGICAL_AND|LOGICAL_OR|"
+    r"STRING_AGG|STDDEV|VARIANCE|ARRAY_AGG)\s*\(",
+    re.IGNORECASE
+)
+_FROM_CLAUSE_END = ("WHERE", "GROUP BY", "HAVING", "QUALIFY", "WINDOW", "ORDER BY", "LIMIT")
+_JOIN_KEYWORDS = ("JOIN", "LEFT", "RIGHT", "FULL", "INNER", "CROSS")
+_NOT_ALIASES = set(_JOIN_KEYWORDS) | {"ON", "USING", "WHERE", "GROUP", "HAVING", "QUALIFY", "WINDOW", "ORDER", "LIMIT", "UNION"}
+# Range variable of the period list in aggregate-only selects
+_PERIOD_LIST_ALIAS = "batch_period"
+
+
+def _nesting_depths(sql: str) -> List[int]:
+    """Parenthesis depth of every character; -1 inside string literals and comments."""
+    depths = []
+    depth = 0
+    i = 0
+    length = len(sql)
+    while i < length:
+        char = sql[i]
+        if char in ("'", '"', "`") or sql.startswith("--", i) or char == "#":
+            if char in ("'", '"', "`"):
+                end = sql.find(char, i + 1)
+            else:
+                end = sql.find("\n", i)
+            end = length if end == -1 else end + 1
+            depths.extend([-1] * (end - i))
+            i = end
+            continue
+        if char == "(":
+            depth += 1
+        depths.append(depth)
+        if char == ")":
+            depth -= 1
+        i += 1
+    return depths
+
+
+def _split_with_clause(sql: str) -> Optional[Tuple[List[Tuple[str, int, int]], int]]:
+    """
+    Split a query into its common table expressions and the final query.
+
+    Returns:
+        ([(CTE name, body start, body end)], start of the final query), or None
+        if the query does not start with a (non-recursive) WITH clause
+    """
+    keywords = _top_level_keywords(sql)
+    if not keywords or keywords[0][1] != "WITH" or (len(keywords) > 1 and keywords[1][1] == "RECURSIVE"):
+        return None
+
+    depths = _nesting_depths(sql)
+    ctes = []
+    position = keywords[0][0] + len("WITH")
+    while True:
+        match = re.compile(r"\s*([A-Za-z_]\w*)\s+AS\s*\(", re.IGNORECASE).match(sql, position)
+        if not match:
+            return None
+        body_start = match.end()
+        body_end = next(
+            (i for i in range(body_start, len(sql)) if sql[i] == ")" and depths[i] == depths[body_start - 1]),
+            None
+        )
+        if body_end is None:
+            return None
+        ctes.append((match.group(1), body_start, body_end))
+        separator = re.compile(r"\s*,").match(sql, body_end + 1)
+        if not separator:
+            return ctes, body_end + 1
+        position = separator.end()
+
+
+def _tag_periods(body: str, time_periods: Sequence[str]) -> Optional[str]:
+    """
+    Rewrite the SELECT holding the date filters to return one row per period
+    its rows fall in (see derive_multi_period_query).
+    """
+    keywords = _top_level_keywords(body)
+    words = [word for _, word in keywords]
+    if words[:1] != ["SELECT"] or words.count("SELECT") != 1 or words[1] == "DISTINCT" or \
+            "UNION" in words or "LIMIT" in words or "QUALIFY" in words or "OVER" in words or words.count("WHERE") != 1:
+        return None
+
+    where_position = next(position for position, word in keywords if word == "WHERE")
+    where_end = next((position for position, word in keywords if position > where_position and word in _FROM_CLAUSE_END), len(body))
+    depths = _nesting_depths(body)
+    filters = list(_PERIOD_FILTER.finditer(body))
+    if any(not where_position < match.start() < where_end or depths[match.start()] != 0 for match in filters):
+        return None
+
+    # Rewrite back to front so the keyword positions stay valid
+    if "GROUP BY" in words:
+        group_by_position = next(position for position, word in keywords if word == "GROUP BY")
+        group_by_end = re.compile(r"GROUP\s+BY\s+", re.IGNORECASE).match(body, group_by_position).end()
+        body = f"{body[:group_by_end]}{PERIOD_COLUMN}, {body[group_by_end:]}"
+
+    for match in reversed(filters):
+        period_filters = "\n        OR ".join(
+            f"({PERIOD_COLUMN} = '{time_period}' AND {_period_filter(match.group(0), time_period)})"
+            for time_period in time_periods
+        )
+        body = f"{body[:match.start()]}(\n        {period_filters}\n    ){body[match.end():]}"
+
+    period_list = ", ".join(f"'{time_period}'" for time_period in time_periods)
+    body = f"{body[:where_position]}CROSS JOIN UNNEST([{period_list}]) AS {PERIOD_COLUMN}\n  {body[where_position:]}"
+
+    select_position = keywords[0][0] + len("SELECT")
+    return f"{body[:select_position]}\n    {PERIOD_COLUMN},{body[select_position:]}"
+
+
+def _period_filter(filter_sql: str, time_period: str) -> str:
+    """A date range filter bound to the parameters of one time period."""
+    start_name, end_name = period_param_names(time_period)
+    return re.sub(r"@end_date\b", f"@{end_name}", re.sub(r"@start_date\b", f"@{start_name}", filter_sql))
+
+
+def _carry_period(body: str, tagged: Iterable[str], time_periods: Sequence[str]) -> Optional[str]:
+    """
+    Rewrite a query over period-tagged relations to return (and group by) the
+    period of its rows. Each branch of a UNION ALL must read a tagged relation
+    first in its FROM clause; further tagged relations must be joined on the period.
+    """
+    keywords = _top_level_keywords(body)
+    words = [word for _, word in keywords]
+    if "WITH" in words or "OVER" in words or "LIMIT" in words or "QUALIFY" in words:
+        return None
+    union_positions = [position for position, word in keywords if word == "UNION"]
+    if any(not re.compile(r"UNION\s+ALL\b", re.IGNORECASE).match(body, position) for position in union_positions):
+        return None
+
+    # Rewrite the branches back to front
+    bounds = [0] + union_positions + [len(body)]
+    for start, end in reversed(list(zip(bounds[:-1], bounds[1:]))):
+        if start:
+            start = re.compile(r"UNION\s+ALL\b", re.IGNORECASE).match(body, start).end()
+        branch = _carry_period_branch(body[start:end], tagged, time_periods)
+        if branch is None:
+            return None
+        body = f"{body[:start]}{branch}{body[end:]}"
+    return body
+
+
+def _carry_period_branch(branch: str, tagged: Iterable[str], time_periods: Sequence[str]) -> Optional[str]:
+    keywords = _top_level_keywords(branch)
+    words = [word for _, word in keywords]
+    if words[:1] != ["SELECT"] or words.count("SELECT") != 1 or words[1] == "DISTINCT" or words.count("FROM") != 1 \
+            or "RIGHT" in words or "FULL" in words:
+        return None
+
+    depths = _nesting_depths(branch)
+    select_position = keywords[0][0] + len("SELECT")
+    from_position = next(position for position, word in keywords if word == "FROM")
+    from_end = next((position for position, word in keywords if position > from_position and word in _FROM_CLAUSE_END), len(branch))
+    select_list = branch[select_position:from_position]
+    # SELECT * would return the period column twice
+    if any(depths[select_position + match.end() - 1] == 0 for match in re.finditer(r"(?:^|,)\s*(?:[A-Za-z_]\w*\.)?\*", select_list)):
+        return None
+    indent = re.match(r"[ \t]*\n?([ \t]*)", select_list).group(1) or "  "
+
+    # Tagged relations may only be read in the FROM clause itself
+    references = []
+    for name in tagged:
+        for match in re.finditer(rf"(?<![\w.]){name}\b(?!\.)", branch):
+            # Skip comments, literals and column aliases named like the relation
+            if depths[match.start()] == -1 or re.search(r"\bAS\s+$", branch[:match.start()], re.IGNORECASE):
+                continue
+            if depths[match.start()] != 0 or not from_position < match.start() < from_end:
+                return None
+            alias = re.compile(r"\s+(?:AS\s+)?([A-Za-z_]\w*)", re.IGNORECASE).match(branch, match.end())
+            if alias and alias.group(1).upper() in _NOT_ALIASES:
+                alias = None
+            references.append((match.start(), match.end(), alias.group(1) if alias else name))
+    references.sort()
+    first_relation = re.compile(r"FROM\s+", re.IGNORECASE).match(branch, from_position).end()
+    if not references or references[0][0] != first_relation:
+        return None
+    qualifier = references[0][2]
+
+    group_by_position = next((position for position, word in keywords if word == "GROUP BY"), None)
+    aggregate_only = group_by_position is None and any(
+        depths[select_position + match.start()] == 0 for match in _AGGREGATE_CALL.finditer(select_list)
+    )
+    if aggregate_only:
+        # Without GROUP BY the branch returns one row even for a period without
+        # rows: read the period list and left join the tagged relation onto it,
+        # with the WHERE clause as part of the join condition (COUNT(*) and
+        # ARRAY_AGG would not ignore the NULL row of such a period)
+        where_position = next((position for position, word in keywords if word == "WHERE"), None)
+        if len(references) != 1 or from_end != (where_position or len(branch)) or \
+                any(word in words for word in ("HAVING", "WINDOW", "ORDER BY")) or \
+                not re.fullmatch(r"\s*(?:(?:AS\s+)?[A-Za-z_]\w*)?\s*", branch[references[0][1]:from_end], re.IGNORECASE) or \
+                re.search(r"\bCOUNT\s*\(\s*(?:\*|1)\s*\)|\bARRAY_AGG\s*\(", select_list, re.IGNORECASE):
+            return None
+        period_list = ", ".join(f"'{time_period}'" for time_period in time_periods)
+        relation_end = len(branch[:from_end].rstrip())
+        branch_end = len(branch.rstrip())
+        condition = f"{qualifier}.{PERIOD_COLUMN} = {_PERIOD_LIST_ALIAS}"
+        if where_position is not None:
+            condition += f" AND ({branch[where_position + len('WHERE'):branch_end].strip()})"
+        return (
+            f"{branch[:select_position]}\n{indent}{_PERIOD_LIST_ALIAS} AS {PERIOD_COLUMN},{select_list}"
+            f"FROM UNNEST([{period_list}]) AS {_PERIOD_LIST_ALIAS}\n"
+            f"LEFT JOIN {branch[references[0][0]:relation_end]} ON {condition}\n"
+            f"GROUP BY {_PERIOD_LIST_ALIAS}{branch[branch_end:]}"
+        )
+
+    # Rewrite back to front: GROUP BY, join conditions, select list
+    if group_by_position is not None:
+        group_by_end = re.compile(r"GROUP\s+BY\s+", re.IGNORECASE).match(branch, group_by_position).end()
+        branch = f"{branch[:group_by_end]}{qualifier}.{PERIOD_COLUMN}, {branch[group_by_end:]}"
+
+    for start, end, alias in reversed(references[1:]):
+        on_keyword = next(
+            (position for position, word in keywords if position > end and word in _JOIN_KEYWORDS + ("ON", "USING") + _FROM_CLAUSE_END),
+            None
+        )
+        if on_keyword is None or not re.compile(r"ON\b", re.IGNORECASE).match(branch, on_keyword):
+            return None
+        condition_start = on_keyword + len("ON")
+        condition_end = next(
+            (position for position, word in keywords if position > condition_start and word in _JOIN_KEYWORDS + _FROM_CLAUSE_END),
+            from_end
+        )
+        comma = next((i for i in range(condition_start, condition_end) if branch[i] == "," and depths[i] == 0), None)
+        if comma is not None:
+            return None
+        condition = branch[condition_start:condition_end].rstrip()
+        branch = (
+            f"{branch[:condition_start]} {qualifier}.{PERIOD_COLUMN} = {alias}.{PERIOD_COLUMN} AND ({condition.strip()})"
+            f"{branch[condition_start + len(condition):]}"
+        )
+
+    return f"{branch[:select_position]}\n{indent}{qualifier}.{PERIOD_COLUMN},{branch[select_position:]}"
+
+
+def derive_multi_period_pipeline(sql: str, time_periods: Sequence[str]) -> Optional[str]:
+    """
+    Derive the multi-period variant of a query built from common table
+    expressions (e.g. the reaction-time statistics).
+
+    The CTEs filtering on the date range are joined with the periods like in
+    derive_multi_period_query. The period column is then carried through the
+    CTEs and the final query reading them: it is selected and grouped by, and
+    joins between tagged relations also match on it. Aggregate-only selects
+    still return one row per period.
+
+    Args:
+        sql (str): SQL of the query
+        time_periods (sequence): The periods to answer
+
+    Returns:
+        SQL taking the parameters of period_params instead of @start_date and
+        @end_date and returning PERIOD_COLUMN, or None if not supported
+    """
+    split = _split_with_clause(sql)
+    filters = list(_PERIOD_FILTER.finditer(sql))
+    if split is None or not filters or not time_periods or len(_DATE_PARAM.findall(sql)) != 2 * len(filters):
+        return None
+    ctes, final_start = split
+
+    parts = ctes + [(None, final_start, len(sql))]
+    rewritten = []
+    tagged = []
+    for name, start, end in parts:
+        body = sql[start:end]
+        references = [cte for cte in tagged if re.search(rf"(?<![\w.]){cte}\b", body)]
+        if any(start <= match.start() < end for match in filters):
+            body = None if references else _tag_periods(body, time_periods)
+        elif references:
+            body = _carry_period(body, tagged, time_periods)
+        else:
+            continue
+        if body is None:
+            return None
+        rewritten.append((start, end, body))
+        tagged.append(name)
+
+    # Each filter must be rewritten and the final query must return the period
+    if any(not any(start <= match.start() < end for start, end, _ in rewritten) for match in filters) or tagged[-1:] != [None]:
+        return None
+    for start, end, body in reversed(rewritten):
+        sql = f"{sql[:start]}{body}{sql[end:]}"
+    return sql
+
+
+def split_period_result(rows: List[Dict[str, Any]], time_periods: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Split the rows of a multi-period query into per-period results.
+
+    Returns:
+        dict: time_period -> rows without PERIOD_COLUMN (periods without rows get an empty list)
+    """
+    results: Dict[str, List[Dict[str, Any]]] = {time_period: [] for time_period in time_periods}
+    for row in rows:
+        time_period = row.get(PERIOD_COLUMN)
+        if time_period in results:
+            results[time_period].append({key: value for key, value in row.items() if key != PERIOD_COLUMN})
+    return results
@@ -0,0 +1,158 @@
+"""
+SQL fingerprints of cached endpoint responses.
+While an endpoint computes a response, the SQL of every query it runs is
+recorded. The cached entry stores the hashes of the registered queries it
+used (named QueryManager queries and the SQL constants of the query and route
+modules) together with the endpoint's version, so after a deploy only the
+entries whose SQL or post-processing changed are treated as misses.
+"""
+
+from typing import Dict, Any, Optional, Iterator, Set
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import threading
+import logging
+import time
+
+from .query_result_cache import sql_hash
+
+logger = logging.getLogger(__name__)
+
+# SQL hashes recorded for the response being computed (None = not recording)
+_recorded_queries: ContextVar[Optional[Set[str]]] = ContextVar("recorded_queries", default=None)
+
+_HASH_LENGTH = 16
+# Seconds before collecting the registered queries is retried after a failure
+_RETRY_SECONDS = 300
+
+
+def record_query(query: str) -> None:
+    """Record that the current response uses this SQL."""
+    recorded = _recorded_queries.get()
+    if recorded is not None:
+        recorded.add(sql_hash(query)[:_HASH_LENGTH])
+
+
+@contextmanager
+def recording_queries() -> Iterator[Set[str]]:
+    """
+    Record the SQL of all queries run by the enclosed code (and the tasks and
+    executor work it starts).
+
+    Yields:
+        The set the SQL hashes are added to
+    """
+    recorded: Set[str] = set()
+    token = _recorded_queries.set(recorded)
+    try:
+        yield recorded
+    finally:
+        _recorded_queries.reset(token)
+
+
+class QueryFingerprintRegistry:
+    """
+    Current SQL hash of every registered query, used to build and check the
+    fingerprints of cached entries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hash_by_name: Optional[Dict[str, str]] = None
+        self._name_by_hash: Dict[str, str] = {}
+        self._stale_entries = 0
+        self._failed_at: Optional[float] = None
+
+    def load(self) -> bool:
+        """
+        Collect the registered queries (once per process).
+
+        Returns:
+            Whether the registry is available
+        """
+        if self._hash_by_name is not None:
+            return True
+        with self._lock:
+            if self._hash_by_name is None:
+                if self._failed_at is not None and time.monotonic() - self._failed_at < _RETRY_SECONDS:
+                    return False
+                try:
+                    from ..services.query_cost_service import get_query_cost_service
+                    targets = get_query_cost_service().collect_targets()
+                except Exception as e:
+                    # Without the registry fingerprints can neither be built nor checked
+                    logger.error(f"[QUERY FINGERPRINT] Could not collect registered queries: {e}")
+                    self._failed_at = time.monotonic()
+                    return False
+                self._name_by_hash = {target["sql_hash"][:_HASH_LENGTH]: target["name"] for target in targets}
+                self._hash_by_name = {name: hash_ for hash_, name in self._name_by_hash.items()}
+                logger.info(f"[QUERY FINGERPRINT] Registered {len(self._hash_by_name)} queries")
+        return True
+
+    def build(self, recorded: Set[str], version: int = 1) -> Optional[str]:
+        """
+        Build the fingerprint of a response.
+
+        Args:
+            recorded: SQL hashes recorded while computing the response
+            version: Version of the endpoint's post-processing
+
+        Returns:
+            JSON fingerprint, or None if the registry is unavailable
+        """
+        if not self.load():
+            return None
+        # SQL built at runtime (f-strings) is not registered; the endpoint version covers it
+        queries = {self._name_by_hash[hash_]: hash_ for hash_ in recorded if hash_ in self._name_by_hash}
+        return json.dumps({"version": version, "queries": queries}, sort_keys=True)
+
+    def is_current(self, fingerprint: Optional[str], version: Optional[int] = None) -> bool:
+        """
+        Check whether a cached entry was produced by the current SQL and endpoint version.
+
+        Args:
+            fingerprint: The stored fingerprint (entries without one are accepted)
+            version: Current version of the endpoint, if known
+
+        Returns:
+            False if the version or the SQL of any query the entry used changed
+        """
+        if not fingerprint or not self.load():
+            return True
+        try:
+            stored = json.loads(fingerprint)
+        except (TypeError, ValueError):
+            return True
+
+        current = version is None or stored.get("version") == version
+        current = current and all(
+            self._hash_by_name.get(name) == hash_ for name, hash_ in stored.get("queries", {}).items()
+        )
+        if not current:
+            with self._lock:
+                self._stale_entries += 1
+        return current
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get registry size and detected stale entries for monitoring.
+        """
+        return {
+            "registered_queries": len(self._hash_by_name or {}),
+            "stale_entries_detected": self._stale_entries
+        }
+
+
+# Global registry instance
+_fingerprint_registry: Optional[QueryFingerprintRegistry] = None
+_fingerprint_registry_lock = threading.Lock()
+
+def get_fingerprint_registry() -> QueryFingerprintRegistry:
+    """Get the global query fingerprint registry instance."""
+    global _fingerprint_registry
+    if _fingerprint_registry is None:
+        with _fingerprint_registry_lock:
+            if _fingerprint_registry is None:
+                _fingerprint_registry = QueryFingerprintRegistry()
+    return _fingerprint_registry
@@ -0,0 +1,228 @@
+"""
+Dependency-graph executor for composite metrics.
+Composite metrics declare the named queries they need as nodes of a DAG;
+the executor runs each distinct (query, params) pair once and runs
+independent nodes concurrently.
+"""
+
+from typing import Dict, List, Any, Optional, Callable, Iterable, Tuple
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+import contextvars
+import threading
+import logging
+import time
+
+from ..dependencies import get_settings
+from .admission_control import is_background
+
+logger = logging.getLogger(__name__)
+
+# Dedicated pools for graph nodes. They are separate from the route-level query
+# executor, so a composite running in that executor can wait on its nodes
+# without starving the pool it runs in. Preload graphs use their own pool so
+# their nodes waiting for admission do not occupy interactive graph threads.
+_graph_executors: Dict[bool, ThreadPoolExecutor] = {}
+_graph_executor_lock = threading.Lock()
+
+def get_graph_executor(background: bool = False) -> ThreadPoolExecutor:
+    """Get the global executor used for query graph nodes (or the one for preload graphs)."""
+    executor = _graph_executors.get(background)
+    if executor is None:
+        with _graph_executor_lock:
+            executor = _graph_executors.get(background)
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=get_settings().bigquery_graph_max_workers,
+                    thread_name_prefix="query-graph-background" if background else "query-graph"
+                )
+                _graph_executors[background] = executor
+    return executor
+
+
+def canonical_params(params: Optional[Dict[str, Any]]) -> Tuple:
+    """
+    Build a hashable, order-independent key for query parameters.
+    """
+    if not params:
+        return ()
+    return tuple(sorted((key, repr(value)) for key, value in params.items()))
+
+
+class QueryGraph:
+    """
+    A DAG of query nodes and derived nodes.
+
+    Query nodes execute a named query with parameters. Nodes that request the
+    same query with the same parameters share one execution. Derived nodes
+    compute a value from the results of the nodes they depend on.
+
+    Usage:
+        graph = QueryGraph(query_manager.execute_query)
+        graph.add_query("GET_AGENCY_RESERVATIONS", params=params)
+        graph.add_query("GET_FULFILLED_RESERVATIONS", params=params)
+        graph.add_derived(
+            "fulfillment",
+            lambda r: build(r["GET_AGENCY_RESERVATIONS"], r["GET_FULFILLED_RESERVATIONS"]),
+            depends_on=["GET_AGENCY_RESERVATIONS", "GET_FULFILLED_RESERVATIONS"]
+        )
+        results = graph.run()
+    """
+
+    def __init__(self, run_query: Callable[[str, Optional[Dict[str, Any]]], Any]):
+        """
+        Args:
+            run_query: Callable executing a named query, e.g. QueryManager.execute_query
+        """
+        self._run_query = run_query
+        self._nodes: Dict[str, Dict[str, Any]] = {}
+
+        # Statistics of the last run
+        self.stats: Dict[str, Any] = {}
+
+    def add_query(
+        self,
+        query_name: str,
+        params: Optional[Dict[str, Any]] = None,
+        node: Optional[str] = None,
+        depends_on: Iterable[str] = ()
+    ) -> str:
+        """
+        Declare a query node.
+
+        Args:
+            query_name: Name of the query to execute
+            params: Parameters for the query
+            node: Node name (defaults to the query name)
+            depends_on: Nodes that must finish before this query runs
+
+        Returns:
+            The node name
+        """
+        node = node or query_name
+        spec = {
+            "kind": "query",
+            "query_name": query_name,
+            "params": params,
+            "depends_on": list(depends_on)
+        }
+        existing = self._nodes.get(node)
+        if existing is not None:
+            if existing["kind"] != "query" or existing["query_name"] != query_name or \
+                    canonical_params(existing["params"]) != canonical_params(params):
+                raise ValueError(f"Node '{node}' is already declared with a different definition")
+            return node
+
+        self._nodes[node] = spec
+        return node
+
+    def __contains__(self, node: str) -> bool:
+        return node in self._nodes
+
+    def add_derived(self, node: str, func: Callable[[Dict[str, Any]], Any], depends_on: Iterable[str]) -> str:
+        """
+        Declare a node computed from the results of other nodes.
+
+        Args:
+            node: Node name
+            func: Called with a dict of dependency results keyed by node name
+            depends_on: Nodes this node needs
+
+        Returns:
+            The node name
+        """
+        if node in self._nodes:
+            raise ValueError(f"Node '{node}' is already declared")
+        self._nodes[node] = {"kind": "derived", "func": func, "depends_on": list(depends_on)}
+        return node
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Execute the graph.
+
+        Returns:
+            dict: Results of every node keyed by node name
+        """
+        self._validate()
+        start = time.perf_counter()
+
+        executor = get_graph_executor(background=is_background())
+        results: Dict[str, Any] = {}
+        pending = dict(self._nodes)
+        running: Dict[Future, List[str]] = {}
+        # One future per distinct (query, params) pair
+        query_futures: Dict[Tuple, Future] = {}
+        executed_queries = 0
+
+        def dependencies_ready(spec: Dict[str, Any]) -> bool:
+            return all(dep in results for dep in spec["depends_on"])
+
+        try:
+            while pending or running:
+                # Submit every node whose dependencies are satisfied
+                for node, spec in list(pending.items()):
+                    if not dependencies_ready(spec):
+                        continue
+                    del pending[node]
+
+                    if spec["kind"] == "query":
+                        key = (spec["query_name"], canonical_params(spec["params"]))
+                        future = query_futures.get(key)
+                        if future is None:
+                            # Nodes run in a copy of the caller's context to keep its query priority
+                            future = executor.submit(contextvars.copy_context().run, self._run_query, spec["query_name"], spec["params"])
+                            query_futures[key] = future
+                            running[future] = []
+                            executed_queries += 1
+                        running.setdefault(future, []).append(node)
+                    else:
+                        inputs = {dep: results[dep] for dep in spec["depends_on"]}
+                        future = executor.submit(contextvars.copy_context().run, spec["func"], inputs)
+                        running[future] = [node]
+
+                if not running:
+                    # Nothing runnable is left although nodes are pending
+                    raise ValueError(f"Unresolvable dependencies for nodes: {sorted(pending)}")
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    value = future.result()  # Re-raises the node's exception
+                    for node in running.pop(future):
+                        results[node] = value
+        except Exception:
+            for future in running:
+                future.cancel()
+            raise
+
+        query_nodes = sum(1 for spec in self._nodes.values() if spec["kind"] == "query")
+        self.stats = {
+            "nodes": len(self._nodes),
+            "query_nodes": query_nodes,
+            "executed_queries": executed_queries,
+            "deduplicated_queries": query_nodes - executed_queries,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+        logger.debug(f"[QUERY GRAPH] {self.stats}")
+        return results
+
+    def _validate(self) -> None:
+        """Check that all dependencies exist and the graph has no cycles."""
+        for node, spec in self._nodes.items():
+            for dep in spec["depends_on"]:
+                if dep not in self._nodes:
+                    raise ValueError(f"Node '{node}' depends on unknown node '{dep}'")
+
+        visiting, visited = set(), set()
+
+        def visit(node: str):
+            if node in visited:
+                return
+            if node in visiting:
+                raise ValueError(f"Cycle detected at node '{node}'")
+            visiting.add(node)
+            for dep in self._nodes[node]["depends_on"]:
+                visit(dep)
+            visiting.discard(node)
+            visited.add(node)
+
+        for node in self._nodes:
+            visit(node)
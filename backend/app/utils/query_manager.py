@@ -7,9 +7,23 @@ from typing import Dict, List, Any, Optional, Union
 import logging
 import os
 import importlib
+import re
+import threading
 from datetime import datetime, timedelta
 from ..dependencies import get_settings, get_bigquery_client
-from .bigquery_connection import BigQueryConnection
+from .bigquery_connection import BigQueryConnection, run_in_query_executor
+from .query_graph import QueryGraph
+from .metric_compiler import compile_fused_query, split_fused_result
+from .query_batching import (
+    BatchedQuery, BATCH_AGENCY_COLUMN, derive_batched_query, batch_base_relation, split_batched_result,
+    derive_multi_period_query, derive_multi_period_pipeline, find_date_filter, period_params, split_period_result
+)
+from .query_result_cache import get_query_result_cache, make_cache_key
+from .query_metrics import get_query_metrics
+from .query_fingerprint import record_query
+from .agency_dimension import get_agency_dimension, drop_agency_join, drop_agency_join_relation
+from .shadow_execution import get_shadow_runner
+from .admission_control import is_background
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -18,6 +32,16 @@ logger = logging.getLogger(__name__)
 # Silence specific warnings
 logging.getLogger(__name__).setLevel(logging.ERROR)
 
+# Queries loaded, rewritten and batched once per process, by whether the agency
+# dimension is used; instances share them and must not modify them (except the
+# memo of derived multi-period SQL)
+_query_catalogs: Dict[bool, Dict[str, Any]] = {}
+_query_catalogs_lock = threading.Lock()
+_CATALOG_ATTRIBUTES = (
+    "queries", "fused_queries", "batched_queries", "fused_relations", "_multi_period_queries",
+    "agency_name_queries", "original_queries"
+)
+
 class QueryManager:
     """
     A class to manage BigQuery queries, including loading, executing, and caching.
@@ -28,11 +52,27 @@ class QueryManager:
         Initialize the QueryManager
         """
         self.bq_connection = BigQueryConnection()
-        self.query_cache = {}  # Simple in-memory cache for query results
         self.queries = {}  # Dictionary to store loaded queries
-        
-        # Load all queries
-        self._load_queries()
+        self.fused_queries = {}  # Query name -> (fused query name, alias, group columns)
+        self.batched_queries = {}  # Query name -> BatchedQuery (multi-agency variant)
+        self.fused_relations = {}  # Fused query name -> (base relation, metrics)
+        self._multi_period_queries = {}  # (query name, time periods, batched) -> SQL or None
+        self.agency_name_queries = set()  # Queries whose agency name is filled in from the agency dimension
+        self.original_queries = {}  # Query name -> SQL as written, for queries that were rewritten
+        
+        # Load all queries; the regex rewriting and batching run once per process, not per request
+        use_dimension = get_settings().bigquery_agency_dimension
+        with _query_catalogs_lock:
+            catalog = _query_catalogs.get(use_dimension)
+            if catalog is None:
+                self._load_queries()
+                self._drop_agency_joins()
+                self._derive_batched_queries()
+                catalog = _query_catalogs[use_dimension] = {
+                    attribute: getattr(self, attribute) for attribute in _CATALOG_ATTRIBUTES
+                }
+        for attribute in _CATALOG_ATTRIBUTES:
+            setattr(self, attribute, catalog[attribute])
     
     def _load_queries(self):
         """
@@ -43,7 +83,8 @@ class QueryManager:
             from ..queries.agencies import agencies
             self.queries.update({
                 "GET_ALL_AGENCIES": agencies.GET_ALL_AGENCIES,
-                "GET_AGENCY_DETAILS": agencies.GET_AGENCY_DETAILS
+                "GET_AGENCY_DETAILS": agencies.GET_AGENCY_DETAILS,
+                "GET_AGENCY_DIMENSION": agencies.GET_AGENCY_DIMENSION
             })
             
             # Load quota queries
@@ -94,9 +135,30 @@ class QueryManager:
                 # Dashboard conversion stats für alle Agenturen
                 "GET_ALL_AGENCIES_CONVERSION_STATS": quotas.GET_ALL_AGENCIES_CONVERSION_STATS,
                 # Dashboard completion stats für alle Agenturen
-                "GET_ALL_AGENCIES_COMPLETION_STATS": quotas.GET_ALL_AGENCIES_COMPLETION_STATS
+                "GET_ALL_AGENCIES_COMPLETION_STATS": quotas.GET_ALL_AGENCIES_COMPLETION_STATS,
             })
             
+            # PV/Angenommen/Bestätigt/Angereist in einem Scan. The agency name is
+            # taken from the agency dimension instead of joining the agencies table.
+            base_relation = quotas.CARE_STAYS_BASE_RELATION
+            if get_settings().bigquery_agency_dimension:
+                dimension_relation = drop_agency_join_relation(base_relation, quotas.CARE_STAYS_FUSED_METRICS)
+                if dimension_relation:
+                    base_relation = dimension_relation
+                    self.agency_name_queries.add("GET_FUSED_CARE_STAY_COUNTS")
+            self.queries["GET_FUSED_CARE_STAY_COUNTS"] = compile_fused_query(base_relation, quotas.CARE_STAYS_FUSED_METRICS)
+            self.fused_relations["GET_FUSED_CARE_STAY_COUNTS"] = (base_relation, quotas.CARE_STAYS_FUSED_METRICS)
+            for metric in quotas.CARE_STAYS_FUSED_METRICS:
+                self.fused_queries[metric["query"]] = (
+                    "GET_FUSED_CARE_STAY_COUNTS", metric["alias"], tuple(quotas.CARE_STAYS_BASE_RELATION["group_by"])
+                )
+            # The fused query is compiled, so its batched variant is compiled as well
+            batched_relation = batch_base_relation(base_relation)
+            if batched_relation:
+                self.batched_queries["GET_FUSED_CARE_STAY_COUNTS"] = BatchedQuery(
+                    compile_fused_query(batched_relation, quotas.CARE_STAYS_FUSED_METRICS), BATCH_AGENCY_COLUMN, True
+                )
+            
             # Load reaction time queries
             from ..queries.reaction_times import reaction_times
             self.queries.update({
@@ -111,6 +173,12 @@ class QueryManager:
                 "TIME_ARRIVAL_TO_CANCELLATION_STATS_OVERALL": reaction_times.TIME_ARRIVAL_TO_CANCELLATION_STATS_OVERALL
             })
             
+            # Load problematic stays queries
+            from ..queries.problematic_stays import queries as problematic_stays
+            self.queries.update({
+                "GET_PROBLEMATIC_STAYS_OVERVIEW": problematic_stays.GET_PROBLEMATIC_STAYS_OVERVIEW
+            })
+            
             # Load profile quality queries (to be added when provided)
             # from ..queries.profile_quality import profile_quality
             
@@ -122,10 +190,103 @@ class QueryManager:
             logger.error(f"Error loading queries: {str(e)}")
             raise
     
+    def _drop_agency_joins(self):
+        """
+        Drop the agencies join from per-agency queries that only use it for the
+        agency name; execute_query fills in the name from the agency dimension
+        """
+        if not get_settings().bigquery_agency_dimension:
+            return
+        for query_name, query in self.queries.items():
+            if query_name in self.fused_relations:
+                continue
+            rewritten = drop_agency_join(query)
+            if rewritten:
+                self.original_queries[query_name] = query
+                self.queries[query_name] = rewritten
+                self.agency_name_queries.add(query_name)
+        logger.info(f"Dropped the agencies join from {len(self.agency_name_queries)} queries")
+    
+    def _derive_batched_queries(self):
+        """
+        Derive the multi-agency variant of every per-agency query that supports it
+        """
+        for query_name, query in self.queries.items():
+            if query_name in self.batched_queries:
+                continue
+            batched = derive_batched_query(query)
+            if batched:
+                self.batched_queries[query_name] = batched
+        logger.info(f"Derived {len(self.batched_queries)} batched multi-agency queries")
+    
+    def _multi_period_sql(self, query_name: str, time_periods, batched: bool = False) -> Optional[str]:
+        """
+        Get the SQL answering a query for several time periods in one scan
+        
+        Args:
+            query_name (str): The name of the query
+            time_periods (iterable): The periods to answer
+            batched (bool): Derive it from the multi-agency variant
+            
+        Returns:
+            str: The multi-period SQL, or None if the query does not support it
+        """
+        key = (query_name, tuple(time_periods), batched)
+        if key not in self._multi_period_queries:
+            sql = None
+            if query_name in self.fused_relations:
+                base_relation, metrics = self.fused_relations[query_name]
+                if batched:
+                    base_relation = batch_base_relation(base_relation)
+                if base_relation and find_date_filter(base_relation["where"]):
+                    sql = compile_fused_query(base_relation, metrics, tuple(time_periods))
+            elif not batched:
+                sql = derive_multi_period_query(self.queries[query_name], tuple(time_periods)) \
+                    or derive_multi_period_pipeline(self.queries[query_name], tuple(time_periods))
+            elif query_name in self.batched_queries:
+                sql = derive_multi_period_query(self.batched_queries[query_name].sql, tuple(time_periods)) \
+                    or derive_multi_period_pipeline(self.batched_queries[query_name].sql, tuple(time_periods))
+            self._multi_period_queries[key] = sql
+        return self._multi_period_queries[key]
+    
+    def _standard_time_period(self, params: Optional[Dict[str, Any]]) -> Optional[str]:
+        """
+        Get the predefined time period whose date range the parameters request
+        """
+        if not params or "start_date" not in params or "end_date" not in params:
+            return None
+        for time_period in self.MULTI_PERIODS:
+            if self._calculate_date_range(time_period) == (params["start_date"], params["end_date"]):
+                return time_period
+        return None
+    
+    def _cached_rows(self, query_name: str, params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Look up the result of a named query in the query result cache
+        """
+        if not get_settings().query_result_cache_enabled:
+            return None
+        rows = get_query_result_cache().get(make_cache_key(self.queries[query_name], params, query_name))
+        get_query_metrics().observe_result_cache(query_name, rows is not None)
+        return rows
+    
+    def _store_rows(self, query_name: str, params: Dict[str, Any], rows: List[Dict[str, Any]]) -> None:
+        """
+        Store a result computed by a batched or multi-period variant under the
+        key of the named query, so execute_query serves it
+        """
+        if get_settings().query_result_cache_enabled:
+            get_query_result_cache().put(make_cache_key(self.queries[query_name], params, query_name), rows)
+    
     def execute_query(self, query_name: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         Execute a named query with optional parameters
         
+        During preloads, a query for one of the predefined time periods is
+        answered for all of them from one scan (if the query supports it),
+        since the preload requests the other periods next. A sampled fraction of
+        queries is compared against the plain BigQuery query in the background.
+        
         Args:
             query_name (str): The name of the query to execute
             params (dict, optional): Parameters for the query
@@ -136,21 +297,316 @@ class QueryManager:
         if query_name not in self.queries:
             raise ValueError(f"Query '{query_name}' not found")
         
+        rows = self._execute_named_query(query_name, params)
+        if query_name in self.agency_name_queries:
+            rows = get_agency_dimension().with_agency_names(rows, (params or {}).get("agency_id"))
+        
+        shadow_runner = get_shadow_runner()
+        if shadow_runner.sample():
+            shadow_runner.submit(query_name, params, *self._shadow_paths(query_name, dict(params or {})))
+        return rows
+    
+    def _shadow_paths(self, query_name: str, params: Dict[str, Any]):
+        """
+        Get the plain BigQuery run of a query and the alternative paths that
+        can answer it, all bypassing the query result cache, BigQuery's query
+        cache and the job the request itself ran
+        
+        Returns:
+            tuple: (reference callable, dict of path name -> callable)
+        """
+        def fetch(query: str, query_params: Dict[str, Any], query_name: str, scan_scale: int = 1) -> List[Dict[str, Any]]:
+            return self.bq_connection._fetch_rows(query, query_params, query_name=query_name, scan_scale=scan_scale, shadow=True)
+        agency_id = params.get("agency_id")
+        
+        def with_names(name: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            if name in self.agency_name_queries:
+                return get_agency_dimension().with_agency_names(rows, agency_id)
+            return rows
+        
+        def reference():
+            return fetch(self.original_queries.get(query_name, self.queries[query_name]), params, query_name=f"{query_name}@SHADOW")
+        
+        paths = {}
+        if query_name in self.fused_relations:
+            # The fused query is compared in the shape of its per-metric queries,
+            # which serve as the baseline
+            _, metrics = self.fused_relations[query_name]
+            group_columns = self.fused_queries[metrics[0]["query"]][2]
+            
+            def per_metric():
+                rows = []
+                for metric in metrics:
+                    metric_query = metric["query"]
+                    rows.extend(fetch(self.original_queries.get(metric_query, self.queries[metric_query]), params,
+                                      query_name=f"{metric_query}@SHADOW"))
+                return rows
+            
+            def fused():
+                fused_rows = with_names(query_name, fetch(self.queries[query_name], params, query_name=f"{query_name}@SHADOW_FUSED"))
+                return [row for metric in metrics for row in split_fused_result(fused_rows, metric["alias"], group_columns)]
+            
+            return per_metric, {"fused": fused}
+        
+        if query_name in self.original_queries:
+            paths["agency_dimension"] = lambda: with_names(
+                query_name, fetch(self.queries[query_name], params, query_name=f"{query_name}@SHADOW_DIMENSION")
+            )
+        
+        batched = self.batched_queries.get(query_name)
+        if batched is not None and agency_id:
+            batch_params = {key: value for key, value in params.items() if key != "agency_id"}
+            paths["batched"] = lambda: with_names(query_name, split_batched_result(
+                fetch(batched.sql, {**batch_params, "agency_ids": [agency_id]}, query_name=f"{query_name}@SHADOW_BATCHED"),
+                [agency_id], batched
+            )[agency_id])
+        
+        time_period = self._standard_time_period(params)
+        if time_period and self._multi_period_sql(query_name, self.MULTI_PERIODS) is not None:
+            period_query_params = {key: value for key, value in params.items() if key not in ("start_date", "end_date")}
+            date_ranges = {period: self._calculate_date_range(period) for period in self.MULTI_PERIODS}
+            paths["multi_period"] = lambda: with_names(query_name, split_period_result(
+                fetch(self._multi_period_sql(query_name, self.MULTI_PERIODS), {**period_query_params, **period_params(date_ranges)},
+                      query_name=f"{query_name}@SHADOW_MULTI_PERIOD", scan_scale=len(self.MULTI_PERIODS)),
+                self.MULTI_PERIODS
+            )[time_period])
+        
+        if query_name in self.fused_queries:
+            fused_name, alias, group_columns = self.fused_queries[query_name]
+            paths["fused"] = lambda: split_fused_result(
+                with_names(fused_name, fetch(self.queries[fused_name], params, query_name=f"{fused_name}@SHADOW")),
+                alias, group_columns
+            )
+        
+        return reference, paths
+    
+    def _execute_named_query(self, query_name: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Execute a named query, answering it with the other predefined time periods if possible
+        """
         query = self.queries[query_name]
+        # The multi-period prefetch runs a derived SQL, record the named query itself
+        record_query(query)
+        
+        settings = get_settings()
+        time_period = self._standard_time_period(params)
+        # Only preloads prefetch the other periods: an interactive request
+        # should not wait for (and pay) an all_time scan it did not ask for
+        if time_period and is_background() and settings.bigquery_multi_period_prefetch and settings.query_result_cache_enabled \
+                and self._multi_period_sql(query_name, self.MULTI_PERIODS) is not None:
+            rows = self._cached_rows(query_name, params)
+            if rows is not None:
+                return rows
+            return self._run_multi_period(query_name, self.MULTI_PERIODS, params)[time_period]
+        
+        # Execute query through BigQuery connection. Results are shared across
+        # requests via the process-wide query result cache, keyed by query name.
+        return self.bq_connection.execute_query(query, params, query_name=query_name)
+    
+    async def execute_query_async(self, query_name: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Execute a named query without blocking the event loop
         
-        # Check cache if applicable
-        cache_key = f"{query_name}:{str(params)}"
-        if cache_key in self.query_cache:
-            return self.query_cache[cache_key]
+        Args:
+            query_name (str): The name of the query to execute
+            params (dict, optional): Parameters for the query
+            
+        Returns:
+            list: List of dictionaries with query results
+        """
+        return await run_in_query_executor(self.execute_query, query_name, params)
+    
+    def execute_query_multi_period(self, query_name: str, time_periods: List[str], params: Optional[Dict[str, Any]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Execute a query for several predefined time periods with one scan
         
-        # Execute query through BigQuery connection
-        results = self.bq_connection.execute_query(query, params)
+        The multi-period variant evaluates the date filter of every period in
+        the same pass. Each period's result is stored in the query result cache
+        under the key of the single-period query. Queries without a
+        multi-period variant run once per period.
         
-        # Store in cache (simple implementation, can be improved)
-        self.query_cache[cache_key] = results
+        Args:
+            query_name (str): The name of a query taking @start_date/@end_date
+            time_periods (list): Predefined time periods (last_month, last_quarter, last_year, all_time)
+            params (dict, optional): The remaining parameters of the query
+            
+        Returns:
+            dict: Results of the query keyed by time period
+        """
+        if query_name not in self.queries:
+            raise ValueError(f"Query '{query_name}' not found")
+        
+        params = {key: value for key, value in (params or {}).items() if key not in ("start_date", "end_date")}
+        time_periods = list(dict.fromkeys(time_periods))
+        
+        if self._multi_period_sql(query_name, time_periods) is None:
+            return {
+                time_period: self.bq_connection.execute_query(
+                    self.queries[query_name], self._period_params(params, time_period), query_name=query_name
+                )
+                for time_period in time_periods
+            }
+        
+        results = {}
+        for time_period in time_periods:
+            rows = self._cached_rows(query_name, self._period_params(params, time_period))
+            if rows is None:
+                return self._run_multi_period(query_name, time_periods, params)
+            results[time_period] = rows
+        return results
+    
+    def _period_params(self, params: Dict[str, Any], time_period: str) -> Dict[str, Any]:
+        start_date, end_date = self._calculate_date_range(time_period)
+        return {**params, "start_date": start_date, "end_date": end_date}
+    
+    def _run_multi_period(self, query_name: str, time_periods, params: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Run the multi-period variant of a query and cache each period's result
+        """
+        params = {key: value for key, value in params.items() if key not in ("start_date", "end_date")}
+        date_ranges = {time_period: self._calculate_date_range(time_period) for time_period in time_periods}
+        
+        rows = self.bq_connection._fetch_rows(
+            self._multi_period_sql(query_name, time_periods),
+            {**params, **period_params(date_ranges)},
+            query_name=f"{query_name}@MULTI_PERIOD",
+            scan_scale=len(time_periods)
+        )
+        
+        results = split_period_result(rows, time_periods)
+        for time_period, period_rows in results.items():
+            self._store_rows(query_name, self._period_params(params, time_period), period_rows)
+        return results
+    
+    def execute_query_batched(self, query_name: str, agency_ids: List[str], params: Optional[Dict[str, Any]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Execute a per-agency query for many agencies with one scan per batch
+        
+        The batched variant filters on @agency_ids and groups by agency. Its
+        result is split per agency and stored in the query result cache under
+        the same keys as the per-agency query, so later execute_query calls for
+        these agencies are served from the cache. Queries without a batched
+        variant run once per agency.
+        
+        Args:
+            query_name (str): The name of a query taking @agency_id
+            agency_ids (list): The agencies to run the query for
+            params (dict, optional): The remaining parameters of the query
+            
+        Returns:
+            dict: Results of the per-agency query keyed by agency ID
+        """
+        if query_name not in self.queries:
+            raise ValueError(f"Query '{query_name}' not found")
+        
+        params = dict(params or {})
+        params.pop("agency_id", None)
+        agency_ids = list(dict.fromkeys(agency_ids))
+        
+        batched = self.batched_queries.get(query_name)
+        if batched is None:
+            return {agency_id: self.execute_query(query_name, {**params, "agency_id": agency_id}) for agency_id in agency_ids}
+        
+        results = {}
+        missing = []
+        for agency_id in agency_ids:
+            rows = self._cached_rows(query_name, {**params, "agency_id": agency_id})
+            if rows is not None:
+                results[agency_id] = rows
+            else:
+                missing.append(agency_id)
+        
+        batch_size = max(1, get_settings().bigquery_agency_batch_size)
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            rows = self.bq_connection._fetch_rows(
+                batched.sql, {**params, "agency_ids": batch}, query_name=f"{query_name}@BATCHED", scan_scale=len(batch)
+            )
+            for agency_id, agency_rows in split_batched_result(rows, batch, batched).items():
+                self._store_rows(query_name, {**params, "agency_id": agency_id}, agency_rows)
+                results[agency_id] = agency_rows
         
         return results
     
+    def _warm_batched_multi_period(self, query_name: str, agency_ids: List[str], time_periods: List[str]) -> None:
+        """
+        Fill the query result cache with a per-agency query's results for many
+        agencies and periods, with one scan per agency batch if the query has a
+        batched multi-period variant and one batched scan per period otherwise
+        """
+        sql = self._multi_period_sql(query_name, time_periods, batched=True)
+        if sql is None:
+            for time_period in time_periods:
+                self.execute_query_batched(query_name, agency_ids, self._period_params({}, time_period))
+            return
+        
+        missing = [
+            agency_id for agency_id in agency_ids
+            if any(
+                self._cached_rows(query_name, self._period_params({"agency_id": agency_id}, time_period)) is None
+                for time_period in time_periods
+            )
+        ]
+        
+        batched = self.batched_queries[query_name]
+        date_ranges = {time_period: self._calculate_date_range(time_period) for time_period in time_periods}
+        batch_size = max(1, get_settings().bigquery_agency_batch_size)
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            rows = self.bq_connection._fetch_rows(
+                sql, {"agency_ids": batch, **period_params(date_ranges)}, query_name=f"{query_name}@BATCHED_MULTI_PERIOD",
+                scan_scale=len(batch) * len(time_periods)
+            )
+            for time_period, period_rows in split_period_result(rows, time_periods).items():
+                for agency_id, agency_rows in split_batched_result(period_rows, batch, batched).items():
+                    self._store_rows(query_name, self._period_params({"agency_id": agency_id}, time_period), agency_rows)
+    
+    def warm_agency_queries(self, agency_ids: List[str], time_periods: List[str]) -> List[str]:
+        """
+        Run all batchable metric queries for many agencies and time periods at
+        once, filling the query result cache before the per-agency endpoints
+        are called
+        
+        Args:
+            agency_ids (list): The agencies to warm
+            time_periods (list): Predefined time periods (last_month, last_quarter, last_year, all_time)
+            
+        Returns:
+            list: Names of the warmed queries
+        """
+        agency_ids = list(dict.fromkeys(agency_ids))
+        time_periods = list(dict.fromkeys(time_periods))
+        
+        # Only warm the queries the metric endpoints actually run
+        use_fused = get_settings().bigquery_fused_metrics
+        fused_names = {fused_name for fused_name, _, _ in self.fused_queries.values()}
+        
+        def runs(query_name: str) -> bool:
+            return not (use_fused and query_name in self.fused_queries) and not (not use_fused and query_name in fused_names)
+        
+        agency_queries = [
+            query_name for query_name in self.batched_queries
+            if set(re.findall(r"@(\w+)", self.queries[query_name])) <= {"agency_id", "start_date", "end_date"} and runs(query_name)
+        ]
+        # Queries over the date range only (e.g. GET_TOTAL_POSTINGS) are shared by all agencies
+        period_queries = [
+            query_name for query_name in self.queries
+            if set(re.findall(r"@(\w+)", self.queries[query_name])) == {"start_date", "end_date"}
+            and runs(query_name) and self._multi_period_sql(query_name, time_periods) is not None
+        ]
+        
+        agency_query_names = set(agency_queries)
+        graph = QueryGraph(
+            lambda query_name, params: self._warm_batched_multi_period(query_name, agency_ids, time_periods)
+            if query_name in agency_query_names else self.execute_query_multi_period(query_name, time_periods)
+        )
+        for query_name in agency_queries + period_queries:
+            graph.add_query(query_name)
+        graph.run()
+        
+        logger.info(f"Warmed {len(agency_queries) + len(period_queries)} queries for {len(agency_ids)} agencies and periods {time_periods}")
+        return agency_queries + period_queries
+    
     def get_all_agencies(self) -> List[Dict[str, Any]]:
         """
         Get a list of all agencies
@@ -158,6 +614,8 @@ class QueryManager:
         Returns:
             list: List of dictionaries with agency information
         """
+        if get_settings().bigquery_agency_dimension:
+            return get_agency_dimension().list_agencies()
         return self.execute_query("GET_ALL_AGENCIES")
     
     def get_agency_details(self, agency_id: str) -> Dict[str, Any]:
@@ -170,6 +628,8 @@ class QueryManager:
         Returns:
             dict: Dictionary with agency details
         """
+        if get_settings().bigquery_agency_dimension:
+            return get_agency_dimension().get(agency_id) or {}
         results = self.execute_query("GET_AGENCY_DETAILS", {"agency_id": agency_id})
         return results[0] if results else {}
     
@@ -197,6 +657,78 @@ class QueryManager:
         
         return posting_results[0] if posting_results else {"posting_count": 0}
     
+    # Predefined time periods answered together by multi-period queries
+    MULTI_PERIODS = ("last_month", "last_quarter", "last_year", "all_time")
+    
+    # Named queries read by each composite metric. All of them take
+    # agency_id/start_date/end_date except GET_TOTAL_POSTINGS (date range only).
+    RESERVATION_METRIC_QUERIES = ("GET_UNIQUE_POSTING_RESERVATIONS", "GET_AGENCY_RESERVATIONS", "GET_TOTAL_POSTINGS")
+    FULFILLMENT_RATE_QUERIES = ("GET_AGENCY_RESERVATIONS", "GET_FULFILLED_RESERVATIONS")
+    WITHDRAWAL_RATE_QUERIES = ("GET_AGENCY_RESERVATIONS", "GET_WITHDRAWN_RESERVATIONS")
+    PENDING_RATE_QUERIES = ("GET_AGENCY_RESERVATIONS", "GET_PENDING_RESERVATIONS")
+    ARRIVAL_METRIC_QUERIES = (
+        # Gesamt (alle Einsätze)
+        "GET_FULFILLED_RESERVATIONS", "GET_PV_COUNT", "GET_ACCEPTED_CARE_STAYS",
+        "GET_CONFIRMED_CARE_STAYS", "GET_SIMPLE_ARRIVED_ALL_CARE_STAYS",
+        # Nur Ersteinsätze (is_swap = false)
+        "GET_FULFILLED_RESERVATIONS_FIRST_STAYS", "GET_PV_FIRST_COUNT", "GET_ACCEPTED_FIRST_CARE_STAYS",
+        "GET_CONFIRMED_FIRST_CARE_STAYS", "GET_SIMPLE_ARRIVED_FIRST_CARE_STAYS",
+        # Nur Folgeeinsätze (is_swap = true), ohne Reservierungen
+        "GET_PV_FOLLOW_COUNT", "GET_ACCEPTED_FOLLOW_CARE_STAYS",
+        "GET_CONFIRMED_FOLLOW_CARE_STAYS", "GET_SIMPLE_ARRIVED_FOLLOW_CARE_STAYS"
+    )
+    CANCELLATION_RATE_QUERIES = ("GET_PERSONNEL_PROPOSALS", "GET_CANCELLED_BEFORE_ARRIVAL")
+    COMPLETION_RATE_QUERIES = ("GET_STARTED_CARE_STAYS", "GET_COMPLETED_CARE_STAYS")
+    
+    def _add_metric_queries(self, graph: QueryGraph, query_names, agency_id: str, start_date: str, end_date: str) -> List[str]:
+        """
+        Declare the input queries of a composite metric as graph nodes
+        
+        Args:
+            graph (QueryGraph): The graph to add the nodes to
+            query_names (iterable): Names of the queries to declare
+            agency_id (str): The ID of the agency
+            start_date (str): Start date in 'YYYY-MM-DD' format
+            end_date (str): End date in 'YYYY-MM-DD' format
+            
+        Returns:
+            list: The declared node names
+        """
+        use_fused = get_settings().bigquery_fused_metrics
+        nodes = []
+        for query_name in query_names:
+            params = {"start_date": start_date, "end_date": end_date}
+            if query_name != "GET_TOTAL_POSTINGS":
+                params = {"agency_id": agency_id, **params}
+            
+            if use_fused and query_name in self.fused_queries:
+                # Read the metric from the fused query that shares its scan
+                fused_name, alias, group_columns = self.fused_queries[query_name]
+                fused_node = graph.add_query(fused_name, params)
+                if query_name not in graph:
+                    graph.add_derived(
+                        query_name,
+                        lambda inputs, fused_node=fused_node, alias=alias, group_columns=group_columns:
+                            split_fused_result(inputs[fused_node], alias, group_columns),
+                        depends_on=[fused_node]
+                    )
+                nodes.append(query_name)
+                continue
+            
+            nodes.append(graph.add_query(query_name, params))
+        return nodes
+    
+    def _run_metric_queries(self, query_names, agency_id: str, start_date: str, end_date: str) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Run the input queries of a single composite metric concurrently
+        
+        Returns:
+            dict: Query results keyed by query name
+        """
+        graph = QueryGraph(self.execute_query)
+        self._add_metric_queries(graph, query_names, agency_id, start_date, end_date)
+        return graph.run()
+    
     def get_agency_reservation_metrics(self, agency_id: str, start_date: str = None, end_date: str = None, time_period: str = "last_quarter") -> Dict[str, Any]:
         """
         Get reservation metrics for a specific agency
@@ -214,22 +746,22 @@ class QueryManager:
         if not start_date or not end_date:
             start_date, end_date = self._calculate_date_range(time_period)
         
-        # Get agency reservations with unique postings
-        reservation_results = self.execute_query("GET_UNIQUE_POSTING_RESERVATIONS", {
-            "agency_id": agency_id,
-            "start_date": start_date,
-            "end_date": end_date
-        })
+        results = self._run_metric_queries(self.RESERVATION_METRIC_QUERIES, agency_id, start_date, end_date)
+        return self._build_reservation_metrics(agency_id, results)
+    
+    def _build_reservation_metrics(self, agency_id: str, results: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Build the reservation metrics from the results of RESERVATION_METRIC_QUERIES
+        """
+        # Agency reservations with unique postings
+        reservation_results = results["GET_UNIQUE_POSTING_RESERVATIONS"]
         
-        # Also get total reservations for reference
-        total_reservation_results = self.execute_query("GET_AGENCY_RESERVATIONS", {
-            "agency_id": agency_id,
-            "start_date": start_date,
-            "end_date": end_date
-        })
+        # Also total reservations for reference
+        total_reservation_results = results["GET_AGENCY_RESERVATIONS"]
         
         # Calculate posting-to-reservation ratio
-        posting_metrics = self.get_posting_metrics(start_date, end_date)
+        posting_results = results["GET_TOTAL_POSTINGS"]
+        posting_metrics = posting_results[0] if posting_results else {"posting_count": 0}
         reserved_postings = reservation_results[0]["anzahl_reservierungen"] if reservation_results else 0
         total_reservation_count = total_reservation_results[0]["anzahl_reservierungen"] if total_reservation_results else 0
         posting_count = posting_metrics.get("posting_count", 0)
@@ -272,19 +804,15 @@ class QueryManager:
         if not start_date or not end_date:
             start_date, end_date = self._calculate_date_range(time_period)
         
-        # Get reservations for this agency
-        reservation_results = self.execute_query("GET_AGENCY_RESERVATIONS", {
-            "agency_id": agency_id,
-            "start_date": start_date,
-            "end_date": end_date
-        })
-        
-        # Get fulfilled reservations for this agency
-        fulfilled_results = self.execute_query("GET_FULFILLED_RESERVATIONS", {
-            "agency_id": agency_id,
-            "start_date": start_date,
-            "end_date": end_date
-        })
+        results = self._run_metric_queries(self.FULFILLMENT_RATE_QUERIES, agency_id, start_date, end_date)
+        return self._build_reservation_fulfillment_rate(agency_id, results)
+    
+    def _build_reservation_fulfillment_rate(self, agency_id: str, results: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Build the metric from the results of FULFILLMENT_RATE_QUERIES
+        """
+        reservation_results = results["GET_AGENCY_RESERVATIONS"]
+        fulfilled_results = results["GET_FULFILLED_RESERVATIONS"]
         
         # Calculate fulfillment rate
         reservation_count = reservation_results[0]["anzahl_reservierungen"] if reservation_results else 0
@@ -331,19 +859,15 @@ class QueryManager:
         if not start_date or not end_date:
             start_date, end_date = self._calculate_date_range(time_period)
         
-        # Get reservations for this agency
-        reservation_results = self.execute_query("GET_AGENCY_RESERVATIONS", {
-            "agency_id": agency_id,
-            "start_date": start_date,
-            "end_date": end_date
-        })
-        
-        # Get withdrawn reservations for this agency
-        withdrawn_results = self.execute_query("GET_WITHDRAWN_RESERVATIONS", {
-            "agency_id": agency_id,
-            "start_date": start_date,
-            "end_date": end_date
-        })
+        results = self._run_metric_queries(self.WITHDRAWAL_RATE_QUERIES, agency_id, start_date, end_date)
+        return self._build_withdrawal_rate(agency_id, results)
+    
+    def _build_withdrawal_rate(self, agency_id: str, results: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Build the metric from the results of WITHDRAWAL_RATE_QUERIES
+        """
+        reservation_results = results["GET_AGENCY_RESERVATIONS"]
+        withdrawn_results = results["GET_WITHDRAWN_RESERVATIONS"]
         
         # Calculate withdrawal rate
         reservation_count = reservation_results[0]["anzahl_reservierungen"] if reservation_results else 0
@@ -388,19 +912,15 @@ class QueryManager:
         if not start_date or not end_date:
             start_date, end_date = self._calculate_date_range(time_period)
         
-        # Get reservations for this agency
-        reservation_results = self.execute_query("GET_AGENCY_RESERVATIONS", {
-            "agency_id": agency_id,
-            "start_date": start_date,
-            "end_date": end_date
-        })
-        
-        # Get pending reservations for this agency
-        pending_results = self.execute_query("GET_PENDING_RESERVATIONS", {
-            "agency_id": agency_id,
-            "start_date": start_date,
-            "end_date": end_date
-        })
+        results = self._run_metric_queries(self.PENDING_RATE_QUERIES, agency_id, start_date, end_date)
+        return self._build_pending_rate(agency_id, results)
+    
+    def _build_pending_rate(self, agency_id: str, results: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Build the metric from the results of PENDING_RATE_QUERIES
+        """
+        reservation_results = results["GET_AGENCY_RESERVATIONS"]
+        pending_results = results["GET_PENDING_RESERVATIONS"]
         
         # Calculate pending rate
         reservation_count = reservation_results[0]["anzahl_reservierungen"] if reservation_results else 0
@@ -445,36 +965,37 @@ class QueryManager:
         if not start_date or not end_date:
             start_date, end_date = self._calculate_date_range(time_period)
         
-        params = {
-            "agency_id": agency_id,
-            "start_date": start_date,
-            "end_date": end_date
-        }
-        
-        # Get counts for each stage - Gesamt (alle Einsätze)
+        results = self._run_metric_queries(self.ARRIVAL_METRIC_QUERIES, agency_id, start_date, end_date)
+        return self._build_arrival_metrics(agency_id, results)
+    
+    def _build_arrival_metrics(self, agency_id: str, results: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Build the arrival metrics from the results of ARRIVAL_METRIC_QUERIES
+        """
+        # Counts for each stage - Gesamt (alle Einsätze)
         # Bisherig: Erfüllte Reservierungen
-        reservation_fulfillment_results = self.execute_query("GET_FULFILLED_RESERVATIONS", params)
+        reservation_fulfillment_results = results["GET_FULFILLED_RESERVATIONS"]
         # Neu: Personalvorschläge (alle Care Stays)
-        pv_results_total = self.execute_query("GET_PV_COUNT", params)
-        accepted_results_total = self.execute_query("GET_ACCEPTED_CARE_STAYS", params)
-        confirmed_results_total = self.execute_query("GET_CONFIRMED_CARE_STAYS", params)
-        arrived_results_total = self.execute_query("GET_SIMPLE_ARRIVED_ALL_CARE_STAYS", params)
+        pv_results_total = results["GET_PV_COUNT"]
+        accepted_results_total = results["GET_ACCEPTED_CARE_STAYS"]
+        confirmed_results_total = results["GET_CONFIRMED_CARE_STAYS"]
+        arrived_results_total = results["GET_SIMPLE_ARRIVED_ALL_CARE_STAYS"]
         
-        # Get counts for each stage - Nur Ersteinsätze (is_swap = false)
+        # Counts for each stage - Nur Ersteinsätze (is_swap = false)
         # Bisherig: Erfüllte Reservierungen für Ersteinsätze
-        reservation_fulfillment_first = self.execute_query("GET_FULFILLED_RESERVATIONS_FIRST_STAYS", params)
+        reservation_fulfillment_first = results["GET_FULFILLED_RESERVATIONS_FIRST_STAYS"]
         # Neu: Personalvorschläge für Ersteinsätze
-        pv_results_first = self.execute_query("GET_PV_FIRST_COUNT", params)
-        accepted_results_first = self.execute_query("GET_ACCEPTED_FIRST_CARE_STAYS", params)
-        confirmed_results_first = self.execute_query("GET_CONFIRMED_FIRST_CARE_STAYS", params)
-        arrived_results_first = self.execute_query("GET_SIMPLE_ARRIVED_FIRST_CARE_STAYS", params)
+        pv_results_first = results["GET_PV_FIRST_COUNT"]
+        accepted_results_first = results["GET_ACCEPTED_FIRST_CARE_STAYS"]
+        confirmed_results_first = results["GET_CONFIRMED_FIRST_CARE_STAYS"]
+        arrived_results_first = results["GET_SIMPLE_ARRIVED_FIRST_CARE_STAYS"]
         
-        # Get counts for each stage - Nur Folgeeinsätze (is_swap = true)
+        # Counts for each stage - Nur Folgeeinsätze (is_swap = true)
         # Bei Folgeeinsätzen gibt es keine Reservierungen, daher nur PV, accepted, confirmed, arrived
-        pv_results_follow = self.execute_query("GET_PV_FOLLOW_COUNT", params)
-        accepted_results_follow = self.execute_query("GET_ACCEPTED_FOLLOW_CARE_STAYS", params)
-        confirmed_results_follow = self.execute_query("GET_CONFIRMED_FOLLOW_CARE_STAYS", params)
-        arrived_results_follow = self.execute_query("GET_SIMPLE_ARRIVED_FOLLOW_CARE_STAYS", params)
+        pv_results_follow = results["GET_PV_FOLLOW_COUNT"]
+        accepted_results_follow = results["GET_ACCEPTED_FOLLOW_CARE_STAYS"]
+        confirmed_results_follow = results["GET_CONFIRMED_FOLLOW_CARE_STAYS"]
+        arrived_results_follow = results["GET_SIMPLE_ARRIVED_FOLLOW_CARE_STAYS"]
         
         # Extrahiere Anzahlen - Gesamt
         reservation_fulfillment_count = reservation_fulfillment_results[0]["fulfilled_reservations_count"] if reservation_fulfillment_results else 0
@@ -593,19 +1114,15 @@ class QueryManager:
         if not start_date or not end_date:
             start_date, end_date = self._calculate_date_range(time_period)
         
-        # Get personnel proposals for this agency
-        proposal_results = self.execute_query("GET_PERSONNEL_PROPOSALS", {
-            "agency_id": agency_id,
-            "start_date": start_date,
-            "end_date": end_date
-        })
-        
-        # Get cancelled before arrival for this agency
-        cancelled_results = self.execute_query("GET_CANCELLED_BEFORE_ARRIVAL", {
-            "agency_id": agency_id,
-            "start_date": start_date,
-            "end_date": end_date
-        })
+        results = self._run_metric_queries(self.CANCELLATION_RATE_QUERIES, agency_id, start_date, end_date)
+        return self._build_cancellation_before_arrival_rate(agency_id, results)
+    
+    def _build_cancellation_before_arrival_rate(self, agency_id: str, results: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Build the metric from the results of CANCELLATION_RATE_QUERIES
+        """
+        proposal_results = results["GET_PERSONNEL_PROPOSALS"]
+        cancelled_results = results["GET_CANCELLED_BEFORE_ARRIVAL"]
         
         # Calculate relative ratios for each bucket
         def fmt_ratio(val, total):
@@ -668,19 +1185,15 @@ class QueryManager:
         if not start_date or not end_date:
             start_date, end_date = self._calculate_date_range(time_period)
         
-        # Get started care stays for this agency
-        started_results = self.execute_query("GET_STARTED_CARE_STAYS", {
-            "agency_id": agency_id,
-            "start_date": start_date,
-            "end_date": end_date
-        })
-        
-        # Get completed care stays for this agency
-        completed_results = self.execute_query("GET_COMPLETED_CARE_STAYS", {
-            "agency_id": agency_id,
-            "start_date": start_date,
-            "end_date": end_date
-        })
+        results = self._run_metric_queries(self.COMPLETION_RATE_QUERIES, agency_id, start_date, end_date)
+        return self._build_completion_rate(agency_id, results)
+    
+    def _build_completion_rate(self, agency_id: str, results: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Build the metric from the results of COMPLETION_RATE_QUERIES
+        """
+        started_results = results["GET_STARTED_CARE_STAYS"]
+        completed_results = results["GET_COMPLETED_CARE_STAYS"]
         
         # Calculate completion rate
         started_count = started_results[0]["successfully_started_care_stays_count"] if started_results else 0
@@ -722,21 +1235,32 @@ class QueryManager:
         """
         if not start_date or not end_date:
             start_date, end_date = self._calculate_date_range(time_period)
-            
-        # Get reservation rate
-        reservation_metrics = self.get_agency_reservation_metrics(agency_id, start_date, end_date, time_period)
         
-        # Get reservation fulfillment rate
-        reservation_fulfillment_metrics = self.get_reservation_fulfillment_rate(agency_id, start_date, end_date, time_period)
+        # Declare all input queries in one graph. Queries shared between the
+        # metrics (e.g. GET_AGENCY_RESERVATIONS, GET_FULFILLED_RESERVATIONS)
+        # run once and independent queries run concurrently.
+        graph = QueryGraph(self.execute_query)
+        metric_builders = {
+            "reservation": (self.RESERVATION_METRIC_QUERIES, self._build_reservation_metrics),
+            "reservation_fulfillment": (self.FULFILLMENT_RATE_QUERIES, self._build_reservation_fulfillment_rate),
+            "cancellation": (self.CANCELLATION_RATE_QUERIES, self._build_cancellation_before_arrival_rate),
+            "completion": (self.COMPLETION_RATE_QUERIES, self._build_completion_rate),
+            "arrival": (self.ARRIVAL_METRIC_QUERIES, self._build_arrival_metrics)
+        }
+        for metric, (query_names, builder) in metric_builders.items():
+            nodes = self._add_metric_queries(graph, query_names, agency_id, start_date, end_date)
+            graph.add_derived(metric, lambda inputs, builder=builder: builder(agency_id, inputs), depends_on=nodes)
         
-        # Get cancellation before arrival rate
-        cancellation_metrics = self.get_cancellation_before_arrival_rate(agency_id, start_date, end_date, time_period)
+        results = graph.run()
+        reservation_metrics = results["reservation"]
+        reservation_fulfillment_metrics = results["reservation_fulfillment"]
+        cancellation_metrics = results["cancellation"]
+        completion_metrics = results["completion"]
+        arrival_metrics = results["arrival"]
         
-        # Get completion rate
-        completion_metrics = self.get_completion_rate(agency_id, start_date, end_date, time_period)
-
-        # Get posting metrics to get the total number of postings
-        posting_metrics = self.get_posting_metrics(start_date, end_date)
+        # Posting metrics to get the total number of postings
+        posting_results = results["GET_TOTAL_POSTINGS"]
+        posting_metrics = posting_results[0] if posting_results else {"posting_count": 0}
         
         # Simplified structure - no need to calculate data for all agencies 
         # since not used actively in frontend
@@ -758,9 +1282,6 @@ class QueryManager:
             "total_reservation_count": 0,
             "total_postings": posting_metrics.get("posting_count", 0)
         }
-        
-        # Get arrival metrics for selected agency
-        arrival_metrics = self.get_arrival_metrics(agency_id, start_date, end_date, time_period)
 
         # Compile and return all results
         return {
@@ -820,6 +1341,36 @@ class QueryManager:
         
         return start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
 
+    # --- Methods for Reaction Time Stats of an Agency ---
+
+    def get_posting_to_reservation_stats(self, agency_id: str, start_date: str, end_date: str) -> dict:
+        params = {"agency_id": agency_id, "start_date": start_date, "end_date": end_date}
+        results = self.execute_query("TIME_POSTING_TO_RESERVATION_STATS", params)
+        return results[0] if results else {"median_hours": None, "avg_hours": None}
+
+    def get_reservation_to_first_proposal_stats(self, agency_id: str, start_date: str, end_date: str) -> dict:
+        params = {"agency_id": agency_id, "start_date": start_date, "end_date": end_date}
+        results = self.execute_query("TIME_RESERVATION_TO_FIRST_PROPOSAL_STATS", params)
+        return results[0] if results else {"median_hours": None, "avg_hours": None}
+
+    def get_proposal_to_cancellation_stats(self, agency_id: str, start_date: str, end_date: str) -> dict:
+        params = {"agency_id": agency_id, "start_date": start_date, "end_date": end_date}
+        results = self.execute_query("TIME_PROPOSAL_TO_CANCELLATION_STATS", params)
+        return results[0] if results else {"median_hours": None, "avg_hours": None}
+
+    def get_arrival_to_cancellation_stats(self, agency_id: str, start_date: str, end_date: str) -> dict:
+        params = {"agency_id": agency_id, "start_date": start_date, "end_date": end_date}
+        results = self.execute_query("TIME_ARRIVAL_TO_CANCELLATION_STATS", params)
+        stats = {"overall": None, "first_stays": None, "followup_stays": None}
+        for row in results:
+            group = row.get("group_type")
+            if group in stats:
+                stats[group] = {
+                    "median_hours": row["median_hours"],
+                    "avg_hours": row["avg_hours"]
+                }
+        return stats
+
     # --- Methods for Overall Reaction Time Stats --- 
 
     def get_overall_posting_to_reservation_stats(self, start_date: str = None, end_date: str = None, time_period: str = "last_quarter") -> dict:
@@ -0,0 +1,207 @@
+"""
+In-process metrics for BigQuery queries.
+BigQueryConnection records wall time, queue time, slot time, bytes processed
+and BigQuery's cache_hit flag of every job per query name, as well as how
+results were downloaded. The metrics are rendered in the Prometheus text
+exposition format at /api/metrics.
+"""
+
+from typing import Dict, List, Any, Optional, Tuple
+from datetime import datetime
+import bisect
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bucket upper bounds per histogram (the +Inf bucket is implicit)
+SECONDS_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120]
+SLOT_MS_BUCKETS = [10, 100, 1_000, 10_000, 60_000, 300_000, 1_800_000, 3_600_000]
+BYTES_BUCKETS = [10 * 1024 ** 2, 100 * 1024 ** 2, 1024 ** 3, 10 * 1024 ** 3, 100 * 1024 ** 3, 1024 ** 4]
+THROUGHPUT_BUCKETS = [256 * 1024, 1024 ** 2, 5 * 1024 ** 2, 10 * 1024 ** 2, 25 * 1024 ** 2, 50 * 1024 ** 2, 100 * 1024 ** 2, 250 * 1024 ** 2]
+
+HISTOGRAMS = {
+    "bigquery_query_wall_seconds": ("Wall time from job submission to result, per query", SECONDS_BUCKETS),
+    "bigquery_query_queue_seconds": ("Time a job waited between creation and start, per query", SECONDS_BUCKETS),
+    "bigquery_query_slot_milliseconds": ("Slot milliseconds consumed by a job, per query", SLOT_MS_BUCKETS),
+    "bigquery_query_bytes_processed": ("Bytes processed by a job, per query", BYTES_BUCKETS),
+    "bigquery_admission_wait_seconds": ("Time a job waited for an admission slot, per priority class", SECONDS_BUCKETS),
+    "bigquery_result_download_seconds": ("Time to download and decode a result, per query and download path", SECONDS_BUCKETS),
+    "bigquery_result_download_bytes_per_second": ("Result download throughput (Arrow bytes), per download path", THROUGHPUT_BUCKETS),
+}
+
+COUNTERS = {
+    "bigquery_queries_total": "BigQuery jobs per query and BigQuery cache_hit flag",
+    "bigquery_query_errors_total": "Failed BigQuery jobs per query",
+    "query_result_cache_lookups_total": "In-process query result cache lookups per query and outcome",
+    "bigquery_result_rows_total": "Result rows downloaded per download path (rest or storage_api)",
+}
+
+
+class _Histogram:
+    def __init__(self, buckets: List[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _number(value: Any) -> Optional[float]:
+    """Job statistics are None (or missing) until BigQuery reports them."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class QueryMetrics:
+    """
+    Thread-safe registry of per-query histograms and counters.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # metric name -> label tuple -> histogram
+        self._histograms: Dict[str, Dict[Tuple, _Histogram]] = {name: {} for name in HISTOGRAMS}
+        # metric name -> label tuple -> count
+        self._counters: Dict[str, Dict[Tuple, int]] = {name: {} for name in COUNTERS}
+
+    def _observe(self, metric: str, labels: Tuple, value: Optional[float]) -> None:
+        if value is None:
+            return
+        series = self._histograms[metric]
+        histogram = series.get(labels)
+        if histogram is None:
+            histogram = series[labels] = _Histogram(HISTOGRAMS[metric][1])
+        histogram.observe(value)
+
+    def _increment(self, metric: str, labels: Tuple, amount: int = 1) -> None:
+        series = self._counters[metric]
+        series[labels] = series.get(labels, 0) + amount
+
+    def observe_job(self, query_label: str, wall_seconds: float, job: Any) -> None:
+        """
+        Record a finished BigQuery job.
+
+        Args:
+            query_label: Query name (or SQL hash for unnamed queries)
+            wall_seconds: Time from submission until the result was available
+            job: The finished QueryJob, read for its statistics
+        """
+        queue_seconds = None
+        created, started = getattr(job, "created", None), getattr(job, "started", None)
+        if isinstance(created, datetime) and isinstance(started, datetime):
+            queue_seconds = max(0.0, (started - created).total_seconds())
+
+        cache_hit = getattr(job, "cache_hit", None)
+        labels = (("query", query_label),)
+
+        with self._lock:
+            self._observe("bigquery_query_wall_seconds", labels, wall_seconds)
+            self._observe("bigquery_query_queue_seconds", labels, queue_seconds)
+            if not cache_hit:
+                # Cached results consume no slots and process no bytes
+                self._observe("bigquery_query_slot_milliseconds", labels, _number(getattr(job, "slot_millis", None)))
+                self._observe("bigquery_query_bytes_processed", labels, _number(getattr(job, "total_bytes_processed", None)))
+            self._increment("bigquery_queries_total", labels + (("cache_hit", "true" if cache_hit is True else "false"),))
+
+    def observe_admission_wait(self, priority_name: str, wait_seconds: float) -> None:
+        """Record how long a job waited for the admission controller."""
+        with self._lock:
+            self._observe("bigquery_admission_wait_seconds", (("priority", priority_name),), wait_seconds)
+
+    def observe_download(self, query_label: str, path: str, rows: int, nbytes: int, seconds: float) -> None:
+        """
+        Record a result download.
+
+        Args:
+            query_label: Query name (or SQL hash for unnamed queries)
+            path: "storage_api" or "rest"
+            rows: Downloaded rows
+            nbytes: Size of the downloaded Arrow table
+            seconds: Download and decode time
+        """
+        with self._lock:
+            self._observe("bigquery_result_download_seconds", (("query", query_label), ("path", path)), seconds)
+            if seconds > 0 and nbytes:
+                self._observe("bigquery_result_download_bytes_per_second", (("path", path),), nbytes / seconds)
+            self._increment("bigquery_result_rows_total", (("path", path),), rows)
+
+    def observe_error(self, query_label: str) -> None:
+        """Record a failed BigQuery job."""
+        with self._lock:
+            self._increment("bigquery_query_errors_total", (("query", query_label),))
+
+    def observe_result_cache(self, query_label: str, hit: bool) -> None:
+        """Record a lookup in the in-process query result cache."""
+        with self._lock:
+            self._increment("query_result_cache_lookups_total", (("query", query_label), ("outcome", "hit" if hit else "miss")))
+
+    def reset(self) -> None:
+        """Drop all recorded values."""
+        with self._lock:
+            for series in self._histograms.values():
+                series.clear()
+            for series in self._counters.values():
+                series.clear()
+
+    def render_prometheus(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: Exposition text (version 0.0.4)
+        """
+        def label_text(labels: Tuple, extra: Tuple = ()) -> str:
+            pairs = labels + extra
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            for name, (help_text, buckets) in HISTOGRAMS.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{label_text(labels, (('le', _format_value(bound)),))} {cumulative}")
+                    lines.append(f"{name}_bucket{label_text(labels, (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{label_text(labels)} {_format_value(histogram.sum)}")
+                    lines.append(f"{name}_count{label_text(labels)} {histogram.count}")
+
+            for name, help_text in COUNTERS.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, count in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{label_text(labels)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Global metrics instance
+_query_metrics: Optional[QueryMetrics] = None
+_query_metrics_lock = threading.Lock()
+
+def get_query_metrics() -> QueryMetrics:
+    """Get the global query metrics instance."""
+    global _query_metrics
+    if _query_metrics is None:
+        with _query_metrics_lock:
+            if _query_metrics is None:
+                _query_metrics = QueryMetrics()
+    return _query_metrics
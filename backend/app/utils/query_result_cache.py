@@ -0,0 +1,202 @@
+"""
+Process-wide result cache for BigQuery queries.
+Sits below cache_endpoint: different endpoints (and different requests)
+issuing the same query with the same parameters share one result. Entries
+expire after a per-query TTL and the least recently used entries are evicted
+once the entry or memory limit is reached.
+"""
+
+from typing import Dict, List, Any, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import json
+import re
+import threading
+import time
+import logging
+
+from ..dependencies import get_settings
+
+logger = logging.getLogger(__name__)
+
+# TTLs in seconds for named queries whose data changes slower or faster than the default
+QUERY_TTL_OVERRIDES: Dict[str, int] = {
+    "GET_ALL_AGENCIES": 6 * 3600,
+    "GET_AGENCY_DETAILS": 6 * 3600,
+}
+
+
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace so formatting differences do not change the key."""
+    return re.sub(r"\s+", " ", query).strip()
+
+
+def sql_hash(query: str) -> str:
+    """SHA256 of the normalized SQL text; identifies a query independent of its name."""
+    return hashlib.sha256(normalize_sql(query).encode()).hexdigest()
+
+
+def make_cache_key(query: str, params: Optional[Dict[str, Any]] = None, query_name: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Build the cache key for a query.
+
+    Args:
+        query: SQL text (hashed when no name is given)
+        params: Query parameters
+        query_name: Name of a registered query
+
+    Returns:
+        tuple: (query name or "sql:<hash>", canonical JSON of the params)
+    """
+    if query_name:
+        name = query_name
+    else:
+        name = "sql:" + sql_hash(query)[:16]
+    canonical_params = json.dumps(params or {}, sort_keys=True, default=str)
+    return name, canonical_params
+
+
+class QueryResultCache:
+    """
+    Thread-safe LRU + TTL cache of query results (lists of row dictionaries).
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, default_ttl_seconds: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl_seconds = default_ttl_seconds
+
+        self._lock = threading.Lock()
+        # key -> (expires_at, size_bytes, rows)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, int, List[Dict[str, Any]]]]" = OrderedDict()
+        self._size_bytes = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._rejected = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Look up a result.
+
+        Returns:
+            A copy of the cached rows, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            expires_at, size_bytes, rows = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._size_bytes -= size_bytes
+                self._expirations += 1
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+
+        # Callers may modify the rows they get back
+        return [dict(row) for row in rows]
+
+    def put(self, key: Tuple[str, str], rows: List[Dict[str, Any]], ttl_seconds: Optional[int] = None) -> None:
+        """
+        Store a result, evicting least recently used entries as needed.
+        """
+        if ttl_seconds is None:
+            ttl_seconds = QUERY_TTL_OVERRIDES.get(key[0], self.default_ttl_seconds)
+        if ttl_seconds <= 0:
+            return
+
+        try:
+            size_bytes = len(json.dumps(rows, default=str))
+        except (TypeError, ValueError):
+            return
+
+        if size_bytes > self.max_bytes:
+            # A single result larger than the whole cache would evict everything
+            with self._lock:
+                self._rejected += 1
+            return
+
+        stored_rows = [dict(row) for row in rows]
+        expires_at = time.monotonic() + ttl_seconds
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size_bytes -= previous[1]
+
+            self._entries[key] = (expires_at, size_bytes, stored_rows)
+            self._size_bytes += size_bytes
+
+            while self._entries and (len(self._entries) > self.max_entries or self._size_bytes > self.max_bytes):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._size_bytes -= evicted_size
+                self._evictions += 1
+
+    def purge_expired(self) -> int:
+        """
+        Remove all expired entries.
+
+        Returns:
+            Number of removed entries
+        """
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (expires_at, _, _) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                _, size_bytes, _ = self._entries.pop(key)
+                self._size_bytes -= size_bytes
+            self._expirations += len(expired)
+        return len(expired)
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss/eviction counters and memory usage for monitoring.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "size_mb": round(self._size_bytes / (1024 * 1024), 2),
+                "max_size_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "default_ttl_seconds": self.default_ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "rejected_oversized": self._rejected
+            }
+
+
+# Global cache instance
+_query_result_cache: Optional[QueryResultCache] = None
+_query_result_cache_lock = threading.Lock()
+
+def get_query_result_cache() -> QueryResultCache:
+    """Get the global query result cache instance."""
+    global _query_result_cache
+    if _query_result_cache is None:
+        with _query_result_cache_lock:
+            if _query_result_cache is None:
+                settings = get_settings()
+                _query_result_cache = QueryResultCache(
+                    max_entries=settings.query_result_cache_max_entries,
+                    max_bytes=settings.query_result_cache_max_mb * 1024 * 1024,
+                    default_ttl_seconds=settings.query_result_cache_ttl_seconds
+                )
+    return _query_result_cache
@@ -0,0 +1,163 @@
+"""
+In-process memory tier of the endpoint response cache.
+Sits in front of the SQLite cache of DatabaseCacheService: responses are
+kept decoded, so a hit needs neither a database session nor JSON decoding.
+Entries are written through on save and filled on SQLite hits; they expire
+with the SQLite entry, but at the latest after a short TTL so writes of other
+worker processes become visible. The least recently used entries are evicted
+once the entry or memory limit is reached.
+"""
+
+from typing import Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import threading
+import logging
+
+from ..dependencies import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseMemoryCache:
+    """
+    Thread-safe LRU cache of decoded responses by cache key.
+    Returned responses are shared between requests and must not be modified.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: int):
+        """
+        Args:
+            max_entries: Maximum number of responses kept (0 = disabled)
+            max_bytes: Maximum total size of the responses' JSON
+            ttl_seconds: Maximum time a response is served without consulting SQLite
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        # cache key -> (expires_at (UTC), size_bytes, query fingerprint, data)
+        self._entries: "OrderedDict[str, Tuple[datetime, int, Optional[str], Any]]" = OrderedDict()
+        self._size_bytes = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._rejected = 0
+
+    def get(self, cache_key: str) -> Optional[Tuple[Any, Optional[str]]]:
+        """
+        Look up a response.
+
+        Returns:
+            Tuple of the data and its query fingerprint, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            expires_at, size_bytes, fingerprint, data = entry
+            if expires_at <= datetime.utcnow():
+                del self._entries[cache_key]
+                self._size_bytes -= size_bytes
+                self._expirations += 1
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(cache_key)
+            self._hits += 1
+            return data, fingerprint
+
+    def put(self, cache_key: str, data: Any, size_bytes: int, expires_at: Optional[datetime], fingerprint: Optional[str] = None) -> None:
+        """
+        Store a response, evicting least recently used entries as needed.
+
+        Args:
+            cache_key: Cache key of the response
+            data: The decoded response
+            size_bytes: Size of its JSON encoding
+            expires_at: Expiry of the SQLite entry (UTC, None = no expiry)
+            fingerprint: Query fingerprint of the SQLite entry
+        """
+        if self.max_entries <= 0:
+            return
+
+        now = datetime.utcnow()
+        max_expires_at = now + timedelta(seconds=self.ttl_seconds)
+        expires_at = min(expires_at, max_expires_at) if expires_at else max_expires_at
+        if expires_at <= now:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(cache_key, None)
+            if previous is not None:
+                self._size_bytes -= previous[1]
+
+            if size_bytes > self.max_bytes:
+                # A single response larger than the whole tier would evict everything
+                self._rejected += 1
+                return
+
+            self._entries[cache_key] = (expires_at, size_bytes, fingerprint, data)
+            self._size_bytes += size_bytes
+
+            while self._entries and (len(self._entries) > self.max_entries or self._size_bytes > self.max_bytes):
+                _, (_, evicted_size, _, _) = self._entries.popitem(last=False)
+                self._size_bytes -= evicted_size
+                self._evictions += 1
+
+    def invalidate(self, cache_key: str) -> None:
+        """Drop a response, e.g. one the fingerprint registry found to be outdated."""
+        with self._lock:
+            entry = self._entries.pop(cache_key, None)
+            if entry is not None:
+                self._size_bytes -= entry[1]
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss/eviction counters and memory usage for monitoring.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "size_mb": round(self._size_bytes / (1024 * 1024), 2),
+                "max_size_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "rejected_oversized": self._rejected
+            }
+
+
+# Global cache instance
+_response_memory_cache: Optional[ResponseMemoryCache] = None
+_response_memory_cache_lock = threading.Lock()
+
+def get_response_memory_cache() -> ResponseMemoryCache:
+    """Get the global response memory cache instance."""
+    global _response_memory_cache
+    if _response_memory_cache is None:
+        with _response_memory_cache_lock:
+            if _response_memory_cache is None:
+                settings = get_settings()
+                _response_memory_cache = ResponseMemoryCache(
+                    max_entries=settings.response_memory_cache_max_entries,
+                    max_bytes=settings.response_memory_cache_max_mb * 1024 * 1024,
+                    ttl_seconds=settings.response_memory_cache_ttl_seconds
+                )
+    return _response_memory_cache
@@ -0,0 +1,231 @@
+"""
+Shadow execution of alternative query paths.
+For a sampled fraction of named queries, QueryManager runs the plain
+BigQuery query (the reference) and each faster path that could answer it
+(fused, batched, multi-period and agency-dimension variants) in the
+background. The results are diffed row by row and the latencies compared;
+the report is served at /api/cache/shadow-report. Shadow jobs bypass
+BigQuery's query cache and never attach to the request's own job, so the
+latencies are those of real runs.
+"""
+
+from typing import Dict, List, Any, Optional, Callable
+from collections import deque
+import contextvars
+import json
+import random
+import threading
+import logging
+import time
+
+from ..dependencies import get_settings
+from .admission_control import query_priority, PRIORITY_COMPREHENSIVE_PRELOAD
+from .bigquery_connection import get_query_executor
+from .job_labels import job_labels
+from .query_fingerprint import recording_queries
+
+logger = logging.getLogger(__name__)
+
+# Significant digits floats are compared with (aggregates may be summed in a different order)
+_FLOAT_DIGITS = 9
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, float):
+        return float(f"{value:.{_FLOAT_DIGITS}g}")
+    if isinstance(value, dict):
+        return {key: _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    return value
+
+
+def diff_rows(expected: List[Dict[str, Any]], actual: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Compare two query results independent of row order.
+
+    Args:
+        expected: Rows of the reference path
+        actual: Rows of the path under test
+
+    Returns:
+        None if the results are identical, otherwise the first difference
+    """
+    if len(expected) != len(actual):
+        return {"reason": "row_count", "expected": len(expected), "actual": len(actual)}
+    expected_keys = sorted(json.dumps(_canonical(row), sort_keys=True, default=str) for row in expected)
+    actual_keys = sorted(json.dumps(_canonical(row), sort_keys=True, default=str) for row in actual)
+    for expected_row, actual_row in zip(expected_keys, actual_keys):
+        if expected_row != actual_row:
+            return {"reason": "row_mismatch", "expected": json.loads(expected_row), "actual": json.loads(actual_row)}
+    return None
+
+
+class _PathStats:
+    def __init__(self):
+        self.runs = 0
+        self.mismatches = 0
+        self.errors = 0
+        self.faster_runs = 0
+        self.reference_seconds = 0.0
+        self.path_seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        compared = self.runs - self.errors
+        return {
+            "runs": self.runs,
+            "mismatches": self.mismatches,
+            "errors": self.errors,
+            "faster_runs": self.faster_runs,
+            "reference_seconds_mean": round(self.reference_seconds / compared, 3) if compared else None,
+            "path_seconds_mean": round(self.path_seconds / compared, 3) if compared else None,
+            "latency_delta_seconds_mean": round((self.path_seconds - self.reference_seconds) / compared, 3) if compared else None
+        }
+
+
+class ShadowRunner:
+    """
+    Samples queries, runs their paths in the background and collects the comparison.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, max_pending: int = 2, max_mismatches: int = 50):
+        """
+        Args:
+            sample_rate: Fraction of queries that are shadowed (0 = off)
+            max_pending: Shadow runs in progress at once; further samples are dropped
+            max_mismatches: Number of recent mismatches kept for the report
+        """
+        self.sample_rate = sample_rate
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._dropped = 0
+        self._stats: Dict[str, Dict[str, _PathStats]] = {}  # query name -> path -> stats
+        self._mismatches: deque = deque(maxlen=max_mismatches)
+
+    def sample(self) -> bool:
+        """Decide whether the current query is shadowed."""
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def submit(self, query_name: str, params: Optional[Dict[str, Any]], reference: Callable[[], List[Dict[str, Any]]],
+               paths: Dict[str, Callable[[], List[Dict[str, Any]]]]) -> bool:
+        """
+        Run the reference and the alternative paths of a query in the background.
+
+        Args:
+            query_name: Name of the query
+            params: Its parameters (for the mismatch report)
+            reference: Runs the plain BigQuery query
+            paths: Path name -> callable running the alternative path
+
+        Returns:
+            Whether the shadow run was started
+        """
+        if not paths:
+            return False
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._dropped += 1
+                return False
+            self._pending += 1
+
+        def run():
+            # Shadow jobs use preload capacity and must not end up in the response's fingerprint
+            try:
+                with query_priority(PRIORITY_COMPREHENSIVE_PRELOAD), job_labels(shadow="true"), recording_queries():
+                    self._compare(query_name, params, reference, paths)
+            except Exception as e:
+                logger.warning(f"[SHADOW] Reference run of {query_name} failed: {e}")
+            finally:
+                with self._lock:
+                    self._pending -= 1
+
+        try:
+            get_query_executor(background=True).submit(contextvars.copy_context().run, run)
+        except Exception as e:
+            logger.error(f"[SHADOW] Could not start shadow run of {query_name}: {e}")
+            with self._lock:
+                self._pending -= 1
+            return False
+        return True
+
+    def _compare(self, query_name: str, params: Optional[Dict[str, Any]], reference: Callable, paths: Dict[str, Callable]) -> None:
+        started = time.perf_counter()
+        expected = reference()
+        reference_seconds = time.perf_counter() - started
+
+        for path, run_path in paths.items():
+            error = None
+            started = time.perf_counter()
+            try:
+                difference = diff_rows(expected, run_path())
+            except Exception as e:
+                error = e
+                difference = None
+            path_seconds = time.perf_counter() - started
+
+            with self._lock:
+                stats = self._stats.setdefault(query_name, {}).setdefault(path, _PathStats())
+                stats.runs += 1
+                if error is not None:
+                    stats.errors += 1
+                    continue
+                stats.reference_seconds += reference_seconds
+                stats.path_seconds += path_seconds
+                if path_seconds < reference_seconds:
+                    stats.faster_runs += 1
+                if difference:
+                    stats.mismatches += 1
+                    self._mismatches.append({
+                        "query": query_name,
+                        "path": path,
+                        "params": {key: str(value) for key, value in (params or {}).items()},
+                        "at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                        **difference
+                    })
+
+            if error is not None:
+                logger.warning(f"[SHADOW] {query_name} via {path} failed: {error}")
+            elif difference:
+                logger.warning(f"[SHADOW] {query_name} via {path} differs from BigQuery: {difference['reason']}")
+
+    def get_report(self) -> Dict[str, Any]:
+        """
+        Get per-query and per-path comparison results and the recent mismatches.
+        """
+        with self._lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "pending": self._pending,
+                "dropped_samples": self._dropped,
+                "queries": {
+                    query_name: {path: stats.as_dict() for path, stats in sorted(paths.items())}
+                    for query_name, paths in sorted(self._stats.items())
+                },
+                "recent_mismatches": list(self._mismatches)
+            }
+
+    def reset(self) -> None:
+        """Drop all collected results."""
+        with self._lock:
+            self._stats.clear()
+            self._mismatches.clear()
+            self._dropped = 0
+
+
+# Global shadow runner instance
+_shadow_runner: Optional[ShadowRunner] = None
+_shadow_runner_lock = threading.Lock()
+
+def get_shadow_runner() -> ShadowRunner:
+    """Get the global shadow runner instance."""
+    global _shadow_runner
+    if _shadow_runner is None:
+        with _shadow_runner_lock:
+            if _shadow_runner is None:
+                settings = get_settings()
+                _shadow_runner = ShadowRunner(
+                    sample_rate=settings.bigquery_shadow_sample_rate,
+                    max_pending=settings.bigquery_shadow_max_pending
+                )
+    return _shadow_runner
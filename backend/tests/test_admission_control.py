@@ -0,0 +1,44 @@
+import threading
+import time
+from app.utils.admission_control import (
+    AdmissionController, PRIORITY_INTERACTIVE, PRIORITY_DASHBOARD_PRELOAD, PRIORITY_COMPREHENSIVE_PRELOAD
+)
+
+
+def test_reserved_slots_and_priority_order():
+    """Background jobs leave the reserved slot free; queued jobs are admitted by priority"""
+    controller = AdmissionController(max_concurrent=2, interactive_reserve=1)
+    controller.acquire(PRIORITY_COMPREHENSIVE_PRELOAD)
+
+    # The second slot is reserved, so an interactive job still gets in immediately
+    assert controller.acquire(PRIORITY_INTERACTIVE) < 0.1
+
+    admitted = []
+
+    def job(priority):
+        controller.acquire(priority)
+        admitted.append(priority)
+
+    waiters = []
+    for priority in (PRIORITY_COMPREHENSIVE_PRELOAD, PRIORITY_DASHBOARD_PRELOAD):
+        thread = threading.Thread(target=job, args=(priority,))
+        thread.start()
+        waiters.append(thread)
+        time.sleep(0.05)
+    assert admitted == []
+    assert controller.get_stats()["waiting"] == {"interactive": 0, "dashboard_preload": 1, "comprehensive_preload": 1}
+
+    # Freeing the interactive slot admits nobody: it is reserved
+    controller.release()
+    time.sleep(0.05)
+    assert admitted == []
+
+    # Freeing the background slot admits the dashboard preload before the comprehensive one
+    controller.release()
+    time.sleep(0.05)
+    assert admitted == [PRIORITY_DASHBOARD_PRELOAD]
+
+    controller.release()
+    for thread in waiters:
+        thread.join(timeout=1)
+    assert admitted == [PRIORITY_DASHBOARD_PRELOAD, PRIORITY_COMPREHENSIVE_PRELOAD]
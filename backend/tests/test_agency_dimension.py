@@ -0,0 +1,56 @@
+from app.utils.agency_dimension import AgencyDimension, drop_agency_join, drop_agency_join_relation
+from app.utils.query_batching import derive_batched_query, BATCH_AGENCY_COLUMN
+
+
+def test_agency_join_is_dropped_from_name_only_queries():
+    """A join used only for the agency name is replaced by grouping on the agency ID"""
+    sql = drop_agency_join("""
+        SELECT COUNT(*) AS cnt, a.name AS agency_name
+        FROM `p.d.contracts` c
+        JOIN `p.d.agencies` a ON c.agency_id = a._id
+        WHERE a._id = @agency_id AND c.created_at BETWEEN @start_date AND @end_date
+        GROUP BY a.name
+    """)
+
+    normalized = " ".join(sql.split())
+    assert "agencies" not in sql and "agency_name" not in sql
+    assert "WHERE c.agency_id = @agency_id" in normalized
+    assert normalized.endswith("GROUP BY c.agency_id")
+
+    # The batched variant still works on the rewritten query
+    batched = derive_batched_query(sql)
+    assert f"c.agency_id AS {BATCH_AGENCY_COLUMN}" in batched.sql
+    assert "GROUP BY c.agency_id" in " ".join(batched.sql.split())
+
+    # Other columns of the agencies table keep the join
+    assert drop_agency_join(
+        "SELECT a.name AS agency_name, a.active FROM `p.d.contracts` c "
+        "JOIN `p.d.agencies` a ON c.agency_id = a._id WHERE a._id = @agency_id GROUP BY a.name, a.active"
+    ) is None
+
+
+def test_fused_relation_groups_by_agency_id():
+    relation = drop_agency_join_relation({
+        "from": "`p.d.contracts` c JOIN `p.d.agencies` a ON c.agency_id = a._id",
+        "where": "a._id = @agency_id",
+        "group_by": {"agency_name": "a.name"}
+    }, [{"alias": "cnt", "expression": "COUNT(*)"}])
+
+    assert relation == {
+        "from": "`p.d.contracts` c",
+        "where": "c.agency_id = @agency_id",
+        "group_by": {"agency_id": "c.agency_id"}
+    }
+
+
+def test_rows_are_enriched_with_agency_names():
+    dimension = AgencyDimension()
+    dimension._agencies = {"a1": {"agency_id": "a1", "agency_name": "One"}, "a2": {"agency_id": "a2", "agency_name": "Two"}}
+    dimension._loaded_at = float("inf")
+    rows = [{"cnt": 3}, {"cnt": 4, "agency_id": "a2"}]
+
+    assert dimension.with_agency_names(rows, "a1") == [
+        {"cnt": 3, "agency_name": "One"},
+        {"cnt": 4, "agency_id": "a2", "agency_name": "Two"},
+    ]
+    assert rows[0] == {"cnt": 3}
@@ -0,0 +1,40 @@
+from unittest.mock import patch, MagicMock
+from app.utils.bigquery_client_registry import BigQueryClientRegistry
+
+
+@patch("app.utils.bigquery_client_registry.bigquery.Client.from_service_account_json")
+def test_client_is_created_once_and_reused(mock_from_json):
+    """The registry resolves credentials once and hands out the same client"""
+    mock_client = MagicMock()
+    mock_from_json.return_value = mock_client
+    registry = BigQueryClientRegistry()
+
+    with patch.object(BigQueryClientRegistry, "_candidate_credential_paths", return_value=["/tmp/creds.json"]):
+        first = registry.get_client()
+        second = registry.get_client()
+        third = registry.get_client()
+
+    assert first is mock_client
+    assert second is mock_client and third is mock_client
+    assert mock_from_json.call_count == 1
+
+    stats = registry.get_stats()
+    assert stats["client_ready"] is True
+    assert stats["clients_created"] == 1
+    assert stats["reuse_count"] == 2
+    assert stats["credentials_path"] == "/tmp/creds.json"
+
+
+@patch("app.utils.bigquery_client_registry.bigquery.Client.from_service_account_json")
+def test_failed_setup_is_retried(mock_from_json):
+    """A failed credential lookup is not cached, so the next call tries again"""
+    mock_from_json.side_effect = [FileNotFoundError(), MagicMock()]
+    registry = BigQueryClientRegistry()
+
+    with patch.object(BigQueryClientRegistry, "_candidate_credential_paths", return_value=["/tmp/creds.json"]):
+        assert registry.warm_up() is False
+        assert registry.warm_up() is True
+
+    stats = registry.get_stats()
+    assert stats["failed_setups"] == 1
+    assert stats["clients_created"] == 1
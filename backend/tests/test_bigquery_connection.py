@@ -0,0 +1,216 @@
+import asyncio
+import time
+from datetime import datetime, date, timezone
+from unittest.mock import patch, MagicMock
+import pyarrow as pa
+from app.utils.bigquery_connection import BigQueryConnection
+from app.utils.query_result_cache import get_query_result_cache
+
+
+def _make_connection(rows, delay=0.0):
+    """Build a BigQueryConnection whose client returns the given rows after a delay"""
+    def slow_result(**kwargs):
+        time.sleep(delay)
+        result = MagicMock()
+        result.to_arrow.return_value = pa.Table.from_pylist(rows) if rows else pa.table({})
+        return result
+
+    job = MagicMock()
+    job.result.side_effect = slow_result
+    client = MagicMock()
+    client.query.return_value = job
+
+    # Results of other tests must not be served from the shared result cache
+    get_query_result_cache().clear()
+
+    with patch("app.utils.bigquery_connection.get_bigquery_client", return_value=client):
+        return BigQueryConnection()
+
+
+def test_execute_query_async_returns_rows():
+    """The async path returns the same dictionaries as execute_query"""
+    connection = _make_connection([{"agency_id": "a1", "count": 3}])
+    rows = asyncio.run(connection.execute_query_async("SELECT 1", {"agency_id": "a1"}))
+    assert rows == [{"agency_id": "a1", "count": 3}]
+
+
+def test_execute_query_async_does_not_block_event_loop():
+    """Other coroutines keep running while a slow BigQuery job is awaited"""
+    connection = _make_connection([{"value": 1}], delay=0.3)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker_task = asyncio.create_task(ticker())
+        await connection.execute_query_async("SELECT 1")
+        ticker_task.cancel()
+        return ticks
+
+    assert asyncio.run(scenario()) >= 10
+
+
+def test_execute_query_converts_temporal_columns_like_isoformat():
+    """Columnar decoding yields the same strings as datetime.isoformat()"""
+    rows = [
+        {"created_at": datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc), "day": date(2025, 1, 2), "count": 1},
+        {"created_at": datetime(2025, 1, 2, 3, 4, 5, 120, tzinfo=timezone.utc), "day": None, "count": None}
+    ]
+    connection = _make_connection(rows)
+    expected = [
+        {key: (value.isoformat() if hasattr(value, "isoformat") else value) for key, value in row.items()}
+        for row in rows
+    ]
+    assert connection.execute_query("SELECT 1") == expected
+
+    lazy_rows = connection.execute_query_rows("SELECT 1")
+    assert len(lazy_rows) == 2
+    assert lazy_rows[-1]["created_at"] == "2025-01-02T03:04:05.000120+00:00"
+    assert lazy_rows == expected
+
+
+def test_stream_query_pages_yields_one_page_per_batch():
+    """Streaming hands out converted pages in result order"""
+    connection = _make_connection([])
+    batches = [
+        pa.RecordBatch.from_pylist([{"day": date(2025, 3, 1)}, {"day": date(2025, 2, 1)}]),
+        pa.RecordBatch.from_pylist([{"day": date(2025, 1, 1)}])
+    ]
+    connection.client.query.return_value.result.side_effect = None
+    connection.client.query.return_value.result.return_value.to_arrow_iterable.return_value = iter(batches)
+
+    async def collect():
+        return [page async for page in connection.stream_query_pages("SELECT 1", page_size=2)]
+
+    assert asyncio.run(collect()) == [[{"day": "2025-03-01"}, {"day": "2025-02-01"}], [{"day": "2025-01-01"}]]
+    connection.client.query.return_value.result.assert_called_with(page_size=2)
+
+
+def test_execute_query_serves_repeated_queries_from_result_cache():
+    """Identical queries from different connections only run one BigQuery job"""
+    connection = _make_connection([{"value": 1}])
+    assert connection.execute_query("SELECT @a", {"a": 1}) == [{"value": 1}]
+    assert connection.execute_query("SELECT  @a", {"a": 1}) == [{"value": 1}]
+    assert connection.client.query.call_count == 1
+
+
+def test_deterministic_job_id_attaches_to_existing_job():
+    """A conflicting job ID makes the connection reuse the job that is already running"""
+    from google.api_core.exceptions import Conflict
+    from app.utils.bigquery_connection import deterministic_job_id
+
+    assert deterministic_job_id("SELECT  @a", {"a": 1}, 300) == deterministic_job_id("SELECT @a", {"a": 1}, 300)
+    assert deterministic_job_id("SELECT @a", {"a": 1}, 300) != deterministic_job_id("SELECT @a", {"a": 2}, 300)
+    assert deterministic_job_id("SELECT @a", {"a": 1}, 300, "BATCH") != deterministic_job_id("SELECT @a", {"a": 1}, 300)
+
+    connection = _make_connection([])
+    connection.settings = MagicMock(bigquery_deterministic_job_ids=True, bigquery_job_id_bucket_seconds=300, bigquery_storage_api_enabled=False)
+    existing_job = MagicMock(state="RUNNING", error_result=None)
+    existing_job.result.return_value.to_arrow.return_value = pa.Table.from_pylist([{"value": 7}])
+    connection.client.query.side_effect = Conflict("Already Exists: Job")
+    connection.client.get_job.return_value = existing_job
+
+    assert connection._fetch_rows("SELECT @a", {"a": 1}) == [{"value": 7}]
+    job_id = connection.client.query.call_args.kwargs["job_id"]
+    assert connection.client.get_job.call_args.args[0] == job_id
+
+    # Shadow runs measure a real run: their own job, without BigQuery's query cache
+    connection.client.query.side_effect = None
+    connection.client.query.return_value = existing_job
+    assert connection._fetch_rows("SELECT @a", {"a": 1}, shadow=True) == [{"value": 7}]
+    assert "job_id" not in connection.client.query.call_args.kwargs
+    assert connection.client.query.call_args.kwargs["job_config"].use_query_cache is False
+
+
+def test_named_query_is_submitted_with_its_byte_limit():
+    """Jobs carry the profiled maximum_bytes_billed of their query; dry runs are not limited"""
+    from app.utils.bytes_billed_guard import get_bytes_billed_guard
+
+    connection = _make_connection([{"value": 1}])
+    connection.client.query.return_value.total_bytes_processed = 4096
+    guard = get_bytes_billed_guard()
+    guard.set_limits({"GET_LIMITED": 10_000_000}, {})
+    try:
+        connection.execute_query("SELECT 1", query_name="GET_LIMITED")
+        job_config = connection.client.query.call_args.kwargs["job_config"]
+        assert job_config.maximum_bytes_billed == 10_000_000
+
+        assert connection.dry_run("SELECT 1") == 4096
+        dry_run_config = connection.client.query.call_args.kwargs["job_config"]
+        assert dry_run_config.dry_run is True
+        assert dry_run_config.maximum_bytes_billed is None
+    finally:
+        guard.set_limits({}, {})
+
+
+def test_preload_jobs_run_with_batch_priority_and_labels():
+    """Jobs of preload requests are submitted as BATCH and carry the request's labels"""
+    from google.cloud import bigquery
+    from app.utils.admission_control import query_priority, PRIORITY_COMPREHENSIVE_PRELOAD
+    from app.utils.job_labels import job_labels
+
+    connection = _make_connection([{"value": 1}])
+    with query_priority(PRIORITY_COMPREHENSIVE_PRELOAD), \
+            job_labels(endpoint="/quotas/all", agency_id="A1B2", time_period="last_quarter", preload_session="comprehensive_execution_20240101"):
+        connection.execute_query("SELECT 1")
+    job_config = connection.client.query.call_args.kwargs["job_config"]
+    assert job_config.priority == bigquery.QueryPriority.BATCH
+    assert job_config.labels == {
+        "endpoint": "quotas_all",
+        "agency_id": "a1b2",
+        "time_period": "last_quarter",
+        "preload_session": "comprehensive_execution_20240101",
+        "request_priority": "comprehensive_preload"
+    }
+
+    connection.execute_query("SELECT 2")
+    job_config = connection.client.query.call_args.kwargs["job_config"]
+    assert job_config.priority is None
+    assert job_config.labels == {"request_priority": "interactive"}
+
+
+def test_large_results_are_downloaded_through_the_storage_api():
+    """Results above the row threshold are read with the Storage Read API client"""
+    from app.utils.bigquery_client_registry import get_client_registry
+
+    connection = _make_connection([{"value": 1}])
+    results = MagicMock(total_rows=50_000, schema=[MagicMock()])
+    results.to_arrow.return_value = pa.Table.from_pylist([{"value": 1}])
+    storage_client = MagicMock()
+
+    with patch.object(get_client_registry(), "get_storage_client", return_value=storage_client):
+        connection._decode_results(results, "GET_DETAILS")
+        assert results.to_arrow.call_args.kwargs["bqstorage_client"] is storage_client
+
+        results.total_rows = 10
+        connection._decode_results(results, "GET_DETAILS")
+        assert results.to_arrow.call_args.kwargs["bqstorage_client"] is None
+
+
+def test_derived_multi_period_job_is_capped_at_the_scaled_base_limit():
+    """Unprofiled "<query>@<variant>" jobs get the base query's limit times the runs they replace"""
+    from app.utils.bytes_billed_guard import get_bytes_billed_guard
+
+    connection = _make_connection([{"value": 1}])
+    guard = get_bytes_billed_guard()
+    guard.set_limits({"GET_LIMITED": 10_000_000}, {})
+    try:
+        connection._fetch_rows("SELECT 1", query_name="GET_LIMITED@MULTI_PERIOD", scan_scale=4)
+        job_config = connection.client.query.call_args.kwargs["job_config"]
+        assert job_config.maximum_bytes_billed == 40_000_000
+    finally:
+        guard.set_limits({}, {})
+
+
+def test_slow_threshold_uses_job_run_time_not_queue_time():
+    """A BATCH job that queued for long but ran quickly is not reported as slow"""
+    from app.utils.bigquery_connection import job_run_seconds
+
+    job = MagicMock(started=datetime(2025, 1, 1, 12, 0, 5), ended=datetime(2025, 1, 1, 12, 0, 8))
+    assert job_run_seconds(job, wall_seconds=600.0) == 3.0
+    assert job_run_seconds(MagicMock(started=None, ended=None), wall_seconds=4.5) == 4.5
@@ -0,0 +1,146 @@
+import asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
+from app.utils.cache_decorator import cache_endpoint, get_single_flight_stats
+
+
+def _cache_service():
+    service = MagicMock()
+    service.get_cached_data = AsyncMock(return_value=None)
+    service.save_cached_data = AsyncMock(return_value=True)
+    return service
+
+
+def test_concurrent_misses_share_one_fetch():
+    """Concurrent requests for the same key wait for the first request's fetch"""
+    calls = []
+
+    @cache_endpoint(ttl_hours=1, key_params=["agency_id"], cache_key_prefix="/test/single-flight")
+    async def endpoint(agency_id: str):
+        calls.append(agency_id)
+        await asyncio.sleep(0.1)
+        return {"agency_id": agency_id}
+
+    service = _cache_service()
+    with patch("app.utils.cache_decorator.get_cache_service", return_value=service):
+        async def scenario():
+            return await asyncio.gather(*[endpoint("a1") for _ in range(5)], endpoint("a2"))
+        results = asyncio.run(scenario())
+
+    assert results == [{"agency_id": "a1"}] * 5 + [{"agency_id": "a2"}]
+    assert sorted(calls) == ["a1", "a2"]
+    assert service.save_cached_data.await_count == 2
+    assert get_single_flight_stats()["in_flight"] == 0
+
+
+def test_fetch_errors_reach_all_waiting_requests():
+    """Every coalesced request sees the error of the shared fetch"""
+    @cache_endpoint(ttl_hours=1, key_params=["agency_id"], cache_key_prefix="/test/single-flight-error")
+    async def endpoint(agency_id: str):
+        await asyncio.sleep(0.05)
+        raise ValueError("BigQuery unavailable")
+
+    service = _cache_service()
+    with patch("app.utils.cache_decorator.get_cache_service", return_value=service):
+        async def scenario():
+            return await asyncio.gather(*[endpoint("a1") for _ in range(3)], return_exceptions=True)
+        results = asyncio.run(scenario())
+
+    assert all(isinstance(result, ValueError) for result in results)
+    service.save_cached_data.assert_not_awaited()
+
+
+def test_open_circuit_is_answered_with_stale_entry():
+    """A fetch rejected by an open circuit returns the expired entry flagged as stale"""
+    from datetime import datetime, timedelta
+    from fastapi import HTTPException
+    from app.utils.cache_decorator import tracking_stale_responses
+    from app.utils.circuit_breaker import CircuitOpenError
+
+    @cache_endpoint(ttl_hours=1, key_params=["agency_id"], cache_key_prefix="/test/stale")
+    async def endpoint(agency_id: str):
+        try:
+            raise CircuitOpenError("quotas", 30)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+    service = _cache_service()
+    now = datetime.utcnow()
+    service.get_stale_data = AsyncMock(return_value=({"quota": 0.5}, now - timedelta(hours=2), now - timedelta(hours=1)))
+    with patch("app.utils.cache_decorator.get_cache_service", return_value=service):
+        async def scenario():
+            with tracking_stale_responses() as stale:
+                return await endpoint("a1"), stale
+        result, stale = asyncio.run(scenario())
+
+    assert result["quota"] == 0.5
+    assert 7100 < result["_stale"]["age_seconds"] < 7300
+    assert stale["age_seconds"] == result["_stale"]["age_seconds"]
+    service.save_cached_data.assert_not_awaited()
+
+
+def test_expired_entry_is_served_while_it_is_refreshed():
+    """Within the revalidation window the expired entry is returned at once and refreshed by one background fetch"""
+    from datetime import datetime, timedelta
+    from app.utils.cache_decorator import tracking_stale_responses
+
+    calls = []
+
+    @cache_endpoint(ttl_hours=1, key_params=["agency_id"], cache_key_prefix="/test/revalidate", stale_while_revalidate_hours=2)
+    async def endpoint(agency_id: str):
+        calls.append(agency_id)
+        await asyncio.sleep(0.05)
+        return {"quota": 0.75}
+
+    service = _cache_service()
+    now = datetime.utcnow()
+    service.get_stale_data = AsyncMock(return_value=({"quota": 0.5}, now - timedelta(hours=2), now - timedelta(hours=1)))
+    with patch("app.utils.cache_decorator.get_cache_service", return_value=service):
+        async def scenario():
+            with tracking_stale_responses() as stale:
+                results = await asyncio.gather(*[endpoint("a1") for _ in range(3)])
+            await asyncio.sleep(0.1)
+            return results, stale
+        results, stale = asyncio.run(scenario())
+
+    assert [result["quota"] for result in results] == [0.5] * 3
+    assert 7100 < stale["age_seconds"] < 7300
+    assert calls == ["a1"]
+    assert service.save_cached_data.await_args.kwargs["data"] == {"quota": 0.75}
+
+    # The window follows the expiry the entry was stored with, not the endpoint's current TTL
+    service.get_stale_data = AsyncMock(return_value=({"quota": 0.5}, now - timedelta(hours=4), now - timedelta(hours=1)))
+    with patch("app.utils.cache_decorator.get_cache_service", return_value=service):
+        assert asyncio.run(endpoint("a1"))["quota"] == 0.5
+
+    # Entries that expired before the window are refetched while the request waits
+    service.get_stale_data = AsyncMock(return_value=({"quota": 0.5}, now - timedelta(hours=4), now - timedelta(hours=3)))
+    with patch("app.utils.cache_decorator.get_cache_service", return_value=service):
+        assert asyncio.run(endpoint("a1")) == {"quota": 0.75}
+
+
+def test_expiry_follows_freshness_policy():
+    """Without ttl_hours the entry expires by the policy for the data type and time period"""
+    @cache_endpoint(key_params=["time_period"], cache_key_prefix="/problematic-stays/test-policy")
+    async def endpoint(time_period: str = "all_time"):
+        return {"time_period": time_period}
+
+    @cache_endpoint(ttl_hours=6, key_params=["time_period"], cache_key_prefix="/quotas/test-policy")
+    async def overridden(time_period: str = "all_time"):
+        return {"time_period": time_period}
+
+    service = _cache_service()
+    with patch("app.utils.cache_decorator.get_cache_service", return_value=service):
+        asyncio.run(endpoint())
+        assert service.save_cached_data.await_args.kwargs["expires_hours"] == 168
+        asyncio.run(endpoint("last_month"))
+        assert service.save_cached_data.await_args.kwargs["expires_hours"] == 24
+        asyncio.run(overridden())
+        assert service.save_cached_data.await_args.kwargs["expires_hours"] == 6
+
+
+def test_care_stays_follow_their_freshness_rules():
+    """Care stays endpoints map to the care_stays freshness rules"""
+    from app.services.database_cache_service import get_ttl_hours
+
+    assert get_ttl_hours("/care_stays/confirmed", "last_quarter") == 48
+    assert get_ttl_hours("/care_stays/confirmed", "current_month") == 4
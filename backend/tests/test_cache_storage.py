@@ -0,0 +1,40 @@
+import zlib
+from app.models.database import CachedData
+from app.utils.database_connection import DatabaseManager
+
+
+def test_compressed_payload_round_trip():
+    """Compressed entries return the same data as JSON entries, hashed over the stored bytes"""
+    data = {"agency_id": "a1", "quota": 0.25, "rows": [{"id": i} for i in range(100)]}
+    entry = CachedData()
+    encoded = entry.set_data(data, "zlib")
+
+    assert entry.data == "" and entry.storage_format == "zlib"
+    assert zlib.decompress(entry.payload).decode() == encoded
+    assert entry.get_data() == data
+
+    entry.set_data(data, "json")
+    assert entry.payload is None and entry.storage_format is None
+    assert entry.get_data() == data
+
+
+def test_existing_entries_are_migrated(tmp_path):
+    """Entries stored as JSON text are rewritten in the configured format"""
+    db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'cache.db'}")
+    db_manager.create_tables()
+    with db_manager.get_sync_session() as session:
+        for index in range(3):
+            entry = CachedData(cache_key=f"/quotas?agency_id={index}", endpoint="/quotas")
+            entry.set_data({"index": index})
+            if index == 0:
+                entry.data_hash = None  # Legacy entries were stored without a hash
+            session.add(entry)
+        session.commit()
+
+    assert db_manager.migrate_cached_data_storage("zlib", batch_size=2) == 3
+    assert db_manager.migrate_cached_data_storage("zlib") == 0
+    with db_manager.get_sync_session() as session:
+        entries = session.query(CachedData).order_by(CachedData.id).all()
+        assert [entry.storage_format for entry in entries] == ["zlib"] * 3
+        assert [entry.get_data() for entry in entries] == [{"index": index} for index in range(3)]
+    db_manager.sync_engine.dispose()
@@ -0,0 +1,58 @@
+import asyncio
+from unittest.mock import patch
+from app.models.database import CachedData, DataFreshness
+from app.services.cache_writer import CacheWriter
+from app.utils.database_connection import DatabaseManager
+
+
+def test_repeated_saves_are_coalesced_into_upserts(tmp_path):
+    """Only the latest save of a key is written; existing rows and freshness rows are updated in place"""
+    db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'cache.db'}")
+    db_manager.create_tables()
+    writer = CacheWriter()
+
+    def save(cache_key, value, agency_id=None):
+        writer.enqueue(cache_key, {"value": value}, "/quotas", agency_id, None, None, 1, False, None, "quotas")
+
+    async def scenario():
+        for value in range(3):
+            save("/quotas?agency_id=a1", value, "a1")
+        save("/quotas", 0)
+        assert writer.get_pending("/quotas?agency_id=a1")["data"] == {"value": 2}
+        assert await writer.flush()
+        save("/quotas", 1)
+        assert await writer.flush()
+
+    with patch("app.services.cache_writer.get_database_manager", return_value=db_manager):
+        asyncio.run(scenario())
+
+    with db_manager.get_sync_session() as session:
+        entries = {entry.cache_key: entry.get_data() for entry in session.query(CachedData).all()}
+        assert entries == {"/quotas?agency_id=a1": {"value": 2}, "/quotas": {"value": 1}}
+        assert sorted((row.agency_id or "") for row in session.query(DataFreshness).all()) == ["", "a1"]
+
+    stats = writer.get_stats()
+    assert stats["coalesced"] == 2
+    assert stats["written_entries"] == 3
+    assert stats["queue_depth"] == 0
+    db_manager.sync_engine.dispose()
+
+
+def test_dropped_batch_is_not_served_from_memory():
+    """Entries reach the memory tier only once committed; a batch that fails every attempt is not served"""
+    from unittest.mock import AsyncMock
+    from app.utils.response_memory_cache import ResponseMemoryCache
+
+    writer = CacheWriter(max_attempts=1)
+    memory_cache = ResponseMemoryCache(max_entries=10, max_bytes=1024 * 1024, ttl_seconds=60)
+
+    async def scenario():
+        writer.enqueue("/quotas", {"value": 1}, "/quotas", None, None, None, 1, False, None, "quotas")
+        assert await writer.flush()
+
+    with patch("app.services.cache_writer.get_response_memory_cache", return_value=memory_cache), \
+            patch.object(writer, "_execute", AsyncMock(side_effect=RuntimeError("database is locked"))):
+        asyncio.run(scenario())
+
+    assert memory_cache.get("/quotas") is None
+    assert writer.get_stats()["failed_entries"] == 1
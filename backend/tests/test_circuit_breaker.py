@@ -0,0 +1,45 @@
+import pytest
+from google.api_core.exceptions import BadRequest, ServiceUnavailable
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError, is_availability_error
+
+
+def test_circuit_opens_probes_and_closes():
+    """Consecutive failures open the circuit; after the open time one job probes and closes it"""
+    breaker = CircuitBreaker(failure_threshold=2, slow_seconds=10, open_seconds=0)
+
+    breaker.record_failure("quotas", "ServiceUnavailable")
+    assert breaker.check("quotas")
+    breaker.record_success("quotas", 11)  # slow jobs count as failures
+    assert breaker.get_stats()["open_circuits"] == ["quotas"]
+
+    # The first job after the open time becomes the probe, others are rejected meanwhile
+    assert breaker.check("quotas") is False
+    with pytest.raises(CircuitOpenError):
+        breaker.check("quotas")
+    assert breaker.check("other_query")
+
+    breaker.record_success("quotas", 1)
+    assert breaker.check("quotas")
+    assert breaker.get_stats()["circuits"]["quotas"]["times_opened"] == 1
+
+
+def test_failed_probe_keeps_circuit_open():
+    """A failed probe reopens the circuit for another open period"""
+    breaker = CircuitBreaker(failure_threshold=1, slow_seconds=10, open_seconds=60)
+    breaker.record_failure("quotas", "timeout")
+    breaker._circuits["quotas"].opened_at -= 60
+
+    assert breaker.check("quotas") is False
+    breaker.record_failure("quotas", "timeout")
+    with pytest.raises(CircuitOpenError):
+        breaker.check("quotas")
+
+
+def test_query_errors_do_not_trip_the_circuit():
+    """Invalid SQL is an error of the query, not of BigQuery"""
+    assert not is_availability_error(BadRequest("Syntax error"))
+    assert is_availability_error(BadRequest("Too many", errors=[{"reason": "rateLimitExceeded"}]))
+    assert is_availability_error(ServiceUnavailable("backend down"))
+    assert is_availability_error(ConnectionResetError("connection reset"))
+    # Bugs in our own code (e.g. decoding the result) are not BigQuery outages
+    assert not is_availability_error(ValueError("could not convert"))
@@ -0,0 +1,111 @@
+from unittest.mock import patch, MagicMock
+from app.utils.metric_compiler import compile_fused_query, split_fused_result
+from app.utils.query_manager import QueryManager
+from app.utils.shadow_execution import diff_rows
+
+
+def test_compile_fused_query_emits_one_aggregate_per_metric():
+    """Each metric becomes one aggregate column over a single scan of the base relation"""
+    sql = compile_fused_query(
+        {"from": "`p.d.care_stays` cs", "where": "cs.created_at > @start_date", "group_by": {"agency_name": "a.name"}},
+        [
+            {"alias": "pv_count", "filter": "TRUE", "distinct": "cs._id"},
+            {"alias": "arrived_count", "filter": "cs.arrival IS NOT NULL"}
+        ]
+    )
+    assert sql.count("FROM\n        `p.d.care_stays` cs") == 1
+    assert "COUNT(DISTINCT IF(m_pv_count, d_0, NULL)) AS pv_count" in sql
+    assert "COUNTIF(m_arrived_count) AS arrived_count" in sql
+    assert "(cs.arrival IS NOT NULL) AS m_arrived_count" in sql
+
+
+def test_compile_multi_period_query_aggregates_each_period():
+    """Every metric is aggregated per period from the same scan and unpivoted to one row per period"""
+    sql = compile_fused_query(
+        {"from": "`p.d.care_stays` cs", "where": "a._id = @agency_id AND cs.created_at BETWEEN @start_date AND @end_date",
+         "group_by": {"agency_name": "a.name"}},
+        [{"alias": "pv_count", "filter": "TRUE", "distinct": "cs._id"}],
+        ["last_month", "all_time"]
+    )
+    assert sql.count("FROM\n        `p.d.care_stays` cs") == 1
+    assert "(cs.created_at BETWEEN @start_date_all_time AND @end_date_all_time) AS p_1" in sql
+    assert "COUNT(DISTINCT IF(m_pv_count AND p_0, d_0, NULL)) AS pv_count_0" in sql
+    assert "STRUCT('all_time' AS batch_time_period, rows_1 AS period_rows, pv_count_1 AS pv_count)" in sql
+    assert "@start_date " not in sql
+
+
+def test_split_fused_result_matches_single_query_shape():
+    """Groups without matches are dropped like a filtered GROUP BY would drop them"""
+    rows = [{"pv_count": 4, "arrived_count": 0, "agency_name": "Agentur A"}]
+    assert split_fused_result(rows, "pv_count", ["agency_name"]) == [{"pv_count": 4, "agency_name": "Agentur A"}]
+    assert split_fused_result(rows, "arrived_count", ["agency_name"]) == []
+
+
+def test_arrival_metrics_use_single_fused_scan():
+    """The twelve care stay counts of the arrival metrics are read from one query"""
+    with patch("app.utils.bigquery_connection.get_bigquery_client", return_value=MagicMock()):
+        manager = QueryManager()
+
+    fused_sql = manager.queries["GET_FUSED_CARE_STAY_COUNTS"]
+    executed = []
+
+    def execute(query, params=None, query_name=None):
+        executed.append(query)
+        if query == fused_sql:
+            return [{
+                "pv_count": 10, "pv_first_count": 6, "pv_follow_count": 4,
+                "accepted_care_stays_count": 8, "accepted_first_care_stays_count": 5, "accepted_follow_care_stays_count": 3,
+                "confirmed_care_stays_count": 6, "confirmed_first_care_stays_count": 4, "confirmed_follow_care_stays_count": 2,
+                "simple_arrived_all_care_stays_count": 5, "simple_arrived_first_care_stays_count": 3,
+                "simple_arrived_follow_care_stays_count": 2, "agency_name": "Agentur A"
+            }]
+        return []
+
+    manager.bq_connection.execute_query = execute
+    metrics = manager.get_arrival_metrics("a1", "2025-01-01", "2025-03-31")
+
+    assert executed.count(fused_sql) == 1
+    assert len(executed) == 3  # fused scan + two reservation queries
+    assert metrics["agency_name"] == "Agentur A"
+    assert metrics["total"]["pv_count"] == 10
+    assert metrics["first_stays"]["accepted_count"] == 5
+    assert metrics["follow_stays"]["arrived_count"] == 2
+    assert metrics["total"]["confirmed_to_arrival_ratio"] == 5 / 6
+
+
+def test_fused_query_is_shadowed_by_its_per_metric_queries():
+    """The shadow pair of the fused query compares it against the stand-alone metric queries"""
+    with patch("app.utils.bigquery_connection.get_bigquery_client", return_value=MagicMock()):
+        manager = QueryManager()
+
+    fused_sql = manager.queries["GET_FUSED_CARE_STAY_COUNTS"]
+    fused_row = {"agency_name": "Agentur A", "pv_count": 10, "confirmed_care_stays_count": 6}
+
+    def fetch_rows(sql, params, query_name=None, scan_scale=1, shadow=False):
+        assert shadow
+        if sql == fused_sql:
+            return [fused_row]
+        metric_query = query_name.split("@")[0]
+        alias = manager.fused_queries[metric_query][1]
+        return [{alias: fused_row[alias], "agency_name": "Agentur A"}] if fused_row.get(alias) else []
+
+    manager.bq_connection._fetch_rows = fetch_rows
+    reference, paths = manager._shadow_paths("GET_FUSED_CARE_STAY_COUNTS", {"agency_id": "a1"})
+
+    assert list(paths) == ["fused"]
+    assert len(reference()) == 2
+    assert diff_rows(reference(), paths["fused"]()) is None
+
+
+def test_fused_declarations_match_their_stand_alone_queries():
+    """Each fused metric declaration compiles to the hand-written query it replaces, so the two cannot drift apart"""
+    import re
+    from app.queries.quotas import quotas
+    from app.utils.metric_compiler import compile_metric_query
+
+    def normalized(sql):
+        return re.sub(r"\s+", " ", re.sub(r"--[^\n]*", "", sql)).strip()
+
+    for metric in quotas.CARE_STAYS_FUSED_METRICS:
+        compiled = compile_metric_query(quotas.CARE_STAYS_BASE_RELATION, metric)
+        assert normalized(compiled) == normalized(getattr(quotas, metric["query"])), metric["query"]
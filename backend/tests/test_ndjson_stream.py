@@ -0,0 +1,53 @@
+import asyncio
+import json
+from app.utils.ndjson_stream import month_grouped_events
+
+
+async def _pages(*pages):
+    for page in pages:
+        yield page
+
+
+def _collect(pages, **kwargs):
+    async def run():
+        return [json.loads(line) async for line in month_grouped_events(pages, **kwargs)]
+    return asyncio.run(run())
+
+
+def test_month_boundaries_are_emitted_as_they_are_crossed():
+    """Month groups open and close in result order, across page boundaries"""
+    pages = _pages(
+        [{"agency_name": "Agentur A", "cancelled_at": "2025-03-20T10:00:00+00:00"},
+         {"agency_name": "Agentur A", "cancelled_at": "2025-03-02T10:00:00+00:00"}],
+        [{"agency_name": "Agentur A", "cancelled_at": "2025-02-11T10:00:00+00:00"},
+         {"agency_name": "Agentur A", "cancelled_at": None}]
+    )
+    events = _collect(
+        pages,
+        format_row=lambda row: {"cancelled_at": row["cancelled_at"]},
+        month_field="cancelled_at",
+        items_key="cancellations",
+        header={"agency_id": "a1"}
+    )
+
+    assert [event["event"] for event in events] == [
+        "start", "month_start", "item", "item", "month_end", "month_start", "item", "month_end", "end"
+    ]
+    assert events[4] == {"event": "month_end", "month": "2025-03", "count": 2}
+    assert events[-1] == {"event": "end", "total_count": 4, "agency_name": "Agentur A"}
+
+
+def test_query_errors_are_reported_in_band():
+    """A failing page ends the stream with an error event instead of a broken response"""
+    async def failing_pages():
+        yield [{"cancelled_at": "2025-03-20T10:00:00+00:00"}]
+        raise RuntimeError("quota exceeded")
+
+    events = _collect(
+        failing_pages(),
+        format_row=lambda row: row,
+        month_field="cancelled_at",
+        items_key="cancellations",
+        header={}
+    )
+    assert events[-1] == {"event": "error", "detail": "quota exceeded"}
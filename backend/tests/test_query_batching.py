@@ -0,0 +1,149 @@
+from app.utils.query_batching import (
+    derive_batched_query, split_batched_result, BATCH_AGENCY_COLUMN,
+    derive_multi_period_query, derive_multi_period_pipeline, split_period_result, period_params, PERIOD_COLUMN
+)
+
+
+def test_derive_and_split_batched_query():
+    """A per-agency GROUP BY query is filtered on @agency_ids, grouped by agency and split back"""
+    batched = derive_batched_query("""
+        SELECT COUNT(*) AS cnt, a.name AS agency_name
+        FROM agencies a JOIN care_stays cs ON cs.agency_id = a._id
+        WHERE a._id = @agency_id AND cs.created_at BETWEEN @start_date AND @end_date
+        GROUP BY a.name
+    """)
+
+    assert "a._id IN UNNEST(@agency_ids)" in batched.sql
+    assert "@agency_id " not in batched.sql
+    assert f"a._id AS {BATCH_AGENCY_COLUMN}," in batched.sql
+    assert "GROUP BY a._id, a.name" in " ".join(batched.sql.split())
+
+    rows = [
+        {BATCH_AGENCY_COLUMN: "a1", "cnt": 3, "agency_name": "One"},
+        {BATCH_AGENCY_COLUMN: "a2", "cnt": 5, "agency_name": "Two"},
+    ]
+    assert split_batched_result(rows, ["a1", "a2", "a3"], batched) == {
+        "a1": [{"cnt": 3, "agency_name": "One"}],
+        "a2": [{"cnt": 5, "agency_name": "Two"}],
+        "a3": [],
+    }
+
+
+def test_unsupported_shapes_are_not_batched():
+    """Queries whose per-agency result cannot be recovered from a grouped scan keep running per agency"""
+    # No GROUP BY: a single-row lookup
+    assert derive_batched_query("SELECT * FROM agencies a WHERE a._id = @agency_id") is None
+    # A UNION of per-agency branches
+    assert derive_batched_query(
+        "SELECT x FROM t WHERE t.agency_id = @agency_id GROUP BY x UNION ALL SELECT y FROM u GROUP BY y"
+    ) is None
+    # Agency parameter used outside an equality filter
+    assert derive_batched_query(
+        "SELECT COUNT(*) FROM t WHERE t.agency_id = @agency_id OR @agency_id IS NULL GROUP BY t.x"
+    ) is None
+
+
+def test_multi_period_query_groups_by_period():
+    """The date filter is evaluated per period in one scan and the result is split per period"""
+    sql = derive_multi_period_query(
+        "SELECT COUNT(*) AS cnt, a.name AS agency_name FROM agencies a "
+        "WHERE a._id = @agency_id AND a.created_at BETWEEN @start_date AND @end_date GROUP BY a.name",
+        ["last_month", "last_year"]
+    )
+
+    assert f"CROSS JOIN UNNEST(['last_month', 'last_year']) AS {PERIOD_COLUMN}" in sql
+    assert "@start_date " not in sql
+    assert f"({PERIOD_COLUMN} = 'last_year' AND a.created_at BETWEEN @start_date_last_year AND @end_date_last_year)" in sql
+    assert f"GROUP BY {PERIOD_COLUMN}, a.name" in sql
+    assert period_params({"last_month": ("2025-01-01", "2025-02-01")}) == {
+        "start_date_last_month": "2025-01-01", "end_date_last_month": "2025-02-01"
+    }
+
+    rows = [{PERIOD_COLUMN: "last_year", "cnt": 7, "agency_name": "One"}]
+    assert split_period_result(rows, ["last_month", "last_year"]) == {
+        "last_month": [],
+        "last_year": [{"cnt": 7, "agency_name": "One"}],
+    }
+
+
+
+def test_multi_period_pipeline_carries_the_period_through_ctes():
+    """CTE pipelines are tagged where they filter on the date range and grouped and joined by period downstream"""
+    sql = derive_multi_period_pipeline("""
+        WITH totals AS (
+          SELECT c.agency_id, COUNT(*) AS total FROM care_stays c
+          WHERE SUBSTR(c.created_at, 1, 10) BETWEEN @start_date AND @end_date
+          GROUP BY c.agency_id
+        ),
+        diffs AS (
+          SELECT r.agency_id, r.hours FROM reservations r
+          WHERE TIMESTAMP(r.created_at) >= TIMESTAMP(@start_date) AND TIMESTAMP(r.created_at) < TIMESTAMP(@end_date)
+        )
+        SELECT t.agency_id, t.total, d.hours AS total_hours FROM totals t LEFT JOIN diffs d ON t.agency_id = d.agency_id
+    """, ["last_month", "last_year"])
+
+    assert sql.count(f"CROSS JOIN UNNEST(['last_month', 'last_year']) AS {PERIOD_COLUMN}") == 2
+    assert "@start_date " not in sql and "TIMESTAMP(@start_date)" not in sql
+    assert "SUBSTR(c.created_at, 1, 10) BETWEEN @start_date_last_year AND @end_date_last_year" in sql
+    assert "TIMESTAMP(r.created_at) < TIMESTAMP(@end_date_last_month)" in sql
+    assert f"GROUP BY {PERIOD_COLUMN}, c.agency_id" in " ".join(sql.split())
+    assert f"ON t.{PERIOD_COLUMN} = d.{PERIOD_COLUMN} AND (t.agency_id = d.agency_id)" in sql
+
+    # An aggregate-only select keeps returning a row for every period
+    sql = derive_multi_period_pipeline("""
+        WITH diffs AS (SELECT d.hours, d.is_swap FROM diffs_table d WHERE d.created_at BETWEEN @start_date AND @end_date)
+        SELECT AVG(hours) AS avg_hours FROM diffs WHERE is_swap = 'false'
+    """, ["last_month"])
+    assert f"FROM UNNEST(['last_month']) AS batch_period" in sql
+    assert f"LEFT JOIN diffs ON diffs.{PERIOD_COLUMN} = batch_period AND (is_swap = 'false')" in sql
+    # ... unless it counts rows, which the empty period's NULL row would distort
+    assert derive_multi_period_pipeline("""
+        WITH diffs AS (SELECT d.hours FROM diffs_table d WHERE d.created_at BETWEEN @start_date AND @end_date)
+        SELECT COUNT(*) AS cnt FROM diffs
+    """, ["last_month"]) is None
+
+def _manager_with_batched_rows(fetch_rows):
+    """Build a QueryManager whose variant scans return the given function's rows"""
+    from unittest.mock import patch, MagicMock
+    from app.utils.query_manager import QueryManager
+    from app.utils.query_result_cache import get_query_result_cache
+
+    with patch("app.utils.bigquery_connection.get_bigquery_client", return_value=MagicMock()):
+        manager = QueryManager()
+    manager.bq_connection._fetch_rows = MagicMock(side_effect=fetch_rows)
+    get_query_result_cache().clear()
+    return manager
+
+
+def test_batched_results_serve_per_agency_queries_from_the_cache():
+    """After a batched run and a warm-up, execute_query for one agency runs no BigQuery job"""
+    manager = _manager_with_batched_rows(
+        lambda sql, params, query_name=None, scan_scale=1: [{split_column: agency_id, "cnt": 1} for agency_id in params["agency_ids"]]
+    )
+    query_name = next(name for name in manager.batched_queries if name not in manager.agency_name_queries)
+    split_column = manager.batched_queries[query_name].split_column
+    params = {"start_date": "2025-01-01", "end_date": "2025-03-31"}
+
+    manager.execute_query_batched(query_name, ["a1", "a2"], params)
+    assert manager.bq_connection._fetch_rows.call_args.kwargs["scan_scale"] == 2
+    assert manager.execute_query(query_name, {**params, "agency_id": "a2"})[0]["cnt"] == 1
+    manager.bq_connection.client.query.assert_not_called()
+
+    manager = _manager_with_batched_rows(lambda sql, params, query_name=None, scan_scale=1: [])
+    warmed = manager.warm_agency_queries(["a1", "a2"], ["last_month", "last_quarter"])
+    query_name = next(name for name in warmed if name in manager.batched_queries and name not in manager.agency_name_queries)
+    assert manager.execute_query(query_name, manager._period_params({"agency_id": "a1"}, "last_quarter")) == []
+    manager.bq_connection.client.query.assert_not_called()
+
+
+def test_query_variants_are_derived_once_per_process():
+    """Further QueryManager instances reuse the derived variants instead of rewriting every query"""
+    from unittest.mock import patch
+    first = _manager_with_batched_rows(lambda sql, params, query_name=None, scan_scale=1: [])
+    with patch("app.utils.query_manager.derive_batched_query") as derive, \
+            patch("app.utils.query_manager.drop_agency_join") as drop:
+        second = _manager_with_batched_rows(lambda sql, params, query_name=None, scan_scale=1: [])
+    derive.assert_not_called()
+    drop.assert_not_called()
+    assert second.batched_queries is first.batched_queries
+    assert second._multi_period_queries is first._multi_period_queries
@@ -0,0 +1,41 @@
+from app.utils.query_fingerprint import QueryFingerprintRegistry, record_query, recording_queries
+from app.utils.query_result_cache import sql_hash
+
+
+def _registry(queries):
+    registry = QueryFingerprintRegistry()
+    registry._hash_by_name = {name: sql_hash(sql)[:16] for name, sql in queries.items()}
+    registry._name_by_hash = {hash_: name for name, hash_ in registry._hash_by_name.items()}
+    return registry
+
+
+def test_entries_of_changed_sql_or_version_are_stale():
+    """A fingerprint stays current until the SQL of a query it used or the endpoint version changes"""
+    registry = _registry({"quotas": "SELECT 1", "stays": "SELECT 2"})
+
+    with recording_queries() as recorded:
+        record_query("SELECT 1")
+        record_query("SELECT 3")  # runtime-built SQL is not part of the fingerprint
+    fingerprint = registry.build(recorded, version=2)
+
+    assert registry.is_current(fingerprint, 2)
+    assert not registry.is_current(fingerprint, 3)
+
+    # Changing a query the entry did not use keeps it current
+    registry = _registry({"quotas": "SELECT 1", "stays": "SELECT 2 -- changed"})
+    assert registry.is_current(fingerprint, 2)
+
+    registry = _registry({"quotas": "SELECT 1 -- changed", "stays": "SELECT 2"})
+    assert not registry.is_current(fingerprint, 2)
+    assert registry.get_stats()["stale_entries_detected"] == 1
+
+    # Entries cached before fingerprinting are kept
+    assert registry.is_current(None, 2)
+
+
+def test_queries_are_only_recorded_while_recording():
+    """Queries outside of a recording context are ignored"""
+    record_query("SELECT 1")
+    with recording_queries() as recorded:
+        record_query("SELECT 1")
+    assert recorded == {sql_hash("SELECT 1")[:16]}
@@ -0,0 +1,57 @@
+import threading
+import time
+from collections import Counter
+from unittest.mock import patch, MagicMock
+from app.utils.query_graph import QueryGraph
+from app.utils.query_manager import QueryManager
+
+
+def test_graph_deduplicates_and_runs_nodes_concurrently():
+    """Identical (query, params) pairs run once and independent queries overlap"""
+    calls = Counter()
+    lock = threading.Lock()
+
+    def run_query(name, params):
+        with lock:
+            calls[name] += 1
+        time.sleep(0.2)
+        return [{"name": name}]
+
+    graph = QueryGraph(run_query)
+    params = {"agency_id": "a1", "start_date": "2025-01-01", "end_date": "2025-03-31"}
+    for name in ("Q1", "Q2", "Q3", "Q4"):
+        graph.add_query(name, dict(params))
+    graph.add_query("Q1", dict(reversed(list(params.items()))), node="Q1_again")
+    graph.add_derived("combined", lambda r: sorted(row[0]["name"] for row in r.values()),
+                      depends_on=["Q1", "Q2", "Q3", "Q4", "Q1_again"])
+
+    start = time.perf_counter()
+    results = graph.run()
+    elapsed = time.perf_counter() - start
+
+    assert results["combined"] == ["Q1", "Q1", "Q2", "Q3", "Q4"]
+    assert calls == Counter({"Q1": 1, "Q2": 1, "Q3": 1, "Q4": 1})
+    assert graph.stats["deduplicated_queries"] == 1
+    assert elapsed < 0.6
+
+
+def test_get_all_quotas_executes_each_query_once():
+    """Queries shared by several quota metrics are only sent to BigQuery once"""
+    with patch("app.utils.bigquery_connection.get_bigquery_client", return_value=MagicMock()):
+        manager = QueryManager()
+
+    executed = Counter()
+    lock = threading.Lock()
+
+    def execute(query, params=None, query_name=None):
+        with lock:
+            executed[query] += 1
+        return []
+
+    manager.bq_connection.execute_query = execute
+    result = manager.get_all_quotas("a1", "2025-01-01", "2025-03-31")
+
+    assert result["selected_agency"]["total_postings"] == 0
+    assert executed[manager.queries["GET_AGENCY_RESERVATIONS"]] == 1
+    assert executed[manager.queries["GET_FULFILLED_RESERVATIONS"]] == 1
+    assert all(count == 1 for count in executed.values())
@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from app.utils.query_metrics import QueryMetrics
+
+
+def test_job_statistics_are_rendered_as_prometheus_histograms():
+    """Wall/queue/slot/bytes land in cumulative buckets; cache hits are counted separately"""
+    metrics = QueryMetrics()
+    created = datetime(2024, 1, 1, 12, 0, 0)
+    job = SimpleNamespace(
+        created=created,
+        started=created + timedelta(seconds=2),
+        slot_millis=500,
+        total_bytes_processed=50 * 1024 ** 2,
+        cache_hit=False
+    )
+    metrics.observe_job("GET_PV_COUNT", 0.3, job)
+    metrics.observe_job("GET_PV_COUNT", 0.1, SimpleNamespace(cache_hit=True, slot_millis=None))
+    metrics.observe_error("GET_PV_COUNT")
+
+    text = metrics.render_prometheus()
+    assert 'bigquery_query_wall_seconds_bucket{query="GET_PV_COUNT",le="0.1"} 1' in text
+    assert 'bigquery_query_wall_seconds_bucket{query="GET_PV_COUNT",le="0.5"} 2' in text
+    assert 'bigquery_query_wall_seconds_count{query="GET_PV_COUNT"} 2' in text
+    assert 'bigquery_query_queue_seconds_sum{query="GET_PV_COUNT"} 2' in text
+    assert 'bigquery_query_slot_milliseconds_count{query="GET_PV_COUNT"} 1' in text
+    assert 'bigquery_query_bytes_processed_bucket{query="GET_PV_COUNT",le="104857600"} 1' in text
+    assert 'bigquery_queries_total{query="GET_PV_COUNT",cache_hit="true"} 1' in text
+    assert 'bigquery_queries_total{query="GET_PV_COUNT",cache_hit="false"} 1' in text
+    assert 'bigquery_query_errors_total{query="GET_PV_COUNT"} 1' in text
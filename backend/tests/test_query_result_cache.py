@@ -0,0 +1,38 @@
+import time
+from app.utils.query_result_cache import QueryResultCache, make_cache_key
+
+
+def test_keys_are_canonical():
+    """Parameter order and SQL whitespace do not change the key"""
+    assert make_cache_key("SELECT  1\n", {"a": 1, "b": 2}) == make_cache_key("SELECT 1", {"b": 2, "a": 1})
+    assert make_cache_key("SELECT 1", None, query_name="GET_PV_COUNT")[0] == "GET_PV_COUNT"
+
+
+def test_lru_eviction_ttl_and_counters():
+    """Entries expire after their TTL and the least recently used entry is evicted first"""
+    cache = QueryResultCache(max_entries=2, max_bytes=1024 * 1024, default_ttl_seconds=60)
+    cache.put(("A", "{}"), [{"value": 1}])
+    cache.put(("B", "{}"), [{"value": 2}])
+    assert cache.get(("A", "{}")) == [{"value": 1}]  # A is now most recently used
+
+    cache.put(("C", "{}"), [{"value": 3}])
+    assert cache.get(("B", "{}")) is None
+    assert cache.get(("A", "{}")) == [{"value": 1}]
+
+    cache.put(("D", "{}"), [{"value": 4}], ttl_seconds=0.05)
+    time.sleep(0.1)
+    assert cache.get(("D", "{}")) is None
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["evictions"] == 2
+    assert stats["expirations"] == 1
+
+
+def test_cached_rows_are_isolated_from_callers():
+    """Modifying returned rows does not change the cached result"""
+    cache = QueryResultCache(max_entries=10, max_bytes=1024 * 1024, default_ttl_seconds=60)
+    cache.put(("A", "{}"), [{"value": 1}])
+    cache.get(("A", "{}"))[0]["value"] = 99
+    assert cache.get(("A", "{}")) == [{"value": 1}]
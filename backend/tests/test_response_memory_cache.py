@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+from app.utils.response_memory_cache import ResponseMemoryCache
+
+
+def test_least_recently_used_responses_are_evicted():
+    """The tier stays within its size limit, evicting the least recently used response"""
+    cache = ResponseMemoryCache(max_entries=10, max_bytes=100, ttl_seconds=300)
+    expires_at = datetime.utcnow() + timedelta(hours=1)
+    cache.put("/a", {"a": 1}, 40, expires_at)
+    cache.put("/b", {"b": 1}, 40, expires_at)
+    assert cache.get("/a") == ({"a": 1}, None)
+
+    cache.put("/c", {"c": 1}, 40, expires_at, fingerprint="fp")
+    assert cache.get("/b") is None
+    assert cache.get("/c") == ({"c": 1}, "fp")
+
+    cache.put("/huge", {}, 1000, expires_at)
+    assert cache.get_stats()["rejected_oversized"] == 1
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_responses_expire_with_the_sqlite_entry():
+    """Expired entries are misses and entries without expiry are bounded by the TTL"""
+    cache = ResponseMemoryCache(max_entries=10, max_bytes=1000, ttl_seconds=300)
+    cache.put("/expired", {}, 10, datetime.utcnow() - timedelta(seconds=1))
+    assert cache.get("/expired") is None
+
+    cache.put("/no-expiry", {}, 10, None)
+    assert cache._entries["/no-expiry"][0] <= datetime.utcnow() + timedelta(seconds=300)
+
+    cache.put("/expiring", {}, 10, datetime.utcnow() + timedelta(hours=1))
+    cache._entries["/expiring"] = (datetime.utcnow() - timedelta(seconds=1),) + cache._entries["/expiring"][1:]
+    assert cache.get("/expiring") is None
+    assert cache.get_stats()["expirations"] == 1
@@ -0,0 +1,34 @@
+from app.utils.shadow_execution import ShadowRunner, diff_rows
+
+
+def test_diff_ignores_row_order_and_float_noise():
+    """Rows may come back in any order and aggregates may differ in the last bits"""
+    expected = [{"agency_id": "a", "quota": 0.1 + 0.2}, {"agency_id": "b", "quota": 1.0}]
+    actual = [{"agency_id": "b", "quota": 1.0}, {"agency_id": "a", "quota": 0.3}]
+    assert diff_rows(expected, actual) is None
+
+    assert diff_rows(expected, actual[:1])["reason"] == "row_count"
+    difference = diff_rows(expected, [{"agency_id": "b", "quota": 1.0}, {"agency_id": "a", "quota": 0.31}])
+    assert difference["reason"] == "row_mismatch"
+
+
+def test_mismatches_and_errors_are_reported_per_path():
+    """Each path is compared against the reference; failing paths count as errors"""
+    runner = ShadowRunner(sample_rate=1.0)
+
+    def failing():
+        raise RuntimeError("boom")
+
+    runner._compare(
+        "GET_QUOTAS", {"agency_id": "a"}, lambda: [{"value": 1}],
+        {"same": lambda: [{"value": 1}], "different": lambda: [{"value": 2}], "failing": failing}
+    )
+    report = runner.get_report()
+
+    assert report["queries"]["GET_QUOTAS"]["same"]["mismatches"] == 0
+    assert report["queries"]["GET_QUOTAS"]["different"]["mismatches"] == 1
+    assert report["queries"]["GET_QUOTAS"]["failing"]["errors"] == 1
+    assert [mismatch["path"] for mismatch in report["recent_mismatches"]] == ["different"]
+
+    runner.reset()
+    assert runner.get_report()["queries"] == {}